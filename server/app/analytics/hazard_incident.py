@@ -1,8 +1,10 @@
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
-from datetime import timedelta
+
+from ..services.datetimes import ensure_datetime
 
 try:
     import networkx as nx
@@ -28,19 +30,53 @@ def _get_sheet(workbook: dict, token: str):
 
 
 def _coerce_datetime(df: pd.DataFrame, cols):
-    for c in cols:
-        if c in df.columns:
-            try:
-                df[c] = pd.to_datetime(df[c], errors='coerce')
-            except Exception:
-                pass
-    return df
+    # Columns already parsed at load time are skipped
+    return ensure_datetime(df, cols)
+
+
+_NS_PER_DAY = 86_400 * 10**9
+
+
+def _window_join(inc_keys, inc_dates, haz_keys, haz_starts, haz_ends):
+    """
+    Pairs (hazard position, incident position) with equal keys and
+    ``start <= incident date <= end``; dates are int64 nanoseconds.
+
+    Incidents are sorted once by (key, date) and each hazard's window is two
+    binary searches, so the cost is O((H + I) log I + links). Pairs come out
+    by hazard, then incident position, like a scan of both frames would.
+    """
+    # Rank every date that is compared, so (key, date) packs into one sortable int64
+    stamps = np.unique(np.concatenate([inc_dates, haz_starts, haz_ends]))
+    width = np.int64(len(stamps))
+    inc_packed = inc_keys * width + np.searchsorted(stamps, inc_dates)
+    order = np.argsort(inc_packed, kind='stable')
+    packed_sorted = inc_packed[order]
+    lo = np.searchsorted(packed_sorted, haz_keys * width + np.searchsorted(stamps, haz_starts), side='left')
+    hi = np.searchsorted(packed_sorted, haz_keys * width + np.searchsorted(stamps, haz_ends), side='right')
+
+    counts = np.maximum(hi - lo, 0)
+    total = int(counts.sum())
+    haz_idx = np.repeat(np.arange(len(haz_keys)), counts)
+    # Position of each pair inside its hazard's window
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    inc_idx = order[np.repeat(lo, counts) + offsets]
+    # Within a hazard, incidents in frame order (the window is in date order)
+    final = np.lexsort((inc_idx, haz_idx))
+    return haz_idx[final], inc_idx[final]
 
 
 class HazardIncidentAnalyzer:
     """Analyze the relationship between hazards and incidents"""
 
-    def __init__(self, incident_df: pd.DataFrame, hazard_df: pd.DataFrame, relationships_df: pd.DataFrame | None = None):
+    def __init__(
+        self,
+        incident_df: pd.DataFrame,
+        hazard_df: pd.DataFrame,
+        relationships_df: pd.DataFrame | None = None,
+        window_days: int = 30,
+    ):
+        self.window_days = window_days
         self.incident_df = incident_df.copy() if incident_df is not None else pd.DataFrame()
         self.hazard_df = hazard_df.copy() if hazard_df is not None else pd.DataFrame()
         self.relationships_df = relationships_df.copy() if relationships_df is not None else pd.DataFrame()
@@ -83,50 +119,67 @@ class HazardIncidentAnalyzer:
 
         self.create_hazard_incident_links()
 
-    def create_hazard_incident_links(self, window_days: int = 30):
-        """Identify potential hazard-to-incident conversions by location+department proximity and time."""
+    def create_hazard_incident_links(self, window_days: int | None = None):
+        """
+        Identify potential hazard-to-incident conversions: incidents at the same
+        location and department dated within ``window_days`` (default: the
+        analyzer's ``window_days``) on or after the hazard.
+        """
+        if window_days is None:
+            window_days = self.window_days
         if not all([self.inc_date, self.haz_date, self.inc_loc, self.haz_loc, self.inc_dept, self.haz_dept]):
             self.links_df = pd.DataFrame()
             return
 
-        links: list[dict] = []
-        # Index incidents by (location, dept) for speed
-        inc = self.incident_df[[self.inc_id, self.inc_date, self.inc_loc, self.inc_dept, self.inc_sev, self.inc_type]].copy()
-        inc = inc.dropna(subset=[self.inc_date])
-
-        # Iterate hazards and select incident window
-        for _, haz in self.hazard_df.iterrows():
-            hz_dt = haz.get(self.haz_date)
-            hz_loc = haz.get(self.haz_loc)
-            hz_dept = haz.get(self.haz_dept)
-            if pd.isna(hz_dt) or pd.isna(hz_loc) or pd.isna(hz_dept):
-                continue
-            dt_start = hz_dt
-            dt_end = hz_dt + timedelta(days=window_days)
-            candid = inc[
-                (inc[self.inc_loc] == hz_loc) &
-                (inc[self.inc_dept] == hz_dept) &
-                (inc[self.inc_date] >= dt_start) &
-                (inc[self.inc_date] <= dt_end)
-            ]
-            if candid.empty:
-                continue
-            for _, inc_row in candid.iterrows():
-                links.append({
-                    'hazard_id': haz.get(self.haz_id),
-                    'incident_id': inc_row.get(self.inc_id),
-                    'hazard_date': hz_dt,
-                    'incident_date': inc_row.get(self.inc_date),
-                    'days_to_incident': (inc_row.get(self.inc_date) - hz_dt).days,
-                    'location': hz_loc,
-                    'department': hz_dept,
-                    'hazard_severity': haz.get(self.haz_sev, pd.NA),
-                    'incident_severity': inc_row.get(self.inc_sev, pd.NA),
-                    'hazard_type': haz.get(self.haz_type, 'Unknown'),
-                    'incident_type': inc_row.get(self.inc_type, 'Unknown')
-                })
-
-        self.links_df = pd.DataFrame(links)
+        inc, haz = self.incident_df, self.hazard_df
+        inc_ok = (inc[self.inc_date].notna() & inc[self.inc_loc].notna() & inc[self.inc_dept].notna()).to_numpy()
+        haz_ok = (haz[self.haz_date].notna() & haz[self.haz_loc].notna() & haz[self.haz_dept].notna()).to_numpy()
+        inc_rows = np.flatnonzero(inc_ok)
+        haz_rows = np.flatnonzero(haz_ok)
+        if not len(inc_rows) or not len(haz_rows):
+            self.links_df = pd.DataFrame()
+            return
+
+        # (location, department) codes shared by both frames; equal values share a code
+        n_inc = len(inc_rows)
+        loc_codes, _ = pd.factorize(pd.concat([inc[self.inc_loc].iloc[inc_rows], haz[self.haz_loc].iloc[haz_rows]], ignore_index=True))
+        dept_codes, _ = pd.factorize(pd.concat([inc[self.inc_dept].iloc[inc_rows], haz[self.haz_dept].iloc[haz_rows]], ignore_index=True))
+        pair_codes, _ = pd.factorize(loc_codes.astype(np.int64) * (int(dept_codes.max()) + 1) + dept_codes)
+        pair_codes = pair_codes.astype(np.int64)
+
+        inc_dates = inc[self.inc_date].iloc[inc_rows].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        haz_dates = haz[self.haz_date].iloc[haz_rows].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        haz_pos, inc_pos = _window_join(
+            pair_codes[:n_inc], inc_dates,
+            pair_codes[n_inc:], haz_dates, haz_dates + np.int64(window_days) * _NS_PER_DAY,
+        )
+        if not len(haz_pos):
+            self.links_df = pd.DataFrame()
+            return
+
+        hz = haz_rows[haz_pos]
+        ic = inc_rows[inc_pos]
+
+        def _values(df, col, rows, default):
+            if col is None or col not in df.columns:
+                return [default] * len(rows)
+            return df[col].iloc[rows].tolist()
+
+        # Built from Python values, so column dtypes are inferred as for the
+        # row-by-row records this replaced
+        self.links_df = pd.DataFrame({
+            'hazard_id': _values(haz, self.haz_id, hz, None),
+            'incident_id': _values(inc, self.inc_id, ic, None),
+            'hazard_date': _values(haz, self.haz_date, hz, None),
+            'incident_date': _values(inc, self.inc_date, ic, None),
+            'days_to_incident': ((inc_dates[inc_pos] - haz_dates[haz_pos]) // _NS_PER_DAY).tolist(),
+            'location': _values(haz, self.haz_loc, hz, None),
+            'department': _values(haz, self.haz_dept, hz, None),
+            'hazard_severity': _values(haz, self.haz_sev, hz, pd.NA),
+            'incident_severity': _values(inc, self.inc_sev, ic, pd.NA),
+            'hazard_type': _values(haz, self.haz_type, hz, 'Unknown'),
+            'incident_type': _values(inc, self.inc_type, ic, 'Unknown'),
+        })
 
     # ---------- Charts ----------
     def create_conversion_funnel(self) -> go.Figure:
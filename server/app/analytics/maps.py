@@ -128,7 +128,7 @@ def build_combined_map_html(inc_df: pd.DataFrame, haz_df: pd.DataFrame) -> str:
         key_col = 'location.1' if 'location.1' in df.columns else ('sublocation' if 'sublocation' in df.columns else ('location' if 'location' in df.columns else None))
         if not key_col:
             return
-        grp = df.groupby(key_col).agg(lat=('latitude','mean'), lon=('longitude','mean'), count=(key_col,'size')).reset_index()
+        grp = df.groupby(key_col, observed=True).agg(lat=('latitude','mean'), lon=('longitude','mean'), count=(key_col,'size')).reset_index()
         grp = grp.sort_values('count', ascending=False).head(max_labels)
         fg = folium.FeatureGroup(name=name, show=True)
         css = """
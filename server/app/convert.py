@@ -1,10 +1,117 @@
-import pandas as pd
+import argparse
+import datetime as dt
 import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
 import openpyxl
 from pathlib import Path
 
 
-def excel_to_sqlite(excel_file, sqlite_file=None, if_exists='replace'):
+# Columns matching these tokens get an index in fast mode
+INDEX_NAME_TOKENS = ('date', 'department', 'location', 'site')
+
+
+def sqlite_table_name(sheet_name):
+    """Clean a sheet name for use as a SQLite table name."""
+    # Replace spaces and special chars
+    table_name = str(sheet_name).replace(' ', '_').replace('-', '_')
+    table_name = ''.join(c for c in table_name if c.isalnum() or c == '_')
+    
+    # Handle empty sheet names
+    return table_name or 'sheet_unnamed'
+
+
+def _quote(identifier):
+    return '"' + str(identifier).replace('"', '""') + '"'
+
+
+def _column_affinity(series):
+    """SQLite column affinity for a pandas column."""
+    if pd.api.types.is_bool_dtype(series):
+        return 'INTEGER'
+    if pd.api.types.is_integer_dtype(series):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(series):
+        return 'REAL'
+    # Datetimes are stored as ISO text, like DataFrame.to_sql does
+    return 'TEXT'
+
+
+def _normalize_value(value):
+    """Convert a cell to a type sqlite3 can bind (datetimes -> 'YYYY-MM-DD HH:MM:SS')."""
+    if value is None or value is pd.NaT:
+        return None
+    if isinstance(value, (pd.Timestamp, dt.datetime)):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, dt.date):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, dt.time):
+        return value.strftime('%H:%M:%S')
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+def _column_values(series):
+    """Column as a list of bindable Python values, vectorized where the dtype allows."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        text = series.dt.strftime('%Y-%m-%d %H:%M:%S')
+        return text.where(series.notna(), None).tolist()
+    if pd.api.types.is_bool_dtype(series):
+        return series.astype(int).tolist()
+    if pd.api.types.is_integer_dtype(series) or pd.api.types.is_float_dtype(series):
+        if not series.hasnans:
+            return series.tolist()
+        return series.astype(object).where(series.notna(), None).tolist()
+    return [_normalize_value(v) for v in series.tolist()]
+
+
+def _index_columns(df):
+    """Date, department, location and id columns worth indexing."""
+    cols = []
+    for col in df.columns:
+        lc = str(col).lower()
+        if any(tok in lc for tok in INDEX_NAME_TOKENS) or lc == 'id' or lc.endswith('_id') or lc.endswith(' number'):
+            cols.append(col)
+    return cols
+
+
+def _write_table_fast(conn, table_name, df, if_exists='replace', chunk_size=5000):
+    """Create a typed table, bulk insert in chunks and add indexes. Caller commits."""
+    cur = conn.cursor()
+    exists = cur.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table_name,)
+    ).fetchone() is not None
+    if exists and if_exists == 'fail':
+        raise ValueError(f"Table '{table_name}' already exists.")
+    if exists and if_exists == 'replace':
+        cur.execute(f"DROP TABLE {_quote(table_name)}")
+        exists = False
+    if not exists:
+        col_defs = ', '.join(f"{_quote(c)} {_column_affinity(df[c])}" for c in df.columns)
+        cur.execute(f"CREATE TABLE {_quote(table_name)} ({col_defs})")
+
+    columns = [_column_values(df[c]) for c in df.columns]
+    placeholders = ', '.join('?' * len(df.columns))
+    insert_sql = f"INSERT INTO {_quote(table_name)} ({', '.join(_quote(c) for c in df.columns)}) VALUES ({placeholders})"
+    n = len(df)
+    for start in range(0, n, chunk_size):
+        end = min(start + chunk_size, n)
+        cur.executemany(insert_sql, zip(*(col[start:end] for col in columns)))
+
+    indexed = []
+    for col in _index_columns(df):
+        index_name = ''.join(c if c.isalnum() else '_' for c in f"idx_{table_name}_{col}")
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {_quote(index_name)} ON {_quote(table_name)} ({_quote(col)})")
+        indexed.append(str(col))
+    return indexed
+
+
+def excel_to_sqlite(excel_file, sqlite_file=None, if_exists='replace', fast=False, chunk_size=5000):
     """
     Convert an Excel file with all sheets to SQLite database.
     
@@ -16,6 +123,12 @@ def excel_to_sqlite(excel_file, sqlite_file=None, if_exists='replace'):
         Path to SQLite database file. If None, uses same name as Excel file
     if_exists : str, default 'replace'
         How to behave if table exists: 'fail', 'replace', 'append'
+    fast : bool, default False
+        Bulk mode: typed columns, datetimes stored as 'YYYY-MM-DD HH:MM:SS',
+        chunked executemany inside one transaction (WAL, synchronous=OFF),
+        indexes on date/department/location/id columns and ANALYZE at the end
+    chunk_size : int, default 5000
+        Rows per executemany batch in fast mode
     
     Returns:
     --------
@@ -29,6 +142,9 @@ def excel_to_sqlite(excel_file, sqlite_file=None, if_exists='replace'):
     # Read all sheets from Excel file
     excel_data = pd.read_excel(excel_file, sheet_name=None, engine='openpyxl')
     
+    if fast:
+        return _excel_data_to_sqlite_fast(excel_data, sqlite_file, if_exists, chunk_size)
+    
     # Connect to SQLite database
     conn = sqlite3.connect(sqlite_file)
     
@@ -37,13 +153,7 @@ def excel_to_sqlite(excel_file, sqlite_file=None, if_exists='replace'):
     try:
         # Iterate through each sheet
         for sheet_name, df in excel_data.items():
-            # Clean sheet name for use as table name (replace spaces and special chars)
-            table_name = sheet_name.replace(' ', '_').replace('-', '_')
-            table_name = ''.join(c for c in table_name if c.isalnum() or c == '_')
-            
-            # Handle empty sheet names
-            if not table_name:
-                table_name = 'sheet_unnamed'
+            table_name = sqlite_table_name(sheet_name)
             
             # Write DataFrame to SQLite
             df.to_sql(
@@ -70,6 +180,49 @@ def excel_to_sqlite(excel_file, sqlite_file=None, if_exists='replace'):
     return conversion_summary
 
 
+def _excel_data_to_sqlite_fast(excel_data, sqlite_file, if_exists='replace', chunk_size=5000):
+    conn = sqlite3.connect(sqlite_file, isolation_level=None)
+    conversion_summary = {}
+    total_rows = 0
+    start = time.perf_counter()
+    
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("BEGIN")
+        for sheet_name, df in excel_data.items():
+            table_name = sqlite_table_name(sheet_name)
+            t0 = time.perf_counter()
+            indexed = _write_table_fast(conn, table_name, df, if_exists=if_exists, chunk_size=chunk_size)
+            elapsed = time.perf_counter() - t0
+            total_rows += len(df)
+            
+            conversion_summary[sheet_name] = {
+                'table_name': table_name,
+                'rows': len(df),
+                'columns': len(df.columns),
+                'column_names': list(df.columns),
+                'indexes': indexed,
+            }
+            rate = len(df) / elapsed if elapsed > 0 else float('inf')
+            print(f"✓ Converted sheet '{sheet_name}' to table '{table_name}' ({len(df)} rows, {len(df.columns)} columns, {rate:,.0f} rows/sec, {len(indexed)} indexes)")
+        conn.execute("COMMIT")
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    
+    elapsed = time.perf_counter() - start
+    rate = total_rows / elapsed if elapsed > 0 else float('inf')
+    print(f"\n✓ Successfully created SQLite database: {sqlite_file} ({total_rows} rows in {elapsed:.2f}s, {rate:,.0f} rows/sec)")
+    return conversion_summary
+
+
 def verify_conversion(sqlite_file):
     """
     Verify the SQLite database by listing all tables and their info.
@@ -111,14 +264,19 @@ def verify_conversion(sqlite_file):
 
 # Example usage
 if __name__ == "__main__":
-    # Replace with your Excel file path
-    excel_file = "EPCL_VEHS_Data_Processed.xlsx"
+    parser = argparse.ArgumentParser(description="Convert an Excel workbook to a SQLite database")
+    parser.add_argument("excel_file", nargs="?", default="EPCL_VEHS_Data_Processed.xlsx")
+    parser.add_argument("--db", dest="sqlite_file", default=None, help="Output database (default: <excel stem>.db)")
+    parser.add_argument("--fast", action="store_true", help="Bulk mode with typed columns, indexes and ANALYZE")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    args = parser.parse_args()
+    excel_file = args.excel_file
     
     # Convert Excel to SQLite
-    summary = excel_to_sqlite(excel_file)
+    summary = excel_to_sqlite(excel_file, args.sqlite_file, fast=args.fast, chunk_size=args.chunk_size)
     
     # Verify the conversion
-    sqlite_file = Path(excel_file).stem + '.db'
+    sqlite_file = args.sqlite_file or Path(excel_file).stem + '.db'
     verify_conversion(sqlite_file)
     
     # Print detailed summary
@@ -130,4 +288,6 @@ if __name__ == "__main__":
         print(f"  → Table: {info['table_name']}")
         print(f"  → Rows: {info['rows']}")
         print(f"  → Columns: {info['columns']}")
-        print(f"  → Column names: {', '.join(info['column_names'])}")
\ No newline at end of file
+        print(f"  → Column names: {', '.join(info['column_names'])}")
+        if info.get('indexes'):
+            print(f"  → Indexes: {', '.join(info['indexes'])}")
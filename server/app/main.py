@@ -1,5 +1,7 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 import os
 from pathlib import Path
 
@@ -41,8 +43,24 @@ from .routers import (
 )
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from .services.watcher import start_workbook_watcher, stop_workbook_watcher
+    from .services.warmup import start_warmup
+    # Hot-reload the default workbook when it changes on disk
+    start_workbook_watcher()
+    # Load data and precompute dashboard responses before reporting ready
+    start_warmup()
+    yield
+    stop_workbook_watcher()
+
+
 def create_app() -> FastAPI:
-    app = FastAPI(title="Safety Copilot API", version="0.1.0")
+    app = FastAPI(title="Safety Copilot API", version="0.1.0", lifespan=lifespan)
+
+    # Serve ?workbook_id=<id> requests from an uploaded workbook (added first so CORS wraps it)
+    from .services.workbook_store import WorkbookContextMiddleware
+    app.add_middleware(WorkbookContextMiddleware)
 
     # CORS (explicit local origins + regex; adjust for production)
     app.add_middleware(
@@ -59,6 +77,13 @@ def create_app() -> FastAPI:
     async def health():
         return {"status": "ok"}
 
+    @app.get("/ready")
+    async def ready():
+        # 503 until the startup warm-up has finished, so traffic waits for warm caches
+        from .services.warmup import readiness
+        state = readiness()
+        return JSONResponse(content=state, status_code=200 if state["ready"] else 503)
+
     # Include feature routers
     app.include_router(workbooks.router)
     app.include_router(wordclouds.router)
@@ -15,6 +15,14 @@ from fastapi.responses import JSONResponse
 
 from ..services.excel import get_incident_df, get_hazard_df, get_audit_df, get_inspection_df, load_default_sheets
 from ..services.json_utils import to_native_json
+from ..services.data_cache import version_cached
+from ..services.filters import apply_analytics_filters, filter_row_ids, filters_from_params
+from ..services.filter_index import get_frame_index
+from ..services.classification import (
+    HEINRICH_COLUMNS, HEINRICH_LAYERS, heinrich_incident_levels, high_risk_mask,
+    pyramid_flags, pyramid_layers_by_group, severity_counts, severity_levels,
+    take_rows, unsafe_condition_mask,
+)
 
 
 router = APIRouter(prefix="/analytics/advanced", tags=["advanced-analytics"])
@@ -40,93 +48,6 @@ def _resolve_column(df: pd.DataFrame, candidates: List[str]) -> Optional[str]:
     return None
 
 
-def _apply_filters(
-    df: pd.DataFrame,
-    start_date: Optional[str] = None,
-    end_date: Optional[str] = None,
-    location: Optional[str] = None,
-    department: Optional[str] = None,
-    status: Optional[str] = None,
-) -> pd.DataFrame:
-    """Apply common filters to dataframe."""
-    if df is None or df.empty:
-        return df
-    
-    filtered = df.copy()
-    
-    # Date range filter
-    if start_date or end_date:
-        date_col = _resolve_column(filtered, ["occurrence_date", "date", "start_date", "reported_date"])
-        if date_col:
-            dates = pd.to_datetime(filtered[date_col], errors="coerce")
-            if start_date:
-                mask = dates >= pd.to_datetime(start_date)
-                filtered = filtered.loc[mask]
-            if end_date:
-                mask = dates <= pd.to_datetime(end_date)
-                filtered = filtered.loc[mask]
-    
-    # Location filter
-    if location is not None and location != "":
-        loc_col = _resolve_column(filtered, ["location", "audit_location", "finding_location"])
-        if loc_col:
-            filtered = filtered[
-                filtered[loc_col].astype(str).str.contains(str(location), case=False, na=False)
-            ]
-    
-    # Department filter
-    if department is not None and department != "":
-        dept_col = _resolve_column(filtered, ["department", "section", "sub_department"])
-        if dept_col:
-            filtered = filtered[
-                filtered[dept_col].astype(str).str.contains(str(department), case=False, na=False)
-            ]
-    
-    # Status filter
-    if status is not None and status != "":
-        status_col = _resolve_column(filtered, ["status", "incident_status", "audit_status", "hazard_status"])
-        if status_col:
-            filtered = filtered[
-                filtered[status_col].astype(str).str.contains(str(status), case=False, na=False)
-            ]
-    
-    return filtered
-
-
-def _classify_severity_level(severity_score: Any, severity_text: Any = None) -> str:
-    """
-    Classify severity into Heinrich Pyramid layers:
-    - Layer 1: Fatality/Serious Injury (severity >= 4 or 'Critical'/'Severe')
-    - Layer 2: Minor Injury (severity 2-3 or 'Serious'/'High')
-    - Layer 3: First Aid/Near Miss (severity 1 or 'Minor'/'Low')
-    - Layer 4: Unsafe Condition (from hazards)
-    - Layer 5: At-Risk Behavior (from observations/audits)
-    """
-    # Try text-based classification first
-    if severity_text and pd.notna(severity_text):
-        text = str(severity_text).lower().strip()
-        if any(k in text for k in ["critical", "fatal", "severe", "c4", "c3"]):
-            return "Serious Injury/Fatality"
-        if any(k in text for k in ["serious", "high", "c2", "moderate"]):
-            return "Minor Injury"
-        if any(k in text for k in ["minor", "low", "c1", "first aid", "near miss"]):
-            return "First Aid/Near Miss"
-    
-    # Numeric classification
-    try:
-        score = float(severity_score)
-        if score >= 3:
-            return "Serious Injury/Fatality"
-        elif score >= 2:
-            return "Minor Injury"
-        else:
-            return "First Aid/Near Miss"
-    except (ValueError, TypeError):
-        pass
-    
-    return "First Aid/Near Miss"  # Default to least severe
-
-
 def _calculate_near_miss_ratio(incidents_df: pd.DataFrame, hazards_df: pd.DataFrame) -> float:
     """Calculate near-miss to incident ratio (industry standard: 1 incident : 10 near-misses)."""
     if incidents_df is None or incidents_df.empty:
@@ -153,42 +74,8 @@ def _calculate_near_miss_ratio(incidents_df: pd.DataFrame, hazards_df: pd.DataFr
 
 # ======================= HEINRICH'S SAFETY PYRAMID =======================
 
-def _classify_heinrich_level(row: pd.Series) -> tuple:
-    """
-    Classify incident into Heinrich pyramid level based on consequence severity.
-    
-    Returns:
-        tuple: (level, description)
-        - Level 1: Fatalities (C4-C5 Injuries)
-        - Level 2: Serious Injuries (C3)
-        - Level 3: Minor Injuries (C1-C2)
-        - Level 4: Near Misses (C0 actual with C3-C5 worst)
-        - Level 5: Unsafe Conditions (from hazards/audits)
-    """
-    actual = str(row.get('actual_consequence_incident', '')).strip()
-    worst = str(row.get('worst_case_consequence_incident', '')).strip()
-    inc_type = str(row.get('incident_type', '')).lower().strip()
-    
-    # Level 1: Fatalities (C4-C5 Injuries)
-    if 'injury' in inc_type and any(x in actual for x in ['C4', 'C5', 'c4', 'c5', 'Major', 'Catastrophic']):
-        return (1, 'Fatalities (C4 and C5 Injuries)')
-    
-    # Level 2: Serious Injuries (C3)
-    if 'injury' in inc_type and any(x in actual for x in ['C3', 'c3', 'Severe']):
-        return (2, 'Serious Injuries (C3)')
-    
-    # Level 3: Minor Injuries (C1-C2)
-    if 'injury' in inc_type and any(x in actual for x in ['C1', 'C2', 'c1', 'c2', 'Minor', 'Serious']):
-        return (3, 'Minor Injuries (C1 and C2)')
-    
-    # Level 4: Near Misses (C0 actual with C3-C5 worst)
-    if any(x in actual for x in ['C0', 'c0']) and any(x in worst for x in ['C3', 'C4', 'C5', 'c3', 'c4', 'c5']):
-        return (4, 'Near Misses (C0 actual, C3 to C5 worst)')
-    
-    return (None, None)
-
-
 @router.get("/heinrich-pyramid")
+@version_cached
 async def heinrich_safety_pyramid():
     """
     Heinrich's Safety Pyramid - exact implementation matching reference logic.
@@ -199,67 +86,23 @@ async def heinrich_safety_pyramid():
     hazard_df = sheets.get('Hazard ID')
     audit_df = sheets.get('Audit Findings')
     
-    # Clean column names (strip only)
-    for df in [incident_df, hazard_df, audit_df]:
-        if df is not None and not df.empty:
-            df.columns = df.columns.str.strip()
-    
-    # Classification function for incidents (exact match to reference)
-    def classify_heinrich_level(row):
-        actual = str(row.get('Actual Consequence (Incident)', '')).strip()
-        worst = str(row.get('Worst Case Consequence (Incident)', '')).strip()
-        inc_type = str(row.get('Incident Type(s)', '')).lower().strip()
-
-        if inc_type == 'injury' and actual in ['C4 - Major', 'C5 - Catastrophic']:
-            return 1, 'Fatality (C4–C5 Injury)'
-        elif inc_type == 'injury' and actual == 'C3 - Severe':
-            return 2, 'Serious Injury (C3)'
-        elif inc_type == 'injury' and actual in ['C1 - Minor', 'C2 - Serious']:
-            return 3, 'Minor Injury (C1–C2)'
-        elif actual.startswith('C0') and any(x in worst for x in ['C3', 'C4', 'C5']):
-            return 4, 'Near Miss (C0 actual, C3–C5 worst)'
-        return None, None
-    
-    # Apply classification to incidents
+    # Layers are classified once per dataset version (exact reference rules,
+    # column names matched after stripping); the sheets themselves are not modified
+    layers = []
     if incident_df is not None and not incident_df.empty:
-        incident_df[['Heinrich_Level', 'Heinrich_Desc']] = incident_df.apply(
-            classify_heinrich_level, axis=1, result_type='expand'
-        )
+        layers.append(heinrich_incident_levels(incident_df)['Heinrich_Level'].dropna().astype(int).to_numpy())
     
-    # Hazards as Unsafe Conditions
+    # Hazards as Unsafe Conditions (worst case exactly C1 - Minor / C2 - Serious)
     if hazard_df is not None and not hazard_df.empty:
-        def _is_hazard_level5(x):
-            val = str(x).strip()
-            # Exact match including case variations
-            return val in ['C1 - Minor', 'C2 - Serious']
-        
-        hazard_df['Heinrich_Level'] = hazard_df['Worst Case Consequence Potential (Hazard ID)'].apply(
-            lambda x: 5 if _is_hazard_level5(x) else None
-        )
-        hazard_df['Heinrich_Desc'] = hazard_df['Heinrich_Level'].apply(
-            lambda x: 'Unsafe Condition (Hazard)' if x == 5 else None
-        )
+        mask = unsafe_condition_mask(hazard_df, HEINRICH_COLUMNS['hazard_worst'], match='exact')
+        layers.append(np.full(int(mask.sum()), 5))
     
-    # Audits as Unsafe Conditions (Level 5)
+    # Audits as Unsafe Conditions (Level 5); values may be semicolon-separated
     if audit_df is not None and not audit_df.empty:
-        def _is_audit_level5(x):
-            val = str(x).strip()
-            # Check if string contains C1 - Minor or C2 - Serious (handles semicolon-separated values)
-            return 'C1 - Minor' in val or 'C2 - Serious' in val
-        
-        audit_df['Heinrich_Level'] = audit_df['Worst Case Consequence'].apply(
-            lambda x: 5 if _is_audit_level5(x) else None
-        )
-        audit_df['Heinrich_Desc'] = audit_df['Heinrich_Level'].apply(
-            lambda x: 'Unsafe Condition (Audit)' if x == 5 else None
-        )
+        mask = unsafe_condition_mask(audit_df, HEINRICH_COLUMNS['audit_worst'], match='contains')
+        layers.append(np.full(int(mask.sum()), 5))
     
-    # Combine all data (exact approach from reference)
-    combined = pd.concat([
-        incident_df.dropna(subset=['Heinrich_Level'])[['Heinrich_Level', 'Heinrich_Desc']] if incident_df is not None else pd.DataFrame(),
-        hazard_df.dropna(subset=['Heinrich_Level'])[['Heinrich_Level', 'Heinrich_Desc']] if hazard_df is not None else pd.DataFrame(),
-        audit_df.dropna(subset=['Heinrich_Level'])[['Heinrich_Level', 'Heinrich_Desc']] if audit_df is not None else pd.DataFrame()
-    ], ignore_index=True)
+    combined = pd.DataFrame({'Heinrich_Level': np.concatenate(layers) if layers else np.zeros(0, dtype=int)})
     
     # Predefine all levels with zero counts (red to green safety gradient)
     all_levels = pd.DataFrame({
@@ -302,6 +145,7 @@ async def heinrich_safety_pyramid():
 
 
 @router.get("/hse-metrics")
+@version_cached
 async def hse_metrics():
     """
     Calculate HSE metrics including incidents, near-miss ratio, and injury statistics.
@@ -312,11 +156,6 @@ async def hse_metrics():
     hazard_df = sheets.get('Hazard ID')
     audit_df = sheets.get('Audit Findings')
     
-    # Clean column names
-    for df in [incident_df, hazard_df, audit_df]:
-        if df is not None and not df.empty:
-            df.columns = df.columns.str.strip()
-    
     # Initialize metrics
     fatalities = 0
     serious_injuries = 0
@@ -326,47 +165,25 @@ async def hse_metrics():
     total_incidents = 0
     injuries_total = 0
     
-    # Calculate from incidents
+    # Calculate from incidents (shared pyramid classification)
     if incident_df is not None and not incident_df.empty:
         total_incidents = len(incident_df)
+        classified = heinrich_incident_levels(incident_df)
+        codes = classified['Heinrich_Level'].cat.codes.to_numpy()
+        per_layer = np.bincount(codes[codes >= 0], minlength=len(HEINRICH_LAYERS))
         
-        # Filter injuries
-        injuries = incident_df[
-            incident_df['Incident Type(s)'].str.lower().str.strip() == 'injury'
-        ]
-        injuries_total = len(injuries)
-        
-        # Fatalities (C4-C5)
-        fatalities = len(injuries[
-            injuries['Actual Consequence (Incident)'].isin(['C4 - Major', 'C5 - Catastrophic'])
-        ])
-        
-        # Serious Injuries (C3)
-        serious_injuries = len(injuries[
-            injuries['Actual Consequence (Incident)'] == 'C3 - Severe'
-        ])
-        
-        # Recordable Injuries (C2-C5)
-        recordable_injuries = len(injuries[
-            injuries['Actual Consequence (Incident)'].isin(['C2 - Serious', 'C3 - Severe', 'C4 - Major', 'C5 - Catastrophic'])
-        ])
-        
-        # Near Misses (C0 actual with C3-C5 worst)
-        near_misses = len(incident_df[
-            (incident_df['Actual Consequence (Incident)'].astype(str).str.startswith('C0', na=False)) &
-            (incident_df['Worst Case Consequence (Incident)'].astype(str).str.contains('C3|C4|C5', na=False))
-        ])
+        injuries_total = int(classified['Injury'].sum())
+        fatalities = int(per_layer[0])  # Layer 1: C4-C5 injuries
+        serious_injuries = int(per_layer[1])  # Layer 2: C3 injuries
+        recordable_injuries = int(classified['Recordable'].sum())  # C2-C5 injuries
+        near_misses = int(per_layer[3])  # Layer 4: C0 actual with C3-C5 worst
     
     # Calculate at-risk behaviors (Unsafe Conditions)
     if hazard_df is not None and not hazard_df.empty:
-        at_risk_behaviors += len(hazard_df[
-            hazard_df['Worst Case Consequence Potential (Hazard ID)'].astype(str).str.strip().isin(['C1 - Minor', 'C2 - Serious'])
-        ])
+        at_risk_behaviors += int(unsafe_condition_mask(hazard_df, HEINRICH_COLUMNS['hazard_worst'], match='exact').sum())
     
     if audit_df is not None and not audit_df.empty:
-        at_risk_behaviors += len(audit_df[
-            audit_df['Worst Case Consequence'].astype(str).str.strip().isin(['C1 - Minor', 'C2 - Serious'])
-        ])
+        at_risk_behaviors += int(unsafe_condition_mask(audit_df, HEINRICH_COLUMNS['audit_worst'], match='exact').sum())
     
     # Calculate near-miss ratio
     near_miss_ratio = f"{near_misses / injuries_total:.2f}:1" if injuries_total > 0 else "N/A"
@@ -385,6 +202,7 @@ async def hse_metrics():
 
 
 @router.get("/injury-risk-by-department")
+@version_cached
 async def injury_risk_by_department():
     """
     Compute ISO 45001-style injury risk per Department using exact column names:
@@ -453,11 +271,11 @@ async def injury_risk_by_department():
 
     injuries_df['Department'] = injuries_df['Department'].astype(str).replace({'': 'Unknown', 'nan': 'Unknown'})
 
-    injuries_df['Actual_Severity'] = injuries_df['Actual Consequence (Incident)'].map(severity_scores).fillna(0)
-    injuries_df['Worst_Severity'] = injuries_df['Worst Case Consequence (Incident)'].map(severity_scores).fillna(0)
+    injuries_df['Actual_Severity'] = injuries_df['Actual Consequence (Incident)'].astype(object).map(severity_scores).fillna(0)
+    injuries_df['Worst_Severity'] = injuries_df['Worst Case Consequence (Incident)'].astype(object).map(severity_scores).fillna(0)
 
     # Injury counts per department -> Likelihood quintiles
-    injury_counts = injuries_df.groupby('Department').size().reset_index(name='Injury_Count')
+    injury_counts = injuries_df.groupby('Department', observed=True).size().reset_index(name='Injury_Count')
     if len(injury_counts) > 1:
         qs = injury_counts['Injury_Count'].quantile([0.2, 0.4, 0.6, 0.8]).values
     else:
@@ -478,7 +296,7 @@ async def injury_risk_by_department():
     injury_counts['Likelihood'] = injury_counts['Injury_Count'].apply(assign_likelihood)
 
     # Aggregate by department
-    dept_summary = injuries_df.groupby('Department').agg(
+    dept_summary = injuries_df.groupby('Department', observed=True).agg(
         Injury_Count=('Incident Number', 'count'),
         Sum_Actual_Severity=('Actual_Severity', 'sum'),
         Sum_Worst_Severity=('Worst_Severity', 'sum'),
@@ -523,9 +341,23 @@ async def injury_risk_by_department():
 
 
 @router.get("/heinrich-pyramid-breakdown")
+@version_cached
 async def heinrich_pyramid_breakdown(
     start_date: Optional[str] = Query(None, description="Filter start date (YYYY-MM-DD)"),
     end_date: Optional[str] = Query(None, description="Filter end date (YYYY-MM-DD)"),
+    departments: Optional[List[str]] = Query(None, description="Filter by departments"),
+    locations: Optional[List[str]] = Query(None, description="Filter by locations"),
+    sublocations: Optional[List[str]] = Query(None, description="Filter by sublocations"),
+    min_severity: Optional[float] = Query(None, ge=0, le=5, description="Min severity"),
+    max_severity: Optional[float] = Query(None, ge=0, le=5, description="Max severity"),
+    min_risk: Optional[float] = Query(None, ge=0, le=5, description="Min risk"),
+    max_risk: Optional[float] = Query(None, ge=0, le=5, description="Max risk"),
+    statuses: Optional[List[str]] = Query(None, description="Filter by status"),
+    incident_types: Optional[List[str]] = Query(None, description="Filter by incident types"),
+    violation_types: Optional[List[str]] = Query(None, description="Filter by violation types"),
+    location: Optional[str] = Query(None, description="Location contains (case-insensitive)"),
+    department: Optional[str] = Query(None, description="Department contains (case-insensitive)"),
+    status: Optional[str] = Query(None, description="Status contains (case-insensitive)"),
 ):
     """
     Detailed breakdown of Heinrich's Pyramid by Department and Location.
@@ -543,14 +375,16 @@ async def heinrich_pyramid_breakdown(
     - Audits: Audit Findings sheet
     - Inspections: Inspection Findings sheet
     """
-    inc_df = get_incident_df()
+    inc_source = get_incident_df()
     haz_df = get_hazard_df()
     aud_df = get_audit_df()
     insp_df = get_inspection_df()
     
-    # Apply date filters
-    inc_df = _apply_filters(inc_df, start_date, end_date, None, None)
-    haz_df = _apply_filters(haz_df, start_date, end_date, None, None)
+    # Apply filters
+    filters = filters_from_params(locals())
+    inc_rows = filter_row_ids(inc_source, **filters)
+    inc_df = apply_analytics_filters(inc_source, **filters)
+    haz_df = apply_analytics_filters(haz_df, **filters)
     
     breakdown = {
         "by_department": [],
@@ -560,157 +394,72 @@ async def heinrich_pyramid_breakdown(
             "lost_workday_cases": "Incident sheet (severity_score >= 3, excluding fatalities)",
             "recordable_injuries": "Incident sheet (severity_score >= 2, excluding LTI and fatalities)",
             "near_misses": "Hazard ID sheet + Incident sheet (incident_type contains 'near miss')",
-            "at_risk_behaviors": "Audit Findings sheet + Inspection Findings sheet (non-null findings)"
+            "at_risk_behaviors": "Audit Findings sheet + Inspection Findings sheet (non-null findings)",
+            "layer_counting": "Each department/location is counted on its own incident rows only (earlier releases misaligned row masks when the sheet index was not 0..n-1, so fatality, lost workday and recordable counts were wrong)",
         }
     }
     
+    if inc_df is None or inc_df.empty:
+        return JSONResponse(content=to_native_json(breakdown))
+    
+    # Per-row layer inputs, classified once per dataset version; the
+    # fatality threshold (>= 5 or >= 4) still depends on each group's maximum
+    sev_col = _resolve_column(inc_df, ["severity_score", "severity"])
+    act_cons = _resolve_column(inc_df, ["actual_consequence_incident"])
+    worst_cons = _resolve_column(inc_df, ["worst_case_consequence_incident"])
+    type_col = _resolve_column(inc_df, ["incident_type", "category"])
+    flags = take_rows(pyramid_flags(inc_source, sev_col, act_cons, worst_cons, type_col), inc_rows)
+    
+    def _value_counts(df: Optional[pd.DataFrame], col: Optional[str]) -> Dict[Any, int]:
+        # Rows equal to each value (a dict, so lookups are always by label)
+        if df is None or df.empty or not col or col not in df.columns:
+            return {}
+        return df[col].value_counts().to_dict()
+    
+    def _contains_counts(df: Optional[pd.DataFrame], col: Optional[str], values) -> List[int]:
+        # Rows whose value contains each group name (case-insensitive regex), per distinct value
+        if df is None or df.empty or not col or col not in df.columns:
+            return [0] * len(values)
+        text = get_frame_index(df).substring(col)
+        return [int(text.counts[text.contains_lut(str(v))].sum()) for v in values]
+    
+    def _rows(group_col: str, label: str, near_miss_counts: Dict[Any, int], at_risk: List[int]) -> List[Dict[str, Any]]:
+        layers = pyramid_layers_by_group(flags, inc_df[group_col], has_severity=bool(sev_col))
+        out = []
+        for i, row in enumerate(layers.itertuples(index=False)):
+            out.append({
+                label: str(row.group),
+                "fatalities": int(row.fatalities),
+                "lost_workday_cases": int(row.lost_workday_cases),
+                "recordable_injuries": int(row.recordable_injuries),
+                "near_misses": int(row.near_misses) + int(near_miss_counts.get(row.group, 0)),
+                "at_risk_behaviors": at_risk[i],
+                "total_incidents": int(row.total_incidents),
+            })
+        return out
+    
     # Department breakdown
-    if inc_df is not None and not inc_df.empty:
-        dept_col = _resolve_column(inc_df, ["department", "sub_department"])
-        sev_col = _resolve_column(inc_df, ["severity_score", "severity"])
-        act_cons = _resolve_column(inc_df, ["actual_consequence_incident"])
-        worst_cons = _resolve_column(inc_df, ["worst_case_consequence_incident"])
-        type_col = _resolve_column(inc_df, ["incident_type", "category"])
-        
-        if dept_col and dept_col in inc_df.columns:
-            for dept in inc_df[dept_col].dropna().unique():
-                dept_inc = inc_df[inc_df[dept_col] == dept]
-                
-                # Calculate layers for this department
-                fatalities = 0
-                lost_workday = 0
-                recordable = 0
-                
-                if sev_col and sev_col in dept_inc.columns:
-                    sev_vals = pd.to_numeric(dept_inc[sev_col], errors="coerce")
-                    
-                    # Fatalities
-                    fat_mask = pd.Series([False] * len(dept_inc))
-                    if act_cons and act_cons in dept_inc.columns:
-                        fat_mask |= dept_inc[act_cons].astype(str).str.contains("fatal", case=False, na=False)
-                    if worst_cons and worst_cons in dept_inc.columns:
-                        fat_mask |= dept_inc[worst_cons].astype(str).str.contains("fatal", case=False, na=False)
-                    max_val = sev_vals.max(skipna=True)
-                    if pd.notna(max_val):
-                        thr = 5 if max_val >= 5 else 4
-                        fat_mask |= sev_vals >= thr
-                    fatalities = int(fat_mask.sum())
-                    
-                    # Lost Workday Cases
-                    lti_mask = (sev_vals >= 3) & ~fat_mask
-                    lost_workday = int(lti_mask.sum())
-                    
-                    # Recordable Injuries
-                    rec_mask = (sev_vals >= 2) & ~(lti_mask | fat_mask)
-                    recordable = int(rec_mask.sum())
-                
-                # Near misses from incidents
-                near_miss_inc = 0
-                if type_col and type_col in dept_inc.columns:
-                    near_miss_inc = int(dept_inc[type_col].astype(str).str.contains("near miss|near-miss", case=False, na=False).sum())
-                
-                # Near misses from hazards
-                near_miss_haz = 0
-                if haz_df is not None and not haz_df.empty:
-                    haz_dept_col = _resolve_column(haz_df, ["department", "sub_department"])
-                    if haz_dept_col and haz_dept_col in haz_df.columns:
-                        near_miss_haz = int((haz_df[haz_dept_col] == dept).sum())
-                
-                # At-risk behaviors from audits
-                at_risk_aud = 0
-                if aud_df is not None and not aud_df.empty:
-                    aud_loc_col = _resolve_column(aud_df, ["finding_location", "location", "audit_location"])
-                    if aud_loc_col and aud_loc_col in aud_df.columns:
-                        at_risk_aud = int(aud_df[aud_loc_col].astype(str).str.contains(str(dept), case=False, na=False).sum())
-                
-                # At-risk behaviors from inspections
-                at_risk_insp = 0
-                if insp_df is not None and not insp_df.empty:
-                    insp_loc_col = _resolve_column(insp_df, ["finding_location", "location", "audit_location"])
-                    if insp_loc_col and insp_loc_col in insp_df.columns:
-                        at_risk_insp = int(insp_df[insp_loc_col].astype(str).str.contains(str(dept), case=False, na=False).sum())
-                
-                breakdown["by_department"].append({
-                    "department": str(dept),
-                    "fatalities": fatalities,
-                    "lost_workday_cases": lost_workday,
-                    "recordable_injuries": recordable,
-                    "near_misses": near_miss_inc + near_miss_haz,
-                    "at_risk_behaviors": at_risk_aud + at_risk_insp,
-                    "total_incidents": int(len(dept_inc))
-                })
+    dept_col = _resolve_column(inc_df, ["department", "sub_department"])
+    if dept_col and dept_col in inc_df.columns:
+        depts = list(pd.unique(inc_df[dept_col].dropna()))
+        haz_counts = _value_counts(haz_df, _resolve_column(haz_df, ["department", "sub_department"]))
+        aud_counts = _contains_counts(aud_df, _resolve_column(aud_df, ["finding_location", "location", "audit_location"]), depts)
+        insp_counts = _contains_counts(insp_df, _resolve_column(insp_df, ["finding_location", "location", "audit_location"]), depts)
+        breakdown["by_department"] = _rows(
+            dept_col, "department", haz_counts, [a + b for a, b in zip(aud_counts, insp_counts)],
+        )
     
     # Location breakdown
-    if inc_df is not None and not inc_df.empty:
-        loc_col = _resolve_column(inc_df, ["location", "sublocation", "location.1"])
-        
-        if loc_col and loc_col in inc_df.columns:
-            for loc in inc_df[loc_col].dropna().unique():
-                loc_inc = inc_df[inc_df[loc_col] == loc]
-                
-                # Calculate layers for this location
-                fatalities = 0
-                lost_workday = 0
-                recordable = 0
-                
-                if sev_col and sev_col in loc_inc.columns:
-                    sev_vals = pd.to_numeric(loc_inc[sev_col], errors="coerce")
-                    
-                    # Fatalities
-                    fat_mask = pd.Series([False] * len(loc_inc))
-                    if act_cons and act_cons in loc_inc.columns:
-                        fat_mask |= loc_inc[act_cons].astype(str).str.contains("fatal", case=False, na=False)
-                    if worst_cons and worst_cons in loc_inc.columns:
-                        fat_mask |= loc_inc[worst_cons].astype(str).str.contains("fatal", case=False, na=False)
-                    max_val = sev_vals.max(skipna=True)
-                    if pd.notna(max_val):
-                        thr = 5 if max_val >= 5 else 4
-                        fat_mask |= sev_vals >= thr
-                    fatalities = int(fat_mask.sum())
-                    
-                    # Lost Workday Cases
-                    lti_mask = (sev_vals >= 3) & ~fat_mask
-                    lost_workday = int(lti_mask.sum())
-                    
-                    # Recordable Injuries
-                    rec_mask = (sev_vals >= 2) & ~(lti_mask | fat_mask)
-                    recordable = int(rec_mask.sum())
-                
-                # Near misses from incidents
-                near_miss_inc = 0
-                if type_col and type_col in loc_inc.columns:
-                    near_miss_inc = int(loc_inc[type_col].astype(str).str.contains("near miss|near-miss", case=False, na=False).sum())
-                
-                # Near misses from hazards
-                near_miss_haz = 0
-                if haz_df is not None and not haz_df.empty:
-                    haz_loc_col = _resolve_column(haz_df, ["location", "sublocation", "location.1"])
-                    if haz_loc_col and haz_loc_col in haz_df.columns:
-                        near_miss_haz = int((haz_df[haz_loc_col] == loc).sum())
-                
-                # At-risk behaviors from audits
-                at_risk_aud = 0
-                if aud_df is not None and not aud_df.empty:
-                    aud_loc_col = _resolve_column(aud_df, ["location", "finding_location", "audit_location"])
-                    if aud_loc_col and aud_loc_col in aud_df.columns:
-                        at_risk_aud = int((aud_df[aud_loc_col] == loc).sum())
-                
-                # At-risk behaviors from inspections
-                at_risk_insp = 0
-                if insp_df is not None and not insp_df.empty:
-                    insp_loc_col = _resolve_column(insp_df, ["location", "finding_location", "audit_location"])
-                    if insp_loc_col and insp_loc_col in insp_df.columns:
-                        at_risk_insp = int((insp_df[insp_loc_col] == loc).sum())
-                
-                breakdown["by_location"].append({
-                    "location": str(loc),
-                    "fatalities": fatalities,
-                    "lost_workday_cases": lost_workday,
-                    "recordable_injuries": recordable,
-                    "near_misses": near_miss_inc + near_miss_haz,
-                    "at_risk_behaviors": at_risk_aud + at_risk_insp,
-                    "total_incidents": int(len(loc_inc))
-                })
+    loc_col = _resolve_column(inc_df, ["location", "sublocation", "location.1"])
+    if loc_col and loc_col in inc_df.columns:
+        locs = list(pd.unique(inc_df[loc_col].dropna()))
+        haz_counts = _value_counts(haz_df, _resolve_column(haz_df, ["location", "sublocation", "location.1"]))
+        aud_counts = _value_counts(aud_df, _resolve_column(aud_df, ["location", "finding_location", "audit_location"]))
+        insp_counts = _value_counts(insp_df, _resolve_column(insp_df, ["location", "finding_location", "audit_location"]))
+        breakdown["by_location"] = _rows(
+            loc_col, "location", haz_counts,
+            [int(aud_counts.get(loc, 0)) + int(insp_counts.get(loc, 0)) for loc in locs],
+        )
     
     return JSONResponse(content=to_native_json(breakdown))
 
@@ -718,10 +467,23 @@ async def heinrich_pyramid_breakdown(
 # ======================= SITE SAFETY INDEX =======================
 
 @router.get("/site-safety-index")
+@version_cached
 async def site_safety_index(
     start_date: Optional[str] = Query(None, description="Filter start date", example="2024-01-01"),
     end_date: Optional[str] = Query(None, description="Filter end date", example="2024-12-31"),
+    departments: Optional[List[str]] = Query(None, description="Filter by departments"),
+    locations: Optional[List[str]] = Query(None, description="Filter by locations"),
+    sublocations: Optional[List[str]] = Query(None, description="Filter by sublocations"),
+    min_severity: Optional[float] = Query(None, ge=0, le=5, description="Min severity"),
+    max_severity: Optional[float] = Query(None, ge=0, le=5, description="Max severity"),
+    min_risk: Optional[float] = Query(None, ge=0, le=5, description="Min risk"),
+    max_risk: Optional[float] = Query(None, ge=0, le=5, description="Max risk"),
+    statuses: Optional[List[str]] = Query(None, description="Filter by status"),
+    incident_types: Optional[List[str]] = Query(None, description="Filter by incident types"),
+    violation_types: Optional[List[str]] = Query(None, description="Filter by violation types"),
     location: Optional[str] = Query(None, description="Filter by location", example="Manufacturing Facility"),
+    department: Optional[str] = Query(None, description="Department contains (case-insensitive)"),
+    status: Optional[str] = Query(None, description="Status contains (case-insensitive)"),
 ):
     """
     Site Safety Index (0-100 score) - Real-time safety health indicator.
@@ -737,36 +499,30 @@ async def site_safety_index(
       - Days since last incident: +0.1 per day (max +10)
       - Completed audits: +0.5 each (max +5)
     """
-    inc_df = get_incident_df()
-    haz_df = get_hazard_df()
+    inc_source = get_incident_df()
+    haz_source = get_hazard_df()
     aud_df = get_audit_df()
     
     # Apply filters
-    inc_df = _apply_filters(inc_df, start_date, end_date, location)
-    haz_df = _apply_filters(haz_df, start_date, end_date, location)
+    filters = filters_from_params(locals())
+    inc_df = apply_analytics_filters(inc_source, **filters)
+    haz_df = apply_analytics_filters(haz_source, **filters)
     
     base_score = 100.0
     deductions = 0.0
     bonuses = 0.0
     breakdown = []
     
-    # Deductions from incidents
+    # Deductions from incidents (levels classified once per dataset version)
     if inc_df is not None and not inc_df.empty:
-        sev_score_col = _resolve_column(inc_df, ["severity_score", "risk_score"])
-        sev_text_col = _resolve_column(inc_df, ["actual_consequence_incident", "severity"])
-        
-        serious_count = 0
-        minor_count = 0
-        
-        for idx, row in inc_df.iterrows():
-            sev_score = row[sev_score_col] if sev_score_col else None
-            sev_text = row[sev_text_col] if sev_text_col else None
-            level = _classify_severity_level(sev_score, sev_text)
-            
-            if level == "Serious Injury/Fatality":
-                serious_count += 1
-            elif level == "Minor Injury":
-                minor_count += 1
+        sev_score_col = _resolve_column(inc_source, ["severity_score", "risk_score"])
+        sev_text_col = _resolve_column(inc_source, ["actual_consequence_incident", "severity"])
+        levels = take_rows(
+            severity_levels(inc_source, sev_score_col, sev_text_col), filter_row_ids(inc_source, **filters)
+        )
+        counts = severity_counts(levels)
+        serious_count = counts["Serious Injury/Fatality"]
+        minor_count = counts["Minor Injury"]
         
         serious_deduction = serious_count * 10
         minor_deduction = minor_count * 3
@@ -779,14 +535,9 @@ async def site_safety_index(
     
     # Deductions from high-risk hazards
     if haz_df is not None and not haz_df.empty:
-        risk_col = _resolve_column(haz_df, ["risk_score", "risk_level"])
+        risk_col = _resolve_column(haz_source, ["risk_score", "risk_level"])
         if risk_col:
-            high_risk = haz_df[risk_col].apply(
-                lambda x: (pd.notna(x) and (
-                    (isinstance(x, (int, float)) and x >= 3) or 
-                    (isinstance(x, str) and any(k in str(x).lower() for k in ["high", "critical", "severe"]))
-                ))
-            ).sum()
+            high_risk = int(take_rows(high_risk_mask(haz_source, risk_col), filter_row_ids(haz_source, **filters)).sum())
             hazard_deduction = high_risk * 2
             deductions += hazard_deduction
             if high_risk > 0:
@@ -864,9 +615,23 @@ async def site_safety_index(
 # ======================= KPI METRICS =======================
 
 @router.get("/kpis/trir")
+@version_cached
 async def kpi_trir(
     start_date: Optional[str] = Query(None, description="Filter start date", example="2023-01-01"),
     end_date: Optional[str] = Query(None, description="Filter end date", example="2024-12-31"),
+    departments: Optional[List[str]] = Query(None, description="Filter by departments"),
+    locations: Optional[List[str]] = Query(None, description="Filter by locations"),
+    sublocations: Optional[List[str]] = Query(None, description="Filter by sublocations"),
+    min_severity: Optional[float] = Query(None, ge=0, le=5, description="Min severity"),
+    max_severity: Optional[float] = Query(None, ge=0, le=5, description="Max severity"),
+    min_risk: Optional[float] = Query(None, ge=0, le=5, description="Min risk"),
+    max_risk: Optional[float] = Query(None, ge=0, le=5, description="Max risk"),
+    statuses: Optional[List[str]] = Query(None, description="Filter by status"),
+    incident_types: Optional[List[str]] = Query(None, description="Filter by incident types"),
+    violation_types: Optional[List[str]] = Query(None, description="Filter by violation types"),
+    location: Optional[str] = Query(None, description="Location contains (case-insensitive)"),
+    department: Optional[str] = Query(None, description="Department contains (case-insensitive)"),
+    status: Optional[str] = Query(None, description="Status contains (case-insensitive)"),
     total_hours_worked: int = Query(2000000, description="Total hours worked (default: 2M for estimation)", example=2000000),
 ):
     """
@@ -874,8 +639,8 @@ async def kpi_trir(
     Formula: (Number of recordable incidents × 200,000) / Total hours worked
     Industry benchmark: < 1.0 is excellent, < 3.0 is good
     """
-    inc_df = get_incident_df()
-    inc_df = _apply_filters(inc_df, start_date, end_date)
+    filters = filters_from_params(locals())
+    inc_df = apply_analytics_filters(get_incident_df(), **filters)
     
     if inc_df is None or inc_df.empty:
         recordable_count = 0
@@ -914,17 +679,31 @@ async def kpi_trir(
 
 
 @router.get("/kpis/ltir")
+@version_cached
 async def kpi_ltir(
     start_date: Optional[str] = Query(None, description="Filter start date", example="2023-01-01"),
     end_date: Optional[str] = Query(None, description="Filter end date", example="2024-12-31"),
+    departments: Optional[List[str]] = Query(None, description="Filter by departments"),
+    locations: Optional[List[str]] = Query(None, description="Filter by locations"),
+    sublocations: Optional[List[str]] = Query(None, description="Filter by sublocations"),
+    min_severity: Optional[float] = Query(None, ge=0, le=5, description="Min severity"),
+    max_severity: Optional[float] = Query(None, ge=0, le=5, description="Max severity"),
+    min_risk: Optional[float] = Query(None, ge=0, le=5, description="Min risk"),
+    max_risk: Optional[float] = Query(None, ge=0, le=5, description="Max risk"),
+    statuses: Optional[List[str]] = Query(None, description="Filter by status"),
+    incident_types: Optional[List[str]] = Query(None, description="Filter by incident types"),
+    violation_types: Optional[List[str]] = Query(None, description="Filter by violation types"),
+    location: Optional[str] = Query(None, description="Location contains (case-insensitive)"),
+    department: Optional[str] = Query(None, description="Department contains (case-insensitive)"),
+    status: Optional[str] = Query(None, description="Status contains (case-insensitive)"),
     total_hours_worked: int = Query(2000000, description="Total hours worked", example=2000000),
 ):
     """
     LTIR - Lost Time Incident Rate
     Formula: (Number of lost-time incidents × 200,000) / Total hours worked
     """
-    inc_df = get_incident_df()
-    inc_df = _apply_filters(inc_df, start_date, end_date)
+    filters = filters_from_params(locals())
+    inc_df = apply_analytics_filters(get_incident_df(), **filters)
     
     if inc_df is None or inc_df.empty:
         lost_time_count = 0
@@ -946,17 +725,31 @@ async def kpi_ltir(
 
 
 @router.get("/kpis/pstir")
+@version_cached
 async def kpi_pstir(
     start_date: Optional[str] = Query(None, description="Filter start date", example="2023-01-01"),
     end_date: Optional[str] = Query(None, description="Filter end date", example="2024-12-31"),
+    departments: Optional[List[str]] = Query(None, description="Filter by departments"),
+    locations: Optional[List[str]] = Query(None, description="Filter by locations"),
+    sublocations: Optional[List[str]] = Query(None, description="Filter by sublocations"),
+    min_severity: Optional[float] = Query(None, ge=0, le=5, description="Min severity"),
+    max_severity: Optional[float] = Query(None, ge=0, le=5, description="Max severity"),
+    min_risk: Optional[float] = Query(None, ge=0, le=5, description="Min risk"),
+    max_risk: Optional[float] = Query(None, ge=0, le=5, description="Max risk"),
+    statuses: Optional[List[str]] = Query(None, description="Filter by status"),
+    incident_types: Optional[List[str]] = Query(None, description="Filter by incident types"),
+    violation_types: Optional[List[str]] = Query(None, description="Filter by violation types"),
+    location: Optional[str] = Query(None, description="Location contains (case-insensitive)"),
+    department: Optional[str] = Query(None, description="Department contains (case-insensitive)"),
+    status: Optional[str] = Query(None, description="Status contains (case-insensitive)"),
     total_hours_worked: int = Query(2000000, description="Total hours worked", example=2000000),
 ):
     """
     PSTIR - Process Safety Total Incident Rate
     Formula: (Number of PSM incidents × 200,000) / Total hours worked
     """
-    inc_df = get_incident_df()
-    inc_df = _apply_filters(inc_df, start_date, end_date)
+    filters = filters_from_params(locals())
+    inc_df = apply_analytics_filters(get_incident_df(), **filters)
     
     if inc_df is None or inc_df.empty:
         psm_count = 0
@@ -978,19 +771,31 @@ async def kpi_pstir(
 
 
 @router.get("/kpis/near-miss-ratio")
+@version_cached
 async def kpi_near_miss_ratio(
     start_date: Optional[str] = Query(None, description="Filter start date", example="2023-01-01"),
     end_date: Optional[str] = Query(None, description="Filter end date", example="2024-12-31"),
+    departments: Optional[List[str]] = Query(None, description="Filter by departments"),
+    locations: Optional[List[str]] = Query(None, description="Filter by locations"),
+    sublocations: Optional[List[str]] = Query(None, description="Filter by sublocations"),
+    min_severity: Optional[float] = Query(None, ge=0, le=5, description="Min severity"),
+    max_severity: Optional[float] = Query(None, ge=0, le=5, description="Max severity"),
+    min_risk: Optional[float] = Query(None, ge=0, le=5, description="Min risk"),
+    max_risk: Optional[float] = Query(None, ge=0, le=5, description="Max risk"),
+    statuses: Optional[List[str]] = Query(None, description="Filter by status"),
+    incident_types: Optional[List[str]] = Query(None, description="Filter by incident types"),
+    violation_types: Optional[List[str]] = Query(None, description="Filter by violation types"),
+    location: Optional[str] = Query(None, description="Location contains (case-insensitive)"),
+    department: Optional[str] = Query(None, description="Department contains (case-insensitive)"),
+    status: Optional[str] = Query(None, description="Status contains (case-insensitive)"),
 ):
     """
     Near-Miss to Incident Ratio
     Industry benchmark: 10:1 (10 near-misses per incident indicates good reporting culture)
     """
-    inc_df = get_incident_df()
-    haz_df = get_hazard_df()
-    
-    inc_df = _apply_filters(inc_df, start_date, end_date)
-    haz_df = _apply_filters(haz_df, start_date, end_date)
+    filters = filters_from_params(locals())
+    inc_df = apply_analytics_filters(get_incident_df(), **filters)
+    haz_df = apply_analytics_filters(get_hazard_df(), **filters)
     
     ratio = _calculate_near_miss_ratio(inc_df, haz_df)
     
@@ -1022,17 +827,33 @@ async def kpi_near_miss_ratio(
 
 
 @router.get("/kpis/summary")
+@version_cached
 async def kpis_summary(
     start_date: Optional[str] = Query(None, description="Filter start date", example="2023-01-01"),
     end_date: Optional[str] = Query(None, description="Filter end date", example="2024-12-31"),
+    departments: Optional[List[str]] = Query(None, description="Filter by departments"),
+    locations: Optional[List[str]] = Query(None, description="Filter by locations"),
+    sublocations: Optional[List[str]] = Query(None, description="Filter by sublocations"),
+    min_severity: Optional[float] = Query(None, ge=0, le=5, description="Min severity"),
+    max_severity: Optional[float] = Query(None, ge=0, le=5, description="Max severity"),
+    min_risk: Optional[float] = Query(None, ge=0, le=5, description="Min risk"),
+    max_risk: Optional[float] = Query(None, ge=0, le=5, description="Max risk"),
+    statuses: Optional[List[str]] = Query(None, description="Filter by status"),
+    incident_types: Optional[List[str]] = Query(None, description="Filter by incident types"),
+    violation_types: Optional[List[str]] = Query(None, description="Filter by violation types"),
+    location: Optional[str] = Query(None, description="Location contains (case-insensitive)"),
+    department: Optional[str] = Query(None, description="Department contains (case-insensitive)"),
+    status: Optional[str] = Query(None, description="Status contains (case-insensitive)"),
 ):
     """Unified dashboard KPI summary with all critical metrics."""
-    # Call individual KPI endpoints with proper parameters
-    trir_resp = await kpi_trir(start_date, end_date, total_hours_worked=2000000)
-    ltir_resp = await kpi_ltir(start_date, end_date, total_hours_worked=2000000)
-    pstir_resp = await kpi_pstir(start_date, end_date, total_hours_worked=2000000)
-    nmr_resp = await kpi_near_miss_ratio(start_date, end_date)
-    safety_index_resp = await site_safety_index(start_date, end_date, location=None)
+    # Call individual KPI endpoints with proper parameters; every one resolves
+    # the same filter set, so the row selection is computed once and cached
+    filters = filters_from_params(locals())
+    trir_resp = await kpi_trir(**filters, total_hours_worked=2000000)
+    ltir_resp = await kpi_ltir(**filters, total_hours_worked=2000000)
+    pstir_resp = await kpi_pstir(**filters, total_hours_worked=2000000)
+    nmr_resp = await kpi_near_miss_ratio(**filters)
+    safety_index_resp = await site_safety_index(**filters)
     
     # Extract JSON data from responses
     import json
@@ -1049,6 +870,7 @@ async def kpis_summary(
 # ======================= RISK ASSESSMENT ANALYTICS =======================
 
 @router.get("/actual-risk-score")
+@version_cached
 async def actual_risk_score():
     """
     Actual Risk Score by Department - Proportion-Based Probability Method
@@ -1111,19 +933,19 @@ async def actual_risk_score():
     }
     
     # Map actual severity to scores
-    incidents_df['Actual_Severity'] = incidents_df['Actual Consequence (Incident)'].map(severity_scores).fillna(0)
+    incidents_df['Actual_Severity'] = incidents_df['Actual Consequence (Incident)'].astype(object).map(severity_scores).fillna(0)
     
     # Calculate proportion for each department and severity level
-    dept_severity_counts = incidents_df.groupby(['Department', 'Actual Consequence (Incident)']).size().reset_index(name='Count')
-    severity_totals = incidents_df.groupby('Actual Consequence (Incident)').size().reset_index(name='Total_Count')
+    dept_severity_counts = incidents_df.groupby(['Department', 'Actual Consequence (Incident)'], observed=True).size().reset_index(name='Count')
+    severity_totals = incidents_df.groupby('Actual Consequence (Incident)', observed=True).size().reset_index(name='Total_Count')
     
     dept_severity_counts = dept_severity_counts.merge(severity_totals, on='Actual Consequence (Incident)', how='left')
     dept_severity_counts['Proportion'] = dept_severity_counts['Count'] / dept_severity_counts['Total_Count']
-    dept_severity_counts['Severity_Score'] = dept_severity_counts['Actual Consequence (Incident)'].map(severity_scores).fillna(0)
+    dept_severity_counts['Severity_Score'] = dept_severity_counts['Actual Consequence (Incident)'].astype(object).map(severity_scores).fillna(0)
     dept_severity_counts['Weighted_Severity'] = dept_severity_counts['Severity_Score'] * dept_severity_counts['Proportion']
     
     # Aggregate by department
-    dept_summary = dept_severity_counts.groupby('Department').agg(
+    dept_summary = dept_severity_counts.groupby('Department', observed=True).agg(
         Actual_Risk_Score=('Weighted_Severity', 'sum'),
         Avg_Proportion=('Proportion', 'mean'),
         Incident_Count=('Count', 'sum')
@@ -1162,6 +984,7 @@ async def actual_risk_score():
 
 
 @router.get("/potential-risk-score")
+@version_cached
 async def potential_risk_score():
     """
     Potential Risk Score by Department - Proportion-Based Near-Miss Analysis
@@ -1226,8 +1049,8 @@ async def potential_risk_score():
         }))
     
     # Map severities
-    potential_risk_df['Actual_Severity'] = potential_risk_df['Actual Consequence (Incident)'].map(severity_scores).fillna(0)
-    potential_risk_df['Worst_Severity'] = potential_risk_df['Worst Case Consequence (Incident)'].map(severity_scores).fillna(0)
+    potential_risk_df['Actual_Severity'] = potential_risk_df['Actual Consequence (Incident)'].astype(object).map(severity_scores).fillna(0)
+    potential_risk_df['Worst_Severity'] = potential_risk_df['Worst Case Consequence (Incident)'].astype(object).map(severity_scores).fillna(0)
     
     # Filter for near-misses: minor actual (≤C1 = ≤2) but severe worst-case (≥C3 = ≥4)
     near_miss_df = potential_risk_df[
@@ -1247,16 +1070,16 @@ async def potential_risk_score():
         }))
     
     # Calculate proportion for each department and worst-case severity level
-    dept_severity_counts = near_miss_df.groupby(['Department', 'Worst Case Consequence (Incident)']).size().reset_index(name='Count')
-    severity_totals = near_miss_df.groupby('Worst Case Consequence (Incident)').size().reset_index(name='Total_Count')
+    dept_severity_counts = near_miss_df.groupby(['Department', 'Worst Case Consequence (Incident)'], observed=True).size().reset_index(name='Count')
+    severity_totals = near_miss_df.groupby('Worst Case Consequence (Incident)', observed=True).size().reset_index(name='Total_Count')
     
     dept_severity_counts = dept_severity_counts.merge(severity_totals, on='Worst Case Consequence (Incident)', how='left')
     dept_severity_counts['Proportion'] = dept_severity_counts['Count'] / dept_severity_counts['Total_Count']
-    dept_severity_counts['Severity_Score'] = dept_severity_counts['Worst Case Consequence (Incident)'].map(severity_scores).fillna(0)
+    dept_severity_counts['Severity_Score'] = dept_severity_counts['Worst Case Consequence (Incident)'].astype(object).map(severity_scores).fillna(0)
     dept_severity_counts['Weighted_Severity'] = dept_severity_counts['Severity_Score'] * dept_severity_counts['Proportion']
     
     # Aggregate by department
-    potential_summary = dept_severity_counts.groupby('Department').agg(
+    potential_summary = dept_severity_counts.groupby('Department', observed=True).agg(
         Potential_Risk_Score=('Weighted_Severity', 'sum'),
         Avg_Proportion=('Proportion', 'mean'),
         Near_Miss_Count=('Count', 'sum')
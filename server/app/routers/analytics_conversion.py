@@ -1,4 +1,4 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Query
 from fastapi.responses import JSONResponse
 import json
 
@@ -7,6 +7,7 @@ from ..services.excel import payload_to_df, get_incident_df, get_hazard_df
 from ..services.json_utils import to_native_json
 from ..services.agent import ask_openai
 from ..analytics.hazard_incident import HazardIncidentAnalyzer
+from ..services.conversion import DEFAULT_LINK_WINDOW_DAYS, get_conversion_analyzer
 
 import pandas as pd
 
@@ -25,19 +26,19 @@ def _analyzer_from_req(req: ConversionRequest) -> HazardIncidentAnalyzer:
 
 
 @router.get("/funnel", response_model=PlotlyFigureResponse)
-async def conversion_funnel_auto():
-    analyzer = HazardIncidentAnalyzer(get_incident_df(), get_hazard_df())
+async def conversion_funnel_auto(window_days: int = Query(DEFAULT_LINK_WINDOW_DAYS, ge=1, le=365, description="Days after a hazard in which an incident counts as linked")):
+    analyzer = get_conversion_analyzer(window_days)
     fig = analyzer.create_conversion_funnel()
     return JSONResponse(content={"figure": to_native_json(fig.to_plotly_json())})
 
 
 @router.get("/funnel/insights", response_model=ChartInsightsResponse)
-async def conversion_funnel_insights():
+async def conversion_funnel_insights(window_days: int = Query(DEFAULT_LINK_WINDOW_DAYS, ge=1, le=365, description="Days after a hazard in which an incident counts as linked")):
     """Generate insights for conversion funnel"""
     title = "Conversion Funnel Analysis"
     inc = get_incident_df()
     haz = get_hazard_df()
-    analyzer = HazardIncidentAnalyzer(inc, haz)
+    analyzer = get_conversion_analyzer(window_days)
     
     total_hazards = 0 if haz is None else int(len(haz))
     total_incidents = 0 if inc is None else int(len(inc))
@@ -117,17 +118,17 @@ async def conversion_funnel_insights():
 
 
 @router.get("/time-lag", response_model=PlotlyFigureResponse)
-async def time_lag_auto():
-    analyzer = HazardIncidentAnalyzer(get_incident_df(), get_hazard_df())
+async def time_lag_auto(window_days: int = Query(DEFAULT_LINK_WINDOW_DAYS, ge=1, le=365, description="Days after a hazard in which an incident counts as linked")):
+    analyzer = get_conversion_analyzer(window_days)
     fig = analyzer.create_time_lag_analysis()
     return JSONResponse(content={"figure": to_native_json(fig.to_plotly_json())})
 
 
 @router.get("/time-lag/insights", response_model=ChartInsightsResponse)
-async def time_lag_insights():
+async def time_lag_insights(window_days: int = Query(DEFAULT_LINK_WINDOW_DAYS, ge=1, le=365, description="Days after a hazard in which an incident counts as linked")):
     """Generate insights for time lag between hazards and incidents"""
     title = "Time Lag Analysis"
-    analyzer = HazardIncidentAnalyzer(get_incident_df(), get_hazard_df())
+    analyzer = get_conversion_analyzer(window_days)
     links = analyzer.links_df
     
     if links is None or links.empty or 'days_to_incident' not in links.columns:
@@ -179,19 +180,19 @@ async def time_lag_insights():
 
 
 @router.get("/sankey", response_model=PlotlyFigureResponse)
-async def sankey_auto():
-    analyzer = HazardIncidentAnalyzer(get_incident_df(), get_hazard_df())
+async def sankey_auto(window_days: int = Query(DEFAULT_LINK_WINDOW_DAYS, ge=1, le=365, description="Days after a hazard in which an incident counts as linked")):
+    analyzer = get_conversion_analyzer(window_days)
     fig = analyzer.create_sankey_flow()
     return JSONResponse(content={"figure": to_native_json(fig.to_plotly_json())})
 
 
 @router.get("/sankey/insights", response_model=ChartInsightsResponse)
-async def sankey_insights():
+async def sankey_insights(window_days: int = Query(DEFAULT_LINK_WINDOW_DAYS, ge=1, le=365, description="Days after a hazard in which an incident counts as linked")):
     """Generate insights for sankey flow diagram"""
     title = "Hazard-to-Incident Flow Analysis"
     inc = get_incident_df()
     haz = get_hazard_df()
-    analyzer = HazardIncidentAnalyzer(inc, haz)
+    analyzer = get_conversion_analyzer(window_days)
     
     total_hazards = 0 if haz is None else int(len(haz))
     total_incidents = 0 if inc is None else int(len(inc))
@@ -246,19 +247,19 @@ async def sankey_insights():
 
 
 @router.get("/department-matrix", response_model=PlotlyFigureResponse)
-async def department_matrix_auto():
-    analyzer = HazardIncidentAnalyzer(get_incident_df(), get_hazard_df())
+async def department_matrix_auto(window_days: int = Query(DEFAULT_LINK_WINDOW_DAYS, ge=1, le=365, description="Days after a hazard in which an incident counts as linked")):
+    analyzer = get_conversion_analyzer(window_days)
     fig = analyzer.create_department_conversion_matrix()
     return JSONResponse(content={"figure": to_native_json(fig.to_plotly_json())})
 
 
 @router.get("/department-matrix/insights", response_model=ChartInsightsResponse)
-async def department_matrix_insights():
+async def department_matrix_insights(window_days: int = Query(DEFAULT_LINK_WINDOW_DAYS, ge=1, le=365, description="Days after a hazard in which an incident counts as linked")):
     """Generate insights for department conversion matrix"""
     title = "Department Conversion Matrix"
     inc = get_incident_df()
     haz = get_hazard_df()
-    analyzer = HazardIncidentAnalyzer(inc, haz)
+    analyzer = get_conversion_analyzer(window_days)
     
     if inc is None or haz is None or inc.empty or haz.empty:
         return ChartInsightsResponse(insights_md=f"## {title}\n\n- **Summary**: Insufficient data for department analysis.")
@@ -326,19 +327,19 @@ async def department_matrix_insights():
 
 
 @router.get("/risk-network", response_model=PlotlyFigureResponse)
-async def risk_network_auto():
-    analyzer = HazardIncidentAnalyzer(get_incident_df(), get_hazard_df())
+async def risk_network_auto(window_days: int = Query(DEFAULT_LINK_WINDOW_DAYS, ge=1, le=365, description="Days after a hazard in which an incident counts as linked")):
+    analyzer = get_conversion_analyzer(window_days)
     fig = analyzer.create_risk_network()
     return JSONResponse(content={"figure": to_native_json(fig.to_plotly_json())})
 
 
 @router.get("/risk-network/insights", response_model=ChartInsightsResponse)
-async def risk_network_insights():
+async def risk_network_insights(window_days: int = Query(DEFAULT_LINK_WINDOW_DAYS, ge=1, le=365, description="Days after a hazard in which an incident counts as linked")):
     """Generate insights for risk network analysis"""
     title = "Risk Network Analysis"
     inc = get_incident_df()
     haz = get_hazard_df()
-    analyzer = HazardIncidentAnalyzer(inc, haz)
+    analyzer = get_conversion_analyzer(window_days)
     
     links = analyzer.links_df
     if links is None or links.empty:
@@ -396,19 +397,18 @@ async def risk_network_insights():
 
 
 @router.get("/prevention-effectiveness", response_model=PlotlyFigureResponse)
-async def prevention_effectiveness_auto():
-    analyzer = HazardIncidentAnalyzer(get_incident_df(), get_hazard_df())
+async def prevention_effectiveness_auto(window_days: int = Query(DEFAULT_LINK_WINDOW_DAYS, ge=1, le=365, description="Days after a hazard in which an incident counts as linked")):
+    analyzer = get_conversion_analyzer(window_days)
     fig = analyzer.create_prevention_effectiveness()
     return JSONResponse(content={"figure": to_native_json(fig.to_plotly_json())})
 
 
 @router.get("/prevention-effectiveness/insights", response_model=ChartInsightsResponse)
-async def prevention_effectiveness_insights():
+async def prevention_effectiveness_insights(window_days: int = Query(DEFAULT_LINK_WINDOW_DAYS, ge=1, le=365, description="Days after a hazard in which an incident counts as linked")):
     """Generate insights for prevention effectiveness analysis"""
     title = "Prevention Effectiveness Analysis"
-    inc = get_incident_df()
     haz = get_hazard_df()
-    analyzer = HazardIncidentAnalyzer(inc, haz)
+    analyzer = get_conversion_analyzer(window_days)
     
     total_hazards = 0 if haz is None else int(len(haz))
     if total_hazards == 0:
@@ -486,12 +486,12 @@ async def metrics_gauge_auto():
 
 
 @router.get("/metrics-gauge/insights", response_model=ChartInsightsResponse)
-async def metrics_gauge_insights():
+async def metrics_gauge_insights(window_days: int = Query(DEFAULT_LINK_WINDOW_DAYS, ge=1, le=365, description="Days after a hazard in which an incident counts as linked")):
     """Generate insights for conversion metrics gauge"""
     title = "Conversion Metrics Overview"
     inc = get_incident_df()
     haz = get_hazard_df()
-    analyzer = HazardIncidentAnalyzer(inc, haz)
+    analyzer = get_conversion_analyzer(window_days)
     links = analyzer.links_df
 
     total_hazards = 0 if haz is None else int(len(haz))
@@ -548,8 +548,8 @@ async def metrics_gauge_insights():
 # ---------- Relationship Data Endpoints (JSON) ----------
 
 @router.get("/links")
-async def hazard_incident_links():
-    analyzer = HazardIncidentAnalyzer(get_incident_df(), get_hazard_df())
+async def hazard_incident_links(window_days: int = Query(DEFAULT_LINK_WINDOW_DAYS, ge=1, le=365, description="Days after a hazard in which an incident counts as linked")):
+    analyzer = get_conversion_analyzer(window_days)
     df = analyzer.links_df
     if df is None or df.empty:
         payload = {"total": 0, "unique_hazards": 0, "unique_incidents": 0}
@@ -563,10 +563,10 @@ async def hazard_incident_links():
 
 
 @router.get("/links/insights", response_model=ChartInsightsResponse)
-async def links_insights():
+async def links_insights(window_days: int = Query(DEFAULT_LINK_WINDOW_DAYS, ge=1, le=365, description="Days after a hazard in which an incident counts as linked")):
     """Generate insights for hazard-incident links"""
     title = "Hazard-Incident Link Analysis"
-    analyzer = HazardIncidentAnalyzer(get_incident_df(), get_hazard_df())
+    analyzer = get_conversion_analyzer(window_days)
     df = analyzer.links_df
     
     if df is None or df.empty:
@@ -611,10 +611,10 @@ async def links_insights():
 
 
 @router.get("/metrics")
-async def hazard_incident_metrics():
+async def hazard_incident_metrics(window_days: int = Query(DEFAULT_LINK_WINDOW_DAYS, ge=1, le=365, description="Days after a hazard in which an incident counts as linked")):
     inc = get_incident_df()
     haz = get_hazard_df()
-    analyzer = HazardIncidentAnalyzer(inc, haz)
+    analyzer = get_conversion_analyzer(window_days)
     links = analyzer.links_df
 
     total_hazards = 0 if haz is None else int(len(haz))
@@ -656,12 +656,12 @@ async def hazard_incident_metrics():
 
 
 @router.get("/metrics/insights", response_model=ChartInsightsResponse)
-async def metrics_insights():
+async def metrics_insights(window_days: int = Query(DEFAULT_LINK_WINDOW_DAYS, ge=1, le=365, description="Days after a hazard in which an incident counts as linked")):
     """Generate insights for hazard-incident metrics"""
     title = "Hazard-Incident Metrics Summary"
     inc = get_incident_df()
     haz = get_hazard_df()
-    analyzer = HazardIncidentAnalyzer(inc, haz)
+    analyzer = get_conversion_analyzer(window_days)
     links = analyzer.links_df
 
     total_hazards = 0 if haz is None else int(len(haz))
@@ -738,10 +738,10 @@ async def metrics_insights():
 
 
 @router.get("/department-metrics-data")
-async def department_metrics_data():
+async def department_metrics_data(window_days: int = Query(DEFAULT_LINK_WINDOW_DAYS, ge=1, le=365, description="Days after a hazard in which an incident counts as linked")):
     inc = get_incident_df()
     haz = get_hazard_df()
-    analyzer = HazardIncidentAnalyzer(inc, haz)
+    analyzer = get_conversion_analyzer(window_days)
 
     if inc is None or haz is None or inc.empty or haz.empty:
         return JSONResponse(content=[])
@@ -781,12 +781,12 @@ async def department_metrics_data():
 
 
 @router.get("/department-metrics-data/insights", response_model=ChartInsightsResponse)
-async def department_metrics_data_insights():
+async def department_metrics_data_insights(window_days: int = Query(DEFAULT_LINK_WINDOW_DAYS, ge=1, le=365, description="Days after a hazard in which an incident counts as linked")):
     """Generate insights for department metrics data"""
     title = "Department Performance Metrics"
     inc = get_incident_df()
     haz = get_hazard_df()
-    analyzer = HazardIncidentAnalyzer(inc, haz)
+    analyzer = get_conversion_analyzer(window_days)
 
     if inc is None or haz is None or inc.empty or haz.empty:
         return ChartInsightsResponse(insights_md=f"## {title}\n\n- **Summary**: Insufficient data for department analysis.")
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, HTTPException, Query
 from fastapi.responses import JSONResponse
 import json
 import re
@@ -15,10 +15,6 @@ from ..models.schemas import (
     FilterOptionsResponse,
     CombinedFilterOptionsResponse,
     DetailedTrendResponse,
-    MonthDetailedData,
-    CountItem,
-    ScoreStats,
-    RecentItem,
     ChartSeries,
 )
 from ..services.excel import (
@@ -32,8 +28,13 @@ from ..services.json_utils import to_native_json
 from ..services.agent import ask_openai
 from ..services.excel import payload_to_df
 from ..services.insights_generator import PlotlyInsightsGenerator, InsightType
-from ..services.filters import apply_analytics_filters, get_filter_summary
-from ..services.filter_options import extract_filter_options, extract_combined_filter_options
+from ..services.filters import apply_analytics_filters, filters_from_params, get_filter_summary
+from ..services.filter_options import extract_filter_options
+from ..services.filter_catalogue import cascade_options, get_filter_catalogue
+from ..services.data_cache import version_cached
+from ..services.trend_details import GRANULARITIES, trend_details
+from ..services import rollup
+from ..services.rollup import answer as answer_from_rollup, get_rollup_cube
 
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
@@ -74,7 +75,34 @@ def _to_date_period(series: pd.Series, granularity: str = 'D') -> pd.Series:
         return dt.dt.date.astype(str)
 
 
+_TYPE_CANDIDATES = ["incident_type(s)", "incident_type", "incident type(s)", "category"]
+_ROOT_CAUSE_CANDIDATES = ["Root Cause", "root_cause", "root cause", "Key Factor", "key_factor", "Contributing Factor", "contributing_factor"]
+_COST_CANDIDATES = ["total cost", "estimated_cost_impact"]
+
+
+def _rollup_cube(df: Optional[pd.DataFrame], root_cause: bool = False):
+    """The dataset frame's rollup cube, carrying the type/cost columns these charts resolve.
+
+    ``root_cause=True`` gets the pareto's own cube (type x root cause over the
+    filter dimensions) instead of the shared one.
+    """
+    if df is None or df.empty:
+        return None
+    if root_cause:
+        return get_rollup_cube(
+            df,
+            type_col=_resolve_column(df, _TYPE_CANDIDATES),
+            root_cause_col=_resolve_column(df, _ROOT_CAUSE_CANDIDATES),
+        )
+    return get_rollup_cube(
+        df,
+        type_col=_resolve_column(df, _TYPE_CANDIDATES),
+        cost_col=_resolve_column(df, _COST_CANDIDATES),
+    )
+
+
 @router.get("/hse-scorecard", response_model=PlotlyFigureResponse)
+@version_cached
 async def hse_scorecard():
     inc = get_incident_df()
     haz = get_hazard_df()
@@ -85,6 +113,7 @@ async def hse_scorecard():
 
 
 @router.get("/filter-options", response_model=FilterOptionsResponse)
+@version_cached
 async def get_filter_options(
     dataset: str = Query("incident", description="Dataset to use: 'incident' or 'hazard'")
 ):
@@ -104,12 +133,16 @@ async def get_filter_options(
         - Available incident/violation types with counts
         - Severity and risk score ranges
     """
+    if dataset in ("incident", "hazard"):
+        # Built once per dataset version
+        return get_filter_catalogue().options[dataset]
     df = get_incident_df() if (dataset or "incident").lower() == "incident" else get_hazard_df()
     options = extract_filter_options(df, dataset)
     return options
 
 
 @router.get("/filter-options/combined", response_model=CombinedFilterOptionsResponse)
+@version_cached
 async def get_combined_filter_options():
     """
     Get all available filter options from both incident and hazard datasets.
@@ -123,10 +156,43 @@ async def get_combined_filter_options():
         - Filter options for hazards
         - Timestamp of when options were generated
     """
-    incident_df = get_incident_df()
-    hazard_df = get_hazard_df()
-    combined_options = extract_combined_filter_options(incident_df, hazard_df)
-    return combined_options
+    catalogue = get_filter_catalogue()
+    return CombinedFilterOptionsResponse(
+        incident=catalogue.options["incident"],
+        hazard=catalogue.options["hazard"],
+        last_updated=catalogue.built_at,
+    )
+
+
+@router.get("/filter-options/cascade")
+async def get_cascading_filter_options(
+    dataset: str = Query("incident", description="Dataset to use: 'incident' or 'hazard'"),
+    start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
+    end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
+    departments: Optional[List[str]] = Query(None, description="Selected departments"),
+    locations: Optional[List[str]] = Query(None, description="Selected locations"),
+    sublocations: Optional[List[str]] = Query(None, description="Selected sublocations"),
+    statuses: Optional[List[str]] = Query(None, description="Selected statuses"),
+    incident_types: Optional[List[str]] = Query(None, description="Selected incident types"),
+    violation_types: Optional[List[str]] = Query(None, description="Selected violation types"),
+    max_items: int = Query(100, ge=1, le=1000, description="Options per filter"),
+):
+    """
+    Dependent filter options: for each filter, the values (with counts) still
+    available given the selections on the *other* filters, e.g. the locations
+    that have records for the selected departments.
+    
+    Example:
+        GET /analytics/filter-options/cascade?dataset=incident&departments=Operations
+    """
+    df = get_incident_df() if (dataset or "incident").lower() == "incident" else get_hazard_df()
+    selections = {
+        "start_date": start_date, "end_date": end_date, "departments": departments,
+        "locations": locations, "sublocations": sublocations, "statuses": statuses,
+        "incident_types": incident_types, "violation_types": violation_types,
+    }
+    result = cascade_options(df, selections, max_items=max_items)
+    return JSONResponse(content=to_native_json({"dataset": dataset, **result}))
 
 
 @router.get("/filter-summary")
@@ -144,6 +210,9 @@ async def get_filter_summary_endpoint(
     statuses: Optional[List[str]] = Query(None, description="Filter by status"),
     incident_types: Optional[List[str]] = Query(None, description="Filter by incident types"),
     violation_types: Optional[List[str]] = Query(None, description="Filter by violation types"),
+    location: Optional[str] = Query(None, description="Location contains (case-insensitive)"),
+    department: Optional[str] = Query(None, description="Department contains (case-insensitive)"),
+    status: Optional[str] = Query(None, description="Status contains (case-insensitive)"),
 ):
     """
     Get a summary of how filters would affect the dataset without returning the full data.
@@ -165,6 +234,9 @@ async def get_filter_summary_endpoint(
         statuses=statuses,
         incident_types=incident_types,
         violation_types=violation_types,
+        location=location,
+        department=department,
+        status=status,
     )
     
     filters_dict = {
@@ -181,6 +253,9 @@ async def get_filter_summary_endpoint(
         'statuses': statuses,
         'incident_types': incident_types,
         'violation_types': violation_types,
+        'location': location,
+        'department': department,
+        'status': status,
     }
     
     summary = get_filter_summary(df_original, df_filtered, filters_dict)
@@ -191,6 +266,7 @@ async def get_filter_summary_endpoint(
 # ----------------------- DATA (JSON) ENDPOINTS FOR FRONTEND --------------------
 
 @router.get("/data/incident-trend")
+@version_cached
 async def data_incident_trend(
     dataset: str = Query("incident"),
     start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
@@ -202,27 +278,33 @@ async def data_incident_trend(
     min_risk: Optional[float] = Query(None, ge=0, le=5, description="Min risk"),
     max_risk: Optional[float] = Query(None, ge=0, le=5, description="Max risk"),
 ):
-    df = get_incident_df() if (dataset or "incident").lower() == "incident" else get_hazard_df()
-    
-    # Apply flexible filters
-    df = apply_analytics_filters(
-        df, start_date=start_date, end_date=end_date, departments=departments,
-        locations=locations, min_severity=min_severity, max_severity=max_severity,
-        min_risk=min_risk, max_risk=max_risk
-    )
+    source = get_incident_df() if (dataset or "incident").lower() == "incident" else get_hazard_df()
+    filters = filters_from_params(locals())
+    empty = {"labels": [], "series": []}
+    date_candidates = ["occurrence_date", "date of occurrence", "date reported", "date entered"]
+    
+    def from_raw():
+        # Apply flexible filters
+        df = apply_analytics_filters(source, **filters)
+        if df is None or df.empty:
+            return empty
+        date_col = _resolve_column(df, date_candidates) or df.columns[0]
+        dates = _to_date_period(df[date_col], granularity='D')  # Daily granularity
+        counts = dates.value_counts().sort_index()
+        return {
+            "labels": counts.index.tolist(),
+            "series": [{"name": "Count", "data": counts.values.astype(int).tolist()}],
+        }
     
-    if df is None or df.empty:
-        return JSONResponse(content={"labels": [], "series": []})
-    date_col = _resolve_column(df, ["occurrence_date", "date of occurrence", "date reported", "date entered"]) or df.columns[0]
-    dates = _to_date_period(df[date_col], granularity='D')  # Daily granularity
-    counts = dates.value_counts().sort_index()
-    return JSONResponse(content={
-        "labels": counts.index.tolist(),
-        "series": [{"name": "Count", "data": counts.values.astype(int).tolist()}],
-    })
+    cube = _rollup_cube(source)
+    return JSONResponse(content=answer_from_rollup(
+        "incident-trend", cube, filters, rollup.trend_counts, from_raw, empty=empty,
+        date=_resolve_column(source, date_candidates),
+    ))
 
 
 @router.get("/data/incident-trend-detailed", response_model=DetailedTrendResponse)
+@version_cached
 async def data_incident_trend_detailed(
     dataset: str = Query("incident", description="Dataset to use: 'incident' or 'hazard'"),
     start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
@@ -237,14 +319,15 @@ async def data_incident_trend_detailed(
     statuses: Optional[List[str]] = Query(None, description="Filter by status"),
     incident_types: Optional[List[str]] = Query(None, description="Filter by incident types"),
     violation_types: Optional[List[str]] = Query(None, description="Filter by violation types"),
+    granularity: str = Query("day", description="Period size: 'day', 'week' or 'month'"),
 ):
     """
     Enhanced endpoint that returns trend data WITH detailed breakdowns for tooltips.
     
     Returns:
-    - labels: Date labels (YYYY-MM-DD format)
-    - series: Chart data (counts per day)
-    - details: Detailed breakdown per day including:
+    - labels: Period labels (YYYY-MM-DD for days, the Monday of each week, YYYY-MM for months)
+    - series: Chart data (counts per period)
+    - details: Detailed breakdown per period including:
         - Top departments with counts
         - Top incident/violation types with counts
         - Severity and risk statistics
@@ -253,6 +336,10 @@ async def data_incident_trend_detailed(
     Example:
         GET /analytics/data/incident-trend-detailed?dataset=incident&start_date=2023-01-01
     """
+    period = GRANULARITIES.get((granularity or "day").strip().lower())
+    if period is None:
+        raise HTTPException(status_code=400, detail="granularity must be 'day', 'week' or 'month'")
+    
     # Load dataset
     df = get_incident_df() if (dataset or "incident").lower() == "incident" else get_hazard_df()
     
@@ -289,103 +376,16 @@ async def data_incident_trend_detailed(
     else:
         type_col = _resolve_column(df, ["violation type (hazard)", "violation_type_hazard_id", "category"]) or None
     
-    # Convert dates to daily periods
-    df_copy = df.copy()
-    df_copy['_day'] = _to_date_period(df_copy[date_col], granularity='D')  # Daily granularity
-    df_copy['_date'] = pd.to_datetime(df_copy[date_col], errors='coerce')
-    
-    # Get overall counts
-    days = df_copy['_day']
-    counts = days.value_counts().sort_index()
-    
-    # Build detailed breakdown for each day
-    details = []
-    for day_label in counts.index:
-        day_df = df_copy[df_copy['_day'] == day_label]
-        total_count = len(day_df)
-        
-        # Top departments
-        departments_list = []
-        if dept_col and dept_col in day_df.columns:
-            dept_counts = day_df[dept_col].astype(str).value_counts().head(5)
-            departments_list = [
-                CountItem(name=str(dept), count=int(count))
-                for dept, count in dept_counts.items()
-            ]
-        
-        # Top types
-        types_list = []
-        if type_col and type_col in day_df.columns:
-            # Handle comma-separated values
-            type_series = day_df[type_col].astype(str).str.split(',').explode().str.strip()
-            type_counts = type_series.value_counts().head(5)
-            types_list = [
-                CountItem(name=str(t), count=int(count))
-                for t, count in type_counts.items()
-                if str(t).lower() not in ['nan', 'none', '']
-            ]
-        
-        # Severity stats
-        severity_stats = None
-        if severity_col and severity_col in day_df.columns:
-            sev_values = pd.to_numeric(day_df[severity_col], errors='coerce').dropna()
-            if len(sev_values) > 0:
-                severity_stats = ScoreStats(
-                    avg=float(sev_values.mean()),
-                    max=float(sev_values.max()),
-                    min=float(sev_values.min())
-                )
-        
-        # Risk stats
-        risk_stats = None
-        if risk_col and risk_col in day_df.columns:
-            risk_values = pd.to_numeric(day_df[risk_col], errors='coerce').dropna()
-            if len(risk_values) > 0:
-                risk_stats = ScoreStats(
-                    avg=float(risk_values.mean()),
-                    max=float(risk_values.max()),
-                    min=float(risk_values.min())
-                )
-        
-        # Recent items (up to 5, sorted by date descending)
-        recent_items_list = []
-        if title_col and title_col in day_df.columns:
-            # Sort by date descending and take top 5
-            day_df_sorted = day_df.sort_values('_date', ascending=False).head(5)
-            
-            for _, row in day_df_sorted.iterrows():
-                title = str(row.get(title_col, "Untitled"))[:100]  # Truncate long titles
-                department = str(row.get(dept_col, "Unknown")) if dept_col else "Unknown"
-                date_val = row.get('_date')
-                date_str = date_val.strftime('%Y-%m-%d') if pd.notna(date_val) else day_label
-                severity_val = None
-                if severity_col and severity_col in row.index:
-                    sev = pd.to_numeric(row.get(severity_col), errors='coerce')
-                    severity_val = float(sev) if pd.notna(sev) else None
-                
-                recent_items_list.append(RecentItem(
-                    title=title,
-                    department=department,
-                    date=date_str,
-                    severity=severity_val
-                ))
-        
-        # Create day detail
-        month_detail = MonthDetailedData(
-            month=str(day_label),
-            total_count=total_count,
-            departments=departments_list,
-            types=types_list,
-            severity=severity_stats,
-            risk=risk_stats,
-            recent_items=recent_items_list
-        )
-        details.append(month_detail)
+    # One sort/groupby pass over all periods
+    labels, counts, details = trend_details(
+        df, date_col, dept_col=dept_col, type_col=type_col, title_col=title_col,
+        severity_col=severity_col, risk_col=risk_col, granularity=period,
+    )
     
     # Build response
     response = DetailedTrendResponse(
-        labels=counts.index.tolist(),
-        series=[ChartSeries(name="Count", data=counts.values.astype(int).tolist())],
+        labels=labels,
+        series=[ChartSeries(name="Count", data=counts)],
         details=details
     )
     
@@ -402,24 +402,30 @@ async def data_incident_type_distribution(
     min_severity: Optional[float] = Query(None, ge=0, le=5, description="Min severity"),
     max_severity: Optional[float] = Query(None, ge=0, le=5, description="Max severity"),
 ):
-    df = get_incident_df() if (dataset or "incident").lower() == "incident" else get_hazard_df()
+    source = get_incident_df() if (dataset or "incident").lower() == "incident" else get_hazard_df()
+    filters = filters_from_params(locals())
+    empty = {"labels": [], "series": []}
+    # Include underscore variant to match documented column 'incident_type'
+    type_candidates = ["incident_type", "incident type(s)", "category", "accident type"]
     
-    # Apply flexible filters
-    df = apply_analytics_filters(
-        df, start_date=start_date, end_date=end_date, departments=departments,
-        locations=locations, min_severity=min_severity, max_severity=max_severity
-    )
+    def from_raw():
+        # Apply flexible filters
+        df = apply_analytics_filters(source, **filters)
+        if df is None or df.empty:
+            return empty
+        type_col = _resolve_column(df, type_candidates) or df.columns[0]
+        vc = df[type_col].astype(str).str.split(",").explode().str.strip()
+        counts = vc.value_counts().head(20)
+        return {
+            "labels": counts.index.tolist(),
+            "series": [{"name": "Count", "data": counts.values.astype(int).tolist()}],
+        }
     
-    if df is None or df.empty:
-        return JSONResponse(content={"labels": [], "series": []})
-    # Include underscore variant to match documented column 'incident_type'
-    type_col = _resolve_column(df, ["incident_type", "incident type(s)", "category", "accident type"]) or df.columns[0]
-    vc = df[type_col].astype(str).str.split(",").explode().str.strip()
-    counts = vc.value_counts().head(20)
-    return JSONResponse(content={
-        "labels": counts.index.tolist(),
-        "series": [{"name": "Count", "data": counts.values.astype(int).tolist()}],
-    })
+    return JSONResponse(content=answer_from_rollup(
+        "incident-type-distribution", _rollup_cube(source), filters, rollup.type_distribution, from_raw,
+        compare=rollup.ranked_match(lambda p: (p["labels"], p["series"][0]["data"] if p["series"] else [])),
+        empty=empty, type=_resolve_column(source, type_candidates),
+    ))
 
 
 @router.get("/data/root-cause-pareto/incident-types")
@@ -482,62 +488,72 @@ async def data_root_cause_pareto(
     incident_types: Optional[List[str]] = Query(None, description="Filter by incident types"),
     top_n: int = Query(15, description="Number of top root causes to show"),
 ):
-    df = get_incident_df() if (dataset or "incident").lower() == "incident" else get_hazard_df()
-    
-    # Apply standard filters
-    df = apply_analytics_filters(
-        df, start_date=start_date, end_date=end_date, departments=departments,
-        locations=locations, sublocations=sublocations, statuses=statuses,
-        incident_types=incident_types
-    )
+    source = get_incident_df() if (dataset or "incident").lower() == "incident" else get_hazard_df()
+    filters = filters_from_params(locals())
+    empty = {"labels": [], "bars": [], "cum_pct": [], "incident_type": incident_type or "All"}
     
-    if df is None or df.empty:
-        return JSONResponse(content={"labels": [], "bars": [], "cum_pct": [], "incident_type": incident_type or "All"})
-    
-    # Additional filter by specific incident_type (radio button selection)
-    if incident_type and incident_type.strip().lower() not in ["all", ""]:
-        type_col = _resolve_column(df, ["incident_type(s)", "incident_type", "incident type(s)", "category"]) or df.columns[0]
-        # Split multi-value incident types and filter
-        df_exploded = df.copy()
-        df_exploded["_type_split"] = df_exploded[type_col].astype(str).str.split(";")
-        df_exploded = df_exploded.explode("_type_split")
-        df_exploded["_type_split"] = df_exploded["_type_split"].str.strip()
-        # Case-insensitive match
-        mask = df_exploded["_type_split"].str.lower() == incident_type.strip().lower()
-        df = df_exploded[mask].copy()
-    
-    if df.empty:
-        return JSONResponse(content={"labels": [], "bars": [], "cum_pct": [], "incident_type": incident_type or "All"})
-    
-    # Extract and process root causes
-    rc_col = _resolve_column(df, ["Root Cause", "root_cause", "root cause", "Key Factor", "key_factor", "Contributing Factor", "contributing_factor"]) or df.columns[0]
-    
-    # Split on semicolons and explode
-    series = df[rc_col].dropna().astype(str)
-    series = series.str.split(";").explode().str.strip()
-    
-    # Remove empty strings and placeholder values
-    series = series[series != ""]
-    series = series[~series.str.contains("nan|null|none|n/a|not applicable", case=False, na=False, regex=True)]
-    
-    if series.empty:
-        return JSONResponse(content={"labels": [], "bars": [], "cum_pct": [], "incident_type": incident_type or "All"})
-    
-    # Count and get top N
-    counts = series.value_counts()
-    counts = counts.head(top_n)
-    
-    # Calculate cumulative percentage
-    total = counts.sum() if counts.sum() > 0 else 1
-    cum = counts.cumsum() / total * 100
+    def from_raw():
+        # Apply standard filters
+        df = apply_analytics_filters(source, **filters)
+        
+        if df is None or df.empty:
+            return empty
+        
+        # Additional filter by specific incident_type (radio button selection)
+        if incident_type and incident_type.strip().lower() not in ["all", ""]:
+            type_col = _resolve_column(df, ["incident_type(s)", "incident_type", "incident type(s)", "category"]) or df.columns[0]
+            # Split multi-value incident types and filter
+            df_exploded = df.copy()
+            df_exploded["_type_split"] = df_exploded[type_col].astype(str).str.split(";")
+            df_exploded = df_exploded.explode("_type_split")
+            df_exploded["_type_split"] = df_exploded["_type_split"].str.strip()
+            # Case-insensitive match
+            mask = df_exploded["_type_split"].str.lower() == incident_type.strip().lower()
+            df = df_exploded[mask].copy()
+        
+        if df.empty:
+            return empty
+        
+        # Extract and process root causes
+        rc_col = _resolve_column(df, ["Root Cause", "root_cause", "root cause", "Key Factor", "key_factor", "Contributing Factor", "contributing_factor"]) or df.columns[0]
+        
+        # Split on semicolons and explode
+        series = df[rc_col].dropna().astype(str)
+        series = series.str.split(";").explode().str.strip()
+        
+        # Remove empty strings and placeholder values
+        series = series[series != ""]
+        series = series[~series.str.contains("nan|null|none|n/a|not applicable", case=False, na=False, regex=True)]
+        
+        if series.empty:
+            return empty
+        
+        # Count and get top N
+        counts = series.value_counts()
+        counts = counts.head(top_n)
+        
+        # Calculate cumulative percentage
+        total = counts.sum() if counts.sum() > 0 else 1
+        cum = counts.cumsum() / total * 100
+        
+        return {
+            "labels": counts.index.tolist(),
+            "bars": counts.values.astype(int).tolist(),
+            "cum_pct": cum.round(2).values.tolist(),
+            "incident_type": incident_type or "All",
+            "total_count": int(counts.sum()),
+        }
     
-    return JSONResponse(content={
-        "labels": counts.index.tolist(),
-        "bars": counts.values.astype(int).tolist(),
-        "cum_pct": cum.round(2).values.tolist(),
-        "incident_type": incident_type or "All",
-        "total_count": int(counts.sum()),
-    })
+    by_type = bool(incident_type and incident_type.strip().lower() not in ["all", ""])
+    columns = {"root_cause": _resolve_column(source, _ROOT_CAUSE_CANDIDATES)}
+    if by_type:
+        columns["type"] = _resolve_column(source, _TYPE_CANDIDATES)
+    return JSONResponse(content=answer_from_rollup(
+        "root-cause-pareto", _rollup_cube(source, root_cause=True), filters,
+        lambda cube, mask: rollup.root_cause_pareto(cube, mask, incident_type, top_n), from_raw,
+        compare=rollup.ranked_match(lambda p: (p["labels"], p["bars"])),
+        empty=empty, **columns,
+    ))
 
 
 @router.get("/data/injury-severity-pyramid")
@@ -585,34 +601,49 @@ async def data_department_month_heatmap(
     min_risk: Optional[float] = Query(None, ge=0, le=5, description="Min risk"),
     max_risk: Optional[float] = Query(None, ge=0, le=5, description="Max risk"),
 ):
-    df = get_incident_df() if (dataset or "incident").lower() == "incident" else get_hazard_df()
+    source = get_incident_df() if (dataset or "incident").lower() == "incident" else get_hazard_df()
+    filters = filters_from_params(locals())
+    date_candidates = ["occurrence_date", "date of occurrence", "date reported"]
     
-    # Apply flexible filters
-    df = apply_analytics_filters(
-        df, start_date=start_date, end_date=end_date, departments=departments,
-        locations=locations, min_severity=min_severity, max_severity=max_severity,
-        min_risk=min_risk, max_risk=max_risk
-    )
-    
-    if df is None or df.empty:
-        return JSONResponse(content={"x": [], "y": [], "z": [], "metric": "count"})
-    dep_col = _resolve_column(df, ["department"]) or _resolve_column(df, ["section"]) or df.columns[0]
-    date_col = _resolve_column(df, ["occurrence_date", "date of occurrence", "date reported"]) or df.columns[0]
-    months = _to_date_period(df[date_col], granularity='M')
-    metric_col = _resolve_column(df, ["risk_score", "severity_score"])  # optional
-    cp = pd.DataFrame({"department": df[dep_col].astype(str), "month": months})
+    def from_raw():
+        # Apply flexible filters
+        df = apply_analytics_filters(source, **filters)
+        if df is None or df.empty:
+            return {"x": [], "y": [], "z": [], "metric": "count"}
+        dep_col = _resolve_column(df, ["department"]) or _resolve_column(df, ["section"]) or df.columns[0]
+        date_col = _resolve_column(df, date_candidates) or df.columns[0]
+        months = _to_date_period(df[date_col], granularity='M')
+        metric_col = _resolve_column(df, ["risk_score", "severity_score"])  # optional
+        cp = pd.DataFrame({"department": df[dep_col].astype(str), "month": months})
+        if metric_col is not None:
+            cp["value"] = pd.to_numeric(df[metric_col], errors='coerce')
+            pivot = cp.pivot_table(values="value", index="department", columns="month", aggfunc="mean")
+            metric = "avg"
+        else:
+            cp["value"] = 1
+            pivot = cp.pivot_table(values="value", index="department", columns="month", aggfunc="count")
+            metric = "count"
+        x = [str(c) for c in pivot.columns]
+        y = [str(i) for i in pivot.index]
+        z = pivot.fillna(0).to_numpy().tolist()
+        return {"x": x, "y": y, "z": z, "metric": metric}
+    
+    cube = _rollup_cube(source)
+    columns = {
+        "department": _resolve_column(source, ["department"]) or _resolve_column(source, ["section"]),
+        "date": _resolve_column(source, date_candidates),
+    }
+    metric_col = _resolve_column(source, ["risk_score", "severity_score"])
+    metric_dim = None
     if metric_col is not None:
-        cp["value"] = pd.to_numeric(df[metric_col], errors='coerce')
-        pivot = cp.pivot_table(values="value", index="department", columns="month", aggfunc="mean")
-        metric = "avg"
-    else:
-        cp["value"] = 1
-        pivot = cp.pivot_table(values="value", index="department", columns="month", aggfunc="count")
-        metric = "count"
-    x = [str(c) for c in pivot.columns]
-    y = [str(i) for i in pivot.index]
-    z = pivot.fillna(0).to_numpy().tolist()
-    return JSONResponse(content={"x": x, "y": y, "z": z, "metric": metric})
+        # The metric is averaged from whichever score measure holds that column
+        metric_dim = "risk" if cube is not None and cube.columns.get("risk") == metric_col else "severity"
+        columns[metric_dim] = metric_col
+    return JSONResponse(content=answer_from_rollup(
+        "department-month-heatmap", cube, filters,
+        lambda c, mask: rollup.department_month(c, mask, metric_dim), from_raw,
+        empty={"x": [], "y": [], "z": [], "metric": "count"}, **columns,
+    ))
 
 
 @router.get("/data/consequence-gap")
@@ -730,7 +761,7 @@ async def data_audit_monthly_volume(
     if not agg_dict:
         return JSONResponse(content={"labels": [], "series": []})
 
-    aud = df.groupby(id_col, as_index=False).agg(agg_dict)
+    aud = df.groupby(id_col, as_index=False, observed=True).agg(agg_dict)
 
     # Build initiated and closed month counts
     initiated = pd.Series(dtype=int)
@@ -1236,16 +1267,23 @@ async def data_incident_cost_trend(dataset: str = Query("incident")):
     if df is None or df.empty:
         return JSONResponse(content={"labels": [], "series": []})
     date_col = _resolve_column(df, ["occurrence_date", "date of occurrence", "date reported"]) or df.columns[0]
-    cost_col = _resolve_column(df, ["total cost", "estimated_cost_impact"]) or None
+    cost_col = _resolve_column(df, _COST_CANDIDATES) or None
     if cost_col is None:
         return JSONResponse(content={"labels": [], "series": []})
-    months = _to_date_period(df[date_col], granularity='M')
-    vals = pd.to_numeric(df[cost_col], errors='coerce')
-    grp = pd.DataFrame({"month": months, "cost": vals}).groupby("month").sum().sort_index()
-    return JSONResponse(content={
-        "labels": grp.index.tolist(),
-        "series": [{"name": "Total Cost", "data": grp["cost"].round(0).fillna(0).astype(float).tolist()}],
-    })
+    
+    def from_raw():
+        months = _to_date_period(df[date_col], granularity='M')
+        vals = pd.to_numeric(df[cost_col], errors='coerce')
+        grp = pd.DataFrame({"month": months, "cost": vals}).groupby("month").sum().sort_index()
+        return {
+            "labels": grp.index.tolist(),
+            "series": [{"name": "Total Cost", "data": grp["cost"].round(0).fillna(0).astype(float).tolist()}],
+        }
+    
+    return JSONResponse(content=answer_from_rollup(
+        "incident-cost-trend", _rollup_cube(df), {}, rollup.cost_trend, from_raw,
+        date=date_col, cost=cost_col,
+    ))
 
 
 @router.get("/data/hazard-cost-trend")
@@ -1361,7 +1399,7 @@ async def hse_performance_index_insights(dataset: str = Query("incident", descri
         cp[c] = pd.to_numeric(cp[c], errors='coerce')
     for c in ['root_cause_is_missing', 'corrective_actions_is_missing']:
         cp[c] = pd.to_numeric(cp[c].astype(float), errors='coerce')
-    dept_metrics = cp.groupby('department').agg({
+    dept_metrics = cp.groupby('department', observed=True).agg({
         'severity_score': 'mean',
         'risk_score': 'mean',
         'reporting_delay_days': 'mean',
@@ -1530,7 +1568,7 @@ async def audit_inspection_traker_insights():
         d = df.copy()
         d['_m'] = pd.to_datetime(d['start_date'], errors='coerce').dt.to_period('M')
         totals = d.groupby('_m').size()
-        by_status = d.groupby([d['_m'], 'audit_status']).size().unstack(fill_value=0)
+        by_status = d.groupby([d['_m'], 'audit_status'], observed=True).size().unstack(fill_value=0)
         return {
             'months': [str(ix) for ix in totals.index],
             'totals': [int(v) for v in totals.values],
@@ -1574,7 +1612,7 @@ async def location_risk_treemap_insights(dataset: str = Query("incident", descri
     for c in ['severity_score','risk_score','estimated_cost_impact']:
         if c in cp.columns:
             cp[c] = pd.to_numeric(cp[c], errors='coerce')
-    g = cp.groupby(['location','sublocation']).agg(
+    g = cp.groupby(['location','sublocation'], observed=True).agg(
         count=('sublocation','count'),
         avg_severity=('severity_score','mean'),
         avg_risk=('risk_score','mean'),
@@ -1632,7 +1670,7 @@ async def violation_analysis_insights(dataset: str = Query("hazard", description
         summary['reporting_delay_mean'] = float(rd.mean()) if rd.notna().any() else None
         summary['reporting_delay_p95'] = float(rd.quantile(0.95)) if rd.notna().any() else None
     if {'department','violation_type_hazard_id'}.issubset(df.columns):
-        heat = df.pivot_table(index='department', columns='violation_type_hazard_id', values='violation_type_hazard_id', aggfunc='count').fillna(0)
+        heat = df.pivot_table(index='department', columns='violation_type_hazard_id', values='violation_type_hazard_id', aggfunc='count', observed=True).fillna(0)
         # Top department-violation pairs
         pairs = []
         for i, dep in enumerate(heat.index):
@@ -2483,8 +2521,8 @@ async def injury_penalty_by_department():
     major_df = injury_df[injury_df[severity_col].isin(['C2 - Serious', 'C3 - Severe'])]
     
     # Count by department
-    minor_counts = minor_df.groupby(dept_col).size().reset_index(name='Minor_Count')
-    major_counts = major_df.groupby(dept_col).size().reset_index(name='Major_Count')
+    minor_counts = minor_df.groupby(dept_col, observed=True).size().reset_index(name='Minor_Count')
+    major_counts = major_df.groupby(dept_col, observed=True).size().reset_index(name='Major_Count')
     
     # Merge and calculate penalties
     dept_summary = pd.merge(minor_counts, major_counts, on=dept_col, how='outer').fillna(0)
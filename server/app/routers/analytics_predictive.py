@@ -13,6 +13,8 @@ from fastapi.responses import JSONResponse
 
 from ..services.excel import get_incident_df, get_hazard_df, get_audit_df, get_inspection_df
 from ..services.json_utils import to_native_json
+from ..services.data_cache import version_cached
+from ..services.filters import apply_analytics_filters, filters_from_params
 
 
 router = APIRouter(prefix="/analytics/predictive", tags=["predictive-analytics"])
@@ -74,10 +76,24 @@ def _simple_forecast(historical_data: pd.Series, months_ahead: int = 3) -> List[
 # ======================= INCIDENT FORECAST =======================
 
 @router.get("/incident-forecast")
+@version_cached
 async def incident_forecast(
     months_ahead: int = Query(4, ge=1, le=12, description="Number of months to forecast", example=4),
     location: Optional[str] = Query(None, description="Filter by location", example="Karachi"),
     department: Optional[str] = Query(None, description="Filter by department", example="Process - EDC / VCM"),
+    status: Optional[str] = Query(None, description="Status contains (case-insensitive)"),
+    start_date: Optional[str] = Query(None, description="Filter start date (YYYY-MM-DD)"),
+    end_date: Optional[str] = Query(None, description="Filter end date (YYYY-MM-DD)"),
+    departments: Optional[List[str]] = Query(None, description="Filter by departments"),
+    locations: Optional[List[str]] = Query(None, description="Filter by locations"),
+    sublocations: Optional[List[str]] = Query(None, description="Filter by sublocations"),
+    min_severity: Optional[float] = Query(None, ge=0, le=5, description="Min severity"),
+    max_severity: Optional[float] = Query(None, ge=0, le=5, description="Max severity"),
+    min_risk: Optional[float] = Query(None, ge=0, le=5, description="Min risk"),
+    max_risk: Optional[float] = Query(None, ge=0, le=5, description="Max risk"),
+    statuses: Optional[List[str]] = Query(None, description="Filter by status"),
+    incident_types: Optional[List[str]] = Query(None, description="Filter by incident types"),
+    violation_types: Optional[List[str]] = Query(None, description="Filter by violation types"),
 ):
     """
     Incident Likelihood Forecast (4-month outlook by default).
@@ -98,15 +114,8 @@ async def incident_forecast(
         }))
     
     # Apply filters
-    if location is not None and location != "":
-        loc_col = _resolve_column(inc_df, ["location"])
-        if loc_col:
-            inc_df = inc_df[inc_df[loc_col].astype(str).str.contains(str(location), case=False, na=False)]
-    
-    if department is not None and department != "":
-        dept_col = _resolve_column(inc_df, ["department", "section"])
-        if dept_col:
-            inc_df = inc_df[inc_df[dept_col].astype(str).str.contains(str(department), case=False, na=False)]
+    filters = filters_from_params(locals())
+    inc_df = apply_analytics_filters(inc_df, **filters)
     
     # Extract monthly counts
     date_col = _resolve_column(inc_df, ["occurrence_date", "date", "reported_date"])
@@ -154,9 +163,24 @@ async def incident_forecast(
 # ======================= RISK TREND PROJECTION =======================
 
 @router.get("/risk-trend-projection")
+@version_cached
 async def risk_trend_projection(
     months_ahead: int = Query(3, ge=1, le=12, description="Number of months to forecast", example=3),
     location: Optional[str] = Query(None, description="Filter by location", example="Manufacturing Facility"),
+    department: Optional[str] = Query(None, description="Department contains (case-insensitive)"),
+    status: Optional[str] = Query(None, description="Status contains (case-insensitive)"),
+    start_date: Optional[str] = Query(None, description="Filter start date (YYYY-MM-DD)"),
+    end_date: Optional[str] = Query(None, description="Filter end date (YYYY-MM-DD)"),
+    departments: Optional[List[str]] = Query(None, description="Filter by departments"),
+    locations: Optional[List[str]] = Query(None, description="Filter by locations"),
+    sublocations: Optional[List[str]] = Query(None, description="Filter by sublocations"),
+    min_severity: Optional[float] = Query(None, ge=0, le=5, description="Min severity"),
+    max_severity: Optional[float] = Query(None, ge=0, le=5, description="Max severity"),
+    min_risk: Optional[float] = Query(None, ge=0, le=5, description="Min risk"),
+    max_risk: Optional[float] = Query(None, ge=0, le=5, description="Max risk"),
+    statuses: Optional[List[str]] = Query(None, description="Filter by status"),
+    incident_types: Optional[List[str]] = Query(None, description="Filter by incident types"),
+    violation_types: Optional[List[str]] = Query(None, description="Filter by violation types"),
 ):
     """
     Risk Trend Lines with Future Projection.
@@ -164,18 +188,14 @@ async def risk_trend_projection(
     Analyzes average risk scores over time and projects future trends.
     Useful for identifying whether risk levels are increasing or decreasing.
     """
-    inc_df = get_incident_df()
-    haz_df = get_hazard_df()
+    filters = filters_from_params(locals())
+    inc_df = apply_analytics_filters(get_incident_df(), **filters)
+    haz_df = apply_analytics_filters(get_hazard_df(), **filters)
     
     combined_data = []
     
     # Process incidents
     if inc_df is not None and not inc_df.empty:
-        if location is not None and location != "":
-            loc_col = _resolve_column(inc_df, ["location"])
-            if loc_col:
-                inc_df = inc_df[inc_df[loc_col].astype(str).str.contains(str(location), case=False, na=False)]
-        
         date_col = _resolve_column(inc_df, ["occurrence_date", "date"])
         risk_col = _resolve_column(inc_df, ["risk_score", "severity_score"])
         
@@ -190,11 +210,6 @@ async def risk_trend_projection(
     
     # Process hazards
     if haz_df is not None and not haz_df.empty:
-        if location is not None and location != "":
-            loc_col = _resolve_column(haz_df, ["location"])
-            if loc_col:
-                haz_df = haz_df[haz_df[loc_col].astype(str).str.contains(str(location), case=False, na=False)]
-        
         date_col = _resolve_column(haz_df, ["occurrence_date", "date"])
         risk_col = _resolve_column(haz_df, ["risk_score"])
         
@@ -339,8 +354,8 @@ async def leading_vs_lagging_indicators():
             }
             
             inc_df_copy = inc_df.copy()
-            inc_df_copy['Actual_Severity'] = inc_df_copy[actual_col].map(severity_scores)
-            inc_df_copy['Worst_Severity'] = inc_df_copy[worst_col].map(severity_scores)
+            inc_df_copy['Actual_Severity'] = inc_df_copy[actual_col].astype(object).map(severity_scores)
+            inc_df_copy['Worst_Severity'] = inc_df_copy[worst_col].astype(object).map(severity_scores)
             
             # Near-miss: Actual=1 (C0), Worst>=4 (C3/C4/C5)
             near_miss_mask = (
@@ -450,9 +465,23 @@ async def leading_vs_lagging_indicators():
 # ======================= OBSERVATION TO INCIDENT LAG TIME =======================
 
 @router.get("/observation-lag-time")
+@version_cached
 async def observation_lag_time(
     location: Optional[str] = Query(None, description="Filter by location", example="Karachi"),
     department: Optional[str] = Query(None, description="Filter by department", example="PVC"),
+    status: Optional[str] = Query(None, description="Status contains (case-insensitive)"),
+    start_date: Optional[str] = Query(None, description="Filter start date (YYYY-MM-DD)"),
+    end_date: Optional[str] = Query(None, description="Filter end date (YYYY-MM-DD)"),
+    departments: Optional[List[str]] = Query(None, description="Filter by departments"),
+    locations: Optional[List[str]] = Query(None, description="Filter by locations"),
+    sublocations: Optional[List[str]] = Query(None, description="Filter by sublocations"),
+    min_severity: Optional[float] = Query(None, ge=0, le=5, description="Min severity"),
+    max_severity: Optional[float] = Query(None, ge=0, le=5, description="Max severity"),
+    min_risk: Optional[float] = Query(None, ge=0, le=5, description="Min risk"),
+    max_risk: Optional[float] = Query(None, ge=0, le=5, description="Max risk"),
+    statuses: Optional[List[str]] = Query(None, description="Filter by status"),
+    incident_types: Optional[List[str]] = Query(None, description="Filter by incident types"),
+    violation_types: Optional[List[str]] = Query(None, description="Filter by violation types"),
 ):
     """
     Observation-to-Incident Lag Time Analysis.
@@ -460,8 +489,9 @@ async def observation_lag_time(
     Measures the time between when hazards/observations are identified
     and when related incidents occur. Helps assess intervention effectiveness.
     """
-    inc_df = get_incident_df()
-    haz_df = get_hazard_df()
+    filters = filters_from_params(locals())
+    inc_df = apply_analytics_filters(get_incident_df(), **filters)
+    haz_df = apply_analytics_filters(get_hazard_df(), **filters)
     
     if inc_df is None or inc_df.empty or haz_df is None or haz_df.empty:
         return JSONResponse(content=to_native_json({
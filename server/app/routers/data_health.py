@@ -6,6 +6,7 @@ from __future__ import annotations
 
 from typing import List, Dict, Any, Optional
 from datetime import datetime
+import numpy as np
 import pandas as pd
 import os
 from pathlib import Path
@@ -17,6 +18,13 @@ from ..services.excel import (
     load_default_sheets, get_dataset_selection_names
 )
 from ..services.json_utils import to_native_json
+from ..services.lazy_workbook import LazyWorkbook
+from ..services.filter_index import contains_mask
+from ..services.data_cache import version_cached
+from ..services.filters import apply_analytics_filters, filter_row_ids, filters_from_params
+from ..services.classification import (
+    HEINRICH_COLUMNS, HEINRICH_LAYERS, high_risk_mask, heinrich_incident_levels, severity_counts, severity_levels, take_rows,
+)
 
 
 router = APIRouter(prefix="/data-health", tags=["data-health"])
@@ -26,7 +34,8 @@ router = APIRouter(prefix="/data-health", tags=["data-health"])
 
 @router.get("/dataset-overview")
 async def get_dataset_overview(
-    sample_rows: int = Query(5, ge=1, le=20, description="Number of sample rows per sheet")
+    sample_rows: int = Query(5, ge=1, le=20, description="Number of sample rows per sheet"),
+    parse_all: bool = Query(False, description="Parse sheets that have not been loaded yet (otherwise they are described from headers only)"),
 ):
     """
     Get complete overview of the Excel dataset including:
@@ -40,6 +49,7 @@ async def get_dataset_overview(
     
     Query Parameters:
         - sample_rows: Number of sample rows to return per sheet (1-20, default: 5)
+        - parse_all: Parse not-yet-loaded sheets instead of listing their headers only
     
     Returns:
         - sheets: List of all sheets with their metadata
@@ -62,7 +72,22 @@ async def get_dataset_overview(
     # Build overview for each sheet
     sheets_overview = []
     
-    for sheet_name, df in sheets_dict.items():
+    lazy = isinstance(sheets_dict, LazyWorkbook)
+    for sheet_name in sheets_dict.keys():
+        if lazy and not parse_all and not sheets_dict.is_loaded(sheet_name):
+            # Metadata only: column names and row count, no sheet parse
+            columns = sheets_dict.sheet_columns(sheet_name)
+            sheets_overview.append({
+                "sheet_name": sheet_name,
+                "total_rows": sheets_dict.sheet_rows(sheet_name),
+                "total_columns": len(columns),
+                "columns": [{"name": c} for c in columns],
+                "sample_rows": [],
+                "used_for_datasets": [k for k, v in dataset_mapping.items() if v == sheet_name],
+                "loaded": False,
+            })
+            continue
+        df = sheets_dict.get(sheet_name)
         if df is None or df.empty:
             continue
         
@@ -119,7 +144,8 @@ async def get_dataset_overview(
             "columns": columns_info,
             "sample_rows": sample_records,
             "used_for_datasets": used_for,
-            "memory_usage_mb": round(df.memory_usage(deep=True).sum() / 1024 / 1024, 2)
+            "memory_usage_mb": round(df.memory_usage(deep=True).sum() / 1024 / 1024, 2),
+            "loaded": True,
         }
         
         sheets_overview.append(sheet_overview)
@@ -137,6 +163,8 @@ async def get_dataset_overview(
             "file_size_mb": round(file_stat.st_size / 1024 / 1024, 2),
             "last_modified": datetime.fromtimestamp(file_stat.st_mtime).isoformat(),
         })
+        from ..services.snapshot import snapshot_info
+        file_info["snapshot"] = snapshot_info(DEFAULT_EXCEL_PATH)
     
     return JSONResponse(content=to_native_json({
         "sheets": sheets_overview,
@@ -573,6 +601,22 @@ async def get_data_source_info():
     }))
 
 
+@router.get("/memory")
+async def get_memory_usage(
+    estimate: bool = Query(False, description="Estimate savings for sheets that were not compacted"),
+):
+    """Resident bytes per loaded sheet and the bytes saved by column compaction
+    (category / int32). Compaction runs on load when EXCEL_COMPACT_COLUMNS=1.
+    """
+    from ..services.compaction import memory_report
+    sheets = load_default_sheets()
+    if isinstance(sheets, LazyWorkbook):
+        # Only sheets that have been parsed occupy memory
+        sheets = sheets.loaded_frames()
+    report = memory_report(sheets, estimate=estimate)
+    return JSONResponse(content=to_native_json(report))
+
+
 @router.get("/selected-sheets")
 async def get_selected_sheets():
     """Return the sheet names that are currently selected for each dataset.
@@ -584,6 +628,7 @@ async def get_selected_sheets():
 
 
 @router.get("/counts/all")
+@version_cached
 async def get_all_counts():
     """Return counts for incidents, hazards, audits, audit findings, inspections, inspection findings.
     Uses dataset accessors for the four primary datasets and name-based matching for findings sheets.
@@ -851,12 +896,19 @@ async def trace_heinrich_pyramid_data(
     insp_df = get_inspection_df()
     
     # Apply same filters as the actual endpoint
-    from ..routers.analytics_advanced import _apply_filters
-    
-    inc_filtered = _apply_filters(inc_df, start_date, end_date, location, department) if inc_df is not None else None
-    haz_filtered = _apply_filters(haz_df, start_date, end_date, location, department) if haz_df is not None else None
-    aud_filtered = _apply_filters(aud_df, start_date, end_date, location) if aud_df is not None else None
-    insp_filtered = _apply_filters(insp_df, start_date, end_date, location) if insp_df is not None else None
+    filters = filters_from_params(locals())
+    inc_filtered = apply_analytics_filters(inc_df, **filters) if inc_df is not None else None
+    haz_filtered = apply_analytics_filters(haz_df, **filters) if haz_df is not None else None
+    aud_filtered = apply_analytics_filters(aud_df, start_date=start_date, end_date=end_date, location=location) if aud_df is not None else None
+    insp_filtered = apply_analytics_filters(insp_df, start_date=start_date, end_date=end_date, location=location) if insp_df is not None else None
+    
+    # Incident rows per pyramid layer, from the shared per-version classification
+    layer_counts = {}
+    if inc_df is not None and not inc_df.empty:
+        levels = take_rows(heinrich_incident_levels(inc_df)['Heinrich_Level'], filter_row_ids(inc_df, **filters))
+        codes = levels.cat.codes.to_numpy()
+        per_layer = np.bincount(codes[codes >= 0], minlength=len(HEINRICH_LAYERS))
+        layer_counts = {f"layer_{layer}": int(c) for layer, c in zip(HEINRICH_LAYERS, per_layer)}
     
     trace_info = {
         "chart_name": "Heinrich's Safety Pyramid",
@@ -871,9 +923,10 @@ async def trace_heinrich_pyramid_data(
             {
                 "layer": "Layer 1-2 (Serious/Minor Injuries)",
                 "excel_sheet": "Incident",
-                "columns_used": ["severity_score", "severity_level", "incident_type"],
+                "columns_used": [HEINRICH_COLUMNS["type"], HEINRICH_COLUMNS["actual"], HEINRICH_COLUMNS["worst"]],
                 "total_records_in_sheet": len(inc_df) if inc_df is not None else 0,
                 "records_after_filter": len(inc_filtered) if inc_filtered is not None else 0,
+                "records_per_layer": layer_counts,
                 "sample_ids": inc_filtered["incident_id"].head(3).tolist() if inc_filtered is not None and "incident_id" in inc_filtered.columns else []
             },
             {
@@ -901,7 +954,7 @@ async def trace_heinrich_pyramid_data(
                 "records_after_filter": (len(aud_filtered) if aud_filtered is not None else 0) + (len(insp_filtered) if insp_filtered is not None else 0)
             }
         ],
-        "calculation_method": "Classifies incidents by severity_score: >=4 (serious), 2-3 (minor), <2 (near-miss)"
+        "calculation_method": "Layers 1-3: injuries by actual consequence (C4-C5, C3, C1-C2); layer 4: C0 actual with C3-C5 worst case; layer 5: hazards/audits with a C1-C2 worst case"
     }
     
     return JSONResponse(content=to_native_json(trace_info))
@@ -917,8 +970,7 @@ async def trace_trir_data(
     """
     inc_df = get_incident_df()
     
-    from ..routers.analytics_advanced import _apply_filters
-    inc_filtered = _apply_filters(inc_df, start_date, end_date) if inc_df is not None else None
+    inc_filtered = apply_analytics_filters(inc_df, start_date=start_date, end_date=end_date) if inc_df is not None else None
     
     # Count recordable incidents (severity >= 2)
     recordable_count = 0
@@ -970,16 +1022,16 @@ async def trace_incident_forecast_data(
     """
     inc_df = get_incident_df()
     
-    # Apply filters
+    # Apply filters (substring matches resolved on the dataset's trigram index)
     filtered_df = inc_df.copy() if inc_df is not None else None
     
-    if filtered_df is not None and location:
-        if "location" in filtered_df.columns:
-            filtered_df = filtered_df[filtered_df["location"].astype(str).str.contains(location, case=False, na=False)]
-    
-    if filtered_df is not None and department:
-        if "department" in filtered_df.columns:
-            filtered_df = filtered_df[filtered_df["department"].astype(str).str.contains(department, case=False, na=False)]
+    if inc_df is not None and (location or department):
+        mask = np.ones(len(inc_df), dtype=bool)
+        if location and "location" in inc_df.columns:
+            mask &= contains_mask(inc_df, "location", location)
+        if department and "department" in inc_df.columns:
+            mask &= contains_mask(inc_df, "department", department)
+        filtered_df = inc_df.take(np.flatnonzero(mask))
     
     # Get date column
     date_col = None
@@ -1037,11 +1089,26 @@ async def trace_safety_index_data(
     haz_df = get_hazard_df()
     aud_df = get_audit_df()
     
-    from ..routers.analytics_advanced import _apply_filters
+    filters = filters_from_params(locals())
+    inc_filtered = apply_analytics_filters(inc_df, **filters) if inc_df is not None else None
+    haz_filtered = apply_analytics_filters(haz_df, **filters) if haz_df is not None else None
+    aud_filtered = apply_analytics_filters(aud_df, **filters) if aud_df is not None else None
     
-    inc_filtered = _apply_filters(inc_df, start_date, end_date, location) if inc_df is not None else None
-    haz_filtered = _apply_filters(haz_df, start_date, end_date, location) if haz_df is not None else None
-    aud_filtered = _apply_filters(aud_df, start_date, end_date, location) if aud_df is not None else None
+    # Same classification (and columns) as the site safety index itself
+    level_counts = {"Serious Injury/Fatality": 0, "Minor Injury": 0}
+    sev_score_col = sev_text_col = None
+    if inc_filtered is not None and not inc_filtered.empty:
+        sev_score_col = _resolve_column_local(inc_df, ["severity_score", "risk_score"])
+        sev_text_col = _resolve_column_local(inc_df, ["actual_consequence_incident", "severity"])
+        level_counts = severity_counts(take_rows(
+            severity_levels(inc_df, sev_score_col, sev_text_col), filter_row_ids(inc_df, **filters)
+        ))
+    high_risk_count = 0
+    risk_col = None
+    if haz_filtered is not None and not haz_filtered.empty:
+        risk_col = _resolve_column_local(haz_df, ["risk_score", "risk_level"])
+        if risk_col:
+            high_risk_count = int(take_rows(high_risk_mask(haz_df, risk_col), filter_row_ids(haz_df, **filters)).sum())
     
     trace_info = {
         "chart_name": "Site Safety Index (0-100 Score)",
@@ -1056,23 +1123,23 @@ async def trace_safety_index_data(
             {
                 "component": "Serious Injuries (Deduction: -10 each)",
                 "excel_sheet": "Incident",
-                "columns_used": ["severity_score", "severity_level"],
-                "filter_criteria": "severity_score >= 4",
-                "records_used": len(inc_filtered[pd.to_numeric(inc_filtered.get("severity_score", pd.Series()), errors="coerce") >= 4]) if inc_filtered is not None and "severity_score" in inc_filtered.columns else 0
+                "columns_used": [c for c in (sev_score_col, sev_text_col) if c],
+                "filter_criteria": "consequence text mentions critical/fatal/severe/C3/C4, else severity score >= 3",
+                "records_used": level_counts["Serious Injury/Fatality"]
             },
             {
                 "component": "Minor Injuries (Deduction: -3 each)",
                 "excel_sheet": "Incident",
-                "columns_used": ["severity_score"],
-                "filter_criteria": "2 <= severity_score < 4",
-                "records_used": len(inc_filtered[(pd.to_numeric(inc_filtered.get("severity_score", pd.Series()), errors="coerce") >= 2) & (pd.to_numeric(inc_filtered.get("severity_score", pd.Series()), errors="coerce") < 4)]) if inc_filtered is not None and "severity_score" in inc_filtered.columns else 0
+                "columns_used": [c for c in (sev_score_col, sev_text_col) if c],
+                "filter_criteria": "consequence text mentions serious/high/C2/moderate, else 2 <= severity score < 3",
+                "records_used": level_counts["Minor Injury"]
             },
             {
                 "component": "High Risk Hazards (Deduction: -2 each)",
                 "excel_sheet": "Hazard ID",
-                "columns_used": ["risk_score"],
-                "filter_criteria": "risk_score >= 4",
-                "records_used": len(haz_filtered[pd.to_numeric(haz_filtered.get("risk_score", pd.Series()), errors="coerce") >= 4]) if haz_filtered is not None and "risk_score" in haz_filtered.columns else 0
+                "columns_used": [risk_col] if risk_col else [],
+                "filter_criteria": "numeric risk >= 3 or risk text contains high/critical/severe",
+                "records_used": high_risk_count
             },
             {
                 "component": "Completed Audits (Bonus: +0.5 each, max +5)",
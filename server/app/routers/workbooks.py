@@ -1,13 +1,19 @@
 from __future__ import annotations
 
+import json
+import os
+import tempfile
 from pathlib import Path
 from datetime import datetime
-from typing import List
+from typing import Any, Dict, Iterator, List, Optional
 
-from fastapi import APIRouter, File, HTTPException, UploadFile
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, File, HTTPException, Query, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 
 from ..models.schemas import (
+    DataFramePayload,
     InferredSchema,
     InferSchemaRequest,
     SheetPreview,
@@ -17,20 +23,37 @@ from ..services.excel import (
     payload_to_df,
     read_excel_to_sheets,
     summarize_sheet,
-    load_default_sheets,
     get_dataset_selection_names,
 )
+from ..services.ingest import (
+    iter_sheet_summaries,
+    parse_workbook_parallel,
+    read_excel_to_sheets_parallel,
+    workbook_sheet_names,
+)
+from ..services.json_utils import to_native_json
+from ..services.registry import get_registry
 from ..services.schema import infer_schema
+from ..services.workbook_store import get_workbook_store
 
 
 router = APIRouter(prefix="/workbooks", tags=["workbooks"])
 
 
 @router.post("/upload")
-async def upload_workbook(file: UploadFile = File(...)):
+async def upload_workbook(
+    file: UploadFile = File(...),
+    parallel: bool = Query(True, description="Parse sheets in a process pool"),
+    workers: Optional[int] = Query(None, ge=1, le=32, description="Max parse workers (default: EXCEL_PARSE_WORKERS or min(4, CPUs))"),
+    keep: bool = Query(True, description="Keep the parsed workbook and return a workbookId usable as ?workbook_id= on other endpoints"),
+):
     try:
         content = await file.read()
-        sheets = read_excel_to_sheets(content)
+        timings = None
+        if parallel:
+            sheets, timings = await run_in_threadpool(read_excel_to_sheets_parallel, content, workers)
+        else:
+            sheets = await run_in_threadpool(read_excel_to_sheets, content)
         out_sheets: List[dict] = []
         for name, df in sheets.items():
             n, rows, cols, cols_list, sample = summarize_sheet(name, df)
@@ -46,21 +69,104 @@ async def upload_workbook(file: UploadFile = File(...)):
             "sheetCount": len(out_sheets),
             "sheets": out_sheets,
         }
+        if timings is not None:
+            payload["timings"] = timings
+        if keep and sheets:
+            payload["workbookId"] = get_workbook_store().put(sheets, payload["fileName"])
         return JSONResponse(content=payload)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to parse workbook: {e}")
 
 
+_SPOOL_CHUNK_BYTES = 1024 * 1024
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _encode_event(event: Dict[str, Any], fmt: str) -> str:
+    data = json.dumps(event, default=str)
+    if fmt == "sse":
+        return f"event: {event['type']}\ndata: {data}\n\n"
+    return data + "\n"
+
+
+def _stream_summary_events(path: str, file_name: str, fmt: str, sample_size: int) -> Iterator[str]:
+    """Yield start / sheet / done events for a spooled workbook, then delete it."""
+    t0 = datetime.utcnow()
+    try:
+        names = workbook_sheet_names(Path(path))
+        yield _encode_event({"type": "start", "fileName": file_name, "sheetCount": len(names), "sheetNames": names}, fmt)
+        count = 0
+        for summary in iter_sheet_summaries(Path(path), sample_size=sample_size):
+            count += 1
+            yield _encode_event({"type": "sheet", **summary}, fmt)
+        yield _encode_event({
+            "type": "done",
+            "fileName": file_name,
+            "uploadDate": t0.isoformat() + "Z",
+            "sheetCount": count,
+            "total_ms": round((datetime.utcnow() - t0).total_seconds() * 1000, 2),
+        }, fmt)
+    except Exception as e:
+        yield _encode_event({"type": "error", "detail": f"Failed to parse workbook: {e}"}, fmt)
+    finally:
+        _remove_quietly(path)
+
+
+@router.post("/upload/stream")
+async def upload_workbook_stream(
+    file: UploadFile = File(...),
+    format: str = Query("ndjson", description="ndjson (one JSON object per line) | sse"),
+    sample_size: int = Query(10, ge=0, le=100),
+):
+    """Bounded-memory variant of /upload.
+
+    The upload is spooled to disk in 1 MB chunks and sheets are walked with
+    openpyxl read-only ``iter_rows``; a summary event is emitted as soon as
+    each sheet has been read, so the first sheet arrives before later sheets
+    are parsed. Events: ``start`` (sheet names), one ``sheet`` per sheet (same
+    fields as /upload's ``sheets`` entries), then ``done`` or ``error``.
+    """
+    fmt = (format or "ndjson").lower()
+    if fmt not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'sse'")
+    fd, tmp_path = tempfile.mkstemp(suffix=".xlsx")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await file.read(_SPOOL_CHUNK_BYTES)
+                if not chunk:
+                    break
+                out.write(chunk)
+    except Exception as e:
+        _remove_quietly(tmp_path)
+        raise HTTPException(status_code=400, detail=f"Failed to receive workbook: {e}")
+
+    media_type = "text/event-stream" if fmt == "sse" else "application/x-ndjson"
+    return StreamingResponse(
+        _stream_summary_events(tmp_path, file.filename or "uploaded.xlsx", fmt, sample_size),
+        media_type=media_type,
+        # Covers clients that disconnect before the generator reaches its finally block
+        background=BackgroundTask(_remove_quietly, tmp_path),
+    )
+
+
 @router.get("/example")
-async def load_example_workbook():
+async def load_example_workbook(
+    workers: Optional[int] = Query(None, ge=1, le=32, description="Max parse workers (default: EXCEL_PARSE_WORKERS or min(4, CPUs))"),
+):
     # Resolve project root and expected example file location
     project_root = Path(__file__).resolve().parents[3]
     example_path = project_root / "EPCL_VEHS_Data_Processed.xlsx"
     if not example_path.exists():
         raise HTTPException(status_code=404, detail="Example workbook not found")
     try:
-        content = example_path.read_bytes()
-        sheets = read_excel_to_sheets(content)
+        sheets, timings = await run_in_threadpool(parse_workbook_parallel, example_path, workers)
         out_sheets: List[dict] = []
         for name, df in sheets.items():
             n, rows, cols, cols_list, sample = summarize_sheet(name, df)
@@ -80,6 +186,7 @@ async def load_example_workbook():
             "uploadDate": mtime,
             "sheetCount": len(out_sheets),
             "sheets": out_sheets,
+            "timings": timings,
         }
         return JSONResponse(content=payload)
     except Exception as e:
@@ -87,23 +194,125 @@ async def load_example_workbook():
 
 
 @router.get("/reload")
-async def reload_default_workbook():
-    """Clear the cached default Excel workbook and reload it from disk.
-    Returns the list of sheet names and count after reload.
+async def reload_default_workbook(
+    wait: bool = Query(True, description="Block until the new version is published"),
+):
+    """Re-read the default Excel workbook from disk.
+
+    By default the request returns once the new version is live, so callers
+    that refetch afterwards see it. ``wait=false`` only schedules the parse
+    (poll ``/workbooks/reload/status`` for the version); the current version
+    keeps serving requests until the new one is swapped in either way. Only
+    one parse runs at a time.
     """
+    registry = get_registry()
     try:
-        # Clear LRU cache and reload
-        load_default_sheets.cache_clear()
-        sheets = load_default_sheets()
+        if wait:
+            ds = await run_in_threadpool(registry.reload)
+            scheduled = False
+        else:
+            registry.reload_in_background()
+            # current() parses the workbook itself when nothing is loaded yet
+            ds = await run_in_threadpool(registry.current)
+            scheduled = True
         return {
-            "reloaded": True,
-            "sheet_count": len(sheets),
-            "sheets": list(sheets.keys()),
+            "reloaded": not scheduled,
+            "scheduled": scheduled,
+            "version": ds.version,
+            "sheet_count": len(ds.sheets),
+            "sheets": list(ds.sheets.keys()),
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to reload default workbook: {e}")
 
 
+@router.get("/reload/status")
+async def reload_status():
+    """Live version, whether a reload is running, and the file watcher state."""
+    from ..services.upsert import upsert_overlay_stats
+    from ..services.watcher import watcher_status
+    registry = get_registry()
+    ds = await run_in_threadpool(registry.current)
+    return {
+        "version": ds.version,
+        "reloading": registry.reloading(),
+        "last_reload": registry.last_reload,
+        "watcher": watcher_status(),
+        "upserts": upsert_overlay_stats(),
+    }
+
+
+@router.post("/delta")
+async def upload_delta_workbook(
+    file: UploadFile = File(...),
+    key: Optional[str] = Query(None, description="Key column (default: incident_id, hazard_id, audit_id, ...)"),
+    mirror_sqlite: bool = Query(True, description="Also apply rows to the SQLite mirror"),
+):
+    """Upsert the rows of a small workbook into the live dataset.
+    Each sheet is matched to a loaded sheet by name (or dataset key such as
+    'incident'); only the delta is parsed, not the full workbook.
+    """
+    from ..services.upsert import upsert_sheets
+    try:
+        content = await file.read()
+        deltas = await run_in_threadpool(read_excel_to_sheets, content)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Failed to parse workbook: {e}")
+    try:
+        result = await run_in_threadpool(upsert_sheets, deltas, key, mirror_sqlite)
+        return JSONResponse(content=to_native_json(result))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to upsert rows: {e}")
+
+
+@router.post("/{sheet}/rows")
+async def upsert_sheet_rows(
+    sheet: str,
+    payload: DataFramePayload,
+    key: Optional[str] = Query(None, description="Key column (default: incident_id, hazard_id, audit_id, ...)"),
+    mirror_sqlite: bool = Query(True, description="Also apply rows to the SQLite mirror"),
+):
+    """Insert or update rows of one sheet, keyed on its id column.
+    ``sheet`` is a sheet name or a dataset key (incident, hazard, audit, inspection).
+    """
+    from ..services.upsert import upsert_sheets
+    delta = payload_to_df(payload.records)
+    if delta is None:
+        raise HTTPException(status_code=400, detail="No records provided")
+    try:
+        result = await run_in_threadpool(upsert_sheets, {sheet: delta}, key, mirror_sqlite)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to upsert rows: {e}")
+    if sheet in result["skipped"]:
+        raise HTTPException(status_code=400, detail=f"Cannot upsert into '{sheet}': {result['skipped'][sheet]}")
+    return JSONResponse(content=to_native_json(result))
+
+
+@router.delete("/upserts")
+async def clear_upserted_rows():
+    """Drop every upserted row and reload the default workbook from disk."""
+    from ..services.upsert import clear_upsert_overlay
+    try:
+        ds = await run_in_threadpool(clear_upsert_overlay)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to clear upserted rows: {e}")
+    return {"cleared": True, "version": ds.version}
+
+
+@router.get("/sessions")
+async def list_workbook_sessions():
+    """Uploaded workbooks kept in the session store, most recently used first, plus store stats."""
+    store = get_workbook_store()
+    return {"workbooks": store.list(), "stats": store.stats()}
+
+
+@router.delete("/sessions/{workbook_id}")
+async def delete_workbook_session(workbook_id: str):
+    if not get_workbook_store().remove(workbook_id):
+        raise HTTPException(status_code=404, detail=f"Unknown workbook_id '{workbook_id}'")
+    return {"deleted": True, "workbookId": workbook_id}
+
+
 @router.get("/selection")
 async def get_selection_mapping():
     """Return which sheet names are currently mapped to incident/hazard/audit/inspection."""
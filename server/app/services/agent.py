@@ -21,6 +21,7 @@ from .excel import (
     get_inspection_df,
     load_default_sheets,
 )
+from .lazy_workbook import lowercase_sheets
 
 try:
     from openai import OpenAI, AsyncOpenAI  # type: ignore
@@ -1103,7 +1104,7 @@ async def generate_agent_response_stream(query: str, *, dataset: str = "incident
         
         dataset_l = (dataset or "incident").lower()
         workbook = load_default_sheets()
-        dfs = {str(k).lower(): v for k, v in (workbook or {}).items()}
+        dfs = lowercase_sheets(workbook)
         preferred = dataset_l if dataset_l in ("incident", "hazard", "audit", "inspection") else None
         primary_df = _select_primary_df(dfs, query, preferred=preferred)
         df = primary_df
@@ -1347,7 +1348,7 @@ def generate_agent_response(query: str, *, dataset: str = "incident", model: str
     # Always gather all sheets and build multi-DF context; also pick a primary df smartly
     dataset_l = (dataset or "incident").lower()
     workbook = load_default_sheets()
-    dfs = {str(k).lower(): v for k, v in (workbook or {}).items()}
+    dfs = lowercase_sheets(workbook)
     # preferred token from dataset param if provided
     preferred = dataset_l if dataset_l in ("incident", "hazard", "audit", "inspection") else None
     primary_df = _select_primary_df(dfs, query, preferred=preferred)
@@ -0,0 +1,314 @@
+"""
+Vectorized severity and Heinrich-pyramid classification.
+
+The site safety index, the Heinrich pyramid (and its breakdown), the HSE
+metrics card and the ``/data-health/trace/*`` endpoints all sort rows into
+severity levels or pyramid layers. The rules here are the ones those
+endpoints applied row by row, expressed as ``np.select`` over keyword and
+string masks. Text rules are evaluated once per distinct value.
+
+For dataset frames every classification is computed once per dataset
+version and shared; endpoints working on a filtered view take the rows
+they need (``take_rows``) from the full-frame result. Other frames are
+classified on each call.
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .data_cache import SingleFlightCache, _workbook_scope
+from .filter_index import get_frame_index
+
+
+# Site-safety-index levels, most severe first (categorical code order)
+SEVERITY_LEVELS = ["Serious Injury/Fatality", "Minor Injury", "First Aid/Near Miss"]
+SERIOUS, MINOR, FIRST_AID = range(3)
+
+_SERIOUS_KEYWORDS = ("critical", "fatal", "severe", "c4", "c3")
+_MINOR_KEYWORDS = ("serious", "high", "c2", "moderate")
+_FIRST_AID_KEYWORDS = ("minor", "low", "c1", "first aid", "near miss")
+_HIGH_RISK_KEYWORDS = ("high", "critical", "severe")
+
+# Heinrich pyramid layers as used by /analytics/advanced/heinrich-pyramid
+HEINRICH_LAYERS = [1, 2, 3, 4, 5]
+HEINRICH_COLUMNS = {
+    "actual": "Actual Consequence (Incident)",
+    "worst": "Worst Case Consequence (Incident)",
+    "type": "Incident Type(s)",
+    "hazard_worst": "Worst Case Consequence Potential (Hazard ID)",
+    "audit_worst": "Worst Case Consequence",
+}
+_FATAL_CONSEQUENCES = {"C4 - Major", "C5 - Catastrophic"}
+_MINOR_CONSEQUENCES = {"C1 - Minor", "C2 - Serious"}
+_RECORDABLE_CONSEQUENCES = {"C2 - Serious", "C3 - Severe", "C4 - Major", "C5 - Catastrophic"}
+
+_results = SingleFlightCache(max_items=64)
+
+
+# ---------------- helpers ----------------
+
+def _distinct(s: pd.Series) -> Tuple[np.ndarray, List[Any]]:
+    """(codes, distinct values); NaN gets code -1."""
+    codes, uniques = pd.factorize(s)
+    return codes, list(uniques)
+
+
+def _column(df: pd.DataFrame, name: str) -> Optional[Any]:
+    """Column whose stripped name is ``name`` (the raw sheets may carry padded headers)."""
+    for col in df.columns:
+        if str(col).strip() == name:
+            return col
+    return None
+
+
+def _stripped(df: pd.DataFrame, name: str) -> Tuple[np.ndarray, List[str]]:
+    """Codes and ``str(value).strip()`` of the distinct values; a missing column reads as ''."""
+    col = _column(df, name)
+    if col is None:
+        return np.zeros(len(df), dtype=np.int64), [""]
+    codes, uniques = _distinct(df[col])
+    # NaN is 'nan' once stringified, as str() of the row value gave before
+    values = [str(v).strip() for v in uniques] + ["nan"]
+    return codes, values
+
+
+def _lut(values: List[str], test: Callable[[str], bool]) -> np.ndarray:
+    return np.fromiter((bool(test(v)) for v in values), dtype=bool, count=len(values))
+
+
+def _cached(df: pd.DataFrame, name: str, compute: Callable[[], Any]) -> Any:
+    """``compute()`` once per dataset version for dataset frames; every call otherwise."""
+    from .registry import current_dataset
+
+    ds = current_dataset()
+    if not ds.owns(df):
+        return compute()
+    key = f"{_workbook_scope()}:{ds.version}:{id(df)}:{name}"
+    return _results.get_or_compute(key, compute)
+
+
+def take_rows(values: Any, rows: Optional[np.ndarray]) -> Any:
+    """The entries of a full-frame classification for ``filter_row_ids`` rows (None: all rows)."""
+    if rows is None:
+        return values
+    if isinstance(values, (pd.DataFrame, pd.Series)):
+        return values.iloc[rows]
+    return values[rows]
+
+
+# ---------------- severity levels (site safety index) ----------------
+
+def classify_severity(score: Optional[np.ndarray], text: Optional[pd.Series], n_rows: int) -> pd.Categorical:
+    """
+    Severity level per row: the text keywords decide first (critical/fatal/
+    severe/c3/c4, then serious/high/c2/moderate, then minor/low/c1/first
+    aid/near miss), otherwise the numeric score (>= 3 serious, >= 2 minor);
+    anything else is First Aid/Near Miss.
+    """
+    no_match = np.zeros(n_rows, dtype=bool)
+    t_serious = t_minor = t_first = no_match
+    if text is not None:
+        codes, uniques = _distinct(text)
+        # Missing text (code -1, the trailing '') never matches a keyword
+        lowered = [str(v).lower().strip() for v in uniques] + [""]
+        t_serious = _lut(lowered, lambda v: any(k in v for k in _SERIOUS_KEYWORDS))[codes]
+        t_minor = _lut(lowered, lambda v: any(k in v for k in _MINOR_KEYWORDS))[codes]
+        t_first = _lut(lowered, lambda v: any(k in v for k in _FIRST_AID_KEYWORDS))[codes]
+    s_serious = s_minor = no_match
+    if score is not None:
+        with np.errstate(invalid="ignore"):
+            s_serious = score >= 3
+            s_minor = score >= 2
+    levels = np.select(
+        [t_serious, t_minor, t_first, s_serious, s_minor],
+        [SERIOUS, MINOR, FIRST_AID, SERIOUS, MINOR],
+        default=FIRST_AID,
+    )
+    return pd.Categorical.from_codes(levels, categories=SEVERITY_LEVELS)
+
+
+def severity_levels(df: pd.DataFrame, score_col: Optional[Any], text_col: Optional[Any]) -> pd.Categorical:
+    """``classify_severity`` over ``df``'s score/text columns (either may be None)."""
+    def compute() -> pd.Categorical:
+        score = get_frame_index(df).numeric(score_col) if score_col is not None else None
+        text = df[text_col] if text_col is not None else None
+        return classify_severity(score, text, len(df))
+
+    return _cached(df, f"severity:{score_col}:{text_col}", compute)
+
+
+def severity_counts(levels: pd.Categorical) -> Dict[str, int]:
+    """Rows per severity level (every level present, zero included)."""
+    counts = np.bincount(levels.codes, minlength=len(SEVERITY_LEVELS))
+    return {level: int(c) for level, c in zip(SEVERITY_LEVELS, counts)}
+
+
+def high_risk_mask(df: pd.DataFrame, col: Any) -> np.ndarray:
+    """
+    Hazards counted as high risk by the site safety index: numeric values
+    >= 3, or text containing high/critical/severe. Numbers stored as text
+    only count through the keywords.
+    """
+    def compute() -> np.ndarray:
+        s = df[col]
+        if pd.api.types.is_bool_dtype(s):
+            return np.zeros(len(s), dtype=bool)
+        if pd.api.types.is_numeric_dtype(s):
+            with np.errstate(invalid="ignore"):
+                mask = s.to_numpy(dtype=float, na_value=np.nan) >= 3
+        else:
+            codes, uniques = _distinct(s)
+            numeric = np.asarray(
+                [float(v) if isinstance(v, (int, float)) else np.nan for v in uniques] + [np.nan],
+                dtype=float,
+            )
+            with np.errstate(invalid="ignore"):
+                numeric_lut = numeric >= 3
+            keyword_lut = np.asarray(
+                [isinstance(v, str) and any(k in v.lower() for k in _HIGH_RISK_KEYWORDS) for v in uniques] + [False],
+                dtype=bool,
+            )
+            mask = (numeric_lut | keyword_lut)[codes]
+        mask.flags.writeable = False
+        return mask
+
+    return _cached(df, f"high_risk:{col}", compute)
+
+
+# ---------------- Heinrich pyramid ----------------
+
+def heinrich_incident_levels(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Pyramid classification of the raw Incident sheet, one row per incident
+    (same index as ``df``):
+
+    - ``Heinrich_Level``: 1 injury with C4/C5 actual consequence, 2 injury
+      with C3, 3 injury with C1/C2, 4 C0 actual with a C3-C5 worst case;
+      missing otherwise
+    - ``Injury``: incident type is 'injury'
+    - ``Recordable``: injury with a C2-C5 actual consequence
+    """
+    def compute() -> pd.DataFrame:
+        act_codes, actual = _stripped(df, HEINRICH_COLUMNS["actual"])
+        worst_codes, worst = _stripped(df, HEINRICH_COLUMNS["worst"])
+        type_codes, types = _stripped(df, HEINRICH_COLUMNS["type"])
+
+        injury = _lut(types, lambda v: v.lower() == "injury")[type_codes]
+        fatal = _lut(actual, lambda v: v in _FATAL_CONSEQUENCES)[act_codes]
+        severe = _lut(actual, lambda v: v == "C3 - Severe")[act_codes]
+        minor = _lut(actual, lambda v: v in _MINOR_CONSEQUENCES)[act_codes]
+        near_miss = (
+            _lut(actual, lambda v: v.startswith("C0"))[act_codes]
+            & _lut(worst, lambda v: any(x in v for x in ("C3", "C4", "C5")))[worst_codes]
+        )
+        levels = np.select(
+            [injury & fatal, injury & severe, injury & minor, near_miss],
+            [0, 1, 2, 3],
+            default=-1,
+        )
+        recordable = injury & _lut(actual, lambda v: v in _RECORDABLE_CONSEQUENCES)[act_codes]
+        return pd.DataFrame({
+            "Heinrich_Level": pd.Categorical.from_codes(levels, categories=HEINRICH_LAYERS),
+            "Injury": injury,
+            "Recordable": recordable,
+        }, index=df.index)
+
+    return _cached(df, "heinrich:incident", compute)
+
+
+def unsafe_condition_mask(df: pd.DataFrame, name: str, match: str = "exact") -> np.ndarray:
+    """
+    Rows of a Hazard ID / Audit Findings sheet whose worst-case consequence
+    (column ``name``) is C1 - Minor or C2 - Serious: the stripped value
+    equals one of them (``match="exact"``) or contains one of them
+    (``match="contains"``, for semicolon-separated audit values).
+    """
+    def compute() -> np.ndarray:
+        col = _column(df, name)
+        if col is None:
+            mask = np.zeros(len(df), dtype=bool)
+        else:
+            codes, values = _stripped(df, name)
+            if match == "contains":
+                lut = _lut(values, lambda v: any(c in v for c in _MINOR_CONSEQUENCES))
+            else:
+                lut = _lut(values, lambda v: v in _MINOR_CONSEQUENCES)
+            mask = lut[codes]
+        mask.flags.writeable = False
+        return mask
+
+    return _cached(df, f"unsafe:{name}:{match}", compute)
+
+
+# ---------------- pyramid breakdown by group ----------------
+
+def pyramid_flags(
+    df: pd.DataFrame,
+    sev_col: Optional[Any],
+    actual_col: Optional[Any],
+    worst_col: Optional[Any],
+    type_col: Optional[Any],
+) -> pd.DataFrame:
+    """
+    Per-row inputs of the pyramid breakdown: numeric ``severity``, ``fatal_text``
+    (actual or worst consequence mentions 'fatal') and ``near_miss`` (type
+    mentions 'near miss'/'near-miss'), all case-insensitive.
+    """
+    def compute() -> pd.DataFrame:
+        n = len(df)
+        index = get_frame_index(df)
+        severity = index.numeric(sev_col) if sev_col is not None else np.full(n, np.nan)
+        fatal_text = np.zeros(n, dtype=bool)
+        for col in (actual_col, worst_col):
+            if col is not None:
+                fatal_text |= index.substring(col).contains_mask("fatal")
+        near_miss = np.zeros(n, dtype=bool)
+        if type_col is not None:
+            near_miss = index.substring(type_col).contains_mask("near miss|near-miss")
+        return pd.DataFrame({"severity": severity, "fatal_text": fatal_text, "near_miss": near_miss})
+
+    return _cached(df, f"pyramid:{sev_col}:{actual_col}:{worst_col}:{type_col}", compute)
+
+
+def pyramid_layers_by_group(flags: pd.DataFrame, groups: pd.Series, has_severity: bool) -> pd.DataFrame:
+    """
+    Layer counts per distinct non-null value of ``groups`` (first-seen order):
+    fatalities (fatal text, or severity >= 5 when the group's highest
+    severity reaches 5 and >= 4 otherwise), lost workday cases (severity >= 3),
+    recordable injuries (severity >= 2), each excluding the layers above,
+    plus incident near misses and the group size. Without a severity column
+    the three injury layers are zero.
+    """
+    codes, uniques = pd.factorize(groups)
+    keep = codes >= 0
+    codes = codes[keep]
+    sev = flags["severity"].to_numpy()[keep]
+    n_groups = len(uniques)
+
+    def per_group(mask: np.ndarray) -> np.ndarray:
+        return np.bincount(codes[mask], minlength=n_groups)
+
+    fatalities = lost_workday = recordable = np.zeros(n_groups, dtype=np.int64)
+    if has_severity:
+        group_max = pd.Series(sev).groupby(codes).max().reindex(range(n_groups)).to_numpy()
+        threshold = np.where(group_max >= 5, 5.0, 4.0)[codes]
+        with np.errstate(invalid="ignore"):
+            fatal = flags["fatal_text"].to_numpy()[keep] | (sev >= threshold)
+            lti = (sev >= 3) & ~fatal
+            rec = (sev >= 2) & ~(lti | fatal)
+        fatalities, lost_workday, recordable = per_group(fatal), per_group(lti), per_group(rec)
+    return pd.DataFrame({
+        "group": list(uniques),
+        "fatalities": fatalities,
+        "lost_workday_cases": lost_workday,
+        "recordable_injuries": recordable,
+        "near_misses": per_group(flags["near_miss"].to_numpy()[keep]),
+        "total_incidents": per_group(np.ones(len(codes), dtype=bool)),
+    })
+
+
+def classification_stats() -> Dict[str, Any]:
+    return _results.stats()
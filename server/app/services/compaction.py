@@ -0,0 +1,205 @@
+"""
+Optional load-time compaction of workbook sheets.
+
+Enabled with EXCEL_COMPACT_COLUMNS=1. Low-cardinality text columns
+(department, location, status, type columns...) become ``category`` so
+filters and value counts work on integer codes, and integer columns are
+downcast to int32 when their range allows it. Each compacted frame carries a
+per-column report in ``df.attrs["compaction"]``.
+
+Values keep their original text (no case folding): they are the labels
+charts show and the option values filters send back. Case-insensitive
+matching already runs on the categories (``lower_isin_mask``, the filter
+index's lowercased codes).
+
+Categoricals differ from object columns in two ways the analytics code
+guards against. A ``groupby``/``pivot_table`` keyed on a categorical lists
+every category, and every combination for several keys, so dataset-column
+groupings pass ``observed=True``. A subset of rows keeps all the categories
+of the full column, so ``apply_analytics_filters`` drops the ones its rows do
+not use (``drop_unused_categories``, on the codes); full sheets keep only
+categories that occur (``merge_rows`` drops ones an upsert left unused).
+Code that writes new values into a dataset column (``fillna("Unknown")``,
+``.loc[mask, col] = ...``) or maps it through a dict works on
+``astype(object)`` of that column.
+"""
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .datetimes import is_datetime_like_column
+
+
+REPORT_ATTR = "compaction"
+
+# A column is categorical when it has at most this many distinct values and
+# they cover at most this share of its non-null rows
+_MAX_CATEGORIES = 5_000
+_MAX_UNIQUE_RATIO = 0.5
+_MIN_ROWS = 50
+
+
+def compaction_enabled() -> bool:
+    return os.getenv("EXCEL_COMPACT_COLUMNS", "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _all_strings(s: pd.Series) -> bool:
+    non_null = s.dropna()
+    if non_null.empty:
+        return False
+    return bool(non_null.map(type).eq(str).all())
+
+
+def _categorize(s: pd.Series) -> Optional[pd.Series]:
+    if s.dtype != object or is_datetime_like_column(s.name):
+        return None
+    non_null = s.notna().sum()
+    if non_null < _MIN_ROWS:
+        return None
+    n_unique = s.nunique(dropna=True)
+    if n_unique > _MAX_CATEGORIES or n_unique > non_null * _MAX_UNIQUE_RATIO:
+        return None
+    if not _all_strings(s):
+        return None
+    return s.astype("category")
+
+
+def _downcast_int(s: pd.Series) -> Optional[pd.Series]:
+    if not pd.api.types.is_integer_dtype(s) or s.dtype.itemsize <= 4 or s.empty:
+        return None
+    info = np.iinfo(np.int32)
+    if s.min() < info.min or s.max() > info.max:
+        return None
+    return s.astype(np.int32)
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Compact eligible columns of ``df`` in place and attach a report."""
+    before_total = int(df.memory_usage(deep=True, index=True).sum())
+    columns: List[Dict[str, Any]] = []
+    for col in list(df.columns):
+        s = df[col]
+        if isinstance(s, pd.DataFrame):  # duplicate column labels
+            continue
+        new = _categorize(s)
+        if new is None:
+            new = _downcast_int(s)
+        if new is None:
+            continue
+        before = int(s.memory_usage(deep=True, index=False))
+        df[col] = new
+        columns.append({
+            "column": str(col),
+            "from": str(s.dtype),
+            "to": str(new.dtype),
+            "bytes_before": before,
+            "bytes_after": int(new.memory_usage(deep=True, index=False)),
+        })
+    after_total = int(df.memory_usage(deep=True, index=True).sum())
+    df.attrs[REPORT_ATTR] = {
+        "bytes_before": before_total,
+        "bytes_after": after_total,
+        "bytes_saved": before_total - after_total,
+        "columns": columns,
+    }
+    return df
+
+
+def compact_sheets(sheets: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """Compact every sheet in place when EXCEL_COMPACT_COLUMNS is on."""
+    if not compaction_enabled():
+        return sheets
+    for name, df in sheets.items():
+        try:
+            compact_frame(df)
+        except Exception as e:
+            print(f"⚠️  Column compaction skipped for sheet {name}: {e}")
+    return sheets
+
+
+def memory_report(sheets: Dict[str, pd.DataFrame], estimate: bool = False) -> Dict[str, Any]:
+    """Resident bytes per sheet plus what compaction saved (or would save).
+
+    Args:
+        sheets: sheet_name -> DataFrame
+        estimate: For sheets that were not compacted, compact a copy to show
+            the potential savings
+    """
+    out: List[Dict[str, Any]] = []
+    for name, df in sheets.items():
+        report = df.attrs.get(REPORT_ATTR)
+        entry: Dict[str, Any] = {
+            "sheet": name,
+            "rows": int(len(df)),
+            "bytes": int(df.memory_usage(deep=True, index=True).sum()),
+            "compacted": report is not None,
+        }
+        if report is None and estimate:
+            report = compact_frame(df.copy()).attrs.get(REPORT_ATTR)
+            entry["estimated"] = True
+        if report is not None:
+            entry.update({
+                "bytes_before": report["bytes_before"],
+                "bytes_after": report["bytes_after"],
+                "bytes_saved": report["bytes_saved"],
+                "columns": report["columns"],
+            })
+        out.append(entry)
+    return {
+        "enabled": compaction_enabled(),
+        "total_bytes": sum(e["bytes"] for e in out),
+        "total_bytes_saved": sum(e.get("bytes_saved", 0) for e in out),
+        "sheets": out,
+    }
+
+
+def drop_unused_categories(df: pd.DataFrame) -> pd.DataFrame:
+    """Drop categories without rows from the categorical columns of ``df``, in place.
+
+    Equivalent to ``cat.remove_unused_categories()`` but done with a bincount
+    and a lookup table over the integer codes (the pandas version hashes
+    them), and columns that use every category are left alone.
+    """
+    for col in df.columns[[isinstance(t, pd.CategoricalDtype) for t in df.dtypes]]:
+        s = df[col]
+        codes = s.cat.codes.to_numpy()
+        n_categories = len(s.cat.categories)
+        # Shifted by one so NaN (code -1) lands in slot 0
+        used = np.bincount(codes + 1, minlength=n_categories + 1)[1:] > 0
+        if used.all():
+            continue
+        lut = np.append(np.where(used, np.cumsum(used) - 1, -1), -1).astype(codes.dtype)
+        dtype = pd.CategoricalDtype(s.cat.categories[used], ordered=s.cat.ordered)
+        df[col] = pd.Series(pd.Categorical.from_codes(lut[codes], dtype=dtype), index=s.index, name=s.name)
+    return df
+
+
+# ---------------- Code-aware helpers for filters / option lists ----------------
+
+def lower_isin_mask(s: pd.Series, values: Iterable[str]) -> np.ndarray:
+    """Boolean mask equal to ``s.astype(str).str.lower().isin(values_lower)``.
+
+    Categorical columns are matched on their (few) categories and the result
+    is broadcast through the integer codes; object columns fall back to the
+    string path.
+    """
+    wanted = {str(v).lower() for v in values}
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        cat_mask = np.asarray(pd.Index(s.cat.categories.astype(str)).str.lower().isin(wanted))
+        codes = s.cat.codes.to_numpy()
+        # NaN (code -1) stringifies to 'nan' in the object path
+        lut = np.append(cat_mask, "nan" in wanted)
+        return lut[codes]
+    return s.astype(str).str.lower().isin(wanted).to_numpy()
+
+
+def categorical_value_counts(s: pd.Series) -> pd.Series:
+    """Non-zero value counts of a categorical column, indexed by string value."""
+    counts = s.value_counts(dropna=True)
+    counts = counts[counts > 0]
+    counts.index = pd.Index(counts.index.astype(str), dtype=object)
+    return counts
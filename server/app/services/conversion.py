@@ -0,0 +1,38 @@
+"""
+Shared hazard-to-incident analyzer for the conversion endpoints.
+
+Building a ``HazardIncidentAnalyzer`` copies the incident and hazard frames,
+parses their dates and computes the whole link table, and the conversion
+dashboard calls a dozen endpoints that each need the same analyzer. One
+analyzer is kept per dataset version and link window; callers must treat
+it (its frames and ``links_df``) as read-only.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict
+
+from .data_cache import SingleFlightCache, _workbook_scope
+
+
+# Days after a hazard within which an incident at the same location and
+# department counts as linked to it
+DEFAULT_LINK_WINDOW_DAYS = 30
+
+_analyzers = SingleFlightCache(max_items=4)
+
+
+def get_conversion_analyzer(window_days: int = DEFAULT_LINK_WINDOW_DAYS):
+    """The current dataset's analyzer for ``window_days``, built once per version."""
+    from ..analytics.hazard_incident import HazardIncidentAnalyzer
+    from .registry import current_dataset
+
+    ds = current_dataset()
+    inc, haz = ds.frame("incident"), ds.frame("hazard")
+    key = f"{_workbook_scope()}:{ds.version}:{int(window_days)}"
+    return _analyzers.get_or_compute(
+        key, lambda: HazardIncidentAnalyzer(inc, haz, window_days=int(window_days)),
+    )
+
+
+def conversion_cache_stats() -> Dict[str, Any]:
+    return _analyzers.stats()
@@ -3,19 +3,26 @@ High-performance data caching layer for blazing fast responses
 Implements LRU cache with TTL for optimal performance
 """
 
+import functools
+import inspect
+import json
+import os
+import typing
+from collections import OrderedDict
 import pandas as pd
-from typing import Dict, Optional, Any
+from typing import Callable, Dict, Optional, Any
 from functools import lru_cache
 import time
-from threading import Lock
+from threading import Event, Lock
 
 
 class DataCache:
     """Thread-safe LRU cache for DataFrames with TTL"""
     
-    def __init__(self, ttl_seconds: int = 300):
+    def __init__(self, ttl_seconds: int = 300, max_items: Optional[int] = None):
         self.cache: Dict[str, tuple[Any, float]] = {}
         self.ttl = ttl_seconds
+        self.max_items = max_items
         self.lock = Lock()
         self._hits = 0
         self._misses = 0
@@ -39,6 +46,10 @@ class DataCache:
         """Cache a value with current timestamp"""
         with self.lock:
             self.cache[key] = (value, time.time())
+            if self.max_items is not None and len(self.cache) > self.max_items:
+                # Drop the oldest entry
+                oldest = min(self.cache, key=lambda k: self.cache[k][1])
+                del self.cache[oldest]
     
     def clear(self):
         """Clear all cached data"""
@@ -60,40 +71,230 @@ class DataCache:
         }
 
 
+class _Flight:
+    def __init__(self):
+        self.event = Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlightCache:
+    """Size-bounded LRU where concurrent misses for the same key compute once.
+
+    The first caller for a missing key runs ``fn``; callers arriving while it
+    runs wait for its result instead of computing it again.
+    """
+
+    def __init__(self, max_items: int = 256, max_bytes: Optional[int] = None,
+                 sizeof: Callable[[Any], int] = lambda v: 0):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._items: "OrderedDict[str, tuple[Any, int]]" = OrderedDict()
+        self._inflight: Dict[str, _Flight] = {}
+        self._bytes = 0
+        self.lock = Lock()
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._evictions = 0
+
+    def get_or_compute(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self.lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self._hits += 1
+                return self._items[key][0]
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._inflight[key] = flight
+                self._misses += 1
+            else:
+                self._coalesced += 1
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            flight.value = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                self._inflight.pop(key, None)
+                if flight.error is None:
+                    self._store(key, flight.value)
+            flight.event.set()
+        return flight.value
+
+    def _store(self, key: str, value: Any) -> None:
+        size = int(self._sizeof(value) or 0)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        old = self._items.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+        self._items[key] = (value, size)
+        self._bytes += size
+        while self._items and (
+            len(self._items) > self.max_items
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            _, (_, dropped) = self._items.popitem(last=False)
+            self._bytes -= dropped
+            self._evictions += 1
+
+    def clear(self):
+        """Drop cached values (counters are kept so hit rates span reloads)"""
+        with self.lock:
+            self._items.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            total = self._hits + self._misses + self._coalesced
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "coalesced": self._coalesced,
+                "hit_rate": round((self._hits + self._coalesced) / total * 100, 2) if total > 0 else 0,
+                "evictions": self._evictions,
+                "cached_items": len(self._items),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+def _nbytes(value: Any) -> int:
+    return int(getattr(value, "nbytes", 0) or 0)
+
+
+def _env_mb(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default))) * 1024 * 1024
+    except ValueError:
+        return default * 1024 * 1024
+
+
 # Global cache instances
 _workbook_cache = DataCache(ttl_seconds=300)  # 5 minutes TTL
 _query_cache = DataCache(ttl_seconds=60)  # 1 minute for query results
+_response_cache = DataCache(ttl_seconds=600, max_items=512)  # Endpoint responses, keyed by dataset version
+# Filter results (row-position arrays), keyed by dataset version + canonical filter signature
+_filter_cache = SingleFlightCache(max_items=1024, max_bytes=_env_mb("FILTER_CACHE_MB", 64), sizeof=_nbytes)
+
+
+def _workbook_scope() -> str:
+    """Cache namespace: the uploaded workbook pinned for this request, or the default file"""
+    from .registry import pinned_workbook_id
+    return pinned_workbook_id() or "default"
 
 
 def get_cached_workbook() -> Optional[Dict[str, pd.DataFrame]]:
     """Get cached workbook data"""
-    return _workbook_cache.get("workbook")
+    return _workbook_cache.get(f"workbook:{_workbook_scope()}")
 
 
 def cache_workbook(workbook: Dict[str, pd.DataFrame]):
     """Cache workbook data"""
-    _workbook_cache.set("workbook", workbook)
+    _workbook_cache.set(f"workbook:{_workbook_scope()}", workbook)
 
 
 def get_cached_query(query_key: str) -> Optional[str]:
     """Get cached query result"""
-    return _query_cache.get(query_key)
+    return _query_cache.get(f"{_workbook_scope()}:{query_key}")
 
 
 def cache_query(query_key: str, result: str):
     """Cache query result"""
-    _query_cache.set(query_key, result)
+    _query_cache.set(f"{_workbook_scope()}:{query_key}", result)
 
 
 def clear_all_caches():
     """Clear all caches"""
     _workbook_cache.clear()
     _query_cache.clear()
+    _response_cache.clear()
+    _filter_cache.clear()
+    from .filter_index import clear_filter_indexes
+    clear_filter_indexes()
 
 
 def get_cache_stats() -> Dict[str, Any]:
     """Get statistics for all caches"""
+    from .workbook_store import get_workbook_store
+    from .filter_index import filter_index_stats
+    from .rollup import rollup_stats
+    from .classification import classification_stats
+    from .conversion import conversion_cache_stats
     return {
         "workbook_cache": _workbook_cache.stats(),
-        "query_cache": _query_cache.stats()
+        "query_cache": _query_cache.stats(),
+        "response_cache": _response_cache.stats(),
+        "filter_cache": _filter_cache.stats(),
+        "filter_index": filter_index_stats(),
+        "rollup": rollup_stats(),
+        "classification": classification_stats(),
+        "conversion": conversion_cache_stats(),
+        "workbook_store": get_workbook_store().stats(),
     }
+
+
+def get_filter_cache() -> SingleFlightCache:
+    return _filter_cache
+
+
+def _resolve_param_default(value: Any) -> Any:
+    """Unwrap FastAPI ``Query(...)``/``Path(...)`` defaults when an endpoint is called directly"""
+    try:
+        from pydantic.fields import FieldInfo
+    except Exception:
+        return value
+    if isinstance(value, FieldInfo):
+        default = value.default
+        return None if default is ... else default
+    return value
+
+
+def version_cached(fn: Callable) -> Callable:
+    """Memoize an async endpoint per dataset version and argument values.
+
+    Responses are reused until the workbook changes (new version) or the TTL
+    expires. Direct calls (e.g. from other endpoints or the warm-up) may omit
+    arguments; Query defaults are resolved before calling ``fn``.
+    """
+    sig = inspect.signature(fn)
+    name = f"{fn.__module__}.{fn.__qualname__}"
+    try:
+        # Resolve string annotations (``from __future__ import annotations``) against
+        # the endpoint's module; FastAPI would otherwise look them up in this one
+        hints = typing.get_type_hints(fn)
+    except Exception:
+        hints = {}
+    resolved_sig = sig.replace(parameters=[
+        p.replace(annotation=hints.get(pname, p.annotation)) for pname, p in sig.parameters.items()
+    ])
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        bound = sig.bind_partial(*args, **kwargs)
+        params = {
+            pname: _resolve_param_default(bound.arguments.get(pname, p.default))
+            for pname, p in sig.parameters.items()
+        }
+        from .registry import current_dataset
+        version = current_dataset().version
+        key = f"{_workbook_scope()}:{name}:{version}:{json.dumps(params, sort_keys=True, default=str)}"
+        cached = _response_cache.get(key)
+        if cached is not None:
+            return cached
+        result = await fn(**params)
+        _response_cache.set(key, result)
+        return result
+
+    wrapper.__signature__ = resolved_sig
+    return wrapper
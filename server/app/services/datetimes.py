@@ -0,0 +1,209 @@
+"""
+Datetime coercion for workbook sheets.
+
+Date-like columns are parsed once at load time: each distinct value of a
+text column is parsed once with an explicit format guessed from a small
+sample (and remembered per column name, so later workbooks and uploads skip
+the guess while every value still follows it), and the datetime64 result is
+written back into the same frame.
+
+The guess tries month-first and day-first readings of the first value and
+keeps the one that parses more of the sample. A day-first column whose first
+value is ambiguous (``07/05/2022``) is therefore read day-first throughout;
+the previous hint-free ``pd.to_datetime`` inferred month-first from that
+value and returned NaT for every day above 12. Parsed columns are recorded in ``df.attrs`` so ``ensure_datetime`` can
+skip them instead of calling ``pd.to_datetime`` again.
+"""
+from __future__ import annotations
+
+import threading
+import warnings
+from typing import Any, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+try:
+    from pandas.tseries.api import guess_datetime_format
+except Exception:  # pandas < 2.2
+    try:
+        from pandas._libs.tslibs.parsing import guess_datetime_format
+    except Exception:
+        guess_datetime_format = None
+
+
+PARSED_ATTR = "datetime_columns"
+
+_SAMPLE_SIZE = 200
+
+# column name -> explicit format ("" means no single format, parse without a hint)
+_format_cache: Dict[str, str] = {}
+_format_lock = threading.Lock()
+_stats = {"guessed": 0, "cache_hits": 0, "fallback_rows": 0}
+
+
+def is_datetime_like_column(name: Any) -> bool:
+    """Name-based rule for columns that should hold datetimes."""
+    lc = str(name).lower()
+    return (
+        ("date" in lc)
+        or ("time" in lc)
+        or lc.startswith("entered_")
+        or lc in ["start_date", "entered_closed"]
+    )
+
+
+def _mark_parsed(df: pd.DataFrame, col: Any) -> None:
+    parsed = df.attrs.get(PARSED_ATTR)
+    if not isinstance(parsed, list):
+        parsed = []
+    if col not in parsed:
+        parsed.append(col)
+    df.attrs[PARSED_ATTR] = parsed
+
+
+def is_parsed(df: pd.DataFrame, col: Any) -> bool:
+    """True if ``col`` already holds datetime64 values (recorded or not)."""
+    return col in df.columns and pd.api.types.is_datetime64_any_dtype(df[col])
+
+
+def _with_format(values: pd.Series, fmt: str) -> Optional[pd.Series]:
+    try:
+        return pd.to_datetime(values, format=fmt, errors="coerce")
+    except Exception:
+        return None
+
+
+def _hint_free(values: pd.Series) -> pd.Series:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return pd.to_datetime(values, errors="coerce")
+
+
+def _guess_format(sample: pd.Series) -> str:
+    """
+    Explicit format for ``sample``: the month-first or day-first guess for its
+    first value, whichever parses more of the sample (month-first on a tie,
+    as pandas' own inference).
+    """
+    if guess_datetime_format is None:
+        return ""
+    first = next((v.strip() for v in sample if isinstance(v, str) and v.strip()), None)
+    if first is None:
+        return ""
+    best, best_hits = "", -1
+    for dayfirst in (False, True):
+        try:
+            fmt = guess_datetime_format(first, dayfirst=dayfirst) or ""
+        except Exception:
+            fmt = ""
+        parsed = _with_format(sample, fmt) if fmt and fmt != best else None
+        if parsed is not None and int(parsed.notna().sum()) > best_hits:
+            best, best_hits = fmt, int(parsed.notna().sum())
+    return best
+
+
+def _format_fits(sample: pd.Series, fmt: str) -> bool:
+    """The explicit format must parse every sample value the hint-free parse does."""
+    with_fmt = _with_format(sample, fmt)
+    if with_fmt is None:
+        return False
+    return not bool((with_fmt.isna() & _hint_free(sample).notna()).any())
+
+
+def _parse_distinct(values: pd.Series, col: Any) -> pd.Series:
+    """Parse the distinct non-null ``values`` of column ``col``."""
+    key = str(col)
+    with _format_lock:
+        cached = _format_cache.get(key)
+    parsed = _with_format(values, cached) if cached else None
+    if parsed is not None and not (parsed.isna() & values.notna()).any():
+        # Every value follows the remembered format: no sample check, no retry
+        _stats["cache_hits"] += 1
+        return parsed
+
+    if cached == "":
+        _stats["cache_hits"] += 1
+        fmt = ""
+    else:
+        # First sight of the column, or values the remembered format misses
+        sample = values.iloc[:_SAMPLE_SIZE]
+        fmt = _guess_format(sample)
+        if fmt and not _format_fits(sample, fmt):
+            fmt = ""
+        with _format_lock:
+            _format_cache[key] = fmt
+            _stats["guessed"] += 1
+    if not fmt:
+        return _hint_free(values)
+    if fmt != cached:
+        parsed = _with_format(values, fmt)
+        if parsed is None:
+            return _hint_free(values)
+    # Values outside the sample that do not follow the format get a hint-free retry
+    missed = parsed.isna() & values.notna()
+    if missed.any():
+        _stats["fallback_rows"] += int(missed.sum())
+        parsed[missed] = _hint_free(values[missed])
+    return parsed
+
+
+def _parse_column(s: pd.Series, col: Any) -> pd.Series:
+    if s.dtype != object:
+        # Numeric / bool columns: keep the previous best-effort behaviour
+        return pd.to_datetime(s, errors="coerce")
+    # Each distinct value is parsed once (date columns repeat a lot, and
+    # non-ISO formats parse value by value); factorize keeps first-seen
+    # order, so pandas infers from the same first value as on the column
+    codes, uniques = pd.factorize(s)
+    if not len(uniques):
+        return pd.to_datetime(s, errors="coerce")
+    parsed = _parse_distinct(pd.Series(uniques, dtype=object), col)
+    return pd.Series(parsed.array.take(codes, allow_fill=True), index=s.index, name=s.name)
+
+
+def coerce_datetime_columns(df: pd.DataFrame, columns: Optional[Iterable[Any]] = None) -> pd.DataFrame:
+    """Parse date-like columns of ``df`` in place and return the same frame.
+
+    Args:
+        df: Frame to update (columns are replaced, the frame is not copied)
+        columns: Columns to parse (default: every column matching
+            ``is_datetime_like_column``)
+    """
+    targets = list(columns) if columns is not None else [c for c in df.columns if is_datetime_like_column(c)]
+    for col in targets:
+        if col not in df.columns:
+            continue
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            _mark_parsed(df, col)
+            continue
+        try:
+            df[col] = _parse_column(df[col], col)
+            _mark_parsed(df, col)
+        except Exception:
+            # keep original on failure
+            pass
+    return df
+
+
+def ensure_datetime(df: pd.DataFrame, cols: Iterable[Any]) -> pd.DataFrame:
+    """Make sure ``cols`` hold datetimes; already-parsed columns are left untouched."""
+    pending = [c for c in cols if c is not None and c in df.columns and not is_parsed(df, c)]
+    if pending:
+        coerce_datetime_columns(df, pending)
+    return df
+
+
+def datetime_format_cache_info() -> Dict[str, Any]:
+    """Known column formats and parse counters for diagnostics."""
+    with _format_lock:
+        formats = dict(_format_cache)
+    return {"formats": formats, **_stats}
+
+
+def clear_datetime_format_cache() -> None:
+    with _format_lock:
+        _format_cache.clear()
+
+
+def parsed_columns(df: pd.DataFrame) -> List[Any]:
+    return list(df.attrs.get(PARSED_ATTR) or [])
@@ -1,30 +1,31 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional, Tuple
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-from functools import lru_cache
 from pathlib import Path
 
 import pandas as pd
 import numpy as np
 
+from .compaction import compact_frame, compact_sheets, compaction_enabled
+from .datetimes import coerce_datetime_columns
+from .lazy_workbook import LazyWorkbook, read_workbook_headers, sheet_columns, sheet_rows
+from .snapshot import (
+    file_fingerprint,
+    hash_file,
+    pinned_snapshot,
+    read_frames,
+    read_snapshot,
+    snapshot_enabled,
+    write_snapshot,
+)
+
 
 def _coerce_datetime_columns(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    for col in df.columns:
-        lc = str(col).lower()
-        if (
-            ("date" in lc)
-            or ("time" in lc)
-            or lc.startswith("entered_")
-            or lc in ["start_date", "entered_closed"]
-        ):
-            try:
-                df[col] = pd.to_datetime(df[col], errors="coerce")
-            except Exception:
-                # keep original on failure
-                pass
-    return df
+    """Parse date-like columns in place (see ``services.datetimes``)."""
+    return coerce_datetime_columns(df)
 
 
 def read_excel_to_sheets(content: bytes) -> Dict[str, pd.DataFrame]:
@@ -73,20 +74,141 @@ def summarize_sheet(name: str, df: pd.DataFrame, sample_size: int = 10) -> Tuple
 DEFAULT_EXCEL_PATH = Path(__file__).resolve().parent.parent / "EPCL_VEHS_Data_Processed.xlsx"
 
 
-@lru_cache(maxsize=1)
-def load_default_sheets() -> Dict[str, pd.DataFrame]:
-    """Load and cache sheets from the default Excel file in the app folder.
+def lazy_sheets_enabled() -> bool:
+    """Lazy per-sheet loading is on by default; set EXCEL_LAZY_SHEETS=0 to parse everything up front."""
+    return os.getenv("EXCEL_LAZY_SHEETS", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def _same_file(fingerprint: Dict[str, Any], st: os.stat_result) -> bool:
+    return (fingerprint["size"], fingerprint["mtime_ns"]) == (int(st.st_size), int(st.st_mtime_ns))
+
+
+def _open_lazy_workbook(path: Path) -> LazyWorkbook:
+    """Sheet names and headers now, sheet bodies on first access.
+
+    Every sheet is read from the file version seen here: the snapshot
+    generation validated now, or the workbook while its size/mtime still
+    match. Once the file has changed a sheet that was not parsed yet is
+    refused (the dataset version holding this workbook is being replaced,
+    and a reload is requested) rather than parsed from the new file, so one
+    version never mixes sheets from two workbooks.
+    """
+    fingerprint = file_fingerprint(path)
+    pinned = pinned_snapshot(path) if snapshot_enabled() else None
+    if pinned is not None:
+        gen_dir, manifest = pinned
+        entries = {e["name"]: e for e in manifest.get("sheets", [])}
+        meta = {name: {"columns": e.get("columns") or [], "rows": e.get("rows")} for name, e in entries.items()}
+        source = "snapshot"
+    else:
+        gen_dir, entries = None, {}
+        meta = read_workbook_headers(path)
+        source = "excel"
+
+    def load(name: str) -> pd.DataFrame:
+        df = None
+        if gen_dir is not None and name in entries:
+            try:
+                df = read_frames(gen_dir, [entries[name]])[name]
+            except Exception:
+                df = None  # generation removed by a newer snapshot; use the workbook if unchanged
+        if df is None:
+            with open(path, "rb") as f:
+                if not _same_file(fingerprint, os.fstat(f.fileno())):
+                    from .registry import get_registry
+                    get_registry().reload_in_background()
+                    raise RuntimeError(f"{path.name} changed on disk after this version was opened")
+                df = coerce_datetime_columns(pd.read_excel(f, sheet_name=name))
+        return compact_frame(df) if compaction_enabled() else df
+
+    return LazyWorkbook(meta, load, source=source, fingerprint=fingerprint)
+
+
+def warm_lazy_workbook(
+    sheets: LazyWorkbook,
+    first: List[str],
+    parse: Optional[Callable[[str], bool]] = None,
+) -> Dict[str, Any]:
+    """Parse ``first`` (the mapped datasets), then the remaining sheets.
+
+    ``parse(name)`` parses one sheet and returns False to stop (the dataset
+    version was replaced); by default every sheet is parsed. When the
+    workbook came from Excel, a snapshot is written once every sheet has been
+    parsed so the next start can skip openpyxl.
+    """
+    if parse is None:
+        def parse(name: str) -> bool:
+            sheets.warm([name])
+            return True
+
+    mapped_names = list(dict.fromkeys(n for n in first if n and n in sheets))
+    fingerprint = sheets.fingerprint
+    timings = {}
+    for label, names in (("mapped_ms", mapped_names), ("rest_ms", [n for n in sheets.keys() if n not in mapped_names])):
+        t0 = time.perf_counter()
+        for name in names:
+            if not parse(name):
+                return {"superseded": True, "snapshot_written": False}
+        timings[label] = round((time.perf_counter() - t0) * 1000, 2)
+    wrote = False
+    # Compacted frames are not snapshotted: the snapshot holds the plain parse
+    if (
+        sheets.source == "excel"
+        and fingerprint is not None
+        and not compaction_enabled()
+        and all(sheets.is_loaded(n) for n in sheets.keys())
+        # Only if the file is still the version the sheets were parsed from
+        and DEFAULT_EXCEL_PATH.exists()
+        and _same_file(fingerprint, DEFAULT_EXCEL_PATH.stat())
+    ):
+        wrote = write_snapshot(DEFAULT_EXCEL_PATH, sheets.loaded_frames(), fingerprint)
+    return {
+        "superseded": False,
+        "mapped_ms": timings["mapped_ms"],
+        "total_ms": timings["mapped_ms"] + timings["rest_ms"],
+        "snapshot_written": wrote,
+    }
+
+
+def read_default_workbook() -> Dict[str, pd.DataFrame]:
+    """Read sheets from the default Excel file in the app folder (uncached).
+    In lazy mode (default) only sheet names and headers are read here and each
+    sheet is parsed on first access. Otherwise reads the columnar snapshot when
+    it matches the workbook on disk, or parses the workbook (one sheet per
+    worker process) and refreshes the snapshot.
+    Columns are compacted afterwards when EXCEL_COMPACT_COLUMNS is on.
     Returns an empty dict if the file is not present or unreadable.
     """
     try:
         if not DEFAULT_EXCEL_PATH.exists():
             return {}
-        content = DEFAULT_EXCEL_PATH.read_bytes()
-        return read_excel_to_sheets(content)
+        if lazy_sheets_enabled():
+            return _open_lazy_workbook(DEFAULT_EXCEL_PATH)
+        cached = read_snapshot(DEFAULT_EXCEL_PATH)
+        if cached is not None:
+            return compact_sheets(cached)
+        from .ingest import parse_workbook_parallel
+        fingerprint = file_fingerprint(DEFAULT_EXCEL_PATH, hash_file(DEFAULT_EXCEL_PATH))
+        sheets, timings = parse_workbook_parallel(DEFAULT_EXCEL_PATH)
+        print(f"📄 Parsed {DEFAULT_EXCEL_PATH.name}: {len(sheets)} sheets in {timings['total_ms']:.0f} ms ({timings['mode']}, {timings['workers']} workers)")
+        # Only snapshot if the file did not change while it was being parsed
+        after = file_fingerprint(DEFAULT_EXCEL_PATH)
+        if (after["size"], after["mtime_ns"]) == (fingerprint["size"], fingerprint["mtime_ns"]):
+            write_snapshot(DEFAULT_EXCEL_PATH, sheets, fingerprint)
+        return compact_sheets(sheets)
     except Exception:
         return {}
 
 
+def load_default_sheets() -> Dict[str, pd.DataFrame]:
+    """Return the sheets of the live default workbook.
+    Loaded once and then replaced atomically by the dataset registry on reload;
+    returns an empty dict if the file is not present or unreadable.
+    """
+    from .registry import current_dataset
+    return current_dataset().sheets
+
+
 def _indicator_columns() -> Dict[str, List[str]]:
     return {
         "incident": [
@@ -120,8 +242,8 @@ def _indicator_columns() -> Dict[str, List[str]]:
     }
 
 
-def _score_sheet_for_dataset(df: pd.DataFrame, indicators: List[str]) -> int:
-    cols = {str(c).lower() for c in df.columns}
+def _score_sheet_for_dataset(columns: List[str], indicators: List[str]) -> int:
+    cols = {str(c).lower() for c in columns}
     score = 0
     for ind in indicators:
         if ind.lower() in cols:
@@ -129,8 +251,8 @@ def _score_sheet_for_dataset(df: pd.DataFrame, indicators: List[str]) -> int:
     return score
 
 
-def _choose_by_name_token(sheets: Dict[str, pd.DataFrame], token: str) -> Optional[pd.DataFrame]:
-    """Choose a sheet by name token with smarter matching.
+def _choose_by_name_token(sheets: Dict[str, pd.DataFrame], token: str) -> Optional[str]:
+    """Choose a sheet name by name token with smarter matching.
     Preference order:
       1) Exact match on token (case-insensitive), or common variants like 'Total <token>'
       2) Name contains token but avoids conflicting dataset tokens (e.g., avoid 'audit' when selecting 'inspection')
@@ -140,7 +262,7 @@ def _choose_by_name_token(sheets: Dict[str, pd.DataFrame], token: str) -> Option
     avoid = {"audit": ["inspection", "finding", "findings"], "inspection": ["audit", "finding", "findings"]}.get(token_l, [])
 
     # 1) Exact/clear variants
-    for name, df in sheets.items():
+    for name in sheets.keys():
         ln = str(name).strip().lower()
         if (
             ln == token_l
@@ -149,34 +271,34 @@ def _choose_by_name_token(sheets: Dict[str, pd.DataFrame], token: str) -> Option
             or ln.startswith(f"{token_l} ")
             or ln.endswith(f" {token_l}")
         ) and (not any(a in ln for a in avoid)):
-            return df
+            return name
 
     # 2) Contains token, prefer without avoid tokens
-    candidates: List[Tuple[str, pd.DataFrame]] = []
-    for name, df in sheets.items():
+    candidates: List[Tuple[str, str]] = []
+    for name in sheets.keys():
         ln = str(name).strip().lower()
         if token_l in ln:
-            candidates.append((ln, df))
+            candidates.append((ln, name))
     if candidates:
-        for ln, df in candidates:
+        for ln, name in candidates:
             if not any(a in ln for a in avoid):
-                return df
+                return name
         # fallback to first candidate
         return candidates[0][1]
     return None
 
 
-def get_default_dataframes() -> Dict[str, Optional[pd.DataFrame]]:
-    """Identify and return best-matching DataFrames for each dataset type.
+def select_dataset_sheets(sheets: Dict[str, pd.DataFrame]) -> Dict[str, Optional[str]]:
+    """Identify the best-matching sheet name for each dataset type.
     Keys: incident, hazard, audit, inspection
-    Values may be None if not found.
+    Values may be None if not found. This is the (relatively expensive) heuristic
+    scan; use the dataset registry for per-request lookups.
     """
-    sheets = load_default_sheets()
+    indicators = _indicator_columns()
     if not sheets:
-        return {"incident": None, "hazard": None, "audit": None, "inspection": None}
+        return {k: None for k in indicators.keys()}
 
-    indicators = _indicator_columns()
-    best: Dict[str, Tuple[int, Optional[pd.DataFrame]]] = {k: (0, None) for k in indicators.keys()}
+    best: Dict[str, Tuple[int, Optional[str]]] = {k: (0, None) for k in indicators.keys()}
 
     # Prefer name-token matches up-front so scoring won't override clear intent
     for key in list(indicators.keys()):
@@ -185,70 +307,64 @@ def get_default_dataframes() -> Dict[str, Optional[pd.DataFrame]]:
             # Use a very high score to lock this selection unless a better explicit rule is added later
             best[key] = (10_000, cand)
 
-    for name, df in sheets.items():
+    # Column/row metadata only, so lazily loaded sheets are not parsed here
+    for name in sheets.keys():
+        columns = sheet_columns(sheets, name)
         for key, cols in indicators.items():
-            s = _score_sheet_for_dataset(df, cols)
+            s = _score_sheet_for_dataset(columns, cols)
             if s > best[key][0]:
-                best[key] = (s, df)
-
-    selected: Dict[str, Optional[pd.DataFrame]] = {k: v for k, (s, v) in best.items()}
-
-    # Secondary fallback by sheet name token if column heuristics fail
-    if selected.get("incident") is None:
-        cand = _choose_by_name_token(sheets, "incident")
-        selected["incident"] = cand or selected.get("incident")
-    if selected.get("hazard") is None:
-        cand = _choose_by_name_token(sheets, "hazard")
-        selected["hazard"] = cand or selected.get("hazard")
-    if selected.get("audit") is None:
-        cand = _choose_by_name_token(sheets, "audit")
-        selected["audit"] = cand or selected.get("audit")
-    if selected.get("inspection") is None:
-        cand = _choose_by_name_token(sheets, "inspection")
-        selected["inspection"] = cand or selected.get("inspection")
+                best[key] = (s, name)
+
+    selected: Dict[str, Optional[str]] = {k: v for k, (s, v) in best.items()}
 
     # Final fallback: largest sheet by rows for any still-missing dataset
-    if sheets:
-        sizes = [(name, len(df) if isinstance(df, pd.DataFrame) else 0) for name, df in sheets.items()]
-        sizes.sort(key=lambda x: x[1], reverse=True)
-        largest_df = sheets[sizes[0][0]] if sizes else None
-        for key in list(selected.keys()):
-            if selected[key] is None:
-                selected[key] = largest_df
+    sizes = [(name, sheet_rows(sheets, name) or 0) for name in sheets.keys()]
+    sizes.sort(key=lambda x: x[1], reverse=True)
+    largest_name = sizes[0][0] if sizes else None
+    for key in list(selected.keys()):
+        if selected[key] is None:
+            selected[key] = largest_name
 
     return selected
 
 
+def get_default_dataframes() -> Dict[str, Optional[pd.DataFrame]]:
+    """Return best-matching DataFrames for each dataset type.
+    Keys: incident, hazard, audit, inspection
+    Values may be None if not found. Selection is resolved once per workbook
+    version by the dataset registry.
+    """
+    from .registry import current_dataset
+    return current_dataset().frames()
+
+
 def get_dataset_selection_names() -> Dict[str, Optional[str]]:
     """Return the sheet names selected for each dataset based on current cache/heuristics."""
-    sheets = load_default_sheets()
-    if not sheets:
-        return {"incident": None, "hazard": None, "audit": None, "inspection": None}
-    selected = get_default_dataframes()
-    name_map: Dict[str, Optional[str]] = {k: None for k in selected.keys()}
-    for key, df in selected.items():
-        if df is None:
-            name_map[key] = None
-            continue
-        # find the sheet name for the df object
-        for name, sdf in sheets.items():
-            if sdf is df:
-                name_map[key] = name
-                break
-    return name_map
+    from .registry import current_dataset
+    return dict(current_dataset().selection)
+
+
+def get_dataset_version() -> int:
+    """Return the version number of the live workbook (changes on every reload)."""
+    from .registry import current_dataset
+    return current_dataset().version
 
 
 def get_incident_df() -> Optional[pd.DataFrame]:
-    return get_default_dataframes().get("incident")
+    from .registry import current_dataset
+    return current_dataset().frame("incident")
 
 
 def get_hazard_df() -> Optional[pd.DataFrame]:
-    return get_default_dataframes().get("hazard")
+    from .registry import current_dataset
+    return current_dataset().frame("hazard")
 
 
 def get_audit_df() -> Optional[pd.DataFrame]:
-    return get_default_dataframes().get("audit")
+    from .registry import current_dataset
+    return current_dataset().frame("audit")
 
 
 def get_inspection_df() -> Optional[pd.DataFrame]:
-    return get_default_dataframes().get("inspection")
+    from .registry import current_dataset
+    return current_dataset().frame("inspection")
@@ -0,0 +1,216 @@
+"""
+Filter-option catalogue.
+
+Every dropdown list served by ``/filters/*`` and the per-dataset options of
+``/analytics/filter-options`` are built together once per dataset version
+and then served from memory. Column value counts come from the filter index
+(``filter_index.FrameIndex.value_counts``), so each column is counted once
+no matter how many lists use it.
+
+``cascade_options`` answers dependent dropdowns (e.g. locations available
+for the selected departments) from the categorical codes of the filter
+index: the other selections resolve to a row set (through the cached
+``filter_row_ids``) and the remaining options are a ``bincount`` over it.
+
+Option lists are ordered by count, highest first, with equal counts ordered
+by value (plain string order).
+"""
+from __future__ import annotations
+
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from .data_cache import SingleFlightCache, _workbook_scope
+from .filter_index import get_frame_index
+from .filter_options import _NULL_TOKENS, extract_filter_options
+from .filters import (
+    INCIDENT_TYPE_COLUMNS,
+    LOCATION_COLUMNS,
+    VIOLATION_TYPE_COLUMNS,
+    _first_column,
+    filter_row_ids,
+)
+
+
+# list name -> ([(dataset key, columns)], separator to split multi-valued entries on)
+LIST_SPECS: Dict[str, Tuple[List[Tuple[str, List[str]]], Optional[str]]] = {
+    "locations": ([
+        ("incident", ["Location", "Sub-Location", "Location (EPCL)"]),
+        ("hazard", ["Location", "Sub-Location", "Location (EPCL)"]),
+        ("audit", ["Audit Location", "Location (EPCL)"]),
+        ("inspection", ["Audit Location", "Location (EPCL)"]),
+    ], None),
+    "departments": ([
+        ("incident", ["Department", "Sub-department", "Section"]),
+        ("hazard", ["Department", "Sub-department", "Section"]),
+    ], None),
+    "statuses": ([
+        ("incident", ["Status"]),
+        ("hazard", ["Status"]),
+        ("audit", ["Audit Status"]),
+        ("inspection", ["Audit Status"]),
+    ], None),
+    "companies": ([
+        ("incident", ["Group Company"]),
+        ("hazard", ["Group Company"]),
+        ("audit", ["Group Company"]),
+        ("inspection", ["Group Company"]),
+    ], None),
+    "incident_types": ([("incident", ["Incident Type(s)", "Category"])], ";"),
+    # /filters/all-filters has always listed types from "Incident Type(s)" only
+    "all_filters_incident_types": ([("incident", ["Incident Type(s)"])], ";"),
+    "violation_types": ([("hazard", ["Violation Type (Hazard ID)"])], None),
+    "consequences": ([
+        ("incident", [
+            "Worst Case Consequence (Incident)",
+            "Actual Consequence (Incident)",
+            "Relevant Consequence (Incident)",
+        ]),
+        ("hazard", [
+            "Worst Case Consequence Potential (Hazard ID)",
+            "Relevant Consequence (Hazard ID)",
+        ]),
+    ], None),
+    "psm_categories": ([("incident", ["PSM"])], None),
+    "pse_categories": ([("incident", ["PSE Category", "Tier 3 Description"])], None),
+    "audit_types": ([("audit", ["Audit Type (EPCL)", "Auditing Body"])], None),
+    "investigation_types": ([("incident", ["Investigation Type"])], None),
+    "injury_classifications": ([("incident", ["Injury Classification"])], None),
+    "root_causes": ([("incident", ["Root Cause", "Key Factor", "Contributing Factor"])], ";"),
+}
+
+_LIST_NULLS = {'nan', 'none', 'not specified', 'not assigned', 'n/a', 'na', ''}
+
+
+def unique_values(df: Optional[pd.DataFrame], column_names: List[str]) -> List[str]:
+    """Distinct non-null, non-placeholder values (stripped) across ``column_names``."""
+    if df is None or df.empty:
+        return []
+    index = get_frame_index(df)
+    values = set()
+    for column in column_names:
+        if column in df.columns:
+            for v in index.value_counts(column).index:
+                v = v.strip()
+                if v.lower() not in _LIST_NULLS:
+                    values.add(v)
+    return sorted(values)
+
+
+class FilterCatalogue:
+    """All filter option lists for one dataset version."""
+
+    def __init__(self, frames: Dict[str, Optional[pd.DataFrame]], version: int):
+        t0 = time.perf_counter()
+        self.version = version
+        self.lists: Dict[str, List[str]] = {}
+        for name, (sources, separator) in LIST_SPECS.items():
+            values = set()
+            for key, columns in sources:
+                values.update(unique_values(frames.get(key), columns))
+            if separator:
+                values = {part.strip() for v in values for part in v.split(separator)}
+            self.lists[name] = sorted(values)
+        self.options = {
+            "incident": extract_filter_options(frames.get("incident"), "incident"),
+            "hazard": extract_filter_options(frames.get("hazard"), "hazard"),
+        }
+        self.built_at = datetime.utcnow().isoformat()
+        self.build_ms = round((time.perf_counter() - t0) * 1000, 2)
+
+    def get(self, name: str) -> List[str]:
+        return list(self.lists.get(name, []))
+
+
+_catalogues = SingleFlightCache(max_items=8)
+
+
+def get_filter_catalogue() -> FilterCatalogue:
+    """Catalogue for the dataset serving this request, built on first use per version."""
+    from .registry import current_dataset
+
+    ds = current_dataset()
+    return _catalogues.get_or_compute(
+        f"{_workbook_scope()}:{ds.version}",
+        lambda: FilterCatalogue(ds.frames(), ds.version),
+    )
+
+
+# ---------------- cascading options ----------------
+
+def _facet_columns(df: pd.DataFrame) -> Dict[str, Optional[str]]:
+    return {
+        "departments": "department" if "department" in df.columns else None,
+        "locations": _first_column(df, LOCATION_COLUMNS),
+        "sublocations": "sublocation" if "sublocation" in df.columns else None,
+        "statuses": "status" if "status" in df.columns else None,
+        "incident_types": _first_column(df, INCIDENT_TYPE_COLUMNS),
+        "violation_types": _first_column(df, VIOLATION_TYPE_COLUMNS),
+    }
+
+
+def _options(pairs: List[Tuple[str, int]], max_items: int) -> List[Dict[str, Any]]:
+    pairs = [(v, c) for v, c in pairs if c > 0 and v.strip() not in _NULL_TOKENS]
+    pairs.sort(key=lambda p: (-p[1], p[0]))
+    return [
+        {"value": v, "label": v.title() if len(v) < 50 else v, "count": int(c)}
+        for v, c in pairs[:max_items]
+    ]
+
+
+def cascade_options(
+    df: Optional[pd.DataFrame],
+    selections: Dict[str, Any],
+    max_items: int = 100,
+) -> Dict[str, Any]:
+    """
+    Options for each facet given the selections on all *other* facets.
+
+    Args:
+        df: Dataset frame
+        selections: ``filter_row_ids`` keyword arguments (departments,
+            locations, sublocations, statuses, incident_types,
+            violation_types, start_date, end_date, ...)
+        max_items: Options per facet
+
+    Returns:
+        {facet: [{value, label, count}], "total_records": rows matching all selections}
+    """
+    if df is None or df.empty:
+        return {"total_records": 0}
+    index = get_frame_index(df)
+    active = {k: v for k, v in selections.items() if v not in (None, "", [])}
+    result: Dict[str, Any] = {}
+    for facet, col in _facet_columns(df).items():
+        if col is None:
+            result[facet] = []
+            continue
+        # A facet's own selection does not narrow its options
+        others = {k: v for k, v in active.items() if k != facet}
+        rows = filter_row_ids(df, **others)
+        if facet in ("incident_types", "violation_types"):
+            counts = index.tokens(col).token_counts(rows)
+            # Tokens are lowercased in the index; show an original spelling
+            display = _token_display(index.tokens(col))
+            pairs = [(display.get(t, t), c) for t, c in counts.items()]
+        else:
+            codes = index.categorical(col)
+            counts = codes.counts_for(rows)
+            pairs = list(zip(codes.display.tolist(), counts.tolist()))
+        result[facet] = _options(pairs, max_items)
+    rows = filter_row_ids(df, **active)
+    result["total_records"] = int(len(df) if rows is None else len(rows))
+    return result
+
+
+def _token_display(tokens) -> Dict[str, str]:
+    out: Dict[str, str] = {}
+    for original in tokens.display:
+        for part in str(original).split(","):
+            part = part.strip()
+            if part:
+                out.setdefault(part.lower(), part)
+    return out
@@ -0,0 +1,372 @@
+"""
+Per-dataset filter index.
+
+For frames that belong to the live dataset (``Dataset.owns``), the columns
+used by the analytics filters are encoded once per dataset version:
+
+- categorical filter columns (department, location, status...) as integer
+  codes over their distinct lowercase string values, so an ``isin`` filter is
+  a lookup table over a few hundred values broadcast through the codes;
+- multi-valued type columns (comma-separated incident/violation types) as
+  codes plus a token -> codes inverted index;
+- text columns searched with ``str.contains`` (location, department...) as
+  codes over their distinct values plus a trigram index over those values;
+- numeric filter columns (severity, risk) as float arrays;
+- date columns as a sorted ``datetime64`` array plus the row permutation
+  that sorts them, so a date range is two ``searchsorted`` calls.
+
+Filters then combine precomputed boolean masks and return row positions;
+nothing is copied until the caller materializes the final rows. Frames that
+are not part of the dataset (already filtered or derived copies) get a
+throwaway index built for the one call.
+"""
+from __future__ import annotations
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+_MAX_INDEXES = 16
+
+
+def _str_value_counts(s: pd.Series) -> pd.Series:
+    counts = s.value_counts(dropna=True)
+    counts = counts[counts > 0]
+    counts.index = pd.Index([str(v) for v in counts.index], dtype=object)
+    if counts.index.has_duplicates:
+        # 1 and "1" (or 1.0) are one option once stringified
+        counts = counts.groupby(level=0, sort=False).sum()
+    return counts.sort_values(ascending=False, kind="stable")
+
+
+class CategoricalCodes:
+    """Integer codes over the distinct ``astype(str).str.lower()`` values of a column."""
+
+    def __init__(self, s: pd.Series):
+        # astype(str) keeps the legacy semantics: NaN becomes the value 'nan'
+        text = s.astype(str)
+        codes, uniques = pd.factorize(text.str.lower())
+        self.codes = codes.astype(np.int32, copy=False)
+        self.values = np.asarray(uniques, dtype=object)
+        self.counts = np.bincount(self.codes, minlength=len(self.values)) if len(self.codes) else np.zeros(0, dtype=np.int64)
+        # Display spelling per code: the first original value seen
+        _, first = np.unique(self.codes, return_index=True)
+        self.display = np.asarray(text.to_numpy()[first], dtype=object)
+
+    def counts_for(self, rows: Optional[np.ndarray]) -> np.ndarray:
+        """Rows per code, over ``rows`` only (None means every row)."""
+        if rows is None:
+            return self.counts
+        return np.bincount(self.codes[rows], minlength=len(self.values))
+
+    def lut(self, wanted: Iterable[str]) -> np.ndarray:
+        """Boolean lookup table (one entry per distinct value) for an ``isin`` filter."""
+        lowered = {str(v).lower() for v in wanted}
+        return np.fromiter((v in lowered for v in self.values), dtype=bool, count=len(self.values))
+
+    def isin_mask(self, wanted: Iterable[str]) -> np.ndarray:
+        return self.lut(wanted)[self.codes]
+
+
+class TokenIndex(CategoricalCodes):
+    """Codes over distinct values of a comma-separated column plus token -> value codes.
+
+    Substring matching tests each distinct value once (same result as testing
+    every row); exact matching looks tokens up in the inverted index. Either
+    way the matching codes are unioned into a lookup table over the rows.
+    """
+
+    def __init__(self, s: pd.Series):
+        super().__init__(s)
+        postings: Dict[str, list] = {}
+        for code, value in enumerate(self.values):
+            for token in str(value).split(","):
+                token = token.strip()
+                if token:
+                    postings.setdefault(token, []).append(code)
+        self.tokens: Dict[str, np.ndarray] = {t: np.asarray(c, dtype=np.int32) for t, c in postings.items()}
+
+    def match_lut(self, wanted: Iterable[str], mode: str = "substring") -> np.ndarray:
+        lowered = [str(v).lower() for v in wanted]
+        if mode == "exact":
+            lut = np.zeros(len(self.values), dtype=bool)
+            for w in lowered:
+                codes = self.tokens.get(w.strip())
+                if codes is not None:
+                    lut[codes] = True
+            return lut
+        return np.fromiter(
+            (any(w in v for w in lowered) for v in self.values), dtype=bool, count=len(self.values)
+        )
+
+    def match_mask(self, wanted: Iterable[str], mode: str = "substring") -> np.ndarray:
+        return self.match_lut(wanted, mode)[self.codes]
+
+    def token_counts(self, rows: Optional[np.ndarray] = None) -> Dict[str, int]:
+        """Rows per token, over ``rows`` only (None means every row)."""
+        counts = self.counts_for(rows)
+        out = {t: int(counts[codes].sum()) for t, codes in self.tokens.items()}
+        return {t: c for t, c in out.items() if c > 0}
+
+
+_REGEX_META = set(".^$*+?{}[]\\|()")
+
+
+class SubstringIndex:
+    """Distinct ``astype(str)`` values of a column with a trigram index over them.
+
+    ``contains_lut`` gives exactly ``Series.astype(str).str.contains(pattern,
+    case=False, na=False)`` per distinct value: the regex is always evaluated
+    (with ``re.IGNORECASE``, as pandas does), but for literal patterns the
+    trigram postings first narrow the distinct values it has to run on.
+    """
+
+    def __init__(self, s: pd.Series):
+        codes, uniques = pd.factorize(s.astype(str))
+        self.codes = codes.astype(np.int32, copy=False)
+        self.values = np.asarray(uniques, dtype=object)
+        self.counts = np.bincount(self.codes, minlength=len(self.values))
+        postings: Dict[str, set] = {}
+        unsafe = []
+        for code, value in enumerate(self.values):
+            if not value.isascii():
+                # Case folding of non-ASCII text can match across different
+                # lowercase forms; always verify these values with the regex
+                unsafe.append(code)
+                continue
+            lowered = value.lower()
+            for i in range(len(lowered) - 2):
+                postings.setdefault(lowered[i:i + 3], set()).add(code)
+        self.trigrams: Dict[str, np.ndarray] = {
+            g: np.fromiter(sorted(c), dtype=np.int32, count=len(c)) for g, c in postings.items()
+        }
+        self.always_check = np.asarray(unsafe, dtype=np.int32)
+
+    def _candidates(self, pattern: str) -> np.ndarray:
+        literal = pattern.lower()
+        if len(literal) < 3 or not literal.isascii() or any(ch in _REGEX_META for ch in literal):
+            return np.arange(len(self.values), dtype=np.int32)
+        candidates: Optional[np.ndarray] = None
+        for i in range(len(literal) - 2):
+            codes = self.trigrams.get(literal[i:i + 3])
+            if codes is None:
+                candidates = np.zeros(0, dtype=np.int32)
+                break
+            candidates = codes if candidates is None else np.intersect1d(candidates, codes, assume_unique=True)
+            if not len(candidates):
+                break
+        return np.union1d(candidates, self.always_check)
+
+    def contains_lut(self, pattern: str) -> np.ndarray:
+        regex = re.compile(pattern, flags=re.IGNORECASE)  # invalid patterns raise like str.contains
+        lut = np.zeros(len(self.values), dtype=bool)
+        for code in self._candidates(pattern):
+            if regex.search(self.values[code]):
+                lut[code] = True
+        return lut
+
+    def contains_mask(self, pattern: str) -> np.ndarray:
+        return self.contains_lut(pattern)[self.codes]
+
+
+class DateIndex:
+    """Sorted non-null dates of a column and the row positions they came from."""
+
+    def __init__(self, dates: np.ndarray):
+        valid = np.flatnonzero(~np.isnat(dates))
+        order = np.argsort(dates[valid], kind="stable")
+        self.rows = valid[order]
+        self.sorted = dates[self.rows]
+        self.n_rows = len(dates)
+
+    def range_rows(self, start: Optional[np.datetime64], end: Optional[np.datetime64]) -> np.ndarray:
+        """Row positions (ascending) with ``start <= date <= end``; NaT never matches."""
+        lo = 0 if start is None else int(np.searchsorted(self.sorted, start, side="left"))
+        hi = len(self.sorted) if end is None else int(np.searchsorted(self.sorted, end, side="right"))
+        if hi <= lo:
+            return np.zeros(0, dtype=np.intp)
+        return np.sort(self.rows[lo:hi])
+
+    def range_mask(self, start: Optional[np.datetime64], end: Optional[np.datetime64]) -> np.ndarray:
+        mask = np.zeros(self.n_rows, dtype=bool)
+        lo = 0 if start is None else int(np.searchsorted(self.sorted, start, side="left"))
+        hi = len(self.sorted) if end is None else int(np.searchsorted(self.sorted, end, side="right"))
+        if hi > lo:
+            mask[self.rows[lo:hi]] = True
+        return mask
+
+
+class FrameIndex:
+    """Lazily built column encodings for one DataFrame.
+
+    Each column is encoded the first time a filter needs it; later calls on
+    the same frame reuse the arrays.
+    """
+
+    def __init__(self, df: pd.DataFrame, shared: bool = False, version: Optional[int] = None):
+        self.df = df
+        # Shared indexes outlive the call, so sorting a date column pays off
+        self.shared = shared
+        self.version = version
+        self.n_rows = int(len(df))
+        self._categorical: Dict[Any, CategoricalCodes] = {}
+        self._tokens: Dict[Any, TokenIndex] = {}
+        self._value_counts: Dict[Any, pd.Series] = {}
+        self._substring: Dict[Any, SubstringIndex] = {}
+        self._numeric: Dict[Any, np.ndarray] = {}
+        self._numeric_sorted: Dict[Any, np.ndarray] = {}
+        self._dates: Dict[Any, np.ndarray] = {}
+        self._date_index: Dict[Any, DateIndex] = {}
+        # Re-entrant: the date index builds on the parsed date column
+        self._lock = threading.RLock()
+        self.build_ms: Dict[str, float] = {}
+
+    def _build(self, store: Dict[Any, Any], kind: str, col: Any, fn) -> Any:
+        value = store.get(col)
+        if value is not None:
+            return value
+        with self._lock:
+            value = store.get(col)
+            if value is None:
+                t0 = time.perf_counter()
+                value = fn(self.df[col])
+                store[col] = value
+                self.build_ms[f"{kind}:{col}"] = round((time.perf_counter() - t0) * 1000, 2)
+        return value
+
+    def categorical(self, col: Any) -> CategoricalCodes:
+        return self._build(self._categorical, "categorical", col, CategoricalCodes)
+
+    def tokens(self, col: Any) -> TokenIndex:
+        return self._build(self._tokens, "tokens", col, TokenIndex)
+
+    def substring(self, col: Any) -> SubstringIndex:
+        return self._build(self._substring, "substring", col, SubstringIndex)
+
+    def value_counts(self, col: Any) -> pd.Series:
+        """Non-null value counts keyed by ``str(value)``, most frequent first."""
+        return self._build(self._value_counts, "value_counts", col, _str_value_counts)
+
+    def numeric(self, col: Any) -> np.ndarray:
+        return self._build(
+            self._numeric, "numeric", col,
+            lambda s: pd.to_numeric(s, errors="coerce").to_numpy(dtype=float, na_value=np.nan),
+        )
+
+    def numeric_sorted(self, col: Any) -> np.ndarray:
+        """Sorted non-NaN values of a numeric column (for range selectivity)."""
+        return self._build(
+            self._numeric_sorted, "numeric_sorted", col,
+            lambda s: np.sort(self.numeric(col)[~np.isnan(self.numeric(col))]),
+        )
+
+    def dates(self, col: Any) -> np.ndarray:
+        return self._build(
+            self._dates, "dates", col,
+            lambda s: pd.to_datetime(s, errors="coerce").to_numpy(dtype="datetime64[ns]"),
+        )
+
+    def date_index(self, col: Any) -> DateIndex:
+        return self._build(self._date_index, "date_index", col, lambda s: DateIndex(self.dates(col)))
+
+    def date_range_mask(self, col: Any, start: Optional[np.datetime64], end: Optional[np.datetime64]) -> np.ndarray:
+        """``start <= date <= end`` as a row mask (either bound may be None)."""
+        if self.shared:
+            return self.date_index(col).range_mask(start, end)
+        dates = self.dates(col)
+        mask = ~np.isnat(dates)
+        if start is not None:
+            mask &= dates >= start
+        if end is not None:
+            mask &= dates <= end
+        return mask
+
+    def date_range_rows(self, col: Any, start: Optional[np.datetime64], end: Optional[np.datetime64]) -> np.ndarray:
+        if self.shared:
+            return self.date_index(col).range_rows(start, end)
+        return np.flatnonzero(self.date_range_mask(col, start, end))
+
+    def date_summary(self, col: Any) -> Tuple[Optional[np.datetime64], Optional[np.datetime64], int]:
+        """(min, max, non-null count) of a date column."""
+        if self.shared:
+            ordered = self.date_index(col).sorted
+            if not len(ordered):
+                return None, None, 0
+            return ordered[0], ordered[-1], int(len(ordered))
+        dates = self.dates(col)
+        valid = dates[~np.isnat(dates)]
+        if not len(valid):
+            return None, None, 0
+        return valid.min(), valid.max(), int(len(valid))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rows": self.n_rows,
+            "categorical": [str(c) for c in self._categorical],
+            "tokens": [str(c) for c in self._tokens],
+            "value_counts": [str(c) for c in self._value_counts],
+            "substring": [str(c) for c in self._substring],
+            "numeric": [str(c) for c in self._numeric],
+            "dates": [str(c) for c in self._dates],
+            "date_index": [str(c) for c in self._date_index],
+            "build_ms": dict(self.build_ms),
+        }
+
+
+# (dataset version, id(frame)) -> FrameIndex; the index holds the frame, so ids are not reused
+_indexes: "OrderedDict[Tuple[int, int], FrameIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+_stats = {"hits": 0, "builds": 0, "transient": 0}
+
+
+def get_frame_index(df: pd.DataFrame) -> FrameIndex:
+    """Shared index for dataset frames, a throwaway one for anything else."""
+    from .registry import current_dataset
+
+    ds = current_dataset()
+    if not ds.owns(df):
+        _stats["transient"] += 1
+        return FrameIndex(df)
+    key = (ds.version, id(df))
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None and index.df is df and index.n_rows == len(df):
+            _indexes.move_to_end(key)
+            _stats["hits"] += 1
+            return index
+        index = FrameIndex(df, shared=True, version=ds.version)
+        _indexes[key] = index
+        _stats["builds"] += 1
+        while len(_indexes) > _MAX_INDEXES:
+            _indexes.popitem(last=False)
+    return index
+
+
+def clear_filter_indexes() -> None:
+    with _indexes_lock:
+        _indexes.clear()
+
+
+def filter_index_stats() -> Dict[str, Any]:
+    with _indexes_lock:
+        indexes = [dict(index.stats(), version=key[0]) for key, index in _indexes.items()]
+    return {**_stats, "indexes": indexes}
+
+
+def date_bound(value: Any) -> Optional[np.datetime64]:
+    """Parse a filter date (``YYYY-MM-DD``...) to ``datetime64[ns]``; None/empty stays None.
+    Raises like ``pd.to_datetime`` for unparseable input."""
+    if value is None or value == "":
+        return None
+    return pd.Timestamp(pd.to_datetime(value)).to_datetime64().astype("datetime64[ns]")
+
+
+def contains_mask(df: pd.DataFrame, col: Any, pattern: Any) -> np.ndarray:
+    """Same rows as ``df[col].astype(str).str.contains(str(pattern), case=False, na=False)``."""
+    return get_frame_index(df).substring(col).contains_mask(str(pattern))
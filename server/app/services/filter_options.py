@@ -13,6 +13,22 @@ from ..models.schemas import (
     DateRangeInfo,
     CombinedFilterOptionsResponse,
 )
+from .filter_index import get_frame_index
+
+
+_NULL_TOKENS = ['', 'nan', 'NaN', 'None', 'null', 'N/A', 'n/a']
+
+
+def _option_counts(counts: pd.Series, explode_comma_separated: bool) -> pd.Series:
+    """Option counts from a column's distinct-value counts, exploding comma-separated values weighted by frequency."""
+    counts = counts[~counts.index.str.strip().isin(_NULL_TOKENS)]
+    if explode_comma_separated and not counts.empty:
+        parts = counts.index.to_series().str.split(',').explode().str.strip()
+        parts = parts[parts != '']
+        counts = counts.reindex(parts.index).groupby(parts.values).sum()
+    # Highest count first, equal counts by value so the order is stable
+    order = np.lexsort((counts.index.to_numpy(dtype=str), -counts.to_numpy()))
+    return counts.iloc[order]
 
 
 def _extract_unique_values(
@@ -33,7 +49,8 @@ def _extract_unique_values(
         max_items: Maximum number of items to return
     
     Returns:
-        List of FilterOption objects sorted by count (descending)
+        List of FilterOption objects sorted by count (descending), equal
+        counts by value
     """
     if df is None or df.empty:
         return []
@@ -49,23 +66,11 @@ def _extract_unique_values(
         return []
     
     try:
-        # Get the series
-        series = df[column].dropna().astype(str)
-        
-        # Remove empty strings and common null representations
-        series = series[~series.str.strip().isin(['', 'nan', 'NaN', 'None', 'null', 'N/A', 'n/a'])]
-        
-        if series.empty:
+        # Distinct-value counts come from the dataset's filter index (one pass per column)
+        value_counts = _option_counts(get_frame_index(df).value_counts(column), explode_comma_separated)
+        if value_counts.empty:
             return []
         
-        # Handle comma-separated values if needed
-        if explode_comma_separated:
-            series = series.str.split(',').explode().str.strip()
-            series = series[series != '']
-        
-        # Count occurrences
-        value_counts = series.value_counts()
-        
         # Filter by minimum count
         value_counts = value_counts[value_counts >= min_count]
         
@@ -116,20 +121,19 @@ def _extract_date_range(
         return DateRangeInfo(min_date=None, max_date=None, total_records=0)
     
     try:
-        # Convert to datetime
-        dates = pd.to_datetime(df[date_col], errors='coerce')
-        dates = dates.dropna()
+        # Parsed and sorted once per dataset version by the filter index
+        lo, hi, total = get_frame_index(df).date_summary(date_col)
         
-        if dates.empty:
+        if total == 0:
             return DateRangeInfo(min_date=None, max_date=None, total_records=0)
         
-        min_date = dates.min().date().isoformat()
-        max_date = dates.max().date().isoformat()
+        min_date = pd.Timestamp(lo).date().isoformat()
+        max_date = pd.Timestamp(hi).date().isoformat()
         
         return DateRangeInfo(
             min_date=min_date,
             max_date=max_date,
-            total_records=len(dates)
+            total_records=total
         )
     
     except Exception:
@@ -164,17 +168,18 @@ def _extract_numeric_range(
         return {}
     
     try:
-        # Convert to numeric
-        values = pd.to_numeric(df[column], errors='coerce').dropna()
+        # Numeric view shared with the severity/risk filters
+        values = get_frame_index(df).numeric(column)
+        values = values[~np.isnan(values)]
         
-        if values.empty:
+        if len(values) == 0:
             return {}
         
         return {
             'min': float(values.min()),
             'max': float(values.max()),
             'avg': float(values.mean()),
-            'median': float(values.median()),
+            'median': float(np.median(values)),
             'count': int(len(values))
         }
     
@@ -3,10 +3,375 @@ Centralized filtering utilities for analytics data.
 Provides flexible, reusable filtering logic for incidents, hazards, audits, and inspections.
 """
 from typing import Optional, List
+import json
+import time
 import pandas as pd
 import numpy as np
 from datetime import datetime
 
+from .compaction import drop_unused_categories
+from .data_cache import get_filter_cache
+from .filter_index import FrameIndex, date_bound, get_frame_index
+
+
+DATE_COLUMNS = ['occurrence_date', 'date_of_occurrence', 'date_reported',
+                'entered_date', 'start_date', 'scheduled_date', 'created_date']
+LOCATION_COLUMNS = ['location', 'location.1', 'site']
+SEVERITY_COLUMNS = ['severity_score', 'severity', 'severity_level']
+RISK_COLUMNS = ['risk_score', 'risk', 'risk_level']
+INCIDENT_TYPE_COLUMNS = ['incident_type(s)', 'incident_type', 'category', 'accident_type']
+VIOLATION_TYPE_COLUMNS = ['violation_type_hazard_id', 'violation_type', 'violation_type_(incident)']
+# Single-value text filters (case-insensitive substring match, as ``str.contains``)
+SUBSTRING_COLUMNS = {
+    'location': LOCATION_COLUMNS + ['audit_location', 'finding_location'],
+    'department': ['department', 'section', 'sub_department'],
+    'status': ['status', 'incident_status', 'audit_status', 'hazard_status'],
+}
+
+
+def _first_column(df: pd.DataFrame, candidates: List[str]) -> Optional[str]:
+    for col in candidates:
+        if col in df.columns:
+            return col
+    return None
+
+
+def _canonical_list(values: Optional[List[str]], strip: bool = False) -> Optional[List[str]]:
+    if not values:
+        return None
+    out = {str(v).lower().strip() if strip else str(v).lower() for v in values}
+    return sorted(out)
+
+
+def _canonical_date(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    try:
+        return str(date_bound(value))
+    except Exception:
+        return f"raw:{value}"
+
+
+def filter_signature(filters: dict, type_match: str = "substring") -> Optional[str]:
+    """
+    Canonical string for a filter set: equivalent filters (list order, case,
+    duplicates, date spelling) give the same signature. None when no filter
+    is active.
+    """
+    canonical = {}
+    for key in ('start_date', 'end_date'):
+        value = _canonical_date(filters.get(key))
+        if value is not None:
+            canonical[key] = value
+    for key in ('departments', 'locations', 'sublocations', 'statuses'):
+        value = _canonical_list(filters.get(key))
+        if value is not None:
+            canonical[key] = value
+    for key in ('incident_types', 'violation_types'):
+        value = _canonical_list(filters.get(key), strip=(type_match == "exact"))
+        if value is not None:
+            canonical[key] = value
+            canonical['type_match'] = type_match
+    for key in ('min_severity', 'max_severity', 'min_risk', 'max_risk'):
+        value = filters.get(key)
+        if value is not None:
+            canonical[key] = float(value)
+    for key in SUBSTRING_COLUMNS:
+        value = filters.get(key)
+        if value is not None and value != "":
+            # Patterns are regexes: keep them as given (``\d`` and ``\D`` differ)
+            canonical[key] = str(value)
+    if not canonical:
+        return None
+    return json.dumps(canonical, sort_keys=True)
+
+
+def filter_row_ids(
+    df: pd.DataFrame,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    departments: Optional[List[str]] = None,
+    locations: Optional[List[str]] = None,
+    sublocations: Optional[List[str]] = None,
+    min_severity: Optional[float] = None,
+    max_severity: Optional[float] = None,
+    min_risk: Optional[float] = None,
+    max_risk: Optional[float] = None,
+    statuses: Optional[List[str]] = None,
+    incident_types: Optional[List[str]] = None,
+    violation_types: Optional[List[str]] = None,
+    location: Optional[str] = None,
+    department: Optional[str] = None,
+    status: Optional[str] = None,
+    type_match: str = "substring",
+) -> Optional[np.ndarray]:
+    """
+    Row positions of ``df`` matching the filters, or None when no filter applies.
+    
+    Same parameters and matching rules as ``apply_analytics_filters``, but
+    nothing is copied: masks come from the frame's filter index and are
+    AND-ed together. Use ``df.iloc[rows]`` (or ``df.take(rows)``) to
+    materialize.
+    
+    For dataset frames the result is cached on the dataset version plus a
+    canonical form of the filters, so the dashboard's many requests with the
+    same filter set compute it once. The returned array is read-only.
+    """
+    if df is None or df.empty:
+        return None
+    
+    filters = {
+        'start_date': start_date, 'end_date': end_date, 'departments': departments,
+        'locations': locations, 'sublocations': sublocations,
+        'min_severity': min_severity, 'max_severity': max_severity,
+        'min_risk': min_risk, 'max_risk': max_risk, 'statuses': statuses,
+        'incident_types': incident_types, 'violation_types': violation_types,
+        'location': location, 'department': department, 'status': status,
+    }
+    signature = filter_signature(filters, type_match)
+    if signature is None:
+        return None
+    
+    index = get_frame_index(df)
+    if not index.shared:
+        return _compute_row_ids(df, index, type_match=type_match, **filters)
+    
+    def compute() -> Optional[np.ndarray]:
+        rows = _compute_row_ids(df, index, type_match=type_match, **filters)
+        if rows is not None:
+            rows.flags.writeable = False
+        return rows
+    
+    key = f"{index.version}:{id(df)}:{signature}"
+    return get_filter_cache().get_or_compute(key, compute)
+
+
+FILTER_KEYS = (
+    'start_date', 'end_date', 'departments', 'locations', 'sublocations',
+    'min_severity', 'max_severity', 'min_risk', 'max_risk', 'statuses',
+    'incident_types', 'violation_types', 'location', 'department', 'status',
+)
+
+
+def filters_from_params(params: dict) -> dict:
+    """The analytics filter arguments among an endpoint's parameters.
+
+    Endpoints call ``filters_from_params(locals())`` before binding other
+    names, so the filter keyword set is spelled out once, here.
+    """
+    return {key: params[key] for key in FILTER_KEYS if key in params}
+
+# Selectivity assumed for range predicates when no sorted statistics exist
+_DEFAULT_RANGE_SELECTIVITY = 0.5
+
+
+class Predicate:
+    """
+    One filter condition, evaluated lazily.
+    
+    ``keep(rows)`` returns a boolean array over ``rows`` (or over every row
+    when ``rows`` is None); ``first()`` may answer the all-rows case more
+    cheaply (e.g. a date range straight from the sorted index).
+    """
+    
+    def __init__(self, name: str, column: str, selectivity: float, keep, first=None):
+        self.name = name
+        self.column = column
+        self.selectivity = float(selectivity)
+        self._keep = keep
+        self._first = first
+        self.rows_in: Optional[int] = None
+        self.rows_out: Optional[int] = None
+        self.elapsed_ms: Optional[float] = None
+    
+    def select(self, rows: Optional[np.ndarray]) -> np.ndarray:
+        if rows is None:
+            if self._first is not None:
+                return self._first()
+            return np.flatnonzero(self._keep(None))
+        return rows[self._keep(rows)]
+    
+    def describe(self) -> dict:
+        return {
+            'filter': self.name,
+            'column': self.column,
+            'estimated_selectivity': round(self.selectivity, 4),
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'elapsed_ms': self.elapsed_ms,
+        }
+
+
+def _lut_predicate(name: str, column: str, codes: np.ndarray, counts: np.ndarray, lut: np.ndarray, n_rows: int) -> Predicate:
+    selectivity = counts[lut].sum() / n_rows if n_rows else 0.0
+    return Predicate(
+        name, column, selectivity,
+        keep=lambda rows: lut[codes] if rows is None else lut[codes[rows]],
+    )
+
+
+def _range_keep(values: np.ndarray, lo, hi):
+    def keep(rows: Optional[np.ndarray]) -> np.ndarray:
+        v = values if rows is None else values[rows]
+        out = np.ones(len(v), dtype=bool)
+        if lo is not None:
+            out &= v >= lo
+        if hi is not None:
+            out &= v <= hi
+        return out
+    return keep
+
+
+def _sorted_fraction(ordered: np.ndarray, lo, hi, n_rows: int) -> float:
+    """Share of rows within [lo, hi] using two binary searches over sorted non-null values."""
+    if not n_rows:
+        return 0.0
+    left = 0 if lo is None else int(np.searchsorted(ordered, lo, side='left'))
+    right = len(ordered) if hi is None else int(np.searchsorted(ordered, hi, side='right'))
+    return max(right - left, 0) / n_rows
+
+
+class FilterPlan:
+    """
+    Filter predicates ordered by estimated selectivity (most selective first).
+    
+    Execution starts from the cheapest answer for the first predicate and
+    then only tests the surviving row positions against the rest, so every
+    later predicate works on a shrinking row set. Nothing is materialized;
+    ``execute`` returns row positions.
+    """
+    
+    def __init__(self, predicates: List[Predicate], n_rows: int):
+        self.predicates = sorted(predicates, key=lambda p: p.selectivity)
+        self.n_rows = n_rows
+        self.elapsed_ms: Optional[float] = None
+    
+    def execute(self) -> Optional[np.ndarray]:
+        if not self.predicates:
+            return None
+        t_start = time.perf_counter()
+        rows: Optional[np.ndarray] = None
+        for pred in self.predicates:
+            if rows is not None and len(rows) == 0:
+                break  # remaining predicates are skipped
+            pred.rows_in = self.n_rows if rows is None else int(len(rows))
+            t0 = time.perf_counter()
+            rows = pred.select(rows)
+            pred.elapsed_ms = round((time.perf_counter() - t0) * 1000, 3)
+            pred.rows_out = int(len(rows))
+        self.elapsed_ms = round((time.perf_counter() - t_start) * 1000, 3)
+        return rows
+    
+    def describe(self) -> dict:
+        return {
+            'order': [p.name for p in self.predicates],
+            'predicates': [p.describe() for p in self.predicates],
+            'elapsed_ms': self.elapsed_ms,
+        }
+
+
+def plan_filters(
+    df: pd.DataFrame,
+    index: Optional[FrameIndex] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    departments: Optional[List[str]] = None,
+    locations: Optional[List[str]] = None,
+    sublocations: Optional[List[str]] = None,
+    min_severity: Optional[float] = None,
+    max_severity: Optional[float] = None,
+    min_risk: Optional[float] = None,
+    max_risk: Optional[float] = None,
+    statuses: Optional[List[str]] = None,
+    incident_types: Optional[List[str]] = None,
+    violation_types: Optional[List[str]] = None,
+    location: Optional[str] = None,
+    department: Optional[str] = None,
+    status: Optional[str] = None,
+    type_match: str = "substring",
+) -> FilterPlan:
+    """
+    Build the predicates for a filter set, with selectivity estimated from
+    the filter index (value counts for categorical and type filters, sorted
+    values for date and numeric ranges on dataset frames).
+    """
+    index = index or get_frame_index(df)
+    n = len(df)
+    predicates: List[Predicate] = []
+    
+    # Date range filtering - first matching date column
+    if start_date or end_date:
+        date_col = _first_column(df, DATE_COLUMNS)
+        if date_col:
+            try:
+                start = date_bound(start_date) if start_date else None
+                end = date_bound(end_date) if end_date else None
+                dates = index.dates(date_col)
+                if index.shared:
+                    ordered = index.date_index(date_col).sorted
+                    selectivity = _sorted_fraction(ordered, start, end, n)
+                    # Binary search over the column's sorted date index
+                    first = lambda c=date_col, a=start, b=end: index.date_range_rows(c, a, b)
+                else:
+                    selectivity, first = _DEFAULT_RANGE_SELECTIVITY, None
+                # NaT compares False, so missing dates never match
+                predicates.append(Predicate('date_range', date_col, selectivity, _range_keep(dates, start, end), first))
+            except Exception:
+                pass  # If date parsing fails, skip date filtering
+    
+    # Department / location / sublocation / status: case-insensitive isin over codes
+    categorical = [
+        ('departments', departments, 'department' if 'department' in df.columns else None),
+        ('locations', locations, _first_column(df, LOCATION_COLUMNS)),
+        ('sublocations', sublocations, 'sublocation' if 'sublocation' in df.columns else None),
+        ('statuses', statuses, 'status' if 'status' in df.columns else None),
+    ]
+    for name, values, col in categorical:
+        if values and col is not None:
+            codes = index.categorical(col)
+            predicates.append(_lut_predicate(name, col, codes.codes, codes.counts, codes.lut(values), n))
+    
+    # Severity / risk ranges on the first numeric column present
+    for name, lo, hi, candidates in (('severity', min_severity, max_severity, SEVERITY_COLUMNS),
+                                     ('risk', min_risk, max_risk, RISK_COLUMNS)):
+        if lo is None and hi is None:
+            continue
+        col = _first_column(df, candidates)
+        if col is None:
+            continue
+        values = index.numeric(col)
+        if index.shared:
+            selectivity = _sorted_fraction(index.numeric_sorted(col), lo, hi, n)
+        else:
+            selectivity = _DEFAULT_RANGE_SELECTIVITY
+        predicates.append(Predicate(name, col, selectivity, _range_keep(values, lo, hi)))
+    
+    # Incident / violation types: comma-separated values via the token index
+    for name, values, candidates in (('incident_types', incident_types, INCIDENT_TYPE_COLUMNS),
+                                     ('violation_types', violation_types, VIOLATION_TYPE_COLUMNS)):
+        if not values:
+            continue
+        col = _first_column(df, candidates)
+        if col is not None:
+            tokens = index.tokens(col)
+            predicates.append(_lut_predicate(name, col, tokens.codes, tokens.counts, tokens.match_lut(values, type_match), n))
+    
+    # Location / department / status text: the pattern is tested once per
+    # distinct value (trigram-narrowed) and mapped back through the codes
+    for name, pattern in (('location', location), ('department', department), ('status', status)):
+        if pattern is None or pattern == "":
+            continue
+        col = _first_column(df, SUBSTRING_COLUMNS[name])
+        if col is not None:
+            text = index.substring(col)
+            predicates.append(_lut_predicate(name, col, text.codes, text.counts, text.contains_lut(str(pattern)), n))
+    
+    return FilterPlan(predicates, n)
+
+
+def _compute_row_ids(df: pd.DataFrame, index: FrameIndex, type_match: str = "substring", **filters) -> Optional[np.ndarray]:
+    return plan_filters(df, index, type_match=type_match, **filters).execute()
+
 
 def apply_analytics_filters(
     df: pd.DataFrame,
@@ -22,6 +387,10 @@ def apply_analytics_filters(
     statuses: Optional[List[str]] = None,
     incident_types: Optional[List[str]] = None,
     violation_types: Optional[List[str]] = None,
+    location: Optional[str] = None,
+    department: Optional[str] = None,
+    status: Optional[str] = None,
+    type_match: str = "substring",
 ) -> pd.DataFrame:
     """
     Apply flexible filters to a DataFrame.
@@ -40,125 +409,31 @@ def apply_analytics_filters(
         statuses: List of status values to include
         incident_types: List of incident types to include
         violation_types: List of violation types to include (for hazards)
+        location: Case-insensitive substring (regex) of the location column
+        department: Case-insensitive substring (regex) of the department column
+        status: Case-insensitive substring (regex) of the status column
+        type_match: How type filters match comma-separated values: "substring"
+            (any value containing the text, the default) or "exact" (one of
+            the comma-separated entries equals it, case-insensitive)
     
     Returns:
-        Filtered DataFrame
+        Filtered DataFrame (a new frame; callers may modify it)
     """
     if df is None or df.empty:
         return df
     
-    filtered = df.copy()
-    
-    # Date range filtering - try multiple common date column names
-    if start_date or end_date:
-        date_cols = ['occurrence_date', 'date_of_occurrence', 'date_reported', 
-                     'entered_date', 'start_date', 'scheduled_date', 'created_date']
-        date_col = None
-        for col in date_cols:
-            if col in filtered.columns:
-                date_col = col
-                break
-        
-        if date_col:
-            try:
-                filtered['__temp_date'] = pd.to_datetime(filtered[date_col], errors='coerce')
-                
-                if start_date:
-                    start_dt = pd.to_datetime(start_date)
-                    filtered = filtered[filtered['__temp_date'] >= start_dt]
-                
-                if end_date:
-                    end_dt = pd.to_datetime(end_date)
-                    filtered = filtered[filtered['__temp_date'] <= end_dt]
-                
-                filtered = filtered.drop(columns=['__temp_date'])
-            except Exception:
-                pass  # If date parsing fails, skip date filtering
-    
-    # Department filtering
-    if departments and 'department' in filtered.columns:
-        # Case-insensitive matching
-        filtered = filtered[filtered['department'].astype(str).str.lower().isin(
-            [d.lower() for d in departments]
-        )]
-    
-    # Location filtering
-    if locations:
-        loc_cols = ['location', 'location.1', 'site']
-        for col in loc_cols:
-            if col in filtered.columns:
-                filtered = filtered[filtered[col].astype(str).str.lower().isin(
-                    [loc.lower() for loc in locations]
-                )]
-                break
-    
-    # Sublocation filtering
-    if sublocations and 'sublocation' in filtered.columns:
-        filtered = filtered[filtered['sublocation'].astype(str).str.lower().isin(
-            [sl.lower() for sl in sublocations]
-        )]
-    
-    # Severity filtering
-    if min_severity is not None or max_severity is not None:
-        sev_cols = ['severity_score', 'severity', 'severity_level']
-        for col in sev_cols:
-            if col in filtered.columns:
-                try:
-                    sev_values = pd.to_numeric(filtered[col], errors='coerce')
-                    if min_severity is not None:
-                        filtered = filtered[sev_values >= min_severity]
-                    if max_severity is not None:
-                        filtered = filtered[sev_values <= max_severity]
-                    break
-                except Exception:
-                    pass
-    
-    # Risk filtering
-    if min_risk is not None or max_risk is not None:
-        risk_cols = ['risk_score', 'risk', 'risk_level']
-        for col in risk_cols:
-            if col in filtered.columns:
-                try:
-                    risk_values = pd.to_numeric(filtered[col], errors='coerce')
-                    if min_risk is not None:
-                        filtered = filtered[risk_values >= min_risk]
-                    if max_risk is not None:
-                        filtered = filtered[risk_values <= max_risk]
-                    break
-                except Exception:
-                    pass
-    
-    # Status filtering
-    if statuses and 'status' in filtered.columns:
-        filtered = filtered[filtered['status'].astype(str).str.lower().isin(
-            [s.lower() for s in statuses]
-        )]
-    
-    # Incident type filtering
-    if incident_types:
-        type_cols = ['incident_type(s)', 'incident_type', 'category', 'accident_type']
-        for col in type_cols:
-            if col in filtered.columns:
-                # Handle comma-separated values
-                mask = filtered[col].astype(str).apply(
-                    lambda x: any(it.lower() in x.lower() for it in incident_types)
-                )
-                filtered = filtered[mask]
-                break
-    
-    # Violation type filtering (for hazards)
-    if violation_types:
-        viol_cols = ['violation_type_hazard_id', 'violation_type', 'violation_type_(incident)']
-        for col in viol_cols:
-            if col in filtered.columns:
-                # Handle comma-separated values
-                mask = filtered[col].astype(str).apply(
-                    lambda x: any(vt.lower() in x.lower() for vt in violation_types)
-                )
-                filtered = filtered[mask]
-                break
-    
-    return filtered
+    rows = filter_row_ids(
+        df, start_date=start_date, end_date=end_date, departments=departments,
+        locations=locations, sublocations=sublocations, min_severity=min_severity,
+        max_severity=max_severity, min_risk=min_risk, max_risk=max_risk,
+        statuses=statuses, incident_types=incident_types, violation_types=violation_types,
+        location=location, department=department, status=status, type_match=type_match,
+    )
+    if rows is None:
+        return df.copy()
+    # take() gathers only the selected rows into new arrays; compacted
+    # columns keep only the categories the subset uses
+    return drop_unused_categories(df.take(rows))
 
 
 def get_filter_summary(
@@ -175,18 +450,29 @@ def get_filter_summary(
         filters_applied: Dictionary of filter parameters that were applied
     
     Returns:
-        Dictionary with filter summary statistics
+        Dictionary with filter summary statistics, including the filter plan
+        (predicate order, estimated selectivity, rows in/out and timing per
+        predicate)
     """
     original_count = len(df_original) if df_original is not None else 0
     filtered_count = len(df_filtered) if df_filtered is not None else 0
     
     active_filters = {k: v for k, v in filters_applied.items() if v is not None}
     
+    plan = None
+    if df_original is not None and not df_original.empty:
+        # Re-run the plan uncached so the timings are real
+        params = {k: filters_applied.get(k) for k in FILTER_KEYS}
+        filter_plan = plan_filters(df_original, type_match=filters_applied.get('type_match') or "substring", **params)
+        filter_plan.execute()
+        plan = filter_plan.describe()
+    
     return {
         'original_count': original_count,
         'filtered_count': filtered_count,
         'records_removed': original_count - filtered_count,
         'retention_rate': (filtered_count / original_count * 100) if original_count > 0 else 0,
         'active_filters': active_filters,
-        'filter_count': len(active_filters)
+        'filter_count': len(active_filters),
+        'plan': plan,
     }
@@ -0,0 +1,272 @@
+"""
+Workbook ingest paths.
+
+- Parallel parse: each sheet is parsed in its own worker process (started
+  via forkserver/spawn, not fork, since the server runs threads) and shipped
+  back as an Arrow IPC buffer (a single bytes copy instead of pickling every
+  Python object in object columns). Falls back to pickle for sheets Arrow
+  cannot represent and to in-process parsing when a pool cannot be started.
+- Streaming summaries: walks a spooled workbook with openpyxl read-only
+  ``iter_rows`` and yields per-sheet summaries without building DataFrames.
+"""
+from __future__ import annotations
+
+import multiprocessing
+import os
+import pickle
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from .excel import _coerce_datetime_columns
+
+try:
+    import pyarrow as pa
+    _ARROW_AVAILABLE = True
+except Exception:
+    _ARROW_AVAILABLE = False
+
+
+def _pool_context():
+    """Start method for parse workers: never fork the (multithreaded) server.
+
+    ``forkserver`` forks workers from a clean single-threaded helper process;
+    ``spawn`` is the fallback where it is unavailable (Windows).
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def default_parse_workers() -> int:
+    """Worker count from EXCEL_PARSE_WORKERS, defaulting to min(4, CPU count)."""
+    try:
+        configured = int(os.getenv("EXCEL_PARSE_WORKERS", "0"))
+    except ValueError:
+        configured = 0
+    if configured > 0:
+        return configured
+    return max(1, min(4, os.cpu_count() or 1))
+
+
+def _encode_frame(df: pd.DataFrame) -> Tuple[bytes, str]:
+    if _ARROW_AVAILABLE and all(isinstance(c, str) for c in df.columns):
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            sink = pa.BufferOutputStream()
+            with pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+            return sink.getvalue().to_pybytes(), "arrow"
+        except Exception:
+            pass
+    return pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL), "pickle"
+
+
+def _decode_frame(payload: bytes, fmt: str) -> pd.DataFrame:
+    if fmt == "arrow":
+        return pa.ipc.open_stream(payload).read_all().to_pandas()
+    return pickle.loads(payload)
+
+
+def _parse_sheet(path: str, sheet: str) -> Dict[str, Any]:
+    """Parse and coerce one sheet. Runs inside a worker process."""
+    t0 = time.perf_counter()
+    try:
+        df = pd.read_excel(path, sheet_name=sheet)
+        df = _coerce_datetime_columns(df)
+    except Exception as e:
+        return {"sheet": sheet, "error": str(e), "parse_ms": (time.perf_counter() - t0) * 1000}
+    parse_ms = (time.perf_counter() - t0) * 1000
+    payload, fmt = _encode_frame(df)
+    return {
+        "sheet": sheet,
+        "payload": payload,
+        "format": fmt,
+        "rows": int(len(df)),
+        "parse_ms": parse_ms,
+        "encode_ms": (time.perf_counter() - t0) * 1000 - parse_ms,
+    }
+
+
+def _sheet_names(path: str) -> List[str]:
+    xls = pd.ExcelFile(path)
+    try:
+        return list(xls.sheet_names)
+    finally:
+        xls.close()
+
+
+def parse_workbook_parallel(
+    path: Path,
+    workers: Optional[int] = None,
+) -> Tuple[Dict[str, pd.DataFrame], Dict[str, Any]]:
+    """Parse every sheet of a workbook file, one sheet per worker process.
+
+    Args:
+        path: Path of the .xlsx file
+        workers: Max worker processes (default: ``default_parse_workers()``)
+
+    Returns:
+        (sheets, timings) where sheets is sheet_name -> DataFrame in workbook
+        order (sheets that fail to parse are skipped, as in
+        ``read_excel_to_sheets``) and timings holds total and per-sheet
+        milliseconds
+    """
+    t0 = time.perf_counter()
+    path_s = str(path)
+    names = _sheet_names(path_s)
+    n_workers = max(1, min(workers or default_parse_workers(), len(names) or 1))
+
+    results: Dict[str, Dict[str, Any]] = {}
+    mode = "parallel"
+    if n_workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=n_workers, mp_context=_pool_context()) as pool:
+                futures = {name: pool.submit(_parse_sheet, path_s, name) for name in names}
+                for name, fut in futures.items():
+                    results[name] = fut.result()
+        except Exception as e:
+            print(f"⚠️  Parallel workbook parse failed ({e}); falling back to sequential parse")
+            results = {}
+    if not results:
+        mode = "sequential"
+        n_workers = 1
+        for name in names:
+            results[name] = _parse_sheet(path_s, name)
+
+    sheets: Dict[str, pd.DataFrame] = {}
+    sheet_timings: List[Dict[str, Any]] = []
+    for name in names:
+        res = results[name]
+        entry: Dict[str, Any] = {"sheet": name, "parse_ms": round(res.get("parse_ms", 0.0), 2)}
+        if "error" in res:
+            entry["error"] = res["error"]
+            sheet_timings.append(entry)
+            continue
+        t_dec = time.perf_counter()
+        sheets[name] = _decode_frame(res["payload"], res["format"])
+        entry.update({
+            "rows": res["rows"],
+            "transfer_format": res["format"],
+            "encode_ms": round(res["encode_ms"], 2),
+            "decode_ms": round((time.perf_counter() - t_dec) * 1000, 2),
+        })
+        sheet_timings.append(entry)
+
+    timings = {
+        "mode": mode,
+        "workers": n_workers,
+        "total_ms": round((time.perf_counter() - t0) * 1000, 2),
+        "sheets": sheet_timings,
+    }
+    return sheets, timings
+
+
+def read_excel_to_sheets_parallel(
+    content: bytes,
+    workers: Optional[int] = None,
+) -> Tuple[Dict[str, pd.DataFrame], Dict[str, Any]]:
+    """Parallel counterpart of ``read_excel_to_sheets`` for in-memory uploads.
+    The bytes are spooled to a temporary file so workers can open it directly.
+    """
+    fd, tmp_path = tempfile.mkstemp(suffix=".xlsx")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        return parse_workbook_parallel(Path(tmp_path), workers=workers)
+    finally:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+# ---------------- Streaming (bounded-memory) sheet summaries ----------------
+
+def _json_safe_cell(value: Any) -> Any:
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def _header_names(header: List[Any], width: int) -> List[str]:
+    """Mirror pandas' header handling: blank -> 'Unnamed: i', duplicates -> 'name.1'."""
+    names: List[str] = []
+    seen: Dict[str, int] = {}
+    for i in range(width):
+        raw = header[i] if i < len(header) else None
+        name = f"Unnamed: {i}" if raw is None or str(raw).strip() == "" else str(raw)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def iter_sheet_summaries(path: Path, sample_size: int = 10):
+    """Yield one summary dict per sheet while walking the workbook row by row.
+
+    Uses openpyxl's read-only mode, so only the current row, the sample rows
+    and the shared-strings table are held in memory regardless of sheet size.
+    Each dict matches the ``sheets`` entries of ``/workbooks/upload``.
+    """
+    from openpyxl import load_workbook
+
+    wb = load_workbook(str(path), read_only=True, data_only=True)
+    try:
+        for index, ws in enumerate(wb.worksheets):
+            t0 = time.perf_counter()
+            rows = ws.iter_rows(values_only=True)
+            header = list(next(rows, None) or [])
+            width = max((i + 1 for i, v in enumerate(header) if v is not None), default=0)
+            samples: List[Tuple[Any, ...]] = []
+            row_count = 0
+            pending_blank = 0
+            for row in rows:
+                last = max((i + 1 for i, v in enumerate(row) if v is not None), default=0)
+                if last == 0:
+                    # Only count blank rows that are followed by data (pandas trims trailing ones)
+                    pending_blank += 1
+                    continue
+                if pending_blank:
+                    if len(samples) < sample_size:
+                        samples.extend([()] * min(pending_blank, sample_size - len(samples)))
+                    row_count += pending_blank
+                    pending_blank = 0
+                width = max(width, last)
+                row_count += 1
+                if len(samples) < sample_size:
+                    samples.append(tuple(row))
+            columns = _header_names(header, width)
+            sample_data = [
+                {col: _json_safe_cell(r[i] if i < len(r) else None) for i, col in enumerate(columns)}
+                for r in samples
+            ]
+            yield {
+                "index": index,
+                "name": ws.title,
+                "columns": columns,
+                "rowCount": row_count,
+                "sampleData": sample_data,
+                "elapsed_ms": round((time.perf_counter() - t0) * 1000, 2),
+            }
+    finally:
+        wb.close()
+
+
+def workbook_sheet_names(path: Path) -> List[str]:
+    """Sheet names without loading any sheet bodies."""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(str(path), read_only=True)
+    try:
+        return list(wb.sheetnames)
+    finally:
+        wb.close()
@@ -35,6 +35,7 @@ from .agent import (
     _to_native_jsonable,
     _normalize_or_recompute,
 )
+from .lazy_workbook import lowercase_sheets
 
 
 # ==================== Enhanced State Schema ====================
@@ -131,8 +132,8 @@ def data_loader_node(state: IntelligentAnalystState) -> Dict:
     # Fast path: Load only requested dataset for simple queries
     if not needs_multi_sheet:
         dataset = state.get("dataset", "incident").lower()
-        workbook = load_default_sheets()  # Still loads all (cached)
-        dfs = {str(k).lower(): v for k, v in (workbook or {}).items()}
+        workbook = load_default_sheets()
+        dfs = lowercase_sheets(workbook)  # Only the primary sheet gets parsed
         
         # Build lightweight context (faster)
         primary_sheet = dataset if dataset in dfs else "incident"
@@ -0,0 +1,208 @@
+"""
+Lazily parsed workbook.
+
+``LazyWorkbook`` is a read-only ``Mapping`` of sheet name -> DataFrame that
+knows every sheet's name, columns and (when available) row count up front,
+but parses a sheet's body only the first time it is looked up. Metadata comes
+from the snapshot manifest when one matches the file, otherwise from the
+header row of each sheet via openpyxl's read-only mode.
+
+Code that iterates ``.items()``/``.values()`` still works (it parses what it
+touches); use ``keys()``, ``sheet_columns()`` and ``sheet_rows()`` to stay on
+metadata only.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Mapping, MutableMapping
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+
+class LazyWorkbook(Mapping):
+    """Mapping of sheet name -> DataFrame that parses sheets on first access."""
+
+    def __init__(
+        self,
+        meta: Dict[str, Dict[str, Any]],
+        loader: Callable[[str], pd.DataFrame],
+        source: str = "",
+        fingerprint: Optional[Dict[str, Any]] = None,
+    ):
+        self._meta = meta
+        self._loader = loader
+        self._frames: Dict[str, pd.DataFrame] = {}
+        self._failed: Dict[str, str] = {}
+        self._locks = {name: threading.Lock() for name in meta}
+        self.source = source
+        # Fingerprint of the file version every sheet is read from (see excel._open_lazy_workbook)
+        self.fingerprint = fingerprint
+        self.parse_ms: Dict[str, float] = {}
+
+    # ---------------- Mapping API ----------------
+
+    def __getitem__(self, name: str) -> pd.DataFrame:
+        df = self._frames.get(name)
+        if df is not None:
+            return df
+        if name not in self._meta:
+            raise KeyError(name)
+        with self._locks[name]:
+            df = self._frames.get(name)
+            if df is None:
+                if name in self._failed:
+                    raise KeyError(name)
+                t0 = time.perf_counter()
+                try:
+                    df = self._loader(name)
+                except Exception as e:
+                    self._failed[name] = str(e)
+                    print(f"⚠️  Failed to parse sheet {name}: {e}")
+                    raise KeyError(name)
+                self.parse_ms[name] = round((time.perf_counter() - t0) * 1000, 2)
+                self._frames[name] = df
+            return df
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._meta)
+
+    def __len__(self) -> int:
+        return len(self._meta)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._meta
+
+    # ---------------- metadata ----------------
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._frames
+
+    def loaded_frames(self) -> Dict[str, pd.DataFrame]:
+        return dict(self._frames)
+
+    def sheet_columns(self, name: str) -> List[str]:
+        df = self._frames.get(name)
+        if df is not None:
+            return [str(c) for c in df.columns]
+        return list(self._meta.get(name, {}).get("columns") or [])
+
+    def sheet_rows(self, name: str) -> Optional[int]:
+        df = self._frames.get(name)
+        if df is not None:
+            return int(len(df))
+        return self._meta.get(name, {}).get("rows")
+
+    def replace(self, overrides: Dict[str, pd.DataFrame]) -> "LazyWorkbook":
+        """New workbook sharing this one's parsed sheets and loader, with ``overrides`` swapped in."""
+        meta = dict(self._meta)
+        for name, df in overrides.items():
+            meta[name] = {"columns": [str(c) for c in df.columns], "rows": int(len(df))}
+        clone = LazyWorkbook(meta, self._loader, source=self.source, fingerprint=self.fingerprint)
+        clone._frames = {**self._frames, **overrides}
+        return clone
+
+    def warm(self, names: List[str]) -> Dict[str, Any]:
+        """Parse the given sheets now (e.g. from a background thread)."""
+        t0 = time.perf_counter()
+        for name in names:
+            try:
+                self[name]
+            except KeyError:
+                pass
+        return {
+            "sheets": [n for n in names if self.is_loaded(n)],
+            "total_ms": round((time.perf_counter() - t0) * 1000, 2),
+        }
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "source": self.source,
+            "sheets": len(self._meta),
+            "loaded": [n for n in self._meta if n in self._frames],
+            "failed": dict(self._failed),
+            "parse_ms": dict(self.parse_ms),
+        }
+
+
+class _LowercaseView(MutableMapping):
+    """Lowercase-keyed view over a lazy workbook. Assignments stay local to the
+    view (agent code may add or replace frames) and never touch the workbook."""
+
+    def __init__(self, sheets: Mapping):
+        self._sheets = sheets
+        self._names: Dict[str, Any] = {}
+        for name in sheets.keys():
+            self._names[str(name).lower()] = name
+        self._local: Dict[str, Any] = {}
+
+    def __getitem__(self, key: str) -> pd.DataFrame:
+        if key in self._local:
+            return self._local[key]
+        return self._sheets[self._names[key]]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._local[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if key in self._local:
+            del self._local[key]
+        else:
+            del self._names[key]
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._names
+        yield from (k for k in self._local if k not in self._names)
+
+    def __len__(self) -> int:
+        return len(set(self._names) | set(self._local))
+
+
+def lowercase_sheets(sheets: Optional[Mapping]) -> MutableMapping:
+    """Sheets keyed by lowercase name without parsing lazy sheets up front."""
+    if not sheets:
+        return {}
+    if isinstance(sheets, LazyWorkbook):
+        return _LowercaseView(sheets)
+    return {str(k).lower(): v for k, v in sheets.items()}
+
+
+def sheet_columns(sheets: Mapping, name: str) -> List[str]:
+    if isinstance(sheets, LazyWorkbook):
+        return sheets.sheet_columns(name)
+    df = sheets.get(name)
+    return [str(c) for c in df.columns] if isinstance(df, pd.DataFrame) else []
+
+
+def sheet_rows(sheets: Mapping, name: str) -> Optional[int]:
+    if isinstance(sheets, LazyWorkbook):
+        return sheets.sheet_rows(name)
+    df = sheets.get(name)
+    return int(len(df)) if isinstance(df, pd.DataFrame) else 0
+
+
+def read_workbook_headers(path: Path) -> Dict[str, Dict[str, Any]]:
+    """Sheet name -> {columns, rows} from header rows only (openpyxl read-only).
+
+    ``rows`` comes from the sheet's stored dimension and is None when the
+    file does not record one.
+    """
+    from openpyxl import load_workbook
+    from .ingest import _header_names
+
+    meta: Dict[str, Dict[str, Any]] = {}
+    wb = load_workbook(str(path), read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            header = list(next(ws.iter_rows(min_row=1, max_row=1, values_only=True), None) or [])
+            width = max((i + 1 for i, v in enumerate(header) if v is not None), default=0)
+            max_row = ws.max_row
+            meta[ws.title] = {
+                "columns": _header_names(header, width),
+                "rows": (max_row - 1) if isinstance(max_row, int) and max_row > 0 else None,
+            }
+    finally:
+        wb.close()
+    return meta
@@ -62,7 +62,7 @@ def create_hse_performance_index(df: Optional[pd.DataFrame]):
         if c not in cp.columns:
             cp[c] = np.nan
         cp[c] = pd.to_numeric(cp[c].astype(float), errors='coerce')
-    dept_metrics = cp.groupby('department').agg({
+    dept_metrics = cp.groupby('department', observed=True).agg({
         'severity_score': 'mean',
         'risk_score': 'mean',
         'reporting_delay_days': 'mean',
@@ -102,10 +102,10 @@ def create_data_quality_metrics(incident_df: Optional[pd.DataFrame]):
         return go.Figure()
     fig = make_subplots(rows=2, cols=3, subplot_titles=['Root Cause Missing', 'Corrective Actions Missing', 'Reporting Delays', 'Resolution Times by Status', '', ''])
     if 'department' in incident_df.columns and 'root_cause_is_missing' in incident_df.columns:
-        missing_rc = incident_df.groupby('department')['root_cause_is_missing'].sum()
+        missing_rc = incident_df.groupby('department', observed=True)['root_cause_is_missing'].sum()
         fig.add_trace(go.Bar(x=missing_rc.index, y=missing_rc.values, name='Root Cause Missing'), row=1, col=1)
     if 'department' in incident_df.columns and 'corrective_actions_is_missing' in incident_df.columns:
-        missing_ca = incident_df.groupby('department')['corrective_actions_is_missing'].sum()
+        missing_ca = incident_df.groupby('department', observed=True)['corrective_actions_is_missing'].sum()
         fig.add_trace(go.Bar(x=missing_ca.index, y=missing_ca.values, name='Actions Missing'), row=1, col=2)
     if 'reporting_delay_days' in incident_df.columns:
         fig.add_trace(go.Histogram(x=_to_days(incident_df['reporting_delay_days']), nbinsx=30, name='Reporting Delay'), row=1, col=3)
@@ -124,7 +124,7 @@ def create_audit_inspection_tracker(audit_df: Optional[pd.DataFrame], inspection
         totals = aud.groupby(aud['_m']).size()
         fig.add_trace(go.Bar(x=totals.index.astype(str), y=totals.values, name='Audits Total'), row=1, col=1)
         # Additional per-status traces
-        timeline = aud.groupby([aud['_m'], 'audit_status']).size().unstack(fill_value=0)
+        timeline = aud.groupby([aud['_m'], 'audit_status'], observed=True).size().unstack(fill_value=0)
         for status in timeline.columns:
             fig.add_trace(go.Bar(x=timeline.index.astype(str), y=timeline[status], name=str(status)), row=1, col=1)
     if isinstance(inspection_df, pd.DataFrame) and {'start_date', 'audit_status'}.issubset(inspection_df.columns):
@@ -132,7 +132,7 @@ def create_audit_inspection_tracker(audit_df: Optional[pd.DataFrame], inspection
         ins['_m'] = pd.to_datetime(ins['start_date'], errors='coerce').dt.to_period('M')
         totals = ins.groupby(ins['_m']).size()
         fig.add_trace(go.Bar(x=totals.index.astype(str), y=totals.values, name='Inspections Total'), row=2, col=1)
-        timeline = ins.groupby([ins['_m'], 'audit_status']).size().unstack(fill_value=0)
+        timeline = ins.groupby([ins['_m'], 'audit_status'], observed=True).size().unstack(fill_value=0)
         for status in timeline.columns:
             fig.add_trace(go.Bar(x=timeline.index.astype(str), y=timeline[status], name=str(status)), row=2, col=1)
     fig.update_layout(barmode='stack', title='Audit & Inspection Compliance Tracking')
@@ -148,7 +148,7 @@ def create_location_risk_treemap(df: Optional[pd.DataFrame]):
     for c in ['severity_score', 'risk_score', 'estimated_cost_impact']:
         if c not in cp.columns:
             cp[c] = np.nan
-    location_data = cp.groupby(['location', 'sublocation']).agg({'incident_id': 'count', 'severity_score': 'mean', 'risk_score': 'mean', 'estimated_cost_impact': 'sum'}).reset_index()
+    location_data = cp.groupby(['location', 'sublocation'], observed=True).agg({'incident_id': 'count', 'severity_score': 'mean', 'risk_score': 'mean', 'estimated_cost_impact': 'sum'}).reset_index()
     location_data['size'] = location_data['incident_id']
     location_data['hover_text'] = (
         'Count: ' + location_data['incident_id'].astype(str) +
@@ -176,7 +176,7 @@ def create_violation_analysis(hazard_df: Optional[pd.DataFrame]):
     if 'reporting_delay_days' in hazard_df.columns:
         fig.add_trace(go.Histogram(x=_to_days(hazard_df['reporting_delay_days']), nbinsx=30, name='Reporting Delay'), row=2, col=1)
     if {'department', 'violation_type_hazard_id'}.issubset(hazard_df.columns):
-        heat = hazard_df.pivot_table(index='department', columns='violation_type_hazard_id', values='violation_type_hazard_id', aggfunc='count').fillna(0)
+        heat = hazard_df.pivot_table(index='department', columns='violation_type_hazard_id', values='violation_type_hazard_id', aggfunc='count', observed=True).fillna(0)
         fig.add_trace(go.Heatmap(z=heat.to_numpy(), x=list(heat.columns.astype(str)), y=list(heat.index.astype(str)), colorscale='YlOrRd', name='Dept x Violation'), row=2, col=2)
     fig.update_layout(title='Hazard Violation Analysis')
     return fig
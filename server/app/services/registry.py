@@ -0,0 +1,292 @@
+"""
+Versioned dataset registry.
+
+Resolves which workbook sheet backs the incident/hazard/audit/inspection
+datasets once per workbook version and serves O(1) lookups afterwards.
+Every published workbook gets a monotonically increasing version number that
+downstream caches can key on. The registry is the only place the default
+workbook is loaded, so reloads (manual or from the file watcher) are
+single-flight and swap versions atomically.
+"""
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+from contextvars import ContextVar, Token
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+from .excel import read_default_workbook, select_dataset_sheets, warm_lazy_workbook
+from .lazy_workbook import LazyWorkbook
+
+
+DATASET_KEYS = ("incident", "hazard", "audit", "inspection")
+
+# Shared across every registry/workbook so versions are globally unique
+_version_counter = itertools.count(1)
+_version_lock = threading.Lock()
+
+
+def next_dataset_version() -> int:
+    with _version_lock:
+        return next(_version_counter)
+
+
+class Dataset:
+    """Immutable view of one workbook version and its resolved dataset mapping."""
+
+    def __init__(
+        self,
+        version: int,
+        sheets: Dict[str, pd.DataFrame],
+        selection: Dict[str, Optional[str]],
+        workbook_id: Optional[str] = None,
+    ):
+        self.version = version
+        self.workbook_id = workbook_id
+        self.sheets = sheets
+        self.selection = dict(selection)
+
+    def frame(self, key: str) -> Optional[pd.DataFrame]:
+        """DataFrame mapped to a dataset key (incident, hazard, audit, inspection).
+        With a lazy workbook the sheet is parsed on first access."""
+        name = self.selection.get(key)
+        return self.sheets.get(name) if name is not None else None
+
+    def frames(self) -> Dict[str, Optional[pd.DataFrame]]:
+        return {key: self.frame(key) for key in self.selection}
+
+    def owns(self, df: Optional[pd.DataFrame]) -> bool:
+        """True if ``df`` is one of this version's sheet frames (not a derived copy)."""
+        if df is None:
+            return False
+        loaded = self.sheets.loaded_frames().values() if isinstance(self.sheets, LazyWorkbook) else self.sheets.values()
+        return any(df is other for other in loaded)
+
+    @classmethod
+    def from_sheets(cls, sheets: Dict[str, pd.DataFrame], workbook_id: Optional[str] = None) -> "Dataset":
+        return cls(next_dataset_version(), sheets, select_dataset_sheets(sheets), workbook_id)
+
+
+class DatasetRegistry:
+    """Owns the live workbook and publishes new versions atomically.
+
+    Readers call ``current()``, which only reads a reference once the first
+    load has happened, so in-flight requests keep the version they started
+    with while a reload runs. All loads go through ``_load_lock``: at most one
+    parse runs at a time, and reload requests that arrive during a parse are
+    coalesced into a single follow-up parse.
+    """
+
+    def __init__(self, loader: Callable[[], Dict[str, pd.DataFrame]]):
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._current: Optional[Dataset] = None
+        self._reload_pending = False
+        self._reload_thread: Optional[threading.Thread] = None
+        self._listeners: List[Callable[[Dataset], None]] = []
+        self.last_reload: Dict[str, Any] = {}
+
+    def current(self) -> Dataset:
+        ds = self._current
+        if ds is not None:
+            return ds
+        # First access: load synchronously (single-flight)
+        with self._load_lock:
+            if self._current is None:
+                self._swap(self._load())
+            return self._current
+
+    def publish(self, sheets: Dict[str, pd.DataFrame]) -> Dataset:
+        """Swap in a new workbook version and notify listeners."""
+        return self._publish(sheets)
+
+    def _publish(self, sheets: Dict[str, pd.DataFrame]) -> Dataset:
+        return self._swap(Dataset.from_sheets(sheets))
+
+    def _load(self) -> Dataset:
+        """Run the loader into a not yet published version.
+
+        A lazy workbook gets its mapped datasets parsed here, under the load
+        lock, so requests against a published version never parse them.
+        """
+        ds = Dataset.from_sheets(self._loader())
+        if isinstance(ds.sheets, LazyWorkbook):
+            ds.sheets.warm([n for n in dict.fromkeys(ds.selection.values()) if n])
+        return ds
+
+    def _swap(self, ds: Dataset) -> Dataset:
+        with self._lock:
+            self._current = ds
+            listeners = list(self._listeners)
+        for fn in listeners:
+            try:
+                fn(ds)
+            except Exception as e:
+                print(f"⚠️  Dataset listener failed: {e}")
+        return ds
+
+    def update(self, fn: Callable[[Dataset], Optional[Dict[str, pd.DataFrame]]]) -> Dataset:
+        """Publish ``fn(current)`` as a new version, serialized with reloads.
+
+        ``fn`` must return a new sheets dict (copy-on-write); the frames of
+        the current version are never modified. When it returns None nothing
+        is published and the current version is returned.
+        """
+        self.current()
+        with self._load_lock:
+            sheets = fn(self._current)
+            if sheets is None:
+                return self._current
+            return self._publish(sheets)
+
+    def subscribe(self, fn: Callable[[Dataset], None]) -> None:
+        """Call ``fn(dataset)`` after every published version (e.g. to drop derived caches)."""
+        with self._lock:
+            self._listeners.append(fn)
+
+    def reload(self) -> Dataset:
+        """Re-read the workbook now (blocking) and publish it."""
+        with self._load_lock:
+            return self._reload_locked()
+
+    def _reload_locked(self) -> Dataset:
+        t0 = time.perf_counter()
+        try:
+            ds = self._load()
+            previous = self._current
+            if previous is not None and previous.sheets:
+                # Unreadable/half-written file: keep serving the last good version
+                if not ds.sheets:
+                    raise RuntimeError(f"workbook could not be read; keeping version {previous.version}")
+                failed = [n for n in ds.selection.values() if n and isinstance(ds.sheets, LazyWorkbook) and not ds.sheets.is_loaded(n)]
+                if failed:
+                    raise RuntimeError(f"sheets {failed} could not be parsed; keeping version {previous.version}")
+            ds = self._swap(ds)
+            self.last_reload = {
+                "version": ds.version,
+                "ok": True,
+                "duration_ms": round((time.perf_counter() - t0) * 1000, 2),
+                "finished_at": time.time(),
+            }
+            return ds
+        except Exception as e:
+            self.last_reload = {"ok": False, "error": str(e), "finished_at": time.time()}
+            raise
+
+    def reload_in_background(self) -> bool:
+        """Schedule a reload off the request path.
+
+        Returns True if a new reload thread was started, False if one is
+        already running (it will parse once more after the current pass).
+        """
+        with self._lock:
+            if self._reload_thread is not None and self._reload_thread.is_alive():
+                self._reload_pending = True
+                return False
+            self._reload_pending = False
+            self._reload_thread = threading.Thread(target=self._reload_worker, name="workbook-reload", daemon=True)
+            self._reload_thread.start()
+            return True
+
+    def _reload_worker(self) -> None:
+        while True:
+            with self._load_lock:
+                try:
+                    self._reload_locked()
+                except Exception as e:
+                    print(f"⚠️  Background workbook reload failed: {e}")
+            with self._lock:
+                if not self._reload_pending:
+                    self._reload_thread = None
+                    return
+                self._reload_pending = False
+
+    def reloading(self) -> bool:
+        t = self._reload_thread
+        return t is not None and t.is_alive()
+
+    def warm_sheet(self, ds: Dataset, name: str) -> bool:
+        """Parse one lazy sheet of ``ds``, serialized with loads.
+
+        Returns False (without parsing) once ``ds`` is no longer the live
+        version, so warm-up of a superseded version stops.
+        """
+        with self._load_lock:
+            if self._current is not ds:
+                return False
+            ds.sheets.warm([name])
+            return True
+
+
+def _read_default_workbook_with_upserts() -> Dict[str, pd.DataFrame]:
+    # Rows upserted since startup (or persisted earlier) are re-applied on every load
+    from .upsert import apply_upsert_overlay
+    return apply_upsert_overlay(read_default_workbook())
+
+
+_registry = DatasetRegistry(_read_default_workbook_with_upserts)
+
+
+def get_registry() -> DatasetRegistry:
+    return _registry
+
+
+# Dataset pinned for the current request (an uploaded workbook selected via
+# ?workbook_id=...); None means the default workbook
+_request_dataset: ContextVar[Optional[Dataset]] = ContextVar("request_dataset", default=None)
+
+
+def current_dataset() -> Dataset:
+    """Return the dataset for this request: the pinned uploaded workbook if any,
+    otherwise the live default workbook (version + resolved sheet mapping)."""
+    ds = _request_dataset.get()
+    if ds is not None:
+        return ds
+    return _registry.current()
+
+
+def pin_request_dataset(ds: Optional[Dataset]) -> Token:
+    """Serve ``ds`` from ``current_dataset()`` in this context; undo with ``unpin_request_dataset``."""
+    return _request_dataset.set(ds)
+
+
+def unpin_request_dataset(token: Token) -> None:
+    _request_dataset.reset(token)
+
+
+def pinned_workbook_id() -> Optional[str]:
+    ds = _request_dataset.get()
+    return getattr(ds, "workbook_id", None) if ds is not None else None
+
+
+def _clear_derived_caches(_: Dataset) -> None:
+    from .data_cache import clear_all_caches
+    clear_all_caches()
+
+
+def _warm_lazy_sheets(ds: Dataset) -> None:
+    # Parse the remaining sheets off the request path, one at a time under the
+    # load lock, until this version is replaced
+    if not isinstance(ds.sheets, LazyWorkbook):
+        return
+
+    def run() -> None:
+        try:
+            info = warm_lazy_workbook(
+                ds.sheets, list(ds.selection.values()), parse=lambda name: _registry.warm_sheet(ds, name),
+            )
+            if info["superseded"]:
+                return
+            print(f"🔥 Warmed workbook version {ds.version}: all sheets in {info['total_ms']:.0f} ms")
+        except Exception as e:
+            print(f"⚠️  Workbook warm-up failed: {e}")
+
+    threading.Thread(target=run, name="workbook-warmup", daemon=True).start()
+
+
+_registry.subscribe(_clear_derived_caches)
+_registry.subscribe(_warm_lazy_sheets)
@@ -0,0 +1,488 @@
+"""
+Materialized rollup cubes for the dashboard aggregations.
+
+The trend, type-distribution, department/month heatmap, root-cause pareto and
+cost-trend endpoints all count or sum rows by a few low-cardinality
+dimensions. For a dataset frame the rows are pre-aggregated once per dataset
+version into cells keyed by
+
+    day x department x location x type x severity bucket
+
+with the row count, the first row position (for ``value_counts`` tie order)
+and count/sum/min/max of the cost, man-hour and score columns per cell.
+Requests then slice the cells with the filter values and aggregate them
+instead of re-filtering and re-parsing the rows. The cube has one cell per
+distinct combination of those dimensions that occurs, so it is only smaller
+than the frame as far as rows repeat them (``stats()`` reports rows and
+cells); at day grain with many departments and locations most cells hold a
+row or two, and the saving is then the per-request filtering and parsing
+rather than the row count. Free-text and continuous columns are kept out of
+it: scores are carried as per-cell sums. The root-cause pareto is served from
+its own cube that adds the root-cause text to the same dimensions, built only
+when that chart is requested.
+
+The severity bucket is the integer part of the score. Cubes answer filters
+over the dimensions they carry (date range, departments, locations, and
+severity ranges when every score is a whole number) and only when the
+endpoint resolves the same columns as the cube; anything else, including
+risk filters, falls back to the raw scan. Date filters are answered at day
+grain, so they are only served from a cube when every date in the column is
+at midnight.
+
+``ROLLUP_CUBE=0`` disables the cubes; ``ROLLUP_VERIFY=1`` computes every
+answer both ways and serves (and reports) the raw result on a mismatch.
+"""
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .data_cache import SingleFlightCache, _workbook_scope
+from .filter_index import date_bound, get_frame_index
+from .filters import DATE_COLUMNS, LOCATION_COLUMNS, RISK_COLUMNS, SEVERITY_COLUMNS, _first_column
+
+
+# Filters the cube can answer; any other active filter falls back to the raw scan
+CUBE_FILTERS = {'start_date', 'end_date', 'departments', 'locations', 'min_severity', 'max_severity'}
+MANHOUR_COLUMNS = ['man_hours', 'manhours', 'man-hours', 'total_man_hours', 'total_manhours']
+# Severity columns spanning more integer buckets than this are not carried as a dimension
+MAX_SEVERITY_BUCKETS = 64
+
+_NAT_KEY = np.iinfo(np.int64).max
+_NS_PER_DAY = 86_400 * 10**9
+_NAT_LABEL = 'NaT'
+_PLACEHOLDERS = re.compile("nan|null|none|n/a|not applicable", flags=re.IGNORECASE)
+
+_stats_lock = threading.Lock()
+_stats = {"served": 0, "fallback": 0, "verified": 0, "mismatches": 0}
+
+
+def rollup_enabled() -> bool:
+    return os.getenv("ROLLUP_CUBE", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def rollup_verify() -> bool:
+    return os.getenv("ROLLUP_VERIFY", "0").strip().lower() not in ("0", "false", "no", "off", "")
+
+
+def _count(name: str) -> None:
+    with _stats_lock:
+        _stats[name] += 1
+
+
+class RollupCube:
+    """Pre-aggregated cells of one dataset frame (see module docstring)."""
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        type_col: Optional[str] = None,
+        root_cause_col: Optional[str] = None,
+        cost_col: Optional[str] = None,
+    ):
+        t0 = time.perf_counter()
+        index = get_frame_index(df)
+        n = len(df)
+        self.n_rows = n
+        self.columns: Dict[str, Optional[str]] = {
+            'date': _first_column(df, DATE_COLUMNS),
+            'department': 'department' if 'department' in df.columns else None,
+            'location': _first_column(df, LOCATION_COLUMNS),
+            'severity': _first_column(df, SEVERITY_COLUMNS),
+            'risk': _first_column(df, RISK_COLUMNS),
+            'type': type_col if type_col in df.columns else None,
+            'root_cause': root_cause_col if root_cause_col in df.columns else None,
+            'cost': cost_col if cost_col in df.columns else None,
+            'manhours': _first_column(df, MANHOUR_COLUMNS),
+        }
+        self.values: Dict[str, np.ndarray] = {}
+        # Severity present but not carried as a dimension (too many buckets)
+        self.uncarried: set = set()
+        # Severity filters are exact on buckets only when every score is whole
+        self.severity_exact = False
+        keys: Dict[str, np.ndarray] = {}
+
+        # Day key (days since epoch); missing dates get a sentinel that sorts last
+        self.day_exact = True
+        if self.columns['date'] is not None:
+            dates = index.dates(self.columns['date'])
+            missing = np.isnat(dates)
+            days = dates.astype('datetime64[D]')
+            self.day_exact = bool((days[~missing] == dates[~missing]).all())
+            day_keys = days.astype(np.int64)
+            day_keys[missing] = _NAT_KEY
+            keys['day'] = day_keys
+
+        # Text dimensions as codes over their astype(str) values (NaN is 'nan',
+        # as in the filters and the charts); root causes keep NaN apart (-1)
+        for dim in ('department', 'location', 'type'):
+            col = self.columns[dim]
+            if col is not None:
+                codes, uniques = pd.factorize(df[col].astype(str))
+                keys[dim] = codes
+                self.values[dim] = np.asarray(uniques, dtype=object)
+        if self.columns['root_cause'] is not None:
+            codes, uniques = pd.factorize(df[self.columns['root_cause']])
+            keys['root_cause'] = codes
+            self.values['root_cause'] = np.asarray([str(v) for v in uniques], dtype=object)
+
+        # Severity bucket: integer part of the score (NaN is -1)
+        if self.columns['severity'] is not None:
+            scores = index.numeric(self.columns['severity'])
+            buckets = np.floor(scores)
+            codes, uniques = pd.factorize(buckets)
+            if len(uniques) > MAX_SEVERITY_BUCKETS:
+                self.uncarried.add('severity')
+            else:
+                keys['severity'] = codes
+                self.values['severity'] = np.asarray(uniques, dtype=float)
+                valid = ~np.isnan(scores)
+                self.severity_exact = bool((buckets[valid] == scores[valid]).all())
+
+        frame = pd.DataFrame({**keys, '_row': np.arange(n)})
+        aggs: Dict[str, Tuple[str, str]] = {'n': ('_row', 'size'), 'first_row': ('_row', 'min')}
+        # Measures: totals for the cost/man-hour charts, sum/count for score means
+        for measure, stats in (('cost', ('sum', 'count', 'min', 'max')), ('manhours', ('sum', 'count', 'min', 'max')),
+                               ('severity', ('sum', 'count')), ('risk', ('sum', 'count'))):
+            col = self.columns[measure]
+            if col is None:
+                continue
+            if measure in ('severity', 'risk'):
+                frame[f'_{measure}'] = index.numeric(col)
+            else:
+                frame[f'_{measure}'] = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=float)
+            for stat in stats:
+                aggs[f'{measure}_{stat}'] = (f'_{measure}', stat)
+        self.dims = list(keys)
+        if not self.dims:
+            frame['_all'] = 0
+        cells = frame.groupby(self.dims or ['_all'], sort=False).agg(**aggs).reset_index()
+        self.cells = {c: cells[c].to_numpy() for c in cells.columns}
+        self.n_cells = len(cells)
+        self.build_ms = round((time.perf_counter() - t0) * 1000, 2)
+
+    # ---------------- slicing ----------------
+
+    def carries(self, **columns: Optional[str]) -> bool:
+        """True when the cube's dimension (or measure) columns are the ones the caller resolved."""
+        return all(col is not None and self.columns.get(dim) == col for dim, col in columns.items())
+
+    def select(self, **filters: Any) -> Optional[np.ndarray]:
+        """
+        Boolean mask over the cells for ``apply_analytics_filters`` keyword
+        arguments, or None when a filter needs the raw rows.
+        """
+        mask = np.ones(self.n_cells, dtype=bool)
+        for name, value in filters.items():
+            if value is None or value == "" or value == []:
+                continue
+            if name not in CUBE_FILTERS:
+                return None
+
+        start_date, end_date = filters.get('start_date'), filters.get('end_date')
+        if (start_date or end_date) and self.columns['date'] is not None:
+            try:
+                start = date_bound(start_date) if start_date else None
+                end = date_bound(end_date) if end_date else None
+            except Exception:
+                start = end = None  # the raw filter skips unparseable dates too
+            if start is not None or end is not None:
+                if not self.day_exact:
+                    return None
+                day = self.cells['day']
+                midnight = np.where(day == _NAT_KEY, 0, day) * _NS_PER_DAY
+                keep = day != _NAT_KEY
+                if start is not None:
+                    keep &= midnight >= start.astype(np.int64)
+                if end is not None:
+                    keep &= midnight <= end.astype(np.int64)
+                mask &= keep
+
+        for dim, wanted in (('department', filters.get('departments')), ('location', filters.get('locations'))):
+            if wanted and self.columns[dim] is not None:
+                lowered = {str(v).lower() for v in wanted}
+                lut = np.fromiter((v.lower() in lowered for v in self.values[dim]), dtype=bool,
+                                  count=len(self.values[dim]))
+                mask &= lut[self.cells[dim]]
+
+        lo, hi = filters.get('min_severity'), filters.get('max_severity')
+        if (lo is not None or hi is not None) and self.columns['severity'] is not None:
+            # Otherwise no such column: the raw filter is a no-op too
+            if 'severity' in self.uncarried or not self.severity_exact:
+                return None
+            scores = np.append(self.values['severity'], np.nan)[self.cells['severity']]  # code -1 -> NaN
+            keep = ~np.isnan(scores)
+            if lo is not None:
+                keep &= scores >= lo
+            if hi is not None:
+                keep &= scores <= hi
+            mask &= keep
+        return mask
+
+    # ---------------- per-cell helpers ----------------
+
+    def day_labels(self, keys: np.ndarray) -> List[str]:
+        return [_NAT_LABEL if k == _NAT_KEY else str(np.datetime64(int(k), 'D')) for k in keys]
+
+    def month_keys(self, mask: np.ndarray) -> np.ndarray:
+        day = self.cells['day'][mask]
+        missing = day == _NAT_KEY
+        months = np.where(missing, 0, day).astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        months[missing] = _NAT_KEY
+        return months
+
+    @staticmethod
+    def month_labels(keys: np.ndarray) -> List[str]:
+        return [_NAT_LABEL if k == _NAT_KEY else str(np.datetime64(int(k), 'M')) for k in keys]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rows": self.n_rows,
+            "cells": self.n_cells,
+            "rows_per_cell": round(self.n_rows / self.n_cells, 2) if self.n_cells else 0.0,
+            "dimensions": self.dims,
+            "columns": {k: v for k, v in self.columns.items() if v is not None},
+            "day_exact": self.day_exact,
+            "build_ms": self.build_ms,
+        }
+
+
+def _ranked(counts: Dict[str, Tuple[int, Tuple[int, int]]], limit: Optional[int]) -> List[Tuple[str, int]]:
+    """Labels by count descending, ties by first appearance (stable ``value_counts``)."""
+    ordered = sorted(counts.items(), key=lambda kv: (-kv[1][0], kv[1][1]))
+    if limit is not None:
+        ordered = ordered[:limit]
+    return [(label, count) for label, (count, _) in ordered]
+
+
+def _split_counts(
+    values: np.ndarray, codes: np.ndarray, weights: np.ndarray, first_rows: np.ndarray,
+    sep: str, keep: Callable[[str], bool] = lambda part: True,
+) -> Dict[str, Tuple[int, Tuple[int, int]]]:
+    """Counts of the ``sep``-separated parts of each value, weighted per cell."""
+    totals = np.bincount(codes, weights=weights, minlength=len(values)).astype(np.int64)
+    first = np.full(len(values), np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(first, codes, first_rows.astype(np.int64))
+    out: Dict[str, Tuple[int, Tuple[int, int]]] = {}
+    for code in np.flatnonzero(totals):
+        for pos, part in enumerate(values[code].split(sep)):
+            part = part.strip()
+            if not keep(part):
+                continue
+            count, seen = out.get(part, (0, (np.iinfo(np.int64).max, 0)))
+            out[part] = (count + int(totals[code]), min(seen, (int(first[code]), pos)))
+    return out
+
+
+# ---------------- endpoint answers ----------------
+
+def trend_counts(cube: RollupCube, mask: np.ndarray) -> Dict[str, Any]:
+    """``/data/incident-trend``: rows per day."""
+    day = cube.cells['day'][mask]
+    keys, inverse = np.unique(day, return_inverse=True)
+    counts = np.bincount(inverse.reshape(-1), weights=cube.cells['n'][mask], minlength=len(keys)).astype(int)
+    return {
+        "labels": cube.day_labels(keys),
+        "series": [{"name": "Count", "data": counts.tolist()}],
+    }
+
+
+def type_distribution(cube: RollupCube, mask: np.ndarray, limit: int = 20) -> Dict[str, Any]:
+    """``/data/incident-type-distribution``: comma-separated types, top ``limit``."""
+    counts = _split_counts(
+        cube.values['type'], cube.cells['type'][mask], cube.cells['n'][mask],
+        cube.cells['first_row'][mask], ",",
+    )
+    ranked = _ranked(counts, limit)
+    return {
+        "labels": [label for label, _ in ranked],
+        "series": [{"name": "Count", "data": [count for _, count in ranked]}],
+    }
+
+
+def department_month(cube: RollupCube, mask: np.ndarray, metric_dim: Optional[str]) -> Dict[str, Any]:
+    """``/data/department-month-heatmap``: mean metric (or row count) per department and month."""
+    depts = cube.values['department'][cube.cells['department'][mask]]
+    months = cube.month_keys(mask)
+    n = cube.cells['n'][mask].astype(float)
+    metric = "avg" if metric_dim is not None else "count"
+    if metric_dim is not None:
+        # Mean over rows with a score: cells without one drop out
+        counts = cube.cells[f'{metric_dim}_count'][mask].astype(float)
+        valid = counts > 0
+        frame = pd.DataFrame({'d': depts[valid], 'm': months[valid], 'w': counts[valid],
+                              'v': cube.cells[f'{metric_dim}_sum'][mask][valid]})
+    else:
+        frame = pd.DataFrame({'d': depts, 'm': months, 'w': n, 'v': n})
+    if frame.empty:
+        return {"x": [], "y": [], "z": [], "metric": metric}
+    grouped = frame.groupby(['d', 'm']).sum()
+    values = grouped['v'] / grouped['w'] if metric_dim is not None else grouped['w']
+    table = values.unstack('m')
+    month_labels = cube.month_labels(table.columns.to_numpy())
+    # The raw pivot sorts labels as strings ('NaT' after the dates)
+    col_order = sorted(range(len(month_labels)), key=lambda i: month_labels[i])
+    row_order = sorted(range(len(table.index)), key=lambda i: str(table.index[i]))
+    z = table.to_numpy(dtype=float)[np.ix_(row_order, col_order)]
+    return {
+        "x": [month_labels[i] for i in col_order],
+        "y": [str(table.index[i]) for i in row_order],
+        "z": np.nan_to_num(z, nan=0.0).tolist(),
+        "metric": metric,
+    }
+
+
+def root_cause_pareto(cube: RollupCube, mask: np.ndarray, incident_type: Optional[str], top_n: int) -> Dict[str, Any]:
+    """``/data/root-cause-pareto``: semicolon-separated root causes, optionally for one incident type."""
+    empty = {"labels": [], "bars": [], "cum_pct": [], "incident_type": incident_type or "All"}
+    weights = cube.cells['n'][mask].astype(np.int64)
+    if incident_type and incident_type.strip().lower() not in ["all", ""]:
+        # A row counts once per ';'-separated entry equal to the selected type
+        target = incident_type.strip().lower()
+        per_value = np.fromiter(
+            (sum(part.strip().lower() == target for part in v.split(";")) for v in cube.values['type']),
+            dtype=np.int64, count=len(cube.values['type']),
+        )
+        weights = weights * per_value[cube.cells['type'][mask]]
+    rc_codes = cube.cells['root_cause'][mask]
+    present = (weights > 0) & (rc_codes >= 0)  # dropna() on the root cause column
+    counts = _split_counts(
+        cube.values['root_cause'], rc_codes[present], weights[present],
+        cube.cells['first_row'][mask][present], ";",
+        keep=lambda part: part != "" and not _PLACEHOLDERS.search(part),
+    )
+    if not counts:
+        return empty
+    ranked = _ranked(counts, None)[:top_n]
+    bars = np.asarray([count for _, count in ranked], dtype=np.int64)
+    total = bars.sum() if bars.sum() > 0 else 1
+    return {
+        "labels": [label for label, _ in ranked],
+        "bars": bars.astype(int).tolist(),
+        "cum_pct": np.round(np.cumsum(bars) / total * 100, 2).tolist(),
+        "incident_type": incident_type or "All",
+        "total_count": int(bars.sum()),
+    }
+
+
+def cost_trend(cube: RollupCube, mask: np.ndarray) -> Dict[str, Any]:
+    """``/data/incident-cost-trend``: total cost per month."""
+    months = cube.month_keys(mask)
+    sums = pd.Series(cube.cells['cost_sum'][mask]).groupby(months).sum()
+    labels = cube.month_labels(sums.index.to_numpy())
+    order = sorted(range(len(labels)), key=lambda i: labels[i])
+    data = sums.round(0).fillna(0).astype(float).to_numpy()
+    return {
+        "labels": [labels[i] for i in order],
+        "series": [{"name": "Total Cost", "data": [float(data[i]) for i in order]}],
+    }
+
+
+# ---------------- cache + dispatch ----------------
+
+_cubes = SingleFlightCache(max_items=16)
+
+
+def get_rollup_cube(
+    df: Optional[pd.DataFrame],
+    type_col: Optional[str] = None,
+    root_cause_col: Optional[str] = None,
+    cost_col: Optional[str] = None,
+) -> Optional[RollupCube]:
+    """Cube for a dataset frame, built once per version and column set; None for other frames.
+
+    Pass ``root_cause_col`` only for the root-cause pareto: it gets its own
+    cube, since the free-text causes multiply the cells.
+    """
+    from .registry import current_dataset
+
+    if df is None or df.empty or not rollup_enabled():
+        return None
+    ds = current_dataset()
+    if not ds.owns(df):
+        return None
+
+    key = f"{_workbook_scope()}:{ds.version}:{id(df)}:{type_col}:{root_cause_col}:{cost_col}"
+    return _cubes.get_or_compute(
+        key, lambda: RollupCube(df, type_col=type_col, root_cause_col=root_cause_col, cost_col=cost_col),
+    )
+
+
+def payloads_match(a: Any, b: Any) -> bool:
+    """Structural equality, floats compared with a relative tolerance."""
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(payloads_match(a[k], b[k]) for k in a)
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        return len(a) == len(b) and all(payloads_match(x, y) for x, y in zip(a, b))
+    if isinstance(a, (int, float, np.number)) and isinstance(b, (int, float, np.number)):
+        return bool(np.isclose(float(a), float(b), rtol=1e-9, atol=1e-9, equal_nan=True))
+    return a == b
+
+
+def ranked_match(ranking: Callable[[Dict[str, Any]], Tuple[list, list]]) -> Callable[[Any, Any], bool]:
+    """
+    Comparator for top-N payloads: the counts must be identical and every
+    label must have the same count, except that labels may swap among equal
+    counts (and at the cut-off), an order ``value_counts`` does not fix.
+    ``ranking`` extracts (labels, counts) from a payload.
+    """
+    def match(a: Any, b: Any) -> bool:
+        la, va = ranking(a)
+        lb, vb = ranking(b)
+        if [int(v) for v in va] != [int(v) for v in vb]:
+            return False
+        cutoff = min(va) if va else None
+        if {k: v for k, v in zip(la, va) if v != cutoff} != {k: v for k, v in zip(lb, vb) if v != cutoff}:
+            return False
+        rest_a = {k: v for k, v in a.items() if k not in ("labels", "series", "bars")}
+        rest_b = {k: v for k, v in b.items() if k not in ("labels", "series", "bars")}
+        return payloads_match(rest_a, rest_b)
+    return match
+
+
+def answer(
+    name: str,
+    cube: Optional[RollupCube],
+    filters: Dict[str, Any],
+    from_cube: Callable[[RollupCube, np.ndarray], Dict[str, Any]],
+    from_raw: Callable[[], Dict[str, Any]],
+    compare: Callable[[Any, Any], bool] = payloads_match,
+    empty: Optional[Dict[str, Any]] = None,
+    **columns: Optional[str],
+) -> Dict[str, Any]:
+    """
+    Serve ``name`` from the cube when it carries ``columns`` and can answer
+    ``filters``; otherwise (or on a ``ROLLUP_VERIFY`` mismatch) from the raw
+    rows. ``empty`` is the payload for a selection without rows.
+    """
+    mask = None
+    if cube is not None and cube.carries(**columns):
+        mask = cube.select(**filters)
+    if mask is None:
+        _count("fallback")
+        return from_raw()
+    if empty is not None and not mask.any():
+        result = dict(empty)
+    else:
+        result = from_cube(cube, mask)
+    _count("served")
+    if rollup_verify():
+        expected = from_raw()
+        _count("verified")
+        if not compare(result, expected):
+            _count("mismatches")
+            print(f"⚠️ Rollup cube mismatch for {name} (filters={filters}); serving the raw result")
+            return expected
+    return result
+
+
+def rollup_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        counters = dict(_stats)
+    return {**counters, "cube_cache": _cubes.stats(), "enabled": rollup_enabled(), "verify": rollup_verify()}
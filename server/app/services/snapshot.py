@@ -0,0 +1,313 @@
+"""
+Columnar on-disk snapshot cache for parsed workbooks.
+
+Parsed sheets are written next to the source workbook (``.snapshots/<stem>/``)
+as one Parquet file per sheet plus a JSON manifest keyed by the workbook's
+file size, mtime and SHA-256 content hash. Later loads read the snapshot
+(optionally pruning columns) instead of re-parsing the workbook with openpyxl,
+and fall back to Excel only when the source file has actually changed.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    _ARROW_AVAILABLE = True
+except Exception:
+    _ARROW_AVAILABLE = False
+
+
+# Bump whenever parsing/coercion rules change so stale snapshots are ignored
+SNAPSHOT_FORMAT_VERSION = 2
+
+_POINTER_FILE = "current.json"
+_MANIFEST_FILE = "manifest.json"
+
+
+def snapshot_enabled() -> bool:
+    """Snapshots are on by default; set EXCEL_SNAPSHOT_CACHE=0 to disable."""
+    return os.getenv("EXCEL_SNAPSHOT_CACHE", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def snapshot_root(source: Path) -> Path:
+    """Directory holding all snapshot generations for a workbook."""
+    source = Path(source)
+    return source.parent / ".snapshots" / source.stem
+
+
+def hash_file(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """Return the SHA-256 hex digest of a file, read in chunks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def file_fingerprint(path: Path, content_hash: Optional[str] = None) -> Dict[str, Any]:
+    """Size/mtime fingerprint of a file, plus its content hash when known."""
+    st = Path(path).stat()
+    return {
+        "name": Path(path).name,
+        "size": int(st.st_size),
+        "mtime_ns": int(st.st_mtime_ns),
+        "sha256": content_hash,
+    }
+
+
+def _read_json(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def _write_json_atomic(path: Path, payload: Dict[str, Any]) -> None:
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2, default=str)
+    os.replace(tmp, path)
+
+
+def _current_generation(source: Path) -> Optional[Path]:
+    root = snapshot_root(source)
+    pointer = _read_json(root / _POINTER_FILE)
+    if not pointer or not pointer.get("generation"):
+        return None
+    gen_dir = root / str(pointer["generation"])
+    return gen_dir if gen_dir.is_dir() else None
+
+
+def load_manifest(source: Path) -> Optional[Dict[str, Any]]:
+    """Return the manifest of the current snapshot generation, if any."""
+    gen_dir = _current_generation(source)
+    if gen_dir is None:
+        return None
+    return _read_json(gen_dir / _MANIFEST_FILE)
+
+
+def validate_snapshot(source: Path) -> Optional[Dict[str, Any]]:
+    """Return the manifest if the snapshot still matches the source workbook.
+
+    Size and mtime are compared first (no I/O beyond ``stat``). When only the
+    mtime differs (e.g. the file was touched or copied) the content hash decides,
+    and a matching hash refreshes the stored mtime so the next check is cheap.
+    """
+    source = Path(source)
+    if not source.exists():
+        return None
+    manifest = load_manifest(source)
+    if not manifest or manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        return None
+
+    stored = manifest.get("source") or {}
+    current = file_fingerprint(source)
+    if stored.get("size") != current["size"]:
+        return None
+    if stored.get("mtime_ns") == current["mtime_ns"]:
+        return manifest
+
+    if not stored.get("sha256") or hash_file(source) != stored["sha256"]:
+        return None
+    try:
+        stored["mtime_ns"] = current["mtime_ns"]
+        manifest["source"] = stored
+        gen_dir = _current_generation(source)
+        if gen_dir is not None:
+            _write_json_atomic(gen_dir / _MANIFEST_FILE, manifest)
+    except Exception:
+        pass
+    return manifest
+
+
+def pinned_snapshot(source: Path) -> Optional[Tuple[Path, Dict[str, Any]]]:
+    """Generation directory and manifest of a snapshot that matches ``source``.
+
+    Readers that must stay on one workbook version (lazy sheets) keep the
+    pair instead of resolving the current generation on every read. None
+    when there is no valid snapshot or the generation changed meanwhile.
+    """
+    gen_dir = _current_generation(Path(source))
+    if gen_dir is None:
+        return None
+    manifest = validate_snapshot(source)
+    if manifest is None or _current_generation(Path(source)) != gen_dir:
+        return None
+    return gen_dir, manifest
+
+
+def _sheet_file_stem(index: int, name: str) -> str:
+    safe = "".join(c if c.isalnum() else "_" for c in str(name)).strip("_") or "sheet"
+    return f"{index:03d}_{safe[:48]}"
+
+
+def _write_sheet(df: pd.DataFrame, gen_dir: Path, stem: str) -> Dict[str, str]:
+    """Write one sheet, preferring Parquet and falling back to pickle.
+
+    Parquet needs string column names and a single type per column; Excel
+    sheets with mixed-type object columns are stored as pickle so the snapshot
+    stays lossless.
+    """
+    if _ARROW_AVAILABLE and all(isinstance(c, str) for c in df.columns):
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            file_name = f"{stem}.parquet"
+            pq.write_table(table, gen_dir / file_name, compression="zstd")
+            return {"file": file_name, "format": "parquet"}
+        except Exception:
+            pass
+    file_name = f"{stem}.pkl"
+    df.to_pickle(gen_dir / file_name)
+    return {"file": file_name, "format": "pickle"}
+
+
+def write_frames(directory: Path, sheets: Dict[str, pd.DataFrame]) -> List[Dict[str, Any]]:
+    """Write sheets into ``directory`` (one file each) and return their manifest entries."""
+    entries: List[Dict[str, Any]] = []
+    for i, (name, df) in enumerate(sheets.items()):
+        entry = _write_sheet(df, directory, _sheet_file_stem(i, name))
+        entry.update({
+            "name": name,
+            "rows": int(len(df)),
+            "columns": [str(c) for c in df.columns],
+        })
+        entries.append(entry)
+    return entries
+
+
+def read_frames(directory: Path, entries: List[Dict[str, Any]]) -> Dict[str, pd.DataFrame]:
+    """Read sheets written by ``write_frames`` back, in manifest order."""
+    return {entry["name"]: _read_sheet(directory, entry) for entry in entries}
+
+
+def write_snapshot(
+    source: Path,
+    sheets: Dict[str, pd.DataFrame],
+    fingerprint: Optional[Dict[str, Any]] = None,
+) -> bool:
+    """Persist parsed sheets as a new snapshot generation.
+
+    Args:
+        source: Path of the source workbook
+        sheets: Parsed sheet_name -> DataFrame mapping
+        fingerprint: Fingerprint of the exact file version that was parsed
+            (see ``file_fingerprint``); computed from disk when omitted
+
+    Returns:
+        True if the snapshot was written
+    """
+    if not snapshot_enabled() or not sheets:
+        return False
+    source = Path(source)
+    root = snapshot_root(source)
+    try:
+        if fingerprint is None:
+            fingerprint = file_fingerprint(source, hash_file(source))
+        elif not fingerprint.get("sha256"):
+            fingerprint = dict(fingerprint, sha256=hash_file(source))
+
+        generation = f"{fingerprint['sha256'][:16]}-{time.time_ns()}"
+        gen_dir = root / generation
+        gen_dir.mkdir(parents=True, exist_ok=True)
+
+        sheet_entries = write_frames(gen_dir, sheets)
+
+        manifest = {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "created_at": pd.Timestamp.utcnow().isoformat(),
+            "source": fingerprint,
+            "sheets": sheet_entries,
+        }
+        _write_json_atomic(gen_dir / _MANIFEST_FILE, manifest)
+        _write_json_atomic(root / _POINTER_FILE, {"generation": generation})
+
+        # Drop older generations; readers resolve the pointer before opening files
+        for child in root.iterdir():
+            if child.is_dir() and child.name != generation:
+                shutil.rmtree(child, ignore_errors=True)
+        return True
+    except Exception as e:
+        print(f"⚠️  Failed to write workbook snapshot for {source.name}: {e}")
+        return False
+
+
+def _read_sheet(gen_dir: Path, entry: Dict[str, Any], columns: Optional[List[str]] = None) -> pd.DataFrame:
+    path = gen_dir / entry["file"]
+    if entry.get("format") == "parquet":
+        if columns is not None:
+            available = set(entry.get("columns") or [])
+            columns = [c for c in columns if c in available]
+        return pq.read_table(path, columns=columns).to_pandas()
+    df = pd.read_pickle(path)
+    if columns is not None:
+        df = df[[c for c in columns if c in df.columns]]
+    return df
+
+
+def read_snapshot(
+    source: Path,
+    sheets: Optional[List[str]] = None,
+    columns: Optional[Dict[str, List[str]]] = None,
+) -> Optional[Dict[str, pd.DataFrame]]:
+    """Read a valid snapshot for ``source``.
+
+    Args:
+        source: Path of the source workbook
+        sheets: Optional subset of sheet names to read (default: all)
+        columns: Optional sheet_name -> column list for column pruning
+
+    Returns:
+        sheet_name -> DataFrame in workbook order, or None if there is no
+        snapshot matching the current source file
+    """
+    if not snapshot_enabled():
+        return None
+    manifest = validate_snapshot(source)
+    if manifest is None:
+        return None
+    gen_dir = _current_generation(Path(source))
+    if gen_dir is None:
+        return None
+    if any(e.get("format") == "parquet" for e in manifest.get("sheets", [])) and not _ARROW_AVAILABLE:
+        return None
+
+    wanted = set(sheets) if sheets is not None else None
+    out: Dict[str, pd.DataFrame] = {}
+    try:
+        for entry in manifest.get("sheets", []):
+            name = entry["name"]
+            if wanted is not None and name not in wanted:
+                continue
+            out[name] = _read_sheet(gen_dir, entry, (columns or {}).get(name))
+    except Exception as e:
+        print(f"⚠️  Ignoring unreadable workbook snapshot for {Path(source).name}: {e}")
+        return None
+    return out
+
+
+def snapshot_info(source: Path) -> Dict[str, Any]:
+    """Describe the current snapshot for diagnostics endpoints."""
+    manifest = load_manifest(source)
+    if not manifest:
+        return {"exists": False, "valid": False}
+    return {
+        "exists": True,
+        "valid": validate_snapshot(source) is not None,
+        "created_at": manifest.get("created_at"),
+        "format_version": manifest.get("format_version"),
+        "sheets": [
+            {"name": e.get("name"), "rows": e.get("rows"), "format": e.get("format")}
+            for e in manifest.get("sheets", [])
+        ],
+    }
@@ -22,6 +22,7 @@ import sqlite3
 from openai import AsyncOpenAI
 
 from .agent import load_default_sheets
+from .lazy_workbook import lowercase_sheets
 from .data_cache import (
     get_cached_workbook,
     cache_workbook,
@@ -414,7 +415,7 @@ def get_data_summary(sheet_name: str = "incident") -> str:
             if workbook:
                 cache_workbook(workbook)
         
-        dfs = {str(k).lower(): v for k, v in (workbook or {}).items()}
+        dfs = lowercase_sheets(workbook)
         
         resolved = _resolve_sheet_name(sheet_name, dfs.keys())
         if not resolved:
@@ -467,7 +468,7 @@ def query_data(sheet_name: str, query_description: str) -> str:
             if workbook:
                 cache_workbook(workbook)
         
-        dfs = {str(k).lower(): v for k, v in (workbook or {}).items()}
+        dfs = lowercase_sheets(workbook)
         
         resolved = _resolve_sheet_name(sheet_name, dfs.keys())
         if not resolved:
@@ -551,7 +552,7 @@ def aggregate_data(sheet_name: str, group_by: str, aggregate_column: str = "", o
             if workbook:
                 cache_workbook(workbook)
         
-        dfs = {str(k).lower(): v for k, v in (workbook or {}).items()}
+        dfs = lowercase_sheets(workbook)
         
         if sheet_name.lower() not in dfs:
             return json.dumps({"error": f"Sheet '{sheet_name}' not found"})
@@ -562,13 +563,13 @@ def aggregate_data(sheet_name: str, group_by: str, aggregate_column: str = "", o
             return json.dumps({"error": f"Column '{group_by}' not found. Available: {list(df.columns)}"})
         
         if operation == "count":
-            result = df.groupby(group_by).size().sort_values(ascending=False).head(20).to_dict()
+            result = df.groupby(group_by, observed=True).size().sort_values(ascending=False).head(20).to_dict()
         elif operation == "sum" and aggregate_column in df.columns:
-            result = df.groupby(group_by)[aggregate_column].sum().sort_values(ascending=False).head(20).to_dict()
+            result = df.groupby(group_by, observed=True)[aggregate_column].sum().sort_values(ascending=False).head(20).to_dict()
         elif operation == "mean" and aggregate_column in df.columns:
-            result = df.groupby(group_by)[aggregate_column].mean().sort_values(ascending=False).head(20).to_dict()
+            result = df.groupby(group_by, observed=True)[aggregate_column].mean().sort_values(ascending=False).head(20).to_dict()
         else:
-            result = df.groupby(group_by).size().sort_values(ascending=False).head(20).to_dict()
+            result = df.groupby(group_by, observed=True).size().sort_values(ascending=False).head(20).to_dict()
         
         # Ensure keys are strings (e.g., Timestamp -> ISO)
         result_str_keys = { _stringify_key(k): _to_jsonable(v) for k, v in result.items() }
@@ -616,7 +617,7 @@ def compare_sheets(sheet1: str, sheet2: str, comparison_type: str = "count") ->
             if workbook:
                 cache_workbook(workbook)
         
-        dfs = {str(k).lower(): v for k, v in (workbook or {}).items()}
+        dfs = lowercase_sheets(workbook)
         
         r1 = _resolve_sheet_name(sheet1, dfs.keys())
         r2 = _resolve_sheet_name(sheet2, dfs.keys())
@@ -668,7 +669,7 @@ def get_top_values(sheet_name: str, column_name: str, limit: int = 10) -> str:
             if workbook:
                 cache_workbook(workbook)
         
-        dfs = {str(k).lower(): v for k, v in (workbook or {}).items()}
+        dfs = lowercase_sheets(workbook)
         
         if sheet_name.lower() not in dfs:
             return json.dumps({"error": f"Sheet '{sheet_name}' not found"})
@@ -731,7 +732,7 @@ def get_trend(sheet_name: str, date_column: str, value_column: str = "", period:
             if workbook:
                 cache_workbook(workbook)
         
-        dfs = {str(k).lower(): v for k, v in (workbook or {}).items()}
+        dfs = lowercase_sheets(workbook)
         
         if sheet_name.lower() not in dfs:
             return json.dumps({"error": f"Sheet '{sheet_name}' not found"})
@@ -819,7 +820,7 @@ def filter_data(sheet_name: str, filter_column: str, filter_value: str, return_c
             if workbook:
                 cache_workbook(workbook)
         
-        dfs = {str(k).lower(): v for k, v in (workbook or {}).items()}
+        dfs = lowercase_sheets(workbook)
         
         if sheet_name.lower() not in dfs:
             return json.dumps({"error": f"Sheet '{sheet_name}' not found"})
@@ -893,7 +894,7 @@ def create_chart(
             if workbook:
                 cache_workbook(workbook)
         
-        dfs = {str(k).lower(): v for k, v in (workbook or {}).items()}
+        dfs = lowercase_sheets(workbook)
         
         resolved = _resolve_sheet_name(sheet_name, dfs.keys())
         if not resolved:
@@ -948,7 +949,7 @@ def create_chart(
         elif chart_type == "bar":
             if y_column:
                 # Group by x_column and sum/mean y_column
-                grouped = df.groupby(x_column)[y_column].sum().sort_values(ascending=False).head(20)
+                grouped = df.groupby(x_column, observed=True)[y_column].sum().sort_values(ascending=False).head(20)
                 chart_data["x_data"] = [_stringify_key(k) for k in grouped.index.tolist()]
                 chart_data["y_data"] = [float(v) if pd.notna(v) else 0 for v in grouped.values.tolist()]
             else:
@@ -960,7 +961,7 @@ def create_chart(
         elif chart_type == "line":
             if y_column:
                 # Group by x_column (usually time-based)
-                grouped = df.groupby(x_column)[y_column].sum().sort_index()
+                grouped = df.groupby(x_column, observed=True)[y_column].sum().sort_index()
                 chart_data["x_data"] = [_stringify_key(k) for k in grouped.index.tolist()]
                 chart_data["y_data"] = [float(v) if pd.notna(v) else 0 for v in grouped.values.tolist()]
             else:
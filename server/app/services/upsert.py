@@ -0,0 +1,390 @@
+"""
+Incremental (upsert) ingestion into the live workbook.
+
+New or changed rows are merged into the in-memory sheet keyed on its id
+column (``incident_id``, ``hazard_id``...), published as a new dataset
+version, and mirrored into the SQLite database used by the agent's SQL tool
+with a DELETE/INSERT of just the affected keys. No workbook is re-parsed.
+
+Upserts are not written back to the Excel file. Instead every upserted row is
+kept in an overlay (one accumulated delta per sheet and key column) that is
+persisted next to the snapshot cache and re-applied whenever the default
+workbook is loaded, so a reload or restart keeps them and memory stays in
+step with the SQLite mirror. ``clear_upsert_overlay`` drops it.
+
+Merging copies the target sheet, and publishing a new version drops the
+per-version derived caches (filter index, rollup cube, classifications,
+conversion analyzer), which are rebuilt on their next use.
+"""
+from __future__ import annotations
+
+import shutil
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .excel import DEFAULT_EXCEL_PATH
+from .lazy_workbook import LazyWorkbook
+from .registry import Dataset, get_registry
+from .snapshot import _read_json, _write_json_atomic, read_frames, write_frames
+
+
+KEY_CANDIDATES = [
+    "incident_id",
+    "hazard_id",
+    "audit_id",
+    "inspection_id",
+    "Incident Number",
+    "id",
+]
+
+# SQLite caps bound parameters per statement (999 on older builds)
+_SQL_CHUNK = 500
+
+# Persisted overlay of upserted rows for the default workbook
+OVERLAY_DIR = DEFAULT_EXCEL_PATH.parent / ".snapshots" / f"{DEFAULT_EXCEL_PATH.stem}.upserts"
+_POINTER_FILE = "current.json"
+_MANIFEST_FILE = "manifest.json"
+
+# [{"sheet": ..., "key": ..., "rows": DataFrame}], read from OVERLAY_DIR on first use.
+# Only touched under the registry's load lock (loads and updates).
+_overlay: Optional[List[Dict[str, Any]]] = None
+
+
+def resolve_sheet_name(ds: Dataset, sheet: str) -> Optional[str]:
+    """Accept a dataset key (incident/hazard/audit/inspection) or a sheet name."""
+    if sheet in ds.selection and ds.selection[sheet] is not None:
+        return ds.selection[sheet]
+    if sheet in ds.sheets:
+        return sheet
+    lowered = {str(name).strip().lower(): name for name in ds.sheets}
+    return lowered.get(sheet.strip().lower())
+
+
+def resolve_key_column(df: pd.DataFrame, key: Optional[str] = None) -> Optional[str]:
+    if key:
+        return key if key in df.columns else None
+    for cand in KEY_CANDIDATES:
+        if cand in df.columns:
+            return cand
+    return None
+
+
+def _key_strings(s: pd.Series) -> pd.Series:
+    # Excel ids come back as int, float (1.0) or str depending on the sheet
+    def norm(v: Any) -> Optional[str]:
+        if v is None or (isinstance(v, float) and np.isnan(v)):
+            return None
+        if isinstance(v, float) and v.is_integer():
+            return str(int(v))
+        return str(v).strip()
+    return s.map(norm)
+
+
+def _align_delta(base: pd.DataFrame, delta: pd.DataFrame) -> pd.DataFrame:
+    """Cast delta columns to the base dtypes where that is lossless enough."""
+    out = delta.copy()
+    for col in out.columns:
+        if col not in base.columns:
+            continue
+        dtype = base[col].dtype
+        try:
+            if pd.api.types.is_datetime64_any_dtype(dtype):
+                if not pd.api.types.is_datetime64_any_dtype(out[col]):
+                    out[col] = pd.to_datetime(out[col], errors="coerce")
+            elif pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+                out[col] = pd.to_numeric(out[col], errors="coerce")
+        except Exception:
+            pass
+    return out
+
+
+def merge_rows(base: pd.DataFrame, delta: pd.DataFrame, key: str) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """Return a new frame with ``delta`` upserted into ``base`` on ``key``.
+
+    Existing rows are updated column by column (columns missing from the
+    delta keep their values); unknown keys are appended. ``base`` is not
+    modified.
+    """
+    delta = _align_delta(base, delta)
+    delta_keys = _key_strings(delta[key])
+    delta = delta[delta_keys.notna()]
+    delta_keys = delta_keys[delta_keys.notna()]
+    # Last occurrence wins within one request
+    keep = ~delta_keys.duplicated(keep="last")
+    delta, delta_keys = delta[keep.values], delta_keys[keep.values]
+
+    base_keys = _key_strings(base[key])
+    position = pd.Series(np.arange(len(base)), index=base_keys.values)
+    position = position[~position.index.duplicated(keep="last")]
+    matched = delta_keys.isin(position.index).values
+
+    updates = delta[matched]
+    inserts = delta[~matched]
+
+    merged = base.reset_index(drop=True)
+    if len(inserts):
+        merged = pd.concat([merged, inserts], ignore_index=True, sort=False)
+    else:
+        merged = merged.copy()
+    if len(updates):
+        rows = position.loc[delta_keys[matched].values].to_numpy()
+        for col in updates.columns:
+            if col not in merged.columns:
+                merged[col] = pd.NA
+            values = updates[col].to_numpy()
+            if isinstance(merged[col].dtype, pd.CategoricalDtype):
+                missing = pd.Index(pd.unique(updates[col].dropna())).difference(merged[col].cat.categories)
+                if len(missing):
+                    merged[col] = merged[col].cat.add_categories(missing)
+            merged.iloc[rows, merged.columns.get_loc(col)] = values
+    # Restore categoricals that concat widened to object; drop categories
+    # the updates left without rows
+    for col in base.columns:
+        if not isinstance(base[col].dtype, pd.CategoricalDtype):
+            continue
+        if isinstance(merged[col].dtype, pd.CategoricalDtype):
+            merged[col] = merged[col].cat.remove_unused_categories()
+        else:
+            merged[col] = merged[col].astype("category")
+    merged.attrs = dict(base.attrs)
+
+    affected = pd.concat([delta_keys[matched], delta_keys[~matched]]).tolist()
+    summary = {
+        "key": key,
+        "received": int(len(delta)),
+        "updated": int(matched.sum()),
+        "inserted": int((~matched).sum()),
+        "rows_before": int(len(base)),
+        "rows_after": int(len(merged)),
+    }
+    return merged, {"summary": summary, "affected_keys": affected}
+
+
+# ---------------- SQLite mirror ----------------
+
+def _sql_value(v: Any) -> Any:
+    if v is None or v is pd.NaT or v is pd.NA:
+        return None
+    if isinstance(v, pd.Timestamp):
+        # Same text layout pandas.to_sql uses for datetimes
+        return str(v.to_pydatetime())
+    if isinstance(v, np.generic):
+        v = v.item()
+    if isinstance(v, float) and np.isnan(v):
+        return None
+    return v
+
+
+def mirror_to_sqlite(
+    sheet_name: str,
+    frame: pd.DataFrame,
+    key: str,
+    affected_keys: List[str],
+    db_path: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Replace the affected rows of the sheet's SQLite table with ``frame``'s rows."""
+    from ..convert import sqlite_table_name
+    if db_path is None:
+        from .tool_agent import DB_PATH as db_path
+
+    table = sqlite_table_name(sheet_name)
+    if not affected_keys:
+        return {"table": table, "rows_written": 0}
+    conn = sqlite3.connect(db_path)
+    try:
+        cur = conn.cursor()
+        info = cur.execute(f'PRAGMA table_info("{table}")').fetchall()
+        if not info:
+            return {"table": table, "skipped": "table not found"}
+        existing_cols = [row[1] for row in info]
+        if key not in existing_cols:
+            return {"table": table, "skipped": f"key column '{key}' not in table"}
+        for col in frame.columns:
+            if str(col) not in existing_cols:
+                cur.execute(f'ALTER TABLE "{table}" ADD COLUMN "{col}"')
+                existing_cols.append(str(col))
+
+        frame_keys = _key_strings(frame[key])
+        rows = frame[frame_keys.isin(set(affected_keys)).values]
+        cols = [str(c) for c in frame.columns]
+        # Delete by the stored key values (matches how to_sql typed them)
+        key_values = [_sql_value(v) for v in rows[key].tolist()]
+
+        # DELETE opens the transaction; everything below commits together
+        for i in range(0, len(key_values), _SQL_CHUNK):
+            chunk = key_values[i:i + _SQL_CHUNK]
+            cur.execute(
+                f'DELETE FROM "{table}" WHERE "{key}" IN ({",".join("?" * len(chunk))})',
+                chunk,
+            )
+        col_sql = ",".join(f'"{c}"' for c in cols)
+        cur.executemany(
+            f'INSERT INTO "{table}" ({col_sql}) VALUES ({",".join("?" * len(cols))})',
+            ([_sql_value(v) for v in rec] for rec in rows.itertuples(index=False, name=None)),
+        )
+        conn.commit()
+        return {"table": table, "rows_written": int(len(rows))}
+    except Exception as e:
+        conn.rollback()
+        return {"table": table, "error": str(e)}
+    finally:
+        conn.close()
+
+
+# ---------------- Overlay ----------------
+
+def _read_overlay() -> List[Dict[str, Any]]:
+    pointer = _read_json(OVERLAY_DIR / _POINTER_FILE)
+    if not pointer or not pointer.get("generation"):
+        return []
+    gen_dir = OVERLAY_DIR / pointer["generation"]
+    manifest = _read_json(gen_dir / _MANIFEST_FILE)
+    if not manifest:
+        return []
+    frames = read_frames(gen_dir, manifest["entries"])
+    return [{"sheet": e["sheet"], "key": e["key"], "rows": frames[e["name"]]} for e in manifest["entries"]]
+
+
+def _write_overlay(entries: List[Dict[str, Any]]) -> None:
+    generation = str(time.time_ns())
+    gen_dir = OVERLAY_DIR / generation
+    gen_dir.mkdir(parents=True, exist_ok=True)
+    written = write_frames(gen_dir, {str(i): e["rows"] for i, e in enumerate(entries)})
+    for entry, meta in zip(entries, written):
+        meta.update({"sheet": entry["sheet"], "key": entry["key"]})
+    _write_json_atomic(gen_dir / _MANIFEST_FILE, {"entries": written})
+    _write_json_atomic(OVERLAY_DIR / _POINTER_FILE, {"generation": generation})
+    for child in OVERLAY_DIR.iterdir():
+        if child.is_dir() and child.name != generation:
+            shutil.rmtree(child, ignore_errors=True)
+
+
+def _overlay_entries() -> List[Dict[str, Any]]:
+    global _overlay
+    if _overlay is None:
+        try:
+            _overlay = _read_overlay()
+        except Exception as e:
+            print(f"⚠️  Failed to read upserted rows from {OVERLAY_DIR}: {e}")
+            _overlay = []
+    return _overlay
+
+
+def _record_upsert(sheet: str, key: str, delta: pd.DataFrame) -> None:
+    entries = _overlay_entries()
+    for entry in entries:
+        if entry["sheet"] == sheet and entry["key"] == key:
+            entry["rows"], _ = merge_rows(entry["rows"], delta, key)
+            break
+    else:
+        entries.append({"sheet": sheet, "key": key, "rows": delta.reset_index(drop=True)})
+    try:
+        _write_overlay(entries)
+    except Exception as e:
+        print(f"⚠️  Failed to persist upserted rows: {e}")
+
+
+def apply_upsert_overlay(sheets: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """``sheets`` with every recorded upsert merged in (the default workbook loader runs this)."""
+    entries = _overlay_entries()
+    if not sheets or not entries:
+        return sheets
+    overrides: Dict[str, pd.DataFrame] = {}
+    for entry in entries:
+        name, key = entry["sheet"], entry["key"]
+        if name not in sheets:
+            continue
+        try:
+            base = overrides[name] if name in overrides else sheets[name]
+        except KeyError:  # lazy sheet that failed to parse
+            continue
+        if key in base.columns:
+            overrides[name], _ = merge_rows(base, entry["rows"], key)
+    if not overrides:
+        return sheets
+    if isinstance(sheets, LazyWorkbook):
+        return sheets.replace(overrides)
+    return {**sheets, **overrides}
+
+
+def upsert_overlay_stats() -> Dict[str, Any]:
+    return {
+        "sheets": [
+            {"sheet": e["sheet"], "key": e["key"], "rows": int(len(e["rows"]))}
+            for e in (_overlay or [])
+        ],
+    }
+
+
+def clear_upsert_overlay() -> Dataset:
+    """Forget every upserted row and reload the default workbook from disk.
+
+    The SQLite mirror keeps the rows it was given; rebuild it with
+    ``app.convert`` to match the file again.
+    """
+    def clear(_: Dataset) -> None:
+        global _overlay
+        _overlay = []
+        shutil.rmtree(OVERLAY_DIR, ignore_errors=True)
+
+    registry = get_registry()
+    registry.update(clear)
+    return registry.reload()
+
+
+# ---------------- Entry points ----------------
+
+def upsert_sheets(
+    deltas: Dict[str, pd.DataFrame],
+    key: Optional[str] = None,
+    mirror_sqlite: bool = True,
+) -> Dict[str, Any]:
+    """Upsert several sheets and publish them as one new dataset version.
+
+    Args:
+        deltas: sheet name or dataset key -> rows to upsert
+        key: Key column (default: first of ``KEY_CANDIDATES`` present)
+        mirror_sqlite: Also apply the rows to the SQLite mirror
+
+    Returns:
+        Per-sheet summaries, skipped sheets and the new version
+    """
+    results: Dict[str, Any] = {}
+    skipped: Dict[str, str] = {}
+
+    def apply(ds: Dataset) -> Optional[Dict[str, pd.DataFrame]]:
+        overrides: Dict[str, pd.DataFrame] = {}
+        for target, delta in deltas.items():
+            name = resolve_sheet_name(ds, target)
+            if name is None:
+                skipped[target] = "unknown sheet"
+                continue
+            if delta is None or delta.empty:
+                skipped[target] = "no rows"
+                continue
+            base = overrides[name] if name in overrides else ds.sheets[name]
+            key_col = resolve_key_column(base, key)
+            if key_col is None or key_col not in delta.columns:
+                skipped[target] = f"key column not found (tried {key or KEY_CANDIDATES})"
+                continue
+            merged, info = merge_rows(base, delta, key_col)
+            overrides[name] = merged
+            results[name] = info["summary"]
+            _record_upsert(name, key_col, delta)
+            # Mirrored before the version is published, under the same lock,
+            # so SQLite sees concurrent upserts in the order memory does
+            if mirror_sqlite:
+                results[name]["sqlite"] = mirror_to_sqlite(name, merged, key_col, info["affected_keys"])
+        if not overrides:
+            return None
+        if isinstance(ds.sheets, LazyWorkbook):
+            # Keep untouched sheets lazy
+            return ds.sheets.replace(overrides)
+        return {**ds.sheets, **overrides}
+
+    ds = get_registry().update(apply)
+    return {"version": ds.version, "sheets": results, "skipped": skipped}
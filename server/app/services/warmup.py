@@ -0,0 +1,201 @@
+"""
+Startup warm-up.
+
+Runs once when the app starts (from the lifespan handler) in a background
+thread: loads the default workbook, resolves the dataset sheets, then calls
+the dashboard's default endpoints so their responses land in the
+version-keyed response cache. ``/ready`` reports progress and per-stage
+timings and only returns 200 once the run has finished, so a load balancer
+can hold traffic until the first requests are served from warm caches.
+``/health`` stays a plain liveness check.
+
+Stage failures are recorded and do not stop later stages; a warm-up that
+finished with errors still reports ready (the endpoints compute on demand).
+
+Environment:
+    WARMUP_ENABLED: set to 0 to skip the warm-up (``/ready`` is then ready at once)
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+def warmup_enabled() -> bool:
+    return os.getenv("WARMUP_ENABLED", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+class WarmupState:
+    """Progress of the warm-up run, safe to read from request handlers."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.status = "pending"  # pending | running | done | skipped
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.stages: List[Dict[str, Any]] = []
+        self.total_stages = 0
+
+    @property
+    def ready(self) -> bool:
+        return self.status in ("done", "skipped")
+
+    def begin(self, total_stages: int) -> None:
+        with self._lock:
+            self.status = "running"
+            self.started_at = time.time()
+            self.total_stages = total_stages
+            self.stages = []
+
+    def record(self, stage: Dict[str, Any]) -> None:
+        with self._lock:
+            self.stages.append(stage)
+
+    def finish(self, status: str = "done") -> None:
+        with self._lock:
+            self.status = status
+            self.finished_at = time.time()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            elapsed = None
+            if self.started_at is not None:
+                elapsed = round(((self.finished_at or time.time()) - self.started_at) * 1000, 2)
+            return {
+                "ready": self.ready,
+                "status": self.status,
+                "completed_stages": len(self.stages),
+                "total_stages": self.total_stages,
+                "elapsed_ms": elapsed,
+                "errors": sum(len(s.get("errors") or {}) for s in self.stages),
+                "stages": [dict(s) for s in self.stages],
+            }
+
+
+_state = WarmupState()
+_thread: Optional[threading.Thread] = None
+
+
+def get_warmup_state() -> WarmupState:
+    return _state
+
+
+# ---------------- stages ----------------
+
+def _load_workbook() -> Dict[str, Any]:
+    from .registry import get_registry
+    ds = get_registry().current()
+    return {"version": ds.version, "sheets": len(ds.sheets)}
+
+
+def _select_sheets() -> Dict[str, Any]:
+    from .registry import current_dataset
+    ds = current_dataset()
+    # Touches the mapped frames, which parses them when the workbook is lazy
+    frames = ds.frames()
+    return {
+        "selection": dict(ds.selection),
+        "rows": {k: (int(len(df)) if df is not None else 0) for k, df in frames.items()},
+    }
+
+
+def _endpoint_calls(group: str) -> List[Tuple[str, Callable[[], Awaitable[Any]]]]:
+    # Imported lazily: routers import services, not the other way round
+    from ..routers import analytics_general as general
+    from ..routers import analytics_advanced as advanced
+    from ..routers import data_health
+
+    if group == "filter_options":
+        return [
+            ("/analytics/filter-options?dataset=incident", lambda: general.get_filter_options(dataset="incident")),
+            ("/analytics/filter-options?dataset=hazard", lambda: general.get_filter_options(dataset="hazard")),
+            ("/analytics/filter-options/combined", lambda: general.get_combined_filter_options()),
+        ]
+    if group == "kpis":
+        return [
+            ("/analytics/advanced/kpis/summary", lambda: advanced.kpis_summary()),
+            ("/analytics/advanced/site-safety-index", lambda: advanced.site_safety_index()),
+            ("/data-health/counts/all", lambda: data_health.get_all_counts()),
+        ]
+    if group == "charts":
+        return [
+            ("/analytics/hse-scorecard", lambda: general.hse_scorecard()),
+            ("/analytics/data/incident-trend?dataset=incident", lambda: general.data_incident_trend(dataset="incident")),
+            ("/analytics/data/incident-trend?dataset=hazard", lambda: general.data_incident_trend(dataset="hazard")),
+            ("/analytics/data/incident-trend-detailed?dataset=incident", lambda: general.data_incident_trend_detailed(dataset="incident")),
+            ("/analytics/data/incident-trend-detailed?dataset=hazard", lambda: general.data_incident_trend_detailed(dataset="hazard")),
+            ("/analytics/advanced/heinrich-pyramid", lambda: advanced.heinrich_safety_pyramid()),
+            ("/analytics/advanced/heinrich-pyramid-breakdown", lambda: advanced.heinrich_pyramid_breakdown()),
+            ("/analytics/advanced/injury-risk-by-department", lambda: advanced.injury_risk_by_department()),
+            ("/analytics/advanced/actual-risk-score", lambda: advanced.actual_risk_score()),
+            ("/analytics/advanced/potential-risk-score", lambda: advanced.potential_risk_score()),
+        ]
+    return []
+
+
+async def _run_endpoints(group: str) -> Dict[str, Any]:
+    timings: Dict[str, float] = {}
+    errors: Dict[str, str] = {}
+    for path, call in _endpoint_calls(group):
+        t0 = time.perf_counter()
+        try:
+            await call()
+        except Exception as e:
+            errors[path] = str(e)
+        timings[path] = round((time.perf_counter() - t0) * 1000, 2)
+    return {"endpoints": timings, "errors": errors}
+
+
+_STAGES: List[Tuple[str, Callable[[], Any]]] = [
+    ("workbook", _load_workbook),
+    ("sheet_selection", _select_sheets),
+    ("filter_options", lambda: _run_endpoints("filter_options")),
+    ("kpis", lambda: _run_endpoints("kpis")),
+    ("charts", lambda: _run_endpoints("charts")),
+]
+
+
+async def run_warmup(state: Optional[WarmupState] = None) -> Dict[str, Any]:
+    """Run every stage in order, recording timings and errors on ``state``."""
+    state = state or _state
+    state.begin(len(_STAGES))
+    for name, stage in _STAGES:
+        t0 = time.perf_counter()
+        entry: Dict[str, Any] = {"stage": name}
+        try:
+            result = stage()
+            if asyncio.iscoroutine(result):
+                result = await result
+            if isinstance(result, dict):
+                entry.update(result)
+        except Exception as e:
+            entry["errors"] = {name: str(e)}
+            print(f"⚠️  Warm-up stage {name} failed: {e}")
+        entry["elapsed_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+        state.record(entry)
+    state.finish()
+    snap = state.snapshot()
+    print(f"🔥 Warm-up finished in {snap['elapsed_ms']} ms ({snap['errors']} error(s))")
+    return snap
+
+
+def start_warmup() -> bool:
+    """Start the warm-up in a background thread. Returns False if disabled or already started."""
+    global _thread
+    if not warmup_enabled():
+        _state.finish("skipped")
+        return False
+    if _thread is not None:
+        return False
+    # Own event loop in its own thread: the stages are CPU-bound pandas work
+    # and must not block the server loop that answers /ready and /health
+    _thread = threading.Thread(target=lambda: asyncio.run(run_warmup()), name="startup-warmup", daemon=True)
+    _thread.start()
+    return True
+
+
+def readiness() -> Dict[str, Any]:
+    return _state.snapshot()
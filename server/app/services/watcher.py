@@ -0,0 +1,114 @@
+"""
+Background watcher for the default workbook.
+
+Polls ``DEFAULT_EXCEL_PATH`` with ``os.stat`` (portable, no extra dependency)
+and asks the dataset registry for a background reload once a change has been
+stable for one poll interval, so files that are still being copied are not
+parsed half-written.
+
+Environment:
+    WORKBOOK_WATCH: set to 0 to disable (default on)
+    WORKBOOK_WATCH_INTERVAL: poll interval in seconds (default 2)
+"""
+from __future__ import annotations
+
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from .excel import DEFAULT_EXCEL_PATH
+from .registry import get_registry
+
+
+def watch_enabled() -> bool:
+    return os.getenv("WORKBOOK_WATCH", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def _watch_interval() -> float:
+    try:
+        return max(0.2, float(os.getenv("WORKBOOK_WATCH_INTERVAL", "2")))
+    except ValueError:
+        return 2.0
+
+
+def _stat_key(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = path.stat()
+        return int(st.st_size), int(st.st_mtime_ns)
+    except OSError:
+        return None
+
+
+class WorkbookWatcher:
+    """Polling watcher that triggers ``DatasetRegistry.reload_in_background``."""
+
+    def __init__(self, path: Path, interval: float):
+        self.path = Path(path)
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._seen = _stat_key(self.path)
+        self.changes_detected = 0
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="workbook-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 2)
+
+    def _run(self) -> None:
+        candidate: Optional[Tuple[int, int]] = None
+        while not self._stop.wait(self.interval):
+            key = _stat_key(self.path)
+            if key is None or key == self._seen:
+                candidate = None
+                continue
+            if key != candidate:
+                # Changed since last poll; wait until it settles
+                candidate = key
+                continue
+            self._seen = key
+            candidate = None
+            self.changes_detected += 1
+            print(f"🔄 {self.path.name} changed on disk; reloading in background")
+            get_registry().reload_in_background()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "path": str(self.path),
+            "running": self._thread is not None and self._thread.is_alive(),
+            "interval_seconds": self.interval,
+            "changes_detected": self.changes_detected,
+        }
+
+
+_watcher: Optional[WorkbookWatcher] = None
+
+
+def start_workbook_watcher() -> Optional[WorkbookWatcher]:
+    """Start the default-workbook watcher (idempotent). Returns None when disabled."""
+    global _watcher
+    if not watch_enabled():
+        return None
+    if _watcher is None:
+        _watcher = WorkbookWatcher(DEFAULT_EXCEL_PATH, _watch_interval())
+    _watcher.start()
+    return _watcher
+
+
+def stop_workbook_watcher() -> None:
+    if _watcher is not None:
+        _watcher.stop()
+
+
+def watcher_status() -> Dict[str, Any]:
+    if _watcher is None:
+        return {"running": False, "enabled": watch_enabled()}
+    return {"enabled": True, **_watcher.status()}
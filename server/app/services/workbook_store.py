@@ -0,0 +1,284 @@
+"""
+Session store for uploaded workbooks.
+
+``POST /workbooks/upload`` keeps the parsed sheets here and returns a
+``workbookId``. Requests that pass ``?workbook_id=<id>`` (HTTP or WebSocket)
+are served from that workbook: ``WorkbookContextMiddleware`` pins its
+``Dataset`` for the request, so every ``get_*_df`` / ``load_default_sheets``
+call underneath sees the upload instead of the default file.
+
+Parsed frames are kept under a total memory budget with size-aware LRU
+eviction. Evicted workbooks are spilled to the snapshot format on disk (when
+enabled) and transparently re-read on their next use. Each process spills
+into its own directory and removes it at exit.
+
+Environment:
+    WORKBOOK_STORE_BUDGET_MB: in-memory budget (default 512)
+    WORKBOOK_STORE_SPILL: set to 0 to drop evicted workbooks instead of spilling
+    WORKBOOK_STORE_MAX_SESSIONS: cap on stored workbooks, spilled ones included (default 50)
+"""
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs
+
+import pandas as pd
+from starlette.concurrency import run_in_threadpool
+
+from .excel import DEFAULT_EXCEL_PATH
+from .registry import Dataset, pin_request_dataset, unpin_request_dataset
+from .snapshot import read_frames, write_frames
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def frame_bytes(df: pd.DataFrame) -> int:
+    try:
+        return int(df.memory_usage(deep=True, index=True).sum())
+    except Exception:
+        return 0
+
+
+class _Entry:
+    def __init__(self, workbook_id: str, file_name: str, sheets: Dict[str, pd.DataFrame]):
+        self.workbook_id = workbook_id
+        self.file_name = file_name
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.dataset: Optional[Dataset] = Dataset.from_sheets(sheets, workbook_id)
+        self.bytes = sum(frame_bytes(df) for df in sheets.values())
+        self.sheet_names = list(sheets.keys())
+        self.spill_dir: Optional[Path] = None
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "workbookId": self.workbook_id,
+            "fileName": self.file_name,
+            "sheets": self.sheet_names,
+            "bytes": self.bytes,
+            "inMemory": self.dataset is not None,
+            "spilled": self.spill_dir is not None,
+            "createdAt": self.created_at,
+            "lastUsed": self.last_used,
+        }
+
+
+class WorkbookStore:
+    """Size-aware LRU store of parsed workbooks keyed by workbook id."""
+
+    def __init__(self, budget_bytes: int, spill_root: Optional[Path] = None, max_sessions: int = 50):
+        self.budget_bytes = budget_bytes
+        self.spill_root = spill_root
+        self.max_sessions = max_sessions
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._spills = 0
+        self._spill_loads = 0
+
+    # ---------------- public API ----------------
+
+    def put(self, sheets: Dict[str, pd.DataFrame], file_name: str = "uploaded.xlsx") -> str:
+        workbook_id = uuid.uuid4().hex[:16]
+        entry = _Entry(workbook_id, file_name, sheets)
+        with self._lock:
+            self._entries[workbook_id] = entry
+            self._enforce_budget(keep=workbook_id)
+            self._enforce_session_cap()
+        return workbook_id
+
+    def contains(self, workbook_id: str) -> bool:
+        with self._lock:
+            return workbook_id in self._entries
+
+    def dataset(self, workbook_id: str) -> Optional[Dataset]:
+        """Return the workbook's dataset, re-reading it from disk if it was spilled."""
+        with self._lock:
+            entry = self._entries.get(workbook_id)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(workbook_id)
+            entry.last_used = time.time()
+            if entry.dataset is not None:
+                self._hits += 1
+                return entry.dataset
+            self._misses += 1
+            sheets = self._load_spilled(entry)
+            if sheets is None:
+                self._entries.pop(workbook_id, None)
+                return None
+            entry.dataset = Dataset.from_sheets(sheets, workbook_id)
+            entry.bytes = sum(frame_bytes(df) for df in sheets.values())
+            self._spill_loads += 1
+            self._enforce_budget(keep=workbook_id)
+            return entry.dataset
+
+    def remove(self, workbook_id: str) -> bool:
+        with self._lock:
+            entry = self._entries.pop(workbook_id, None)
+        if entry is None:
+            return False
+        self._drop_spill(entry)
+        return True
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [e.describe() for e in reversed(self._entries.values())]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / total * 100, 2) if total else 0,
+                "evictions": self._evictions,
+                "spills": self._spills,
+                "spill_loads": self._spill_loads,
+                "workbooks": len(self._entries),
+                "in_memory": sum(1 for e in self._entries.values() if e.dataset is not None),
+                "bytes_in_memory": self._resident_bytes(),
+                "budget_bytes": self.budget_bytes,
+                "spill_enabled": self.spill_root is not None,
+            }
+
+    # ---------------- eviction ----------------
+
+    def _resident_bytes(self) -> int:
+        return sum(e.bytes for e in self._entries.values() if e.dataset is not None)
+
+    def _enforce_budget(self, keep: str) -> None:
+        # Oldest first; the workbook being stored/loaded stays resident even if
+        # it alone exceeds the budget
+        for workbook_id in list(self._entries.keys()):
+            if self._resident_bytes() <= self.budget_bytes:
+                return
+            entry = self._entries[workbook_id]
+            if workbook_id == keep or entry.dataset is None:
+                continue
+            self._evict(entry)
+
+    def _enforce_session_cap(self) -> None:
+        while len(self._entries) > self.max_sessions:
+            _, entry = self._entries.popitem(last=False)
+            self._drop_spill(entry)
+            self._evictions += 1
+
+    def _evict(self, entry: _Entry) -> None:
+        self._evictions += 1
+        if self.spill_root is not None and entry.spill_dir is None:
+            try:
+                spill_dir = self.spill_root / entry.workbook_id
+                spill_dir.mkdir(parents=True, exist_ok=True)
+                manifest = write_frames(spill_dir, entry.dataset.sheets)
+                with open(spill_dir / "manifest.json", "w", encoding="utf-8") as f:
+                    json.dump({"sheets": manifest}, f, default=str)
+                entry.spill_dir = spill_dir
+                self._spills += 1
+            except Exception as e:
+                print(f"⚠️  Failed to spill workbook {entry.workbook_id}: {e}")
+        if entry.spill_dir is None:
+            # Nothing to reload from: forget the workbook entirely
+            self._entries.pop(entry.workbook_id, None)
+        entry.dataset = None
+
+    def _load_spilled(self, entry: _Entry) -> Optional[Dict[str, pd.DataFrame]]:
+        if entry.spill_dir is None:
+            return None
+        try:
+            with open(entry.spill_dir / "manifest.json", "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            return read_frames(entry.spill_dir, manifest["sheets"])
+        except Exception as e:
+            print(f"⚠️  Failed to reload spilled workbook {entry.workbook_id}: {e}")
+            return None
+
+    def _drop_spill(self, entry: _Entry) -> None:
+        if entry.spill_dir is not None:
+            shutil.rmtree(entry.spill_dir, ignore_errors=True)
+            entry.spill_dir = None
+
+
+def _spill_root() -> Optional[Path]:
+    if os.getenv("WORKBOOK_STORE_SPILL", "1").strip().lower() in ("0", "false", "no", "off"):
+        return None
+    # One directory per process: workers share ``_sessions`` but not their
+    # session ids, and spilled sessions do not outlive the process that made them
+    root = DEFAULT_EXCEL_PATH.parent / ".snapshots" / "_sessions" / f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    atexit.register(shutil.rmtree, root, ignore_errors=True)
+    return root
+
+
+_store = WorkbookStore(
+    budget_bytes=_env_int("WORKBOOK_STORE_BUDGET_MB", 512) * 1024 * 1024,
+    spill_root=_spill_root(),
+    max_sessions=_env_int("WORKBOOK_STORE_MAX_SESSIONS", 50),
+)
+
+
+def get_workbook_store() -> WorkbookStore:
+    return _store
+
+
+# ---------------- request scoping ----------------
+
+class WorkbookContextMiddleware:
+    """Pure ASGI middleware that pins ``?workbook_id=`` for HTTP and WebSocket scopes.
+
+    Unknown ids get a 404 (HTTP) or a 4404 close (WebSocket) instead of
+    silently falling back to the default workbook.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        workbook_id = (query.get("workbook_id") or [""])[0].strip()
+        if not workbook_id:
+            await self.app(scope, receive, send)
+            return
+
+        # May re-read a spilled workbook from disk, so keep it off the event loop
+        ds = await run_in_threadpool(get_workbook_store().dataset, workbook_id)
+        if ds is None:
+            await self._reject(scope, send, workbook_id)
+            return
+        token = pin_request_dataset(ds)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            unpin_request_dataset(token)
+
+    @staticmethod
+    async def _reject(scope, send, workbook_id: str) -> None:
+        if scope["type"] == "websocket":
+            await send({"type": "websocket.close", "code": 4404})
+            return
+        body = json.dumps({"detail": f"Unknown or expired workbook_id '{workbook_id}'"}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 404,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
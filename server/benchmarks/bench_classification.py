@@ -0,0 +1,102 @@
+"""Micro-benchmark: per-row severity / Heinrich classification vs the vectorized module.
+
+Classifies a synthetic incident sheet with the previous row-by-row functions
+and with ``app.services.classification``, checks the results are identical
+and reports both timings.
+
+Usage (from server/):
+    python benchmarks/bench_classification.py [rows]
+"""
+import sys
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import pandas as pd
+
+from app.services.classification import classify_severity, heinrich_incident_levels
+from app.services.registry import Dataset, next_dataset_version, pin_request_dataset, unpin_request_dataset
+
+
+def legacy_severity(severity_score, severity_text=None):
+    """The previous per-row site-safety-index classifier, kept for comparison."""
+    if severity_text and pd.notna(severity_text):
+        text = str(severity_text).lower().strip()
+        if any(k in text for k in ["critical", "fatal", "severe", "c4", "c3"]):
+            return "Serious Injury/Fatality"
+        if any(k in text for k in ["serious", "high", "c2", "moderate"]):
+            return "Minor Injury"
+        if any(k in text for k in ["minor", "low", "c1", "first aid", "near miss"]):
+            return "First Aid/Near Miss"
+    try:
+        score = float(severity_score)
+        if score >= 3:
+            return "Serious Injury/Fatality"
+        elif score >= 2:
+            return "Minor Injury"
+        else:
+            return "First Aid/Near Miss"
+    except (ValueError, TypeError):
+        pass
+    return "First Aid/Near Miss"
+
+
+def legacy_heinrich(row):
+    """The previous per-row pyramid classifier of the heinrich-pyramid endpoint."""
+    actual = str(row.get('Actual Consequence (Incident)', '')).strip()
+    worst = str(row.get('Worst Case Consequence (Incident)', '')).strip()
+    inc_type = str(row.get('Incident Type(s)', '')).lower().strip()
+    if inc_type == 'injury' and actual in ['C4 - Major', 'C5 - Catastrophic']:
+        return 1
+    elif inc_type == 'injury' and actual == 'C3 - Severe':
+        return 2
+    elif inc_type == 'injury' and actual in ['C1 - Minor', 'C2 - Serious']:
+        return 3
+    elif actual.startswith('C0') and any(x in worst for x in ['C3', 'C4', 'C5']):
+        return 4
+    return None
+
+
+def make_frame(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    consequences = ["C0 - No Ill Effect", "C1 - Minor", "C2 - Serious", "C3 - Severe",
+                    "C4 - Major", "C5 - Catastrophic", None]
+    types = ["Injury", "injury ", "Near Miss", "Property Damage", "Fire", None]
+    return pd.DataFrame({
+        "severity_score": np.where(rng.random(rows) > 0.1, rng.integers(0, 6, rows), np.nan),
+        "Actual Consequence (Incident)": rng.choice(consequences, rows),
+        "Worst Case Consequence (Incident)": rng.choice(consequences, rows),
+        "Incident Type(s)": rng.choice(types, rows),
+    })
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, (time.perf_counter() - t0) * 1000
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    df = make_frame(rows)
+    score, text = "severity_score", "Actual Consequence (Incident)"
+
+    legacy, legacy_ms = timed(lambda: [legacy_severity(r[score], r[text]) for _, r in df.iterrows()])
+    levels, vector_ms = timed(lambda: classify_severity(
+        pd.to_numeric(df[score], errors="coerce").to_numpy(dtype=float), df[text], len(df)))
+    assert list(levels.astype(str)) == legacy
+    print(f"severity  rows={rows}  iterrows {legacy_ms:9.1f} ms  vectorized {vector_ms:7.1f} ms")
+
+    # A pinned dataset that does not own ``df``: classified directly, not cached
+    token = pin_request_dataset(Dataset(next_dataset_version(), {}, {}))
+    try:
+        legacy, legacy_ms = timed(lambda: df.apply(legacy_heinrich, axis=1))
+        levels, vector_ms = timed(lambda: heinrich_incident_levels(df)["Heinrich_Level"])
+    finally:
+        unpin_request_dataset(token)
+    assert legacy.fillna(0).astype(int).tolist() == levels.cat.codes.add(1).tolist()
+    print(f"heinrich  rows={rows}  apply    {legacy_ms:9.1f} ms  vectorized {vector_ms:7.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Micro-benchmark: legacy copy-and-scan filtering vs the per-dataset filter index.
+
+Latency is reported for 0..N active filters; with the index it should stay
+roughly flat as filters are added.
+
+Usage (from server/):
+    python benchmarks/bench_filter_index.py [rows]
+"""
+import sys
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import pandas as pd
+
+from app.services.filters import apply_analytics_filters
+from app.services.registry import Dataset, next_dataset_version, pin_request_dataset, unpin_request_dataset
+
+
+def legacy_filter(df, start_date=None, end_date=None, departments=None, locations=None,
+                  sublocations=None, statuses=None, min_severity=None, max_severity=None,
+                  incident_types=None, **_):
+    """The pre-index implementation (the filters exercised here), kept for comparison."""
+    filtered = df.copy()
+    if start_date or end_date:
+        filtered['__temp_date'] = pd.to_datetime(filtered['occurrence_date'], errors='coerce')
+        if start_date:
+            filtered = filtered[filtered['__temp_date'] >= pd.to_datetime(start_date)]
+        if end_date:
+            filtered = filtered[filtered['__temp_date'] <= pd.to_datetime(end_date)]
+        filtered = filtered.drop(columns=['__temp_date'])
+    for values, col in ((departments, 'department'), (locations, 'location'),
+                        (sublocations, 'sublocation'), (statuses, 'status')):
+        if values:
+            wanted = {v.lower() for v in values}
+            filtered = filtered[filtered[col].astype(str).str.lower().isin(wanted)]
+    if min_severity is not None or max_severity is not None:
+        sev = pd.to_numeric(filtered['severity_score'], errors='coerce')
+        if min_severity is not None:
+            filtered = filtered[sev >= min_severity]
+        if max_severity is not None:
+            filtered = filtered[sev <= max_severity]
+    if incident_types:
+        mask = filtered['incident_type(s)'].astype(str).apply(
+            lambda x: any(it.lower() in x.lower() for it in incident_types)
+        )
+        filtered = filtered[mask]
+    return filtered
+
+
+def make_frame(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    departments = [f"Department {i}" for i in range(40)]
+    locations = [f"Plant {i}" for i in range(25)]
+    sublocations = [f"Area {i}" for i in range(300)]
+    types = ["Slip", "Trip", "Fall", "Fire", "Chemical Spill", "Vehicle", "Electrical", "Near Miss"]
+    stamps = pd.Timestamp("2019-01-01") + pd.to_timedelta(rng.integers(0, 6 * 365, rows), unit="D")
+    return pd.DataFrame({
+        "incident_id": np.arange(rows),
+        "occurrence_date": stamps,
+        "department": rng.choice(departments, rows),
+        "location": rng.choice(locations, rows),
+        "sublocation": rng.choice(sublocations, rows),
+        "status": rng.choice(["Open", "Closed", "In Progress", None], rows),
+        "severity_score": rng.integers(0, 6, rows).astype(float),
+        "incident_type(s)": [", ".join(t) for t in zip(rng.choice(types, rows), rng.choice(types, rows))],
+        "description": ["lorem ipsum dolor sit amet"] * rows,
+    })
+
+
+FILTER_STEPS = [
+    ("start_date", "2020-01-01"),
+    ("end_date", "2023-12-31"),
+    ("departments", [f"department {i}" for i in range(0, 40, 2)]),
+    ("locations", [f"Plant {i}" for i in range(10)]),
+    ("statuses", ["open", "in progress"]),
+    ("min_severity", 1),
+    ("sublocations", [f"Area {i}" for i in range(150)]),
+    ("incident_types", ["fire", "spill"]),
+]
+
+
+def best_of(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    df = make_frame(rows)
+    token = pin_request_dataset(Dataset(next_dataset_version(), {"Incidents": df}, {"incident": "Incidents"}))
+    try:
+        # First call builds the column encodings for this dataset version
+        t0 = time.perf_counter()
+        apply_analytics_filters(df, **dict(FILTER_STEPS))
+        build_ms = (time.perf_counter() - t0) * 1000
+
+        print(f"rows={rows}  (index build on first call: {build_ms:.1f} ms)")
+        print(f"{'filters':>8} {'legacy ms':>10} {'indexed ms':>11} {'rows out':>9}")
+        for n in range(len(FILTER_STEPS) + 1):
+            params = dict(FILTER_STEPS[:n])
+            legacy = legacy_filter(df, **params)
+            indexed = apply_analytics_filters(df, **params)
+            assert legacy.index.equals(indexed.index), n
+            legacy_ms = best_of(lambda: legacy_filter(df, **params))
+            indexed_ms = best_of(lambda: apply_analytics_filters(df, **params))
+            print(f"{n:>8} {legacy_ms:>10.1f} {indexed_ms:>11.1f} {len(indexed):>9}")
+    finally:
+        unpin_request_dataset(token)
+
+
+if __name__ == "__main__":
+    main()
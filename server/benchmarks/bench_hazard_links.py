@@ -0,0 +1,101 @@
+"""Micro-benchmark: per-hazard scan vs interval join for hazard-to-incident links.
+
+The previous ``create_hazard_incident_links`` re-filtered every incident for
+each hazard (O(hazards x incidents)); the join sorts incidents once per
+(location, department) and binary-searches each hazard's window. The scan
+is run on a slice of the hazards (it is far too slow for all of them) and
+both results are compared on that slice; the join is then timed at full size.
+
+Usage (from server/):
+    python benchmarks/bench_hazard_links.py [hazards] [incidents] [scan_hazards]
+"""
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import pandas as pd
+
+from app.analytics.hazard_incident import HazardIncidentAnalyzer
+
+
+def legacy_links(a: HazardIncidentAnalyzer, window_days: int = 30) -> pd.DataFrame:
+    """The previous row-by-row implementation, kept for comparison."""
+    links = []
+    inc = a.incident_df[[a.inc_id, a.inc_date, a.inc_loc, a.inc_dept, a.inc_sev, a.inc_type]].copy()
+    inc = inc.dropna(subset=[a.inc_date])
+    for _, haz in a.hazard_df.iterrows():
+        hz_dt, hz_loc, hz_dept = haz.get(a.haz_date), haz.get(a.haz_loc), haz.get(a.haz_dept)
+        if pd.isna(hz_dt) or pd.isna(hz_loc) or pd.isna(hz_dept):
+            continue
+        candid = inc[
+            (inc[a.inc_loc] == hz_loc) & (inc[a.inc_dept] == hz_dept)
+            & (inc[a.inc_date] >= hz_dt) & (inc[a.inc_date] <= hz_dt + timedelta(days=window_days))
+        ]
+        for _, inc_row in candid.iterrows():
+            links.append({
+                'hazard_id': haz.get(a.haz_id),
+                'incident_id': inc_row.get(a.inc_id),
+                'hazard_date': hz_dt,
+                'incident_date': inc_row.get(a.inc_date),
+                'days_to_incident': (inc_row.get(a.inc_date) - hz_dt).days,
+                'location': hz_loc,
+                'department': hz_dept,
+                'hazard_severity': haz.get(a.haz_sev, pd.NA),
+                'incident_severity': inc_row.get(a.inc_sev, pd.NA),
+                'hazard_type': haz.get(a.haz_type, 'Unknown'),
+                'incident_type': inc_row.get(a.inc_type, 'Unknown'),
+            })
+    return pd.DataFrame(links)
+
+
+def make_frames(hazards: int, incidents: int):
+    rng = np.random.default_rng(0)
+    locations = [f"Plant {i}" for i in range(12)]
+    departments = [f"Department {i}" for i in range(25)]
+
+    def frame(rows, id_prefix, id_col, type_col, types):
+        stamps = pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 4 * 365 * 24, rows), unit="h")
+        return pd.DataFrame({
+            id_col: [f"{id_prefix}-{i}" for i in range(rows)],
+            "occurrence_date": stamps.where(rng.random(rows) > 0.02),
+            "location": np.where(rng.random(rows) > 0.01, rng.choice(locations, rows), None),
+            "department": rng.choice(departments, rows),
+            "severity_score": rng.integers(0, 6, rows).astype(float),
+            type_col: rng.choice(types, rows),
+        })
+
+    haz = frame(hazards, "HZ", "hazard_id", "violation_type_hazard_id", ["Unsafe Act", "Unsafe Condition", "PPE"])
+    inc = frame(incidents, "IN", "incident_id", "incident_type", ["Injury", "Near Miss", "Fire", "Spill"])
+    return inc, haz
+
+
+def main() -> None:
+    hazards = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    incidents = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+    scan_hazards = int(sys.argv[3]) if len(sys.argv) > 3 else 2_000
+    inc, haz = make_frames(hazards, incidents)
+
+    # Equality (and the scan's cost) on a slice of the hazards
+    small = HazardIncidentAnalyzer(inc, haz.iloc[:scan_hazards])
+    t0 = time.perf_counter()
+    expected = legacy_links(small)
+    scan_ms = (time.perf_counter() - t0) * 1000
+    pd.testing.assert_frame_equal(small.links_df, expected)
+    print(f"{scan_hazards} hazards x {incidents} incidents: scan {scan_ms:.0f} ms, "
+          f"~{scan_ms * hazards / scan_hazards / 1000:.0f} s extrapolated to {hazards} hazards; "
+          f"{len(expected)} links identical")
+
+    full = HazardIncidentAnalyzer(inc, haz)
+    for window in (7, 30, 90):
+        t0 = time.perf_counter()
+        full.create_hazard_incident_links(window_days=window)
+        join_ms = (time.perf_counter() - t0) * 1000
+        print(f"{hazards} hazards x {incidents} incidents, {window:>2}-day window: "
+              f"join {join_ms:8.1f} ms, {len(full.links_df)} links")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Micro-benchmark: raw filter-and-aggregate vs the rollup cube.
+
+Times the incident-trend, department/month heatmap and root-cause pareto
+aggregations both ways for a few filter sets and checks that the answers
+agree (ranked payloads may order tied labels differently). The pareto is
+timed against its own type x root-cause cube.
+
+Usage (from server/):
+    python benchmarks/bench_rollup.py [rows]
+"""
+import sys
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import pandas as pd
+
+from app.services import rollup
+from app.services.filters import apply_analytics_filters
+from app.services.registry import Dataset, next_dataset_version, pin_request_dataset, unpin_request_dataset
+
+
+def raw_trend(df, **filters):
+    df = apply_analytics_filters(df, **filters)
+    counts = pd.to_datetime(df["occurrence_date"], errors="coerce").dt.date.astype(str).value_counts().sort_index()
+    return {"labels": counts.index.tolist(), "series": [{"name": "Count", "data": counts.values.astype(int).tolist()}]}
+
+
+def raw_heatmap(df, **filters):
+    df = apply_analytics_filters(df, **filters)
+    months = pd.to_datetime(df["occurrence_date"], errors="coerce").dt.to_period("M").astype(str)
+    cp = pd.DataFrame({"department": df["department"].astype(str), "month": months,
+                       "value": pd.to_numeric(df["risk_score"], errors="coerce")})
+    pivot = cp.pivot_table(values="value", index="department", columns="month", aggfunc="mean")
+    return {"x": [str(c) for c in pivot.columns], "y": [str(i) for i in pivot.index],
+            "z": pivot.fillna(0).to_numpy().tolist(), "metric": "avg"}
+
+
+def raw_pareto(df, top_n=15, **filters):
+    df = apply_analytics_filters(df, **filters)
+    series = df["root_cause"].dropna().astype(str).str.split(";").explode().str.strip()
+    series = series[series != ""]
+    series = series[~series.str.contains("nan|null|none|n/a|not applicable", case=False, na=False, regex=True)]
+    counts = series.value_counts().head(top_n)
+    total = counts.sum() if counts.sum() > 0 else 1
+    return {"labels": counts.index.tolist(), "bars": counts.values.astype(int).tolist(),
+            "cum_pct": (counts.cumsum() / total * 100).round(2).values.tolist(),
+            "incident_type": "All", "total_count": int(counts.sum())}
+
+
+def make_frame(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    departments = [f"Department {i}" for i in range(30)]
+    locations = [f"Plant {i}" for i in range(20)]
+    causes = ["Procedure not followed", "Inadequate training", "Equipment failure", "Housekeeping",
+              "Poor communication", "N/A", "Fatigue", "Design flaw"]
+    types = ["Slip", "Trip", "Fall", "Fire", "Chemical Spill", "Vehicle", "Electrical", "Near Miss"]
+    stamps = pd.Timestamp("2019-01-01") + pd.to_timedelta(rng.integers(0, 6 * 365, rows), unit="D")
+    return pd.DataFrame({
+        "occurrence_date": stamps,
+        "department": rng.choice(departments, rows),
+        "location": rng.choice(locations, rows),
+        "severity_score": rng.integers(0, 6, rows).astype(float),
+        "risk_score": np.where(rng.random(rows) > 0.1, rng.integers(1, 6, rows), np.nan),
+        "incident_type(s)": [", ".join(t) for t in zip(rng.choice(types, rows), rng.choice(types, rows))],
+        "root_cause": [f"{a}; {b}" for a, b in zip(rng.choice(causes, rows), rng.choice(causes, rows))],
+        "total cost": rng.gamma(2.0, 500.0, rows).round(2),
+    })
+
+
+FILTER_SETS = [
+    {},
+    {"start_date": "2021-01-01", "end_date": "2022-12-31"},
+    {"departments": [f"Department {i}" for i in range(0, 30, 3)], "min_severity": 3},
+    {"locations": ["Plant 1", "Plant 2"], "min_severity": 2, "max_severity": 4, "start_date": "2020-06-01"},
+]
+
+
+def best_of(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    df = make_frame(rows)
+    token = pin_request_dataset(Dataset(next_dataset_version(), {"Incidents": df}, {"incident": "Incidents"}))
+    try:
+        cube = rollup.get_rollup_cube(df, type_col="incident_type(s)", cost_col="total cost")
+        causes = rollup.get_rollup_cube(df, type_col="incident_type(s)", root_cause_col="root_cause")
+        for label, c in (("shared", cube), ("pareto", causes)):
+            print(f"{label} cube: rows={rows}  cells={c.n_cells}  rows/cell={c.stats()['rows_per_cell']}"
+                  f"  (build: {c.build_ms:.1f} ms)")
+        charts = [
+            ("trend", cube, raw_trend, rollup.trend_counts, rollup.payloads_match, {"date": "occurrence_date"}),
+            ("heatmap", cube, raw_heatmap, lambda c, m: rollup.department_month(c, m, "risk"), rollup.payloads_match,
+             {"date": "occurrence_date", "department": "department", "risk": "risk_score"}),
+            ("pareto", causes, raw_pareto, lambda c, m: rollup.root_cause_pareto(c, m, None, 15),
+             rollup.ranked_match(lambda p: (p["labels"], p["bars"])), {"root_cause": "root_cause"}),
+        ]
+        print(f"{'chart':>8} {'filters':>8} {'raw ms':>8} {'cube ms':>8}")
+        for name, cube, raw, from_cube, compare, columns in charts:
+            assert cube.carries(**columns), name
+            for filters in FILTER_SETS:
+                mask = cube.select(**filters)
+                assert mask is not None, (name, filters)
+                assert compare(from_cube(cube, mask), raw(df, **filters)), (name, filters)
+                raw_ms = best_of(lambda: raw(df, **filters))
+                cube_ms = best_of(lambda: from_cube(cube, cube.select(**filters)))
+                print(f"{name:>8} {len(filters):>8} {raw_ms:>8.1f} {cube_ms:>8.2f}")
+    finally:
+        unpin_request_dataset(token)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Micro-benchmark: per-day loop vs single-pass breakdown for incident-trend-detailed.
+
+The legacy loop scans every row once per distinct day (O(days x rows)); the
+grouped version sorts once, so its time should grow linearly with the row
+count. Results are compared for equality on every size. ``value_counts``
+orders tied counts arbitrarily, so the legacy top lists are re-ranked with
+the documented tie rule (count descending, then label) before comparing.
+
+Usage (from server/):
+    python benchmarks/bench_trend_details.py [max_rows]
+"""
+import sys
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import pandas as pd
+
+from app.services.trend_details import trend_details
+
+
+def top(counts: pd.Series, k: int = 5):
+    """Top ``k`` of a ``value_counts`` result, equal counts ordered by label."""
+    return sorted(((str(n), int(c)) for n, c in counts.items()), key=lambda nc: (-nc[1], nc[0]))[:k]
+
+
+def legacy_details(df, date_col, dept_col, type_col, title_col, severity_col, risk_col):
+    """The previous per-day implementation (as plain dicts), kept for comparison."""
+    df_copy = df.copy()
+    df_copy['_day'] = pd.to_datetime(df_copy[date_col], errors='coerce').dt.date.astype(str)
+    df_copy['_date'] = pd.to_datetime(df_copy[date_col], errors='coerce')
+    counts = df_copy['_day'].value_counts().sort_index()
+    details = []
+    for day_label in counts.index:
+        day_df = df_copy[df_copy['_day'] == day_label]
+        depts = top(day_df[dept_col].astype(str).value_counts())
+        type_series = day_df[type_col].astype(str).str.split(',').explode().str.strip()
+        types = [(t, c) for t, c in top(type_series.value_counts()) if t.lower() not in ['nan', 'none', '']]
+        stats = []
+        for col in (severity_col, risk_col):
+            v = pd.to_numeric(day_df[col], errors='coerce').dropna()
+            stats.append((float(v.mean()), float(v.max()), float(v.min())) if len(v) else None)
+        recent = []
+        for _, row in day_df.sort_values('_date', ascending=False, kind='stable').head(5).iterrows():
+            sev = pd.to_numeric(row.get(severity_col), errors='coerce')
+            recent.append((str(row.get(title_col))[:100], str(row.get(dept_col)),
+                           row['_date'].strftime('%Y-%m-%d') if pd.notna(row['_date']) else day_label,
+                           float(sev) if pd.notna(sev) else None))
+        details.append((day_label, len(day_df), depts, types, stats[0], stats[1], recent))
+    return counts.index.tolist(), details
+
+
+def as_tuples(details):
+    out = []
+    for d in details:
+        stats = [(s.avg, s.max, s.min) if s is not None else None for s in (d.severity, d.risk)]
+        out.append((d.month, d.total_count,
+                    [(c.name, c.count) for c in d.departments], [(c.name, c.count) for c in d.types],
+                    stats[0], stats[1],
+                    [(r.title, r.department, r.date, r.severity) for r in d.recent_items]))
+    return out
+
+
+def same(a, b) -> bool:
+    """Equal, allowing float rounding in the score averages."""
+    for x, y in zip(a, b):
+        if x[:4] != y[:4] or x[6] != y[6]:
+            return False
+        for s, t in ((x[4], y[4]), (x[5], y[5])):
+            if (s is None) != (t is None) or (s is not None and not np.allclose(s, t)):
+                return False
+    return len(a) == len(b)
+
+
+def make_frame(rows: int, days: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    departments = [f"Department {i}" for i in range(30)]
+    types = ["Slip", "Trip", "Fall", "Fire", "Chemical Spill", "Vehicle", "Electrical", "Near Miss"]
+    stamps = pd.Timestamp("2019-01-01") + pd.to_timedelta(rng.integers(0, days * 24, rows), unit="h")
+    stamps = stamps.where(rng.random(rows) > 0.01)  # a few missing dates
+    return pd.DataFrame({
+        "occurrence_date": stamps,
+        "department": rng.choice(departments, rows),
+        "incident_type(s)": [", ".join(t) for t in zip(rng.choice(types, rows), rng.choice(types, rows))],
+        "title": [f"Observation {i}" for i in range(rows)],
+        "severity_score": rng.integers(0, 6, rows).astype(float),
+        "risk_score": np.where(rng.random(rows) > 0.2, rng.integers(1, 6, rows), np.nan),
+    })
+
+
+def timed(fn) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return (time.perf_counter() - t0) * 1000
+
+
+def main() -> None:
+    max_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    cols = dict(date_col="occurrence_date", dept_col="department", type_col="incident_type(s)",
+                title_col="title", severity_col="severity_score", risk_col="risk_score")
+    print(f"{'rows':>8} {'days':>6} {'legacy ms':>10} {'grouped ms':>11} {'week ms':>8} {'month ms':>9}")
+    rows = 12_500
+    while rows <= max_rows:
+        days = min(rows // 10, 6 * 365)
+        df = make_frame(rows, days)
+        labels, details = None, None
+
+        def run():
+            nonlocal labels, details
+            labels, _, details = trend_details(df, **cols)
+
+        grouped_ms = timed(run)
+        week_ms = timed(lambda: trend_details(df, granularity="week", **cols))
+        month_ms = timed(lambda: trend_details(df, granularity="month", **cols))
+        if rows <= 50_000:  # the legacy loop gets slow quickly
+            legacy_labels, legacy = None, None
+
+            def run_legacy():
+                nonlocal legacy_labels, legacy
+                legacy_labels, legacy = legacy_details(df, **cols)
+
+            legacy_ms = f"{timed(run_legacy):10.1f}"
+            assert legacy_labels == labels and same(legacy, as_tuples(details)), rows
+        else:
+            legacy_ms = f"{'-':>10}"
+        print(f"{rows:>8} {days:>6} {legacy_ms} {grouped_ms:>11.1f} {week_ms:>8.1f} {month_ms:>9.1f}")
+        rows *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Compacted (categorical) sheets answer like the plain object sheets."""
+import asyncio
+import json
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.routers.analytics_advanced import potential_risk_score
+from app.routers.analytics_general import location_risk_treemap
+from app.services.compaction import compact_frame
+from app.services.filters import apply_analytics_filters
+from app.services.registry import Dataset, next_dataset_version, pin_request_dataset, unpin_request_dataset
+from app.services.upsert import merge_rows
+
+
+CONSEQUENCES = ["C0 - No Ill Effect", "C1 - Minor", "C2 - Serious", "C3 - Severe", "C4 - Major", "C5 - Catastrophic"]
+
+
+def make_incidents(rows: int = 400) -> pd.DataFrame:
+    rng = np.random.default_rng(3)
+    location = rng.choice(np.array(["Karachi", "Lahore", "Head Office", np.nan], dtype=object), rows)
+    # Each location has its own sublocation, so most location/sublocation pairs never occur
+    sublocation = pd.Series(location).map({"Karachi": "Plant", "Lahore": "Warehouse", "Head Office": "Offices"})
+    department = rng.choice(np.array(["PVC", "HSE", "Utilities", "Maintenance"], dtype=object), rows)
+    return pd.DataFrame({
+        "incident_id": [f"IN-{i:04d}" for i in range(rows)],
+        "Incident Number": [f"IN-{i:04d}" for i in range(rows)],
+        "occurrence_date": pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D"),
+        "location": location,
+        "sublocation": sublocation.to_numpy(dtype=object),
+        "department": department,
+        "Department": department,
+        "Actual Consequence (Incident)": rng.choice(np.array(CONSEQUENCES[:3], dtype=object), rows),
+        # Utilities only ever reports C3, so the C5 near-miss groups have no Utilities rows
+        "Worst Case Consequence (Incident)": np.where(
+            department == "Utilities", "C3 - Severe", rng.choice(np.array(CONSEQUENCES[3:], dtype=object), rows)
+        ).astype(object),
+        "severity_score": rng.integers(0, 6, rows).astype(float),
+        "risk_score": rng.integers(1, 6, rows).astype(float),
+        "estimated_cost_impact": rng.gamma(2.0, 500.0, rows).round(2),
+    })
+
+
+def answer(df: pd.DataFrame, endpoint):
+    token = pin_request_dataset(Dataset(next_dataset_version(), {"Incident": df}, {"incident": "Incident"}))
+    try:
+        return json.loads(asyncio.run(endpoint()).body)
+    finally:
+        unpin_request_dataset(token)
+
+
+@pytest.mark.parametrize("endpoint", [
+    lambda: location_risk_treemap(dataset="incident"),
+    potential_risk_score,
+])
+def test_endpoint_matches_plain_frame(endpoint):
+    plain = make_incidents()
+    compacted = compact_frame(make_incidents())
+    assert isinstance(compacted["location"].dtype, pd.CategoricalDtype)
+    assert answer(compacted, endpoint) == answer(plain, endpoint)
+
+
+def test_filtered_rows_keep_only_used_categories():
+    compacted = compact_frame(make_incidents())
+    out = apply_analytics_filters(compacted, departments=["PVC"])
+    assert list(out["department"].cat.categories) == ["PVC"]
+    assert out["department"].value_counts().to_dict() == {"PVC": len(out)}
+    assert isinstance(apply_analytics_filters(compacted)["location"].dtype, pd.CategoricalDtype)
+    # The shared sheet itself stays compacted
+    assert isinstance(compacted["department"].dtype, pd.CategoricalDtype)
+
+
+def test_upsert_drops_unused_categories():
+    base = compact_frame(make_incidents())
+    delta = pd.DataFrame({"incident_id": base["incident_id"], "department": "HSE"})
+    merged, _ = merge_rows(base, delta, "incident_id")
+    assert list(merged["department"].cat.categories) == ["HSE"]
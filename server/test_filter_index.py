@@ -0,0 +1,111 @@
+"""Index-backed analytics filters select the same rows as plain pandas masks."""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.compaction import compact_frame
+from app.services.filters import apply_analytics_filters
+from app.services.registry import Dataset, next_dataset_version, pin_request_dataset, unpin_request_dataset
+
+
+def make_incidents(rows: int = 500) -> pd.DataFrame:
+    rng = np.random.default_rng(5)
+
+    def pick(values):
+        out = rng.choice(np.array(values, dtype=object), rows)
+        out[rng.random(rows) < 0.05] = np.nan
+        return out
+
+    dates = pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 730, rows), unit="D")
+    df = pd.DataFrame({
+        "occurrence_date": pd.Series(dates).where(rng.random(rows) > 0.05),
+        "department": pick(["PVC", "HSE", "Utilities", "pvc", "Process - EDC / VCM"]),
+        "location": pick(["Karachi", "Lahore", "Head Office", "KARACHI"]),
+        "sublocation": pick(["Plant", "Warehouse", "Offices"]),
+        "status": pick(["Open", "Closed", "In Progress"]),
+        "incident_type(s)": pick(["Near Miss", "Fire, Injury", "Injury; First Aid", "Slip, Near Miss"]),
+        "severity_score": np.where(rng.random(rows) > 0.1, rng.integers(0, 6, rows), np.nan),
+        "risk_score": rng.integers(1, 6, rows).astype(float),
+    })
+    df.index = np.arange(rows) * 2 + 7
+    return df
+
+
+def reference(df: pd.DataFrame, start_date=None, end_date=None, departments=None, locations=None,
+              sublocations=None, min_severity=None, max_severity=None, min_risk=None, max_risk=None,
+              statuses=None, incident_types=None, location=None) -> pd.Index:
+    """Row labels kept by one boolean mask per filter."""
+    keep = pd.Series(True, index=df.index)
+    dates = pd.to_datetime(df["occurrence_date"], errors="coerce")
+    if start_date:
+        keep &= dates >= pd.to_datetime(start_date)
+    if end_date:
+        keep &= dates <= pd.to_datetime(end_date)
+    for col, values in (("department", departments), ("location", locations),
+                        ("sublocation", sublocations), ("status", statuses)):
+        if values:
+            keep &= df[col].astype(str).str.lower().isin([v.lower() for v in values])
+    sev = pd.to_numeric(df["severity_score"], errors="coerce")
+    if min_severity is not None:
+        keep &= sev >= min_severity
+    if max_severity is not None:
+        keep &= sev <= max_severity
+    risk = pd.to_numeric(df["risk_score"], errors="coerce")
+    if min_risk is not None:
+        keep &= risk >= min_risk
+    if max_risk is not None:
+        keep &= risk <= max_risk
+    if incident_types:
+        keep &= df["incident_type(s)"].astype(str).apply(
+            lambda x: any(it.lower() in x.lower() for it in incident_types))
+    if location:
+        keep &= df["location"].astype(str).str.contains(location, case=False, na=False, regex=True)
+    return df.index[keep.to_numpy()]
+
+
+CASES = [
+    {},
+    {"start_date": "2023-06-01", "end_date": "2024-03-31"},
+    {"end_date": "2023-02-15"},
+    {"departments": ["pvc", "HSE"]},
+    {"locations": ["karachi"], "sublocations": ["Plant", "Offices"]},
+    {"statuses": ["open"], "min_severity": 2, "max_severity": 4},
+    {"min_risk": 3, "departments": ["Utilities"]},
+    {"incident_types": ["near miss"]},
+    {"incident_types": ["injury", "fire"], "start_date": "2023-09-01"},
+    {"location": "kar|head"},
+    {"departments": ["nan"]},
+    {"departments": ["Nobody"]},
+]
+
+
+@pytest.fixture(params=[False, True], ids=["object", "compacted"])
+def incidents(request):
+    df = make_incidents()
+    if request.param:
+        compact_frame(df)
+    # Pinned, so the frame belongs to the dataset and gets the shared index
+    token = pin_request_dataset(Dataset(next_dataset_version(), {"Incident": df}, {"incident": "Incident"}))
+    try:
+        yield df
+    finally:
+        unpin_request_dataset(token)
+
+
+@pytest.mark.parametrize("filters", CASES, ids=[",".join(c) or "none" for c in CASES])
+def test_index_matches_masks(incidents, filters):
+    expected = reference(incidents, **filters)
+    # Twice: the second call is answered from the cached row ids
+    for _ in range(2):
+        assert apply_analytics_filters(incidents, **filters).index.equals(expected)
+
+
+@pytest.mark.parametrize("filters", CASES[1:6], ids=[",".join(c) for c in CASES[1:6]])
+def test_derived_frames_match_masks(incidents, filters):
+    # A filtered copy is not part of the dataset and gets a throwaway index
+    subset = incidents.iloc[::3]
+    assert apply_analytics_filters(subset, **filters).index.equals(reference(subset, **filters))
@@ -0,0 +1,107 @@
+"""Heinrich pyramid breakdown: vectorized layers vs a per-group reference loop.
+
+The incident frame carries a non-range index (as sheets do after filtering
+or row upserts), which the previous endpoint mis-aligned its row masks on.
+"""
+import asyncio
+import json
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.routers.analytics_advanced import heinrich_pyramid_breakdown
+from app.services.classification import pyramid_flags, pyramid_layers_by_group
+from app.services.registry import Dataset, next_dataset_version, pin_request_dataset, unpin_request_dataset
+
+
+def make_incidents(rows: int = 600) -> pd.DataFrame:
+    rng = np.random.default_rng(7)
+    consequences = ["C1 - Minor", "C2 - Serious", "C3 - Severe", "Fatality", "fatal injury", None]
+    df = pd.DataFrame({
+        "occurrence_date": pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D"),
+        "department": rng.choice(["Operations", "Maintenance", "HSE", "Utilities", None], rows),
+        "location": rng.choice(["Plant A", "Plant B", "Karachi", None], rows),
+        "severity_score": np.where(rng.random(rows) > 0.1, rng.integers(0, 6, rows), np.nan),
+        "actual_consequence_incident": rng.choice(consequences, rows),
+        "worst_case_consequence_incident": rng.choice(consequences, rows),
+        "incident_type": rng.choice(["Near Miss", "near-miss; Fire", "Slip", "Injury"], rows),
+    })
+    # Shuffled, non-contiguous labels
+    df.index = rng.permutation(np.arange(rows) * 3 + 1000)
+    # Utilities never reaches severity 5, so its fatality threshold is 4
+    df.loc[df["department"] == "Utilities", "severity_score"] = df.loc[
+        df["department"] == "Utilities", "severity_score"].clip(upper=4)
+    return df
+
+
+def reference_layers(df: pd.DataFrame, group_col: str) -> dict:
+    """The per-group rules, with every mask aligned on the group's own rows."""
+    out = {}
+    for value in df[group_col].dropna().unique():
+        rows = df[df[group_col] == value]
+        sev = pd.to_numeric(rows["severity_score"], errors="coerce")
+        fat = pd.Series(False, index=rows.index)
+        for col in ("actual_consequence_incident", "worst_case_consequence_incident"):
+            fat |= rows[col].astype(str).str.contains("fatal", case=False, na=False)
+        top = sev.max(skipna=True)
+        if pd.notna(top):
+            fat |= sev >= (5 if top >= 5 else 4)
+        lti = (sev >= 3) & ~fat
+        rec = (sev >= 2) & ~(lti | fat)
+        near = rows["incident_type"].astype(str).str.contains("near miss|near-miss", case=False, na=False)
+        out[str(value)] = (int(fat.sum()), int(lti.sum()), int(rec.sum()), int(near.sum()), len(rows))
+    return out
+
+
+@pytest.fixture
+def incidents():
+    df = make_incidents()
+    token = pin_request_dataset(Dataset(next_dataset_version(), {"Incident": df}, {"incident": "Incident"}))
+    try:
+        yield df
+    finally:
+        unpin_request_dataset(token)
+
+
+@pytest.mark.parametrize("group_col", ["department", "location"])
+def test_layers_match_reference(incidents, group_col):
+    flags = pyramid_flags(incidents, "severity_score", "actual_consequence_incident",
+                          "worst_case_consequence_incident", "incident_type")
+    layers = pyramid_layers_by_group(flags, incidents[group_col], has_severity=True)
+    got = {
+        str(r.group): (r.fatalities, r.lost_workday_cases, r.recordable_injuries, r.near_misses, r.total_incidents)
+        for r in layers.itertuples(index=False)
+    }
+    assert got == reference_layers(incidents, group_col)
+    # Groups are listed in first-seen order
+    assert list(got) == [str(v) for v in incidents[group_col].dropna().unique()]
+
+
+def test_endpoint_matches_reference(incidents):
+    body = json.loads(asyncio.run(heinrich_pyramid_breakdown()).body)
+    for section, label, group_col in (("by_department", "department", "department"),
+                                      ("by_location", "location", "location")):
+        expected = reference_layers(incidents, group_col)
+        got = {
+            row[label]: (row["fatalities"], row["lost_workday_cases"], row["recordable_injuries"],
+                         row["near_misses"], row["total_incidents"])
+            for row in body[section]
+        }
+        assert got == expected, section
+
+
+def test_filtered_rows_match_reference(incidents):
+    flags = pyramid_flags(incidents, "severity_score", "actual_consequence_incident",
+                          "worst_case_consequence_incident", "incident_type")
+    keep = np.flatnonzero(incidents["occurrence_date"] >= "2023-07-01")
+    subset = incidents.iloc[keep]
+    layers = pyramid_layers_by_group(flags.iloc[keep].reset_index(drop=True), subset["department"], has_severity=True)
+    got = {
+        str(r.group): (r.fatalities, r.lost_workday_cases, r.recordable_injuries, r.near_misses, r.total_incidents)
+        for r in layers.itertuples(index=False)
+    }
+    assert got == reference_layers(subset, "department")
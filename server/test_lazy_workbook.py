@@ -0,0 +1,124 @@
+"""Lazy default-workbook sheets stay on the file version they were opened from."""
+import os
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import pandas as pd
+import pytest
+
+from app.services import excel, registry
+from app.services.lazy_workbook import LazyWorkbook
+from app.services.snapshot import file_fingerprint, write_snapshot
+
+
+def write_workbook(path: Path, tag: str) -> None:
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame({"id": [1, 2], "tag": [tag, tag]}).to_excel(writer, sheet_name="Incident", index=False)
+        pd.DataFrame({"id": [3], "tag": [tag]}).to_excel(writer, sheet_name="Hazard ID", index=False)
+
+
+def rewrite(path: Path, tag: str) -> None:
+    before = path.stat().st_mtime_ns
+    write_workbook(path, tag)
+    os.utime(path, ns=(before + 10**9, before + 10**9))  # a distinct mtime even on coarse clocks
+
+
+class _Registry:
+    reloads = 0
+
+    def reload_in_background(self):
+        self.reloads += 1
+        return True
+
+
+@pytest.fixture
+def fake_registry(monkeypatch):
+    fake = _Registry()
+    monkeypatch.setattr(registry, "get_registry", lambda: fake)
+    monkeypatch.setenv("EXCEL_COMPACT_COLUMNS", "0")
+    return fake
+
+
+def test_excel_source_refuses_changed_file(tmp_path, monkeypatch, fake_registry):
+    monkeypatch.setenv("EXCEL_SNAPSHOT_CACHE", "0")
+    path = tmp_path / "book.xlsx"
+    write_workbook(path, "old")
+    sheets = excel._open_lazy_workbook(path)
+    assert sheets.source == "excel"
+    assert sheets["Incident"]["tag"].tolist() == ["old", "old"]
+
+    rewrite(path, "new")
+    with pytest.raises(KeyError):
+        sheets["Hazard ID"]
+    assert fake_registry.reloads == 1
+    # Already parsed sheets are unaffected; a freshly opened workbook reads the new file
+    assert sheets["Incident"]["tag"].tolist() == ["old", "old"]
+    assert excel._open_lazy_workbook(path)["Hazard ID"]["tag"].tolist() == ["new"]
+
+
+def test_snapshot_source_stays_on_its_generation(tmp_path, monkeypatch, fake_registry):
+    monkeypatch.setenv("EXCEL_SNAPSHOT_CACHE", "1")
+    path = tmp_path / "book.xlsx"
+    write_workbook(path, "old")
+    assert write_snapshot(path, pd.read_excel(path, sheet_name=None))
+    sheets = excel._open_lazy_workbook(path)
+    assert sheets.source == "snapshot"
+
+    # A newer workbook and snapshot replace the generation this one was opened on
+    rewrite(path, "new")
+    assert write_snapshot(path, pd.read_excel(path, sheet_name=None), file_fingerprint(path))
+    with pytest.raises(KeyError):
+        sheets["Hazard ID"]
+    assert fake_registry.reloads == 1
+
+
+def test_snapshot_generation_gone_but_file_unchanged(tmp_path, monkeypatch, fake_registry):
+    monkeypatch.setenv("EXCEL_SNAPSHOT_CACHE", "1")
+    path = tmp_path / "book.xlsx"
+    write_workbook(path, "old")
+    assert write_snapshot(path, pd.read_excel(path, sheet_name=None))
+    sheets = excel._open_lazy_workbook(path)
+    # Same file, rewritten snapshot: the old generation is removed, the workbook is still valid
+    assert write_snapshot(path, pd.read_excel(path, sheet_name=None))
+    assert sheets["Hazard ID"]["tag"].tolist() == ["old"]
+    assert fake_registry.reloads == 0
+
+
+def lazy_loader(parsed, broken=()):
+    """Loader of two-sheet lazy workbooks that records which sheets get parsed."""
+    meta = {
+        "Incident": {"columns": ["incident_id", "occurrence_date", "severity_score", "department"], "rows": 1},
+        "Notes": {"columns": ["note"], "rows": 1},
+    }
+
+    def parse(name):
+        if name in broken:
+            raise RuntimeError("file changed")
+        parsed.append(name)
+        return pd.DataFrame({c: [1] for c in meta[name]["columns"]})
+
+    return lambda: LazyWorkbook(meta, parse, source="excel")
+
+
+def test_reload_parses_mapped_sheets_before_publishing():
+    parsed = []
+    reg = registry.DatasetRegistry(lazy_loader(parsed))
+    ds = reg.reload()
+    assert ds.selection["incident"] == "Incident"
+    assert parsed == ["Incident"]
+    # Warm-up of a replaced version stops without parsing
+    newer = reg.reload()
+    assert reg.warm_sheet(ds, "Notes") is False
+    assert not ds.sheets.is_loaded("Notes")
+    assert reg.warm_sheet(newer, "Notes") is True
+    assert newer.sheets.is_loaded("Notes")
+
+
+def test_reload_keeps_previous_version_when_mapped_sheet_fails():
+    reg = registry.DatasetRegistry(lazy_loader([]))
+    ds = reg.reload()
+    reg._loader = lazy_loader([], broken=("Incident",))
+    with pytest.raises(RuntimeError):
+        reg.reload()
+    assert reg.current() is ds
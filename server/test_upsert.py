@@ -0,0 +1,122 @@
+"""Keyed row upserts: merge_rows and the SQLite mirror."""
+import sqlite3
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services import registry, upsert
+from app.services.upsert import merge_rows, mirror_to_sqlite
+
+
+def make_base() -> pd.DataFrame:
+    return pd.DataFrame({
+        "incident_id": [1, 2, 3],
+        "status": ["Open", "Open", "Closed"],
+        "severity_score": [1.0, 2.0, 3.0],
+    }, index=[10, 20, 30])
+
+
+def test_updates_and_inserts():
+    base = make_base()
+    delta = pd.DataFrame({"incident_id": ["2", 4.0], "status": ["Closed", "Open"]})
+    merged, info = merge_rows(base, delta, "incident_id")
+    assert merged["incident_id"].tolist() == [1, 2, 3, 4]
+    assert merged["status"].tolist() == ["Open", "Closed", "Closed", "Open"]
+    # Columns missing from the delta keep their values; new rows get NaN
+    assert merged["severity_score"].tolist()[:3] == [1.0, 2.0, 3.0]
+    assert np.isnan(merged["severity_score"].iloc[3])
+    assert info["summary"] == {
+        "key": "incident_id", "received": 2, "updated": 1, "inserted": 1, "rows_before": 3, "rows_after": 4,
+    }
+    assert info["affected_keys"] == ["2", "4"]
+    # The base frame is left alone
+    assert base["status"].tolist() == ["Open", "Open", "Closed"]
+
+
+def test_duplicate_keys():
+    base = make_base()
+    delta = pd.DataFrame({"incident_id": [3, 3, None], "status": ["Pending", "Reopened", "Lost"]})
+    merged, info = merge_rows(base, delta, "incident_id")
+    # Last occurrence wins; rows without a key are dropped
+    assert merged["status"].tolist() == ["Open", "Open", "Reopened"]
+    assert info["summary"]["received"] == 1
+
+
+def test_categorical_columns_stay_categorical():
+    base = make_base()
+    base["status"] = base["status"].astype("category")
+    delta = pd.DataFrame({"incident_id": [1, 5], "status": ["Pending", "Pending"]})
+    merged, _ = merge_rows(base, delta, "incident_id")
+    assert isinstance(merged["status"].dtype, pd.CategoricalDtype)
+    assert merged["status"].tolist() == ["Pending", "Open", "Closed", "Pending"]
+    assert set(merged["status"].cat.categories) == {"Open", "Closed", "Pending"}
+
+
+def _table(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute('SELECT incident_id, status FROM "Incident" ORDER BY incident_id').fetchall()
+    finally:
+        conn.close()
+
+
+def _seed(path):
+    conn = sqlite3.connect(path)
+    try:
+        make_base().to_sql("Incident", conn, index=False)
+    finally:
+        conn.close()
+
+
+def test_mirror_replaces_affected_rows(tmp_path):
+    db = str(tmp_path / "mirror.db")
+    _seed(db)
+    merged, info = merge_rows(make_base(), pd.DataFrame({"incident_id": [2, 4], "status": ["Closed", "New"]}), "incident_id")
+    result = mirror_to_sqlite("Incident", merged, "incident_id", info["affected_keys"], db_path=db)
+    assert result == {"table": "Incident", "rows_written": 2}
+    assert _table(db) == [(1, "Open"), (2, "Closed"), (3, "Closed"), (4, "New")]
+
+
+def test_mirror_rolls_back_on_error(tmp_path):
+    db = str(tmp_path / "mirror.db")
+    _seed(db)
+    frame = make_base()
+    # A value SQLite cannot bind fails the INSERT after the DELETE ran
+    frame["status"] = pd.Series(["Open", {"bad": 1}, "Closed"], index=frame.index, dtype=object)
+    result = mirror_to_sqlite("Incident", frame, "incident_id", ["1", "2"], db_path=db)
+    assert "error" in result
+    assert _table(db) == [(1, "Open"), (2, "Open"), (3, "Closed")]
+
+
+@pytest.fixture
+def live(tmp_path, monkeypatch):
+    """A registry over an in-memory 'file' whose loads re-apply the upsert overlay."""
+    monkeypatch.setattr(upsert, "OVERLAY_DIR", tmp_path / "upserts")
+    monkeypatch.setattr(upsert, "_overlay", None)
+    reg = registry.DatasetRegistry(lambda: upsert.apply_upsert_overlay({"Incident": make_base()}))
+    monkeypatch.setattr(upsert, "get_registry", lambda: reg)
+    return reg
+
+
+def test_upserts_survive_reload_and_restart(live, monkeypatch):
+    out = upsert.upsert_sheets({"Incident": pd.DataFrame({"incident_id": [2, 9], "status": ["Closed", "New"]})},
+                               mirror_sqlite=False)
+    assert out["sheets"]["Incident"]["inserted"] == 1
+    assert live.reload().sheets["Incident"]["status"].tolist() == ["Open", "Closed", "Closed", "New"]
+    # A new process reads the persisted overlay
+    monkeypatch.setattr(upsert, "_overlay", None)
+    assert live.reload().sheets["Incident"]["incident_id"].tolist() == [1, 2, 3, 9]
+
+    upsert.clear_upsert_overlay()
+    assert live.current().sheets["Incident"]["incident_id"].tolist() == [1, 2, 3]
+
+
+def test_skipped_upsert_does_not_publish(live):
+    before = live.current().version
+    out = upsert.upsert_sheets({"nosuchsheet": pd.DataFrame({"incident_id": [1]})}, mirror_sqlite=False)
+    assert out["skipped"] == {"nosuchsheet": "unknown sheet"}
+    assert out["version"] == before == live.current().version
@@ -0,0 +1,75 @@
+"""Hazard-to-incident window join: edges of the window and a brute-force reference."""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import numpy as np
+import pandas as pd
+
+from app.analytics.hazard_incident import HazardIncidentAnalyzer, _NS_PER_DAY, _window_join
+
+
+def reference_pairs(inc_keys, inc_dates, haz_keys, haz_starts, haz_ends):
+    return [
+        (h, i)
+        for h in range(len(haz_keys))
+        for i in range(len(inc_keys))
+        if inc_keys[i] == haz_keys[h] and haz_starts[h] <= inc_dates[i] <= haz_ends[h]
+    ]
+
+
+def join(*args):
+    haz_pos, inc_pos = _window_join(*(np.asarray(a, dtype=np.int64) for a in args))
+    return list(zip(haz_pos.tolist(), inc_pos.tolist()))
+
+
+def test_window_bounds_are_inclusive():
+    day = _NS_PER_DAY
+    start, end = 10 * day, 40 * day
+    inc_dates = [start - 1, start, start + day, end, end + 1]
+    inc_keys = [0, 0, 0, 0, 0]
+    assert join(inc_keys, inc_dates, [0], [start], [end]) == [(0, 1), (0, 2), (0, 3)]
+
+
+def test_keys_must_match():
+    day = _NS_PER_DAY
+    # Same dates, different (location, department) keys
+    assert join([1, 2, 1], [day, day, 2 * day], [1, 3], [0, 0], [5 * day, 5 * day]) == [(0, 0), (0, 2)]
+
+
+def test_no_matches_and_empty_inputs():
+    assert join([0], [100], [0], [0], [50]) == []
+    assert join([], [], [0], [0], [50]) == []
+    assert join([0], [10], [], [], []) == []
+
+
+def test_matches_brute_force():
+    rng = np.random.default_rng(11)
+    inc_keys = rng.integers(0, 4, 300)
+    inc_dates = rng.integers(0, 60, 300) * _NS_PER_DAY
+    haz_keys = rng.integers(0, 4, 120)
+    haz_starts = rng.integers(0, 60, 120) * _NS_PER_DAY
+    haz_ends = haz_starts + rng.integers(0, 20, 120) * _NS_PER_DAY
+    expected = reference_pairs(inc_keys, inc_dates, haz_keys, haz_starts, haz_ends)
+    # Pairs come out by hazard, then incident position
+    assert join(inc_keys, inc_dates, haz_keys, haz_starts, haz_ends) == expected
+
+
+def test_analyzer_links_within_window_days():
+    hazards = pd.DataFrame({
+        "hazard_id": ["HZ-1", "HZ-2"],
+        "occurrence_date": pd.to_datetime(["2024-01-01", "2024-01-01"]),
+        "location": ["Karachi", "Lahore"],
+        "department": ["PVC", "PVC"],
+    })
+    incidents = pd.DataFrame({
+        "incident_id": ["IN-before", "IN-same-day", "IN-day-30", "IN-day-31", "IN-other-site"],
+        "occurrence_date": pd.to_datetime(["2023-12-31", "2024-01-01", "2024-01-31", "2024-02-01", "2024-01-10"]),
+        "location": ["Karachi", "Karachi", "Karachi", "Karachi", "Multan"],
+        "department": ["PVC", "PVC", "PVC", "PVC", "PVC"],
+    })
+    links = HazardIncidentAnalyzer(incidents, hazards, window_days=30).links_df
+    assert links[["hazard_id", "incident_id", "days_to_incident"]].values.tolist() == [
+        ["HZ-1", "IN-same-day", 0],
+        ["HZ-1", "IN-day-30", 30],
+    ]